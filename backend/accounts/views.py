@@ -300,18 +300,8 @@ def login_user(request):
             
             # Associate any unassociated loan applications with this user based on email
             try:
-                from loans.models import LoanApplication
-                # Find applications with the same email but no user
-                user_email = user.email.lower()
-                unassociated_apps = LoanApplication.objects.filter(
-                    user=None,
-                    personal_info__email__iexact=user_email
-                )
-                
-                # Associate these applications with the current user
-                if unassociated_apps.exists():
-                    print(f"Login: Associating {unassociated_apps.count()} applications with user {user}")
-                    unassociated_apps.update(user=user)
+                from loans.dashboard import associate_by_email
+                associate_by_email(user)
             except Exception as e:
                 print(f"Error associating applications: {str(e)}")
             
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import AdminProfile
+from .models import AdminProfile, DailyStats
 
 @admin.register(AdminProfile)
 class AdminProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'department', 'position', 'created_at')
     search_fields = ('user__email', 'user__username', 'department', 'position')
-    list_filter = ('department', 'position', 'created_at')
\ No newline at end of file
+    list_filter = ('department', 'position', 'created_at')
+
+
+@admin.register(DailyStats)
+class DailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('date', 'kind', 'status', 'count', 'amount', 'updated_at')
+    list_filter = ('kind', 'status')
+    date_hierarchy = 'date'
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_app import rollups
+
+
+class Command(BaseCommand):
+    help = 'Compare the DailyStats rollups with live aggregates over the user and loan application tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild the rollups when they differ',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = rollups.diff()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Daily stats match the live aggregates'))
+            return
+
+        for kind, date, status, (stored_count, stored_amount), (live_count, live_amount) in mismatches:
+            self.stdout.write(
+                f'{kind} {date} {status}: rollup {stored_count} / {stored_amount}, '
+                f'live {live_count} / {live_amount}'
+            )
+
+        if options['fix']:
+            count = rollups.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatches)} buckets differed; rebuilt {count} rows'))
+            return
+        raise CommandError(f'{len(mismatches)} daily stats buckets differ; run with --fix or rebuild_daily_stats')
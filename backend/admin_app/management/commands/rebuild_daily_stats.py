@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from admin_app import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DailyStats rollups from the user and loan application tables'
+
+    def handle(self, *args, **options):
+        count = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} daily stats rows'))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:16
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+USER_STATUSES = {
+    (True, True): 'active',
+    (True, False): 'pending',
+    (False, True): 'suspended',
+    (False, False): 'suspended_pending',
+}
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Fill the rollups from the existing rows (same buckets as admin_app.rollups)"""
+    DailyStats = apps.get_model('admin_app', 'DailyStats')
+    LoanApplication = apps.get_model('loans', 'LoanApplication')
+    User = apps.get_model('accounts', 'User')
+
+    rows = []
+    loans = LoanApplication.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        count=Count('id'), amount=Sum('amount'),
+    ).order_by()
+    for row in loans:
+        rows.append(DailyStats(kind='loan', date=row['day'], status=row['status'], count=row['count'], amount=row['amount'] or 0))
+
+    users = User.objects.filter(user_type='user').annotate(day=TruncDate('created_at')).values(
+        'day', 'is_active', 'is_verified',
+    ).annotate(count=Count('id')).order_by()
+    for row in users:
+        status = USER_STATUSES[(row['is_active'], row['is_verified'])]
+        rows.append(DailyStats(kind='user', date=row['day'], status=status, count=row['count']))
+
+    DailyStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_app', '0001_initial'),
+        ('accounts', '0002_user_date_of_birth'),
+        ('loans', '0020_ai_call_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('loan', 'Loan application'), ('user', 'User signup')], max_length=10)),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily stats',
+                'ordering': ['-date', 'kind', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'date', 'status'), name='unique_daily_stats_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
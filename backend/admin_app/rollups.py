@@ -0,0 +1,205 @@
+"""
+DailyStats rollups: users and loan applications counted by creation day and
+current status.
+
+Signals (admin_app.signals) move an object between buckets as it changes,
+inside the transaction of the save, so the rollups stay in step with the fact
+tables. Bulk decisions (loans.decisions) send applications_decided for
+their UPDATEs; other writes that bypass signals (queryset.update(),
+bulk_create(), raw SQL) are not tracked, so run `manage.py rebuild_daily_stats`
+after them.
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Count, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# User states tracked by the rollups (is_active, is_verified)
+USER_STATUSES = {
+    (True, True): 'active',
+    (True, False): 'pending',
+    (False, True): 'suspended',
+    (False, False): 'suspended_pending',
+}
+
+# Loan statuses counted as approved on the dashboard
+APPROVED_LOAN_STATUSES = ('approved', 'active', 'disbursed')
+
+# Fields whose change can move an object to another bucket
+LOAN_FIELDS = frozenset(['status', 'amount', 'created_at'])
+USER_FIELDS = frozenset(['user_type', 'is_active', 'is_verified', 'created_at'])
+
+
+def user_status(user):
+    return USER_STATUSES[(bool(user.is_active), bool(user.is_verified))]
+
+
+def loan_bucket(application):
+    """(kind, date, status, amount) the application is counted in"""
+    if application.created_at is None:
+        return None
+    return 'loan', timezone.localdate(application.created_at), application.status, Decimal(str(application.amount or 0))
+
+
+def user_bucket(user):
+    """(kind, date, status, amount) the user is counted in, or None for admins"""
+    if user.user_type != 'user' or user.created_at is None:
+        return None
+    return 'user', timezone.localdate(user.created_at), user_status(user), Decimal(0)
+
+
+def apply_delta(kind, date, status, count, amount):
+    """Add count/amount to a bucket, creating its row if needed"""
+    from .models import DailyStats
+
+    rows = DailyStats.objects.filter(kind=kind, date=date, status=status)
+    if rows.update(count=F('count') + count, amount=F('amount') + amount):
+        return
+    try:
+        with transaction.atomic():
+            DailyStats.objects.create(kind=kind, date=date, status=status, count=count, amount=amount)
+    except IntegrityError:
+        # Another transaction created the row first
+        rows.update(count=F('count') + count, amount=F('amount') + amount)
+
+
+def move(previous, current):
+    """Move an object from bucket `previous` to `current` (either may be None)"""
+    if previous == current:
+        return
+    if previous is not None:
+        kind, date, status, amount = previous
+        apply_delta(kind, date, status, -1, -amount)
+    if current is not None:
+        kind, date, status, amount = current
+        apply_delta(kind, date, status, 1, amount)
+
+
+def move_many(moves):
+    """
+    Apply many (previous, current) moves, one update per bucket touched
+    rather than two per object.
+    """
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for previous, current in moves:
+        if previous == current:
+            continue
+        for bucket, sign in ((previous, -1), (current, 1)):
+            if bucket is not None:
+                kind, date, status, amount = bucket
+                deltas[(kind, date, status)][0] += sign
+                deltas[(kind, date, status)][1] += sign * amount
+    for (kind, date, status), (count, amount) in deltas.items():
+        if count or amount:
+            apply_delta(kind, date, status, count, amount)
+
+
+def live_rows():
+    """
+    Rollup rows computed from the fact tables.
+
+    Returns:
+        dict: {(kind, date, status): (count, amount)}
+    """
+    from accounts.models import User
+    from loans.models import LoanApplication
+
+    rows = {}
+    loans = LoanApplication.objects.annotate(day=TruncDate('created_at')).values('day', 'status').annotate(
+        count=Count('id'), amount=Sum('amount'),
+    ).order_by()
+    for row in loans:
+        rows[('loan', row['day'], row['status'])] = (row['count'], row['amount'] or Decimal(0))
+
+    state = Case(
+        *[When(is_active=active, is_verified=verified, then=Value(name)) for (active, verified), name in USER_STATUSES.items()],
+        output_field=CharField(),
+    )
+    users = User.objects.filter(user_type='user').annotate(day=TruncDate('created_at'), state=state).values(
+        'day', 'state',
+    ).annotate(count=Count('id')).order_by()
+    for row in users:
+        rows[('user', row['day'], row['state'])] = (row['count'], Decimal(0))
+    return rows
+
+
+def stored_rows():
+    """Non-empty DailyStats rows as {(kind, date, status): (count, amount)}"""
+    from .models import DailyStats
+
+    return {
+        (row.kind, row.date, row.status): (row.count, row.amount)
+        for row in DailyStats.objects.all()
+        if row.count or row.amount
+    }
+
+
+def diff():
+    """
+    Buckets where the rollups disagree with the fact tables.
+
+    Returns:
+        list: (kind, date, status, stored (count, amount), live (count, amount))
+    """
+    live = live_rows()
+    stored = stored_rows()
+    empty = (0, Decimal(0))
+    mismatches = []
+    for key in sorted(set(live) | set(stored), key=lambda key: (key[0], key[1], key[2])):
+        if live.get(key, empty) != stored.get(key, empty):
+            mismatches.append((*key, stored.get(key, empty), live.get(key, empty)))
+    return mismatches
+
+
+@transaction.atomic
+def rebuild():
+    """Replace every rollup row with live aggregates; returns the number of rows"""
+    from .models import DailyStats
+
+    DailyStats.objects.all().delete()
+    rows = [
+        DailyStats(kind=kind, date=date, status=status, count=count, amount=amount)
+        for (kind, date, status), (count, amount) in live_rows().items()
+    ]
+    DailyStats.objects.bulk_create(rows, batch_size=1000)
+    logger.info(f"Rebuilt {len(rows)} daily stats rows")
+    return len(rows)
+
+
+class Rollups:
+    """
+    DailyStats loaded for a dashboard: all-time totals per status, plus the
+    per-day rows from `since` for windowed sums.
+    """
+
+    def __init__(self, since):
+        from .models import DailyStats
+
+        self.totals = defaultdict(lambda: [0, Decimal(0)])
+        for row in DailyStats.objects.values('kind', 'status').annotate(count=Sum('count'), amount=Sum('amount')).order_by():
+            self.totals[(row['kind'], row['status'])] = [row['count'] or 0, row['amount'] or Decimal(0)]
+        self.days = list(DailyStats.objects.filter(date__gte=since).values_list('kind', 'date', 'status', 'count', 'amount'))
+
+    def total(self, kind, statuses=None, field='count'):
+        index = 0 if field == 'count' else 1
+        return sum(
+            (value[index] for (row_kind, status), value in self.totals.items()
+             if row_kind == kind and (statuses is None or status in statuses)),
+            0 if field == 'count' else Decimal(0),
+        )
+
+    def window(self, kind, start, end, statuses=None, field='count'):
+        """Sum over days in [start, end)"""
+        index = 3 if field == 'count' else 4
+        return sum(
+            (row[index] for row in self.days
+             if row[0] == kind and start <= row[1] < end and (statuses is None or row[2] in statuses)),
+            0 if field == 'count' else Decimal(0),
+        )
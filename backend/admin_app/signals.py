@@ -0,0 +1,69 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from loans.decisions import applications_decided
+from loans.models import LoanApplication
+
+from . import rollups
+
+
+def _remember_bucket(instance, bucket, fields, update_fields):
+    """Store the bucket the saved row is counted in before this save"""
+    instance._daily_stats_previous = None
+    if instance.pk is None or instance._state.adding:
+        return
+    if update_fields is not None and not fields.intersection(update_fields):
+        # None of the bucket fields are written; skip the lookup
+        instance._daily_stats_previous = bucket(instance)
+        return
+    previous = type(instance)._base_manager.filter(pk=instance.pk).first()
+    instance._daily_stats_previous = bucket(previous) if previous is not None else None
+
+
+@receiver(pre_save, sender=LoanApplication)
+def remember_loan_bucket(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        _remember_bucket(instance, rollups.loan_bucket, rollups.LOAN_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=LoanApplication)
+def update_loan_rollup(sender, instance, created, raw=False, **kwargs):
+    """Count a new application, or move it when its status, amount or day changed"""
+    if not raw:
+        rollups.move(getattr(instance, '_daily_stats_previous', None), rollups.loan_bucket(instance))
+
+
+@receiver(post_delete, sender=LoanApplication)
+def remove_loan_from_rollup(sender, instance, **kwargs):
+    rollups.move(rollups.loan_bucket(instance), None)
+
+
+@receiver(applications_decided)
+def move_decided_loans(sender, decided, **kwargs):
+    """Follow bulk decisions, which change statuses with UPDATEs instead of save()"""
+    moves = []
+    for application, previous_status in decided:
+        current = rollups.loan_bucket(application)
+        if current is not None:
+            kind, date, _, amount = current
+            moves.append(((kind, date, previous_status, amount), current))
+    rollups.move_many(moves)
+
+
+@receiver(pre_save, sender=User)
+def remember_user_bucket(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        _remember_bucket(instance, rollups.user_bucket, rollups.USER_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def update_user_rollup(sender, instance, created, raw=False, **kwargs):
+    """Count a signup, or move the user when they are suspended, verified, etc."""
+    if not raw:
+        rollups.move(getattr(instance, '_daily_stats_previous', None), rollups.user_bucket(instance))
+
+
+@receiver(post_delete, sender=User)
+def remove_user_from_rollup(sender, instance, **kwargs):
+    rollups.move(rollups.user_bucket(instance), None)
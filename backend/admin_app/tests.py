@@ -1,3 +1,184 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from loans.models import LoanApplication
+from loans.tests import create_application
+from . import rollups
+from .models import DailyStats
+
+
+class AdminUserListTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.borrowed = {}
+        for i in range(7):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='pass12345')
+            # Pairs of users with the same total exercise the id tie-break
+            amount = 1000 * (i // 2)
+            if amount:
+                create_application(user=user, amount=amount, status='approved')
+            create_application(user=user, amount=99999, status='rejected')
+            self.borrowed[user.id] = amount
+
+    def fetch(self, **params):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/admin/users/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(queries)
+
+    def test_keyset_pages_cover_every_user_in_order(self):
+        data, first_queries = self.fetch(sortBy='totalBorrowed', sortOrder='desc', pageSize=3)
+        seen = list(data['users'])
+        while data['nextCursor']:
+            data, queries = self.fetch(sortBy='totalBorrowed', sortOrder='desc', pageSize=3, cursor=data['nextCursor'])
+            # No count on cursor pages
+            self.assertEqual(queries, first_queries - 1)
+            self.assertNotIn('total', data)
+            seen.extend(data['users'])
+
+        self.assertEqual(len({user['id'] for user in seen}), 7)
+        self.assertEqual([user['totalBorrowed'] for user in seen], sorted(self.borrowed.values(), reverse=True))
+        for user in seen:
+            self.assertEqual(user['totalBorrowed'], self.borrowed[user['id']])
+
+    def test_keyset_pages_match_offset_pages(self):
+        for sort_by in ('createdDate', 'email', 'activeLoans'):
+            offset_ids = []
+            for page in (1, 2, 3):
+                offset_ids += [user['id'] for user in self.fetch(sortBy=sort_by, sortOrder='asc', pageSize=3, page=page)[0]['users']]
+
+            data, _ = self.fetch(sortBy=sort_by, sortOrder='asc', pageSize=3)
+            keyset_ids = [user['id'] for user in data['users']]
+            while data['nextCursor']:
+                data, _ = self.fetch(sortBy=sort_by, sortOrder='asc', pageSize=3, cursor=data['nextCursor'])
+                keyset_ids += [user['id'] for user in data['users']]
+
+            self.assertEqual(keyset_ids, offset_ids, sort_by)
+
+    def test_page_size_is_clamped_and_last_page_has_no_cursor(self):
+        self.assertEqual(len(self.fetch(pageSize=0)[0]['users']), 1)
+        self.assertEqual(len(self.fetch(pageSize=-5)[0]['users']), 1)
+        with mock.patch('admin_app.views.MAX_USER_PAGE_SIZE', 2):
+            self.assertEqual(self.fetch(pageSize=50)[0]['pageSize'], 2)
+
+        data, _ = self.fetch(pageSize=7)
+        self.assertEqual(len(data['users']), 7)
+        self.assertIsNone(data['nextCursor'])
+        self.assertIsNone(self.fetch(pageSize=4, page=2)[0]['nextCursor'])
+
+    def test_unknown_sort_and_bad_cursor(self):
+        self.assertEqual(self.fetch(sortBy='creditScore')[0]['total'], 7)
+        response = self.client.get('/api/admin/users/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AdminDashboardStatisticsTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def backdate(self, obj, **delta):
+        # A model save, so the DailyStats signals move the row to its new day
+        obj.created_at = timezone.now() - timedelta(**delta)
+        obj.save(update_fields=['created_at'])
+
+    def test_statistics_in_two_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        recent = User.objects.create_user(username='recent', email='recent@example.com', password='pass12345', is_verified=True)
+        old = User.objects.create_user(username='old', email='old@example.com', password='pass12345')
+        self.backdate(recent, days=1)
+        self.backdate(old, days=40)
+        self.backdate(create_application(user=recent, amount=1000, status='pending'), hours=1)
+        self.backdate(create_application(user=recent, amount=4000, status='approved'), days=10)
+        self.backdate(create_application(user=recent, amount=6000, status='active'), days=40)
+        self.backdate(create_application(user=old, amount=9000, status='rejected'), days=40)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/admin/dashboard/statistics/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 2)
+        data = response.data
+        self.assertEqual(
+            {key: data['users'][key] for key in ('total', 'active', 'newThisMonth')},
+            {'total': 2, 'active': 1, 'newThisMonth': 1},
+        )
+        self.assertEqual(
+            {key: data['loans'][key] for key in ('total', 'pending', 'approved', 'active', 'totalAmount', 'approvalRate')},
+            {'total': 4, 'pending': 1, 'approved': 2, 'active': 1, 'totalAmount': 10000.0, 'approvalRate': 50.0},
+        )
+        self.assertAlmostEqual(data['revenue']['total'], 1000.0)
+        self.assertAlmostEqual(data['revenue']['monthly'], 400.0)
+        self.assertEqual(data['revenue']['totalPayments'], 2)
+        self.assertEqual(len(data['charts']['userGrowth']), 9)
+        self.assertEqual(data['charts']['loanTrends'], {
+            'approved': [0, 0, 1, 0],
+            'pending': [0, 0, 0, 1],
+            'rejected': [0, 0, 0, 0],
+        })
+
+    def test_user_statistics_from_rollups(self):
+        active = User.objects.create_user(username='active', email='active@example.com', password='pass12345', is_verified=True)
+        User.objects.create_user(username='pending', email='pending@example.com', password='pass12345')
+        suspended = User.objects.create_user(username='suspended', email='suspended@example.com', password='pass12345')
+        suspended.is_active = False
+        suspended.save()
+        self.backdate(active, days=40)
+
+        response = self.client.get('/api/admin/users/statistics/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'total': 3, 'active': 1, 'suspended': 1, 'pending': 2, 'newUsersLast30Days': 2,
+        })
+
+
+class DailyStatsTestCase(TestCase):
+    def rows(self, kind='loan'):
+        return {
+            (row.status, row.count, row.amount)
+            for row in DailyStats.objects.filter(kind=kind)
+            if row.count
+        }
+
+    def test_signals_follow_status_changes(self):
+        from decimal import Decimal
+
+        user = User.objects.create_user(username='rollup', email='rollup@example.com', password='pass12345')
+        application = create_application(user=user, amount=5000, status='pending')
+        other = create_application(user=user, amount=3000, status='pending')
+        self.assertEqual(self.rows(), {('pending', 2, Decimal('8000.00'))})
+
+        application.status = 'approved'
+        application.save()
+        other.delete()
+        self.assertEqual(self.rows(), {('approved', 1, Decimal('5000.00'))})
+        self.assertEqual(self.rows('user'), {('pending', 1, Decimal('0.00'))})
+
+    def test_check_detects_and_fixes_drift(self):
+        application = create_application(amount=5000, status='pending')
+        # Queryset updates bypass the signals
+        LoanApplication.objects.filter(pk=application.pk).update(status='rejected')
+        self.assertEqual(len(rollups.diff()), 2)
 
-# Create your tests here.
+        with self.assertRaises(CommandError):
+            call_command('check_daily_stats', stdout=io.StringIO())
+        call_command('check_daily_stats', '--fix', stdout=io.StringIO())
+        self.assertEqual(rollups.diff(), [])
+        call_command('check_daily_stats', stdout=io.StringIO())
@@ -12,4 +12,10 @@ urlpatterns = [
     path('users/bulk-update/', views.bulk_update_users, name='bulk_update_users'),
     path('users/bulk-delete/', views.bulk_delete_users, name='bulk_delete_users'),
     path('users/statistics/', views.get_user_statistics, name='get_user_statistics'),
+    
+    # AI
+    path('ai/cache/statistics/', views.get_ai_cache_statistics, name='get_ai_cache_statistics'),
+    path('ai/gateway/status/', views.get_ai_gateway_status, name='get_ai_gateway_status'),
+    path('ai/prescreen/statistics/', views.get_ai_prescreen_statistics, name='get_ai_prescreen_statistics'),
+    path('ai/calls/statistics/', views.get_ai_call_statistics, name='get_ai_call_statistics'),
 ]
\ No newline at end of file
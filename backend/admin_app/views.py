@@ -1,4 +1,10 @@
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+
 from django.shortcuts import render
+from django.utils.dateparse import parse_datetime
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -56,11 +62,56 @@ def update_admin_profile(request):
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+# sortBy values accepted by get_all_users: (ORDER BY expression, cursor value parser).
+# Anything else falls back to created_at.
+USER_SORT_FIELDS = {
+    'created_at': ('created_at', parse_datetime),
+    'createdDate': ('created_at', parse_datetime),
+    'name': ('first_name', str),
+    'username': ('username', str),
+    'email': ('email', str),
+    'totalBorrowed': ('total_borrowed', Decimal),
+    'activeLoans': ('active_loans', int),
+}
+
+# Loan statuses counted in a user's total borrowed amount
+BORROWED_LOAN_STATUSES = ['approved', 'disbursed', 'active']
+
+# Largest pageSize get_all_users will serve
+MAX_USER_PAGE_SIZE = 100
+
+
+def _encode_cursor(value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, Decimal):
+        value = str(value)
+    return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+
+def _decode_cursor(cursor, parse):
+    """(sort value, pk) from a cursor, or None if it is malformed"""
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value = parse(value)
+        if value is None:
+            return None
+        return value, int(pk)
+    except (ValueError, TypeError, ArithmeticError):
+        return None
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_all_users(request):
     """
     Get all regular users with pagination, search, and filters (admin only)
+
+    Loan statistics are annotated onto the user query, so a page is one query
+    plus the total count. Pass the returned `nextCursor` as `cursor` to page
+    with a keyset (WHERE sort key > last row) instead of an OFFSET, which stays
+    fast at deep pages; `page` is still accepted for the first pages. Cursor
+    pages skip the count, so they have no `total` or `totalPages`.
     """
     if not request.user.is_admin_user:
         return Response(
@@ -69,15 +120,20 @@ def get_all_users(request):
         )
     
     # Get query parameters
-    page = int(request.GET.get('page', 1))
-    page_size = int(request.GET.get('pageSize', 12))
+    try:
+        page = max(1, int(request.GET.get('page', 1)))
+        page_size = max(1, min(int(request.GET.get('pageSize', 12)), MAX_USER_PAGE_SIZE))
+    except ValueError:
+        return Response({"error": "page and pageSize must be integers"}, status=status.HTTP_400_BAD_REQUEST)
     search = request.GET.get('search', '').strip()
     status_filter = request.GET.get('status', '')
     sort_by = request.GET.get('sortBy', 'created_at')
     sort_order = request.GET.get('sortOrder', 'desc')
+    cursor = request.GET.get('cursor', '')
     
     # Start with base queryset
-    from django.db.models import Q, Sum, Count
+    from django.db.models import Q, Sum, Count, Value, DecimalField, OuterRef, Subquery
+    from django.db.models.functions import Coalesce
     users_query = User.objects.filter(user_type='user')
     
     # Apply search filter
@@ -100,32 +156,56 @@ def get_all_users(request):
         elif status_filter == 'verified':
             users_query = users_query.filter(is_verified=True)
     
-    # Apply sorting
-    sort_field = sort_by
-    if sort_order == 'desc':
-        sort_field = f'-{sort_field}'
-    users_query = users_query.order_by(sort_field)
-    
-    # Get total count
-    total = users_query.count()
-    
+    # Get total count (before the loan statistics are added); a cursor page
+    # has already been counted by the first one
+    total = None if cursor else users_query.count()
+
+    # Loan statistics for every user on the page in the same query. Correlated
+    # subqueries rather than a JOIN + GROUP BY, so sorting by a user column only
+    # aggregates the loans of the rows on the page.
+    from loans.models import LoanApplication
+    user_loans = LoanApplication.objects.filter(user=OuterRef('pk')).order_by().values('user')
+    users_query = users_query.annotate(
+        total_borrowed=Coalesce(
+            Subquery(user_loans.filter(status__in=BORROWED_LOAN_STATUSES).annotate(total=Sum('amount')).values('total')),
+            Value(0),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+        active_loans=Coalesce(
+            Subquery(user_loans.filter(status='active').annotate(count=Count('pk')).values('count')),
+            Value(0),
+        ),
+    )
+
+    # Apply sorting; the primary key breaks ties so the keyset is unique
+    sort_field, parse_sort_value = USER_SORT_FIELDS.get(sort_by, USER_SORT_FIELDS['created_at'])
+    descending = sort_order == 'desc'
+    if descending:
+        users_query = users_query.order_by(f'-{sort_field}', '-id')
+    else:
+        users_query = users_query.order_by(sort_field, 'id')
+
     # Apply pagination
-    start = (page - 1) * page_size
-    end = start + page_size
-    users = users_query[start:end]
+    if cursor:
+        position = _decode_cursor(cursor, parse_sort_value)
+        if position is None:
+            return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        value, last_id = position
+        lookup = 'lt' if descending else 'gt'
+        users_query = users_query.filter(
+            Q(**{f'{sort_field}__{lookup}': value}) | Q(**{sort_field: value, f'id__{lookup}': last_id})
+        )
+    else:
+        users_query = users_query[(page - 1) * page_size:]
+
+    # One extra row tells whether there is a next page
+    users = list(users_query[:page_size + 1])
+    has_next = len(users) > page_size
+    users = users[:page_size]
     
     # Format user data with loan statistics
-    from loans.models import LoanApplication
     user_data = []
     for user in users:
-        # Get user's loan statistics
-        user_loans = LoanApplication.objects.filter(user=user)
-        total_borrowed = user_loans.filter(
-            status__in=['approved', 'disbursed', 'active']
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        active_loans_count = user_loans.filter(status='active').count()
-        
         # Determine user status
         if not user.is_active:
             user_status = 'suspended'
@@ -146,19 +226,27 @@ def get_all_users(request):
             'created_at': user.created_at.isoformat() if user.created_at else None,
             'createdDate': user.created_at.isoformat() if user.created_at else None,
             'last_login': user.last_login.isoformat() if user.last_login else None,
-            'totalBorrowed': float(total_borrowed),
-            'activeLoans': active_loans_count,
+            'totalBorrowed': float(user.total_borrowed),
+            'activeLoans': user.active_loans,
             'creditScore': 720,  # Default for now - can be extended with a credit score model
             'accountBalance': 0,  # Can be extended with account balance tracking
         })
+
+    next_cursor = None
+    if has_next:
+        last = users[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_field), last.id)
     
-    return Response({
+    response_data = {
         "users": user_data,
-        "total": total,
         "page": page,
         "pageSize": page_size,
-        "totalPages": (total + page_size - 1) // page_size
-    })
+        "nextCursor": next_cursor,
+    }
+    if total is not None:
+        response_data["total"] = total
+        response_data["totalPages"] = (total + page_size - 1) // page_size
+    return Response(response_data)
 
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
@@ -354,20 +442,21 @@ def get_user_statistics(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    from django.db.models import Count, Q
-    from datetime import datetime, timedelta
+    from datetime import timedelta
+    from django.utils import timezone
+    from .rollups import Rollups
+    
+    # Read from the DailyStats rollups rather than counting the user table
+    today = timezone.localdate()
+    stats = Rollups(since=today - timedelta(days=29))
     
-    total_users = User.objects.filter(user_type='user').count()
-    active_users = User.objects.filter(user_type='user', is_active=True, is_verified=True).count()
-    suspended_users = User.objects.filter(user_type='user', is_active=False).count()
-    pending_users = User.objects.filter(user_type='user', is_verified=False).count()
+    total_users = stats.total('user')
+    active_users = stats.total('user', ['active'])
+    suspended_users = stats.total('user', ['suspended', 'suspended_pending'])
+    pending_users = stats.total('user', ['pending', 'suspended_pending'])
     
     # Users created in last 30 days
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    new_users = User.objects.filter(
-        user_type='user',
-        created_at__gte=thirty_days_ago
-    ).count()
+    new_users = stats.window('user', today - timedelta(days=29), today + timedelta(days=1))
     
     return Response({
         "total": total_users,
@@ -389,28 +478,57 @@ def get_dashboard_statistics(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    from django.db.models import Count, Sum, Avg, Q
-    from datetime import datetime, timedelta
-    from loans.models import LoanApplication
-    
-    # Date calculations
-    now = datetime.now()
-    thirty_days_ago = now - timedelta(days=30)
-    last_month_start = (now.replace(day=1) - timedelta(days=1)).replace(day=1)
-    last_month_end = now.replace(day=1) - timedelta(days=1)
+    from datetime import timedelta
+    from django.utils import timezone
+    from .rollups import APPROVED_LOAN_STATUSES, Rollups
+    
+    # Date calculations. Statistics come from the DailyStats rollups, so every
+    # window is a range of whole days: [start, end)
+    today = timezone.localdate()
+    first_of_month = today.replace(day=1)
+    tomorrow = today + timedelta(days=1)
+    this_month = (today - timedelta(days=29), tomorrow)
+    last_month = ((first_of_month - timedelta(days=1)).replace(day=1), first_of_month)
+
+    # Chart windows: 9 rolling 30-day months of user sign-ups, 4 rolling weeks of loans
+    month_windows = []
+    for i in range(8, -1, -1):
+        month_start = first_of_month - timedelta(days=i*30)
+        month_windows.append((month_start, month_start + timedelta(days=30)))
+    week_windows = [
+        (tomorrow - timedelta(days=(i+1)*7), tomorrow - timedelta(days=i*7))
+        for i in range(3, -1, -1)
+    ]
+
+    # Two queries on the rollup table: totals per status, and the days the windows cover
+    stats = Rollups(since=min(month_windows[0][0], last_month[0], this_month[0], week_windows[0][0]))
+    approved = APPROVED_LOAN_STATUSES
+
+    user_stats = {
+        'total': stats.total('user'),
+        'active': stats.total('user', ['active']),
+        'new_this_month': stats.window('user', *this_month),
+        'new_last_month': stats.window('user', *last_month),
+    }
+    loan_stats = {
+        'total': stats.total('loan'),
+        'pending': stats.total('loan', ['pending']),
+        'approved': stats.total('loan', approved),
+        'rejected': stats.total('loan', ['rejected']),
+        'active': stats.total('loan', ['active']),
+        'approved_amount': stats.total('loan', approved, field='amount'),
+        'this_month': stats.window('loan', *this_month),
+        'last_month': stats.window('loan', *last_month),
+        'approved_amount_this_month': stats.window('loan', *this_month, statuses=approved, field='amount'),
+        'approved_amount_last_month': stats.window('loan', *last_month, statuses=approved, field='amount'),
+    }
+    week_statuses = {'approved': approved, 'pending': ['pending'], 'rejected': ['rejected']}
     
     # User Statistics
-    total_users = User.objects.filter(user_type='user').count()
-    active_users = User.objects.filter(user_type='user', is_active=True, is_verified=True).count()
-    new_users_this_month = User.objects.filter(
-        user_type='user',
-        created_at__gte=thirty_days_ago
-    ).count()
-    new_users_last_month = User.objects.filter(
-        user_type='user',
-        created_at__gte=last_month_start,
-        created_at__lte=last_month_end
-    ).count()
+    total_users = user_stats['total']
+    active_users = user_stats['active']
+    new_users_this_month = user_stats['new_this_month']
+    new_users_last_month = user_stats['new_last_month']
     
     # Calculate user growth percentage
     if new_users_last_month > 0:
@@ -419,23 +537,16 @@ def get_dashboard_statistics(request):
         user_growth = 100 if new_users_this_month > 0 else 0
     
     # Loan Statistics
-    total_loans = LoanApplication.objects.count()
-    pending_loans = LoanApplication.objects.filter(status='pending').count()
-    approved_loans = LoanApplication.objects.filter(status__in=['approved', 'active', 'disbursed']).count()
-    rejected_loans = LoanApplication.objects.filter(status='rejected').count()
-    active_loans = LoanApplication.objects.filter(status='active').count()
-    
-    total_loan_amount = LoanApplication.objects.filter(
-        status__in=['approved', 'active', 'disbursed']
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    loans_this_month = LoanApplication.objects.filter(
-        created_at__gte=thirty_days_ago
-    ).count()
-    loans_last_month = LoanApplication.objects.filter(
-        created_at__gte=last_month_start,
-        created_at__lte=last_month_end
-    ).count()
+    total_loans = loan_stats['total']
+    pending_loans = loan_stats['pending']
+    approved_loans = loan_stats['approved']
+    rejected_loans = loan_stats['rejected']
+    active_loans = loan_stats['active']
+    
+    total_loan_amount = loan_stats['approved_amount'] or 0
+    
+    loans_this_month = loan_stats['this_month']
+    loans_last_month = loan_stats['last_month']
     
     # Calculate loan growth percentage
     if loans_last_month > 0:
@@ -451,26 +562,17 @@ def get_dashboard_statistics(request):
     
     # Payment/Revenue Statistics (calculated from loans since no Payment model exists)
     # Estimate revenue as 10% of total approved loan amounts (interest + fees)
-    total_approved_amount = LoanApplication.objects.filter(
-        status__in=['approved', 'active', 'disbursed']
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    total_approved_amount = total_loan_amount
     
-    total_revenue = total_approved_amount * 0.10  # 10% estimated revenue rate
+    total_revenue = float(total_approved_amount) * 0.10  # 10% estimated revenue rate
     
-    monthly_loans_amount = LoanApplication.objects.filter(
-        status__in=['approved', 'active', 'disbursed'],
-        created_at__gte=thirty_days_ago
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    monthly_loans_amount = loan_stats['approved_amount_this_month'] or 0
     
-    monthly_revenue = monthly_loans_amount * 0.10
+    monthly_revenue = float(monthly_loans_amount) * 0.10
     
-    last_month_loans_amount = LoanApplication.objects.filter(
-        status__in=['approved', 'active', 'disbursed'],
-        created_at__gte=last_month_start,
-        created_at__lte=last_month_end
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    last_month_loans_amount = loan_stats['approved_amount_last_month'] or 0
     
-    last_month_revenue = last_month_loans_amount * 0.10
+    last_month_revenue = float(last_month_loans_amount) * 0.10
     
     # Total payments count (using approved loans as proxy)
     total_payments = approved_loans
@@ -482,46 +584,13 @@ def get_dashboard_statistics(request):
         revenue_growth = 100 if monthly_revenue > 0 else 0
     
     # Chart data - Last 9 months user growth
-    user_growth_chart = []
-    for i in range(8, -1, -1):
-        month_start = (now.replace(day=1) - timedelta(days=i*30))
-        month_end = month_start + timedelta(days=30)
-        count = User.objects.filter(
-            user_type='user',
-            created_at__gte=month_start,
-            created_at__lt=month_end
-        ).count()
-        user_growth_chart.append(count)
+    user_growth_chart = [stats.window('user', start, end) for start, end in month_windows]
     
     # Chart data - Last 4 weeks loan trends
     loan_trends_chart = {
-        'approved': [],
-        'pending': [],
-        'rejected': []
+        name: [stats.window('loan', start, end, statuses=statuses) for start, end in week_windows]
+        for name, statuses in week_statuses.items()
     }
-    for i in range(3, -1, -1):
-        week_start = now - timedelta(days=(i+1)*7)
-        week_end = now - timedelta(days=i*7)
-        
-        approved = LoanApplication.objects.filter(
-            status__in=['approved', 'active', 'disbursed'],
-            created_at__gte=week_start,
-            created_at__lt=week_end
-        ).count()
-        pending = LoanApplication.objects.filter(
-            status='pending',
-            created_at__gte=week_start,
-            created_at__lt=week_end
-        ).count()
-        rejected = LoanApplication.objects.filter(
-            status='rejected',
-            created_at__gte=week_start,
-            created_at__lt=week_end
-        ).count()
-        
-        loan_trends_chart['approved'].append(approved)
-        loan_trends_chart['pending'].append(pending)
-        loan_trends_chart['rejected'].append(rejected)
     
     return Response({
         "users": {
@@ -549,4 +618,184 @@ def get_dashboard_statistics(request):
             "userGrowth": user_growth_chart,
             "loanTrends": loan_trends_chart
         }
-    })
\ No newline at end of file
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ai_cache_statistics(request):
+    """
+    Hit/miss counters and size of the AI result caches (admin only).
+    Counters are per server process; entry totals are shared.
+    """
+    if not request.user.is_admin_user:
+        return Response(
+            {"error": "Access denied. Admin privileges required."}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    from loans.ai_cache import get_image_analysis_cache, get_market_comparison_cache
+    
+    image_cache = get_image_analysis_cache()
+    market_cache = get_market_comparison_cache()
+    return Response({
+        "imageAnalysis": image_cache.stats() if image_cache else {"enabled": False},
+        "marketComparison": market_cache.stats() if market_cache else {"enabled": False},
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ai_gateway_status(request):
+    """
+    Circuit breaker state and rate limiter waits for AI calls (admin only).
+    Breaker state and available tokens are shared; call counters are per server process.
+    """
+    if not request.user.is_admin_user:
+        return Response(
+            {"error": "Access denied. Admin privileges required."}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    from loans.ai_gateway import get_gateway
+    
+    stats = get_gateway().stats()
+    limiter = stats.pop('limiter')
+    breaker = stats.pop('breaker')
+    return Response({
+        "calls": stats,
+        "rateLimiter": limiter or {"enabled": False},
+        "circuitBreaker": breaker or {"enabled": False},
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ai_prescreen_statistics(request):
+    """
+    Applications decided by the rules-based pre-screen, by rule, and the
+    model calls avoided (admin only). Counted from the stored analyses.
+    """
+    if not request.user.is_admin_user:
+        return Response(
+            {"error": "Access denied. Admin privileges required."}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    from collections import Counter
+    from loans.models import LoanApplication
+    
+    analyzed = LoanApplication.objects.filter(ai_analysis_timestamp__isnull=False)
+    prescreens = analyzed.filter(ai_analysis_data__has_key='prescreen').values_list(
+        'ai_analysis_data__prescreen', flat=True
+    )
+    
+    by_rule = Counter()
+    calls_avoided = 0
+    prescreened = 0
+    for prescreen in prescreens:
+        prescreened += 1
+        by_rule.update(prescreen.get('rules', []))
+        calls_avoided += prescreen.get('llm_calls_avoided', 0)
+    
+    total = analyzed.count()
+    return Response({
+        "applicationsAnalyzed": total,
+        "applicationsPrescreened": prescreened,
+        "prescreenRate": round(prescreened / total, 4) if total else 0.0,
+        "llmCallsAvoided": calls_avoided,
+        "byRule": dict(by_rule),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_ai_call_statistics(request):
+    """
+    Latency percentiles, cache hits, tokens and cost of AI model calls per call
+    type, plus daily cost rollups (admin only).
+    
+    Query params:
+        days: Window in days, 1-90 (default 7)
+    """
+    if not request.user.is_admin_user:
+        return Response(
+            {"error": "Access denied. Admin privileges required."}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    from datetime import timedelta
+    from django.db.models import Count, Q, Sum
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from loans import ai_telemetry
+    from loans.models import AICallLog
+    
+    try:
+        days = min(90, max(1, int(request.query_params.get('days', 7))))
+    except ValueError:
+        return Response({"error": "days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    since = timezone.now() - timedelta(days=days)
+    logs = AICallLog.objects.filter(started_at__gte=since)
+    totals = dict(
+        calls=Count('id'),
+        cache_hits=Count('id', filter=Q(cache_hit=True)),
+        errors=Count('id', filter=~Q(outcome='success')),
+        prompt_tokens=Sum('prompt_tokens'),
+        response_tokens=Sum('response_tokens'),
+        request_bytes=Sum('request_bytes'),
+        cost=Sum('cost_usd'),
+    )
+    
+    call_types = {}
+    for row in logs.values('call_type').annotate(**totals).order_by('call_type'):
+        call_type = row['call_type']
+        model_calls = logs.filter(call_type=call_type, cache_hit=False)
+        percentiles = ai_telemetry.latency_percentiles(model_calls)
+        by_outcome = model_calls.values('outcome').annotate(count=Count('id')).order_by()
+        call_types[call_type] = {
+            "calls": row['calls'],
+            "modelCalls": row['calls'] - row['cache_hits'],
+            "cacheHits": row['cache_hits'],
+            "cacheHitRate": round(row['cache_hits'] / row['calls'], 4),
+            "errors": row['errors'],
+            "byOutcome": {entry['outcome']: entry['count'] for entry in by_outcome},
+            "latencyMs": {
+                "p50": percentiles[0.5],
+                "p95": percentiles[0.95],
+                "p99": percentiles[0.99],
+            },
+            "promptTokens": row['prompt_tokens'] or 0,
+            "responseTokens": row['response_tokens'] or 0,
+            "requestBytes": row['request_bytes'] or 0,
+            "costUsd": float(row['cost'] or 0),
+        }
+    
+    daily = [
+        {
+            "date": row['day'].isoformat(),
+            "callType": row['call_type'],
+            "calls": row['calls'],
+            "cacheHits": row['cache_hits'],
+            "promptTokens": row['prompt_tokens'] or 0,
+            "responseTokens": row['response_tokens'] or 0,
+            "costUsd": float(row['cost'] or 0),
+        }
+        for row in logs.annotate(day=TruncDate('started_at'))
+        .values('day', 'call_type').annotate(**totals).order_by('day', 'call_type')
+    ]
+    
+    buffer = ai_telemetry.get_call_log_buffer()
+    return Response({
+        "days": days,
+        "since": since.isoformat(),
+        "callTypes": call_types,
+        "daily": daily,
+        "totalCostUsd": round(sum(entry['costUsd'] for entry in call_types.values()), 8),
+        "telemetry": {
+            "pending": buffer.pending() if buffer else 0,
+            "written": buffer.written if buffer else 0,
+            "dropped": buffer.dropped if buffer else 0,
+        },
+    })
@@ -11,8 +11,6 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
-from chat.routing import websocket_urlpatterns
-from chat.middleware import JWTAuthMiddlewareStack
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
 
@@ -20,12 +18,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
+from chat.routing import websocket_urlpatterns  # noqa: E402
+from chat.middleware import JWTAuthMiddlewareStack  # noqa: E402
+from notifications.routing import websocket_urlpatterns as notification_websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         JWTAuthMiddlewareStack(
             URLRouter(
-                websocket_urlpatterns
+                websocket_urlpatterns + notification_websocket_urlpatterns
             )
         )
     ),
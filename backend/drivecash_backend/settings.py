@@ -213,11 +213,147 @@ AUTH_USER_MODEL = 'accounts.User'
 # Gemini AI key (optional if using Application Default Credentials)
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Model backend (loans/ai_backends.py): "gemini" calls the API, "replay" answers offline
+# from recorded responses, "record" calls the API and saves its responses for replay
+AI_MODEL_BACKEND = os.getenv('AI_MODEL_BACKEND', 'gemini')
+# Directory of recorded responses (<kind>.json) used by the replay and record backends
+AI_REPLAY_FIXTURES_DIR = os.getenv('AI_REPLAY_FIXTURES_DIR') or os.path.join(BASE_DIR, 'loans', 'ai_replay')
+# Replay latency is log-normal with this median and 95th percentile in seconds (equal values give a fixed latency)
+AI_REPLAY_LATENCY_MEDIAN = float(os.getenv('AI_REPLAY_LATENCY_MEDIAN', 1.5))
+AI_REPLAY_LATENCY_P95 = float(os.getenv('AI_REPLAY_LATENCY_P95', 4.0))
+# Extra replay latency per image in the request
+AI_REPLAY_LATENCY_PER_IMAGE = float(os.getenv('AI_REPLAY_LATENCY_PER_IMAGE', 0.1))
+# Fraction of replayed requests that fail with a 429 or 503
+AI_REPLAY_ERROR_RATE = float(os.getenv('AI_REPLAY_ERROR_RATE', 0))
+# Random seed for replay latency and errors (unset for a different run each time)
+AI_REPLAY_SEED = int(os.getenv('AI_REPLAY_SEED')) if os.getenv('AI_REPLAY_SEED') else None
+
+# Vehicle image analysis (loans/car_image_analyzer.py)
+# Maximum parallel Gemini vision requests per evaluation
+GEMINI_IMAGE_CONCURRENCY = int(os.getenv('GEMINI_IMAGE_CONCURRENCY', 4))
+# Seconds allowed for a single image analysis before it counts as failed
+GEMINI_IMAGE_TIMEOUT = float(os.getenv('GEMINI_IMAGE_TIMEOUT', 60))
+# "per_image": one request per photo plus a market request; "combined": all photos
+# and the market valuation in a single request (compare with `run_ai_benchmark.py vision-mode`)
+GEMINI_VISION_MODE = os.getenv('GEMINI_VISION_MODE', 'per_image')
+# Seconds allowed for the single request of the combined mode
+GEMINI_COMBINED_TIMEOUT = float(os.getenv('GEMINI_COMBINED_TIMEOUT', 120))
+# Seconds allowed for the async Gemini loan analysis call (GeminiLoanAnalyzer.analyze_loan_application_async)
+GEMINI_ANALYSIS_TIMEOUT = float(os.getenv('GEMINI_ANALYSIS_TIMEOUT', 60))
+# Downscale and re-encode photos before sending them (loans/image_preprocessing.py)
+AI_IMAGE_PREPROCESSING_ENABLED = os.getenv('AI_IMAGE_PREPROCESSING_ENABLED', 'True').lower() in ('true', '1', 't')
+# Longest side in pixels of the image sent to the vision model
+AI_IMAGE_MAX_DIMENSION = int(os.getenv('AI_IMAGE_MAX_DIMENSION', 1600))
+# JPEG quality of the re-encoded image
+AI_IMAGE_JPEG_QUALITY = int(os.getenv('AI_IMAGE_JPEG_QUALITY', 85))
+# Keep the preprocessed derivative next to the original upload for reuse
+AI_IMAGE_CACHE_DERIVATIVES = os.getenv('AI_IMAGE_CACHE_DERIVATIVES', 'True').lower() in ('true', '1', 't')
+# Persistent cache of parsed image analyses, keyed on image SHA-256 + model + prompt version
+AI_IMAGE_CACHE_ENABLED = os.getenv('AI_IMAGE_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+# Seconds a cached analysis stays valid (default 30 days)
+AI_IMAGE_CACHE_TTL = int(os.getenv('AI_IMAGE_CACHE_TTL', 30 * 24 * 3600))
+# Least recently used entries beyond this count are evicted
+AI_IMAGE_CACHE_MAX_ENTRIES = int(os.getenv('AI_IMAGE_CACHE_MAX_ENTRIES', 10000))
+# ...and beyond this many bytes of stored analyses in total (0 for no limit)
+AI_IMAGE_CACHE_MAX_BYTES = int(os.getenv('AI_IMAGE_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+# Market comparison cache: in-process LRU in front of the shared table
+AI_MARKET_CACHE_ENABLED = os.getenv('AI_MARKET_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+# Seconds cached market data stays valid (default 7 days)
+AI_MARKET_CACHE_TTL = int(os.getenv('AI_MARKET_CACHE_TTL', 7 * 24 * 3600))
+# Entries kept in each process's LRU tier
+AI_MARKET_CACHE_LOCAL_SIZE = int(os.getenv('AI_MARKET_CACHE_LOCAL_SIZE', 512))
+# Entries kept in the shared tier before LRU eviction
+AI_MARKET_CACHE_MAX_ENTRIES = int(os.getenv('AI_MARKET_CACHE_MAX_ENTRIES', 5000))
+# ...and beyond this many bytes in total (0 for no limit)
+AI_MARKET_CACHE_MAX_BYTES = int(os.getenv('AI_MARKET_CACHE_MAX_BYTES', 20 * 1024 * 1024))
+# Width in years of the model-year buckets vehicles are grouped into
+VEHICLE_YEAR_BUCKET_SIZE = int(os.getenv('VEHICLE_YEAR_BUCKET_SIZE', 2))
+
+# AI gateway (loans/ai_gateway.py): shared rate limit and circuit breaker for all Gemini calls
+# Set to False to call the model directly
+AI_GATEWAY_ENABLED = os.getenv('AI_GATEWAY_ENABLED', 'True').lower() in ('true', '1', 't')
+# Model calls per minute across all processes (0 disables the limiter)
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv('AI_RATE_LIMIT_PER_MINUTE', 60))
+# Calls that may be made back-to-back after an idle period
+AI_RATE_LIMIT_BURST = int(os.getenv('AI_RATE_LIMIT_BURST', 10))
+# Longest a caller waits for its slot before the call is rejected
+AI_RATE_LIMIT_MAX_WAIT = float(os.getenv('AI_RATE_LIMIT_MAX_WAIT', 30))
+# Consecutive upstream failures that open the breaker (0 disables it)
+AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', 5))
+# Seconds the breaker stays open before a trial call is let through
+AI_BREAKER_RESET_TIMEOUT = float(os.getenv('AI_BREAKER_RESET_TIMEOUT', 30))
+# Retries of transient errors (429, 5xx, timeouts) with full-jitter backoff
+AI_GATEWAY_MAX_RETRIES = int(os.getenv('AI_GATEWAY_MAX_RETRIES', 2))
+# Backoff before retry n is uniform(0, min(AI_GATEWAY_RETRY_MAX, AI_GATEWAY_RETRY_BASE * 2^(n-1)))
+AI_GATEWAY_RETRY_BASE = float(os.getenv('AI_GATEWAY_RETRY_BASE', 0.5))
+AI_GATEWAY_RETRY_MAX = float(os.getenv('AI_GATEWAY_RETRY_MAX', 8))
+# Seconds after which a slow call is raced against a duplicate request (0 disables hedging)
+AI_GATEWAY_HEDGE_AFTER = float(os.getenv('AI_GATEWAY_HEDGE_AFTER', 0))
+
+# AI call telemetry (loans/ai_telemetry.py): one AICallLog row per model call or cache hit
+AI_TELEMETRY_ENABLED = os.getenv('AI_TELEMETRY_ENABLED', 'True').lower() in ('true', '1', 't')
+# Rows are written in one batch once this many are buffered or the oldest is this many seconds old
+# (and at the end of each request and AI job)
+AI_TELEMETRY_BATCH_SIZE = int(os.getenv('AI_TELEMETRY_BATCH_SIZE', 50))
+AI_TELEMETRY_FLUSH_INTERVAL = float(os.getenv('AI_TELEMETRY_FLUSH_INTERVAL', 5))
+# USD per million prompt / response tokens, used for the cost of each logged call
+AI_PRICE_INPUT_PER_MILLION = float(os.getenv('AI_PRICE_INPUT_PER_MILLION', 0.10))
+AI_PRICE_OUTPUT_PER_MILLION = float(os.getenv('AI_PRICE_OUTPUT_PER_MILLION', 0.40))
+
 # Loan policy settings
 # Maximum absolute loan amount regardless of collateral value
 LOAN_MAX_LIMIT = int(os.getenv('LOAN_MAX_LIMIT', 25000))
 # Maximum Loan-To-Value (LTV) ratio allowed (e.g., 0.5 = 50%)
 LOAN_MAX_LTV_RATIO = float(os.getenv('LOAN_MAX_LTV_RATIO', 0.5))
+# Most decisions accepted by one POST /api/loans/applications/bulk_decision/
+LOAN_BULK_DECISION_MAX_ITEMS = int(os.getenv('LOAN_BULK_DECISION_MAX_ITEMS', 200))
+# Decide clear-cut applications (active bankruptcy, no income, far over the limits) by rules,
+# without calling Gemini (GeminiLoanAnalyzer.prescreen)
+AI_PRESCREEN_ENABLED = os.getenv('AI_PRESCREEN_ENABLED', 'True').lower() in ('true', '1', 't')
+# Loan-to-value above LOAN_MAX_LTV_RATIO times this is rejected by the pre-screen
+AI_PRESCREEN_LTV_MULTIPLE = float(os.getenv('AI_PRESCREEN_LTV_MULTIPLE', 1.5))
+
+# Background AI job queue (loans/ai_jobs.py, processed by `manage.py run_ai_worker`)
+# Number of jobs each worker process runs in parallel
+AI_WORKER_CONCURRENCY = int(os.getenv('AI_WORKER_CONCURRENCY', 2))
+# Applications `manage.py rescore_applications` scores in parallel by default
+AI_RESCORE_CONCURRENCY = int(os.getenv('AI_RESCORE_CONCURRENCY', 4))
+# Attempts per job before it is marked failed
+AI_JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', 5))
+# Seconds a claimed job is hidden from other workers before it is considered abandoned
+AI_JOB_VISIBILITY_TIMEOUT = int(os.getenv('AI_JOB_VISIBILITY_TIMEOUT', 300))
+# Retry backoff: AI_JOB_BACKOFF_BASE * 2^(attempt-1) seconds, capped at AI_JOB_BACKOFF_MAX
+AI_JOB_BACKOFF_BASE = int(os.getenv('AI_JOB_BACKOFF_BASE', 10))
+AI_JOB_BACKOFF_MAX = int(os.getenv('AI_JOB_BACKOFF_MAX', 600))
+# Run queued jobs inside the enqueuing request (local development without a worker)
+AI_JOBS_RUN_INLINE = os.getenv('AI_JOBS_RUN_INLINE', 'False').lower() in ('true', '1', 't')
+
+# Django cache (per-user dashboard summaries, keyed by version so a per-process cache is safe).
+# A shared backend, e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://127.0.0.1:6379, lets web processes share the entries
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    # Serialized loan application responses keyed by version (loans/response_cache.py).
+    # Entries are never stale, so a per-process cache is safe; FileBasedCache
+    # (RESPONSE_CACHE_LOCATION=/var/tmp/drivecash-responses) or Redis share them between processes
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'loan-responses'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 5000))},
+    },
+}
+# Cache serialized loan applications and document listings, and answer polls with ETags/304
+LOAN_RESPONSE_CACHE_ENABLED = os.getenv('LOAN_RESPONSE_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+# Seconds a cached loan application response is kept
+LOAN_RESPONSE_CACHE_TTL = int(os.getenv('LOAN_RESPONSE_CACHE_TTL', 86400))
+# Loan application list pages (loans.pagination): default and largest ?page_size=
+LOAN_APPLICATION_PAGE_SIZE = int(os.getenv('LOAN_APPLICATION_PAGE_SIZE', 20))
+LOAN_APPLICATION_MAX_PAGE_SIZE = int(os.getenv('LOAN_APPLICATION_MAX_PAGE_SIZE', 100))
+# Seconds a user's cached dashboard summary is kept (writes that don't bump cache_version show up after this)
+USER_DASHBOARD_CACHE_TTL = int(os.getenv('USER_DASHBOARD_CACHE_TTL', 300))
 
 # CORS settings
 # For production, set CORS_ALLOW_ALL_ORIGINS to False and use CORS_ALLOWED_ORIGINS
@@ -290,4 +426,8 @@ CHANNEL_LAYERS = {
         # },
     },
 }
+
+# Most missed notifications replayed when a client reconnects to ws/notifications/ with
+# last_seen_id; beyond this the client is told to reload the list instead
+NOTIFICATION_REPLAY_LIMIT = int(os.getenv('NOTIFICATION_REPLAY_LIMIT', 100))
  
\ No newline at end of file
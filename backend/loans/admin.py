@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import LoanApplication, LoanApplicationNote, LoanApplicationDocument, VehicleValuation
+from .models import LoanApplication, LoanApplicationNote, LoanApplicationDocument, VehicleValuation, AIJob, AIResultCache, AIRateLimitBucket, AICircuitBreaker, AICallLog
 
 
 @admin.register(LoanApplication)
@@ -309,3 +309,38 @@ class VehicleValuationAdmin(admin.ModelAdmin):
             obj.ltv_ratio, obj.max_loan_amount, obj.recommended_loan_amount
         )
     loan_assessment_display.short_description = 'Loan Assessment'
+
+
+@admin.register(AIJob)
+class AIJobAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'job_type', 'application', 'status', 'attempts', 'available_at', 'created_at', 'finished_at']
+    list_filter = ['job_type', 'status', 'created_at']
+    search_fields = ['job_id', 'application__application_id', 'last_error']
+    readonly_fields = ['job_id', 'created_at', 'updated_at', 'started_at', 'finished_at', 'result', 'last_error']
+
+
+@admin.register(AIResultCache)
+class AIResultCacheAdmin(admin.ModelAdmin):
+    list_display = ['namespace', 'cache_key', 'hit_count', 'size_bytes', 'last_accessed_at', 'expires_at']
+    list_filter = ['namespace']
+    search_fields = ['cache_key']
+    readonly_fields = ['created_at', 'last_accessed_at', 'hit_count', 'size_bytes']
+
+
+@admin.register(AICircuitBreaker)
+class AICircuitBreakerAdmin(admin.ModelAdmin):
+    list_display = ['name', 'state', 'consecutive_failures', 'times_opened', 'updated_at']
+    readonly_fields = ['updated_at', 'version']
+
+
+@admin.register(AIRateLimitBucket)
+class AIRateLimitBucketAdmin(admin.ModelAdmin):
+    list_display = ['name', 'tokens', 'refilled_at']
+    readonly_fields = ['version']
+
+
+@admin.register(AICallLog)
+class AICallLogAdmin(admin.ModelAdmin):
+    list_display = ['call_type', 'outcome', 'cache_hit', 'latency_ms', 'prompt_tokens', 'response_tokens', 'cost_usd', 'started_at']
+    list_filter = ['call_type', 'outcome', 'cache_hit', 'started_at']
+    search_fields = ['application_id']
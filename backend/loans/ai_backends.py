@@ -0,0 +1,298 @@
+"""
+Pluggable model backends behind loans.ai_clients.get_generative_model.
+
+AI_MODEL_BACKEND selects what the analyzers talk to:
+
+- "gemini": google.generativeai.GenerativeModel (default)
+- "replay": ReplayModel, a local stand-in that answers from recorded responses
+  in AI_REPLAY_FIXTURES_DIR with a simulated latency distribution and error
+  rate. It needs no API key or network, so the submit -> worker pipeline can be
+  load-tested offline (`run_ai_benchmark.py submit`).
+- "record": the Gemini model wrapped in RecordingModel, which appends every
+  response it receives to the fixtures directory for later replay.
+
+Requests are told apart by what the analyzers send (see classify_request), so a
+fixtures directory holds one JSON list of responses per request kind.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('gemini', 'replay', 'record')
+
+# One fixture file (<kind>.json) per kind of request the analyzers make
+REQUEST_KINDS = ('image_analysis', 'combined_analysis', 'market_comparison', 'loan_analysis')
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_replay')
+
+# z-score of the 95th percentile of a standard normal distribution
+_Z95 = 1.6448536269514722
+
+
+def get_backend_name():
+    backend = getattr(settings, 'AI_MODEL_BACKEND', 'gemini') or 'gemini'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown AI_MODEL_BACKEND '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+def requires_api_key(backend=None):
+    """Whether the backend talks to the real Gemini API"""
+    return (backend or get_backend_name()) != 'replay'
+
+
+def classify_request(contents):
+    """
+    Work out which analyzer request `contents` is.
+
+    Args:
+        contents: What was passed to generate_content (a prompt string, or a
+                  list of prompt strings and images)
+
+    Returns:
+        tuple: (kind from REQUEST_KINDS, number of images in the request)
+    """
+    parts = contents if isinstance(contents, list) else [contents]
+    text = '\n'.join(part for part in parts if isinstance(part, str))
+    images = sum(1 for part in parts if not isinstance(part, str))
+
+    if '"approval_suggestion"' in text:
+        return 'loan_analysis', images
+    if images and '"market"' in text:
+        return 'combined_analysis', images
+    if images:
+        return 'image_analysis', images
+    return 'market_comparison', images
+
+
+def estimate_tokens(contents, response_text=''):
+    """
+    Rough token counts for a request: about 4 characters per text token and
+    258 tokens per image (one 768px tile).
+
+    Returns:
+        tuple: (prompt tokens, response tokens)
+    """
+    parts = contents if isinstance(contents, list) else [contents]
+    text_chars = sum(len(part) for part in parts if isinstance(part, str))
+    images = sum(1 for part in parts if not isinstance(part, str))
+    return text_chars // 4 + 258 * images, len(response_text) // 4
+
+
+class LatencyProfile:
+    """
+    Log-normal latency given its median and 95th percentile, plus a fixed
+    amount per image in the request. p95 <= median gives a constant latency.
+    """
+
+    def __init__(self, median=1.5, p95=4.0, per_image=0.1):
+        self.median = max(0.0, float(median))
+        self.p95 = max(self.median, float(p95))
+        self.per_image = max(0.0, float(per_image))
+        if self.median > 0 and self.p95 > self.median:
+            self.sigma = math.log(self.p95 / self.median) / _Z95
+        else:
+            self.sigma = 0.0
+
+    def sample(self, rng, images=0):
+        base = self.median
+        if self.sigma:
+            base = rng.lognormvariate(math.log(self.median), self.sigma)
+        return base + self.per_image * images
+
+
+def load_fixtures(fixtures_dir, kind):
+    """
+    Recorded responses for `kind`: a JSON list whose entries are raw response
+    text, or objects that are serialized as the response JSON.
+    """
+    path = os.path.join(fixtures_dir, f'{kind}.json')
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Replay fixture {path} must be a non-empty JSON list")
+    return [entry if isinstance(entry, str) else json.dumps(entry) for entry in entries]
+
+
+def _api_error(kind):
+    """429 or 503 from google.api_core, which the gateway treats as retryable"""
+    from google.api_core import exceptions
+
+    if kind == 'rate_limited':
+        return exceptions.ResourceExhausted('Replay backend: simulated quota exhaustion (429)')
+    return exceptions.ServiceUnavailable('Replay backend: simulated outage (503)')
+
+
+class ReplayResponse:
+    """The parts of a GenerateContentResponse the analyzers read"""
+
+    def __init__(self, text, prompt_tokens=0, response_tokens=0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=response_tokens,
+            total_token_count=prompt_tokens + response_tokens,
+        )
+
+
+class ReplayModel:
+    """
+    Offline stand-in for genai.GenerativeModel.
+
+    Each request is classified, answered with the next recorded response of its
+    kind (round-robin), and delayed by a sample from the latency profile. A
+    fraction `error_rate` of requests fails instead: half with a 429 raised
+    straight away, half with a 503 after the sampled latency. A latency beyond
+    request_options['timeout'] raises DeadlineExceeded once the timeout passes.
+    """
+
+    def __init__(self, model_name, fixtures_dir=None, latency=None, error_rate=0.0, seed=None):
+        self.model_name = model_name
+        self.fixtures_dir = fixtures_dir or DEFAULT_FIXTURES_DIR
+        self.latency = latency or LatencyProfile()
+        self.error_rate = min(1.0, max(0.0, float(error_rate)))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fixtures = {}
+        self._positions = {}
+        self._stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'by_kind': {}}
+
+    def _plan(self, contents, request_options):
+        """Pick the response, delay and outcome of one request"""
+        kind, images = classify_request(contents)
+        with self._lock:
+            if kind not in self._fixtures:
+                self._fixtures[kind] = load_fixtures(self.fixtures_dir, kind)
+            responses = self._fixtures[kind]
+            position = self._positions.get(kind, 0)
+            self._positions[kind] = position + 1
+            delay = self.latency.sample(self._rng, images)
+            error = None
+            if self._rng.random() < self.error_rate:
+                error = self._rng.choice(('rate_limited', 'unavailable'))
+            self._stats['calls'] += 1
+            self._stats['by_kind'][kind] = self._stats['by_kind'].get(kind, 0) + 1
+
+        text = responses[position % len(responses)]
+        timeout = (request_options or {}).get('timeout')
+        if error is None and timeout is not None and delay > timeout:
+            error, delay = 'timeout', timeout
+        if error == 'rate_limited':
+            delay = 0.0
+        if error:
+            with self._lock:
+                self._stats['timeouts' if error == 'timeout' else 'errors'] += 1
+        return text, delay, error
+
+    def _finish(self, text, error, contents):
+        if error == 'timeout':
+            from google.api_core import exceptions
+            raise exceptions.DeadlineExceeded('Replay backend: simulated deadline exceeded')
+        if error:
+            raise _api_error(error)
+        return ReplayResponse(text, *estimate_tokens(contents, text))
+
+    def generate_content(self, contents, request_options=None, **kwargs):
+        text, delay, error = self._plan(contents, request_options)
+        time.sleep(delay)
+        return self._finish(text, error, contents)
+
+    async def generate_content_async(self, contents, request_options=None, **kwargs):
+        text, delay, error = self._plan(contents, request_options)
+        await asyncio.sleep(delay)
+        return self._finish(text, error, contents)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'by_kind': dict(self._stats['by_kind'])}
+
+
+class RecordingModel:
+    """
+    Wraps a real model and appends each successful response's text to
+    <fixtures_dir>/<kind>.json, producing fixtures for ReplayModel.
+    """
+
+    _file_lock = threading.Lock()
+
+    def __init__(self, model, fixtures_dir):
+        self.model = model
+        self.model_name = getattr(model, 'model_name', None)
+        self.fixtures_dir = fixtures_dir
+
+    def _record(self, contents, response):
+        kind, _ = classify_request(contents)
+        path = os.path.join(self.fixtures_dir, f'{kind}.json')
+        try:
+            with self._file_lock:
+                entries = []
+                if os.path.exists(path):
+                    with open(path, encoding='utf-8') as f:
+                        entries = json.load(f)
+                entries.append(response.text)
+                os.makedirs(self.fixtures_dir, exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, indent=2)
+        except Exception as e:
+            # Recording is best effort; never fail the real request over it
+            logger.warning(f"Could not record {kind} response to {path}: {str(e)}")
+
+    def generate_content(self, contents, request_options=None, **kwargs):
+        response = self.model.generate_content(contents, request_options=request_options, **kwargs)
+        self._record(contents, response)
+        return response
+
+    async def generate_content_async(self, contents, request_options=None, **kwargs):
+        response = await self.model.generate_content_async(contents, request_options=request_options, **kwargs)
+        await asyncio.to_thread(self._record, contents, response)
+        return response
+
+
+def get_fixtures_dir():
+    return getattr(settings, 'AI_REPLAY_FIXTURES_DIR', None) or DEFAULT_FIXTURES_DIR
+
+
+def build_replay_model(model_name):
+    """ReplayModel configured from the AI_REPLAY_* settings"""
+    return ReplayModel(
+        model_name,
+        fixtures_dir=get_fixtures_dir(),
+        latency=LatencyProfile(
+            median=getattr(settings, 'AI_REPLAY_LATENCY_MEDIAN', 1.5),
+            p95=getattr(settings, 'AI_REPLAY_LATENCY_P95', 4.0),
+            per_image=getattr(settings, 'AI_REPLAY_LATENCY_PER_IMAGE', 0.1),
+        ),
+        error_rate=getattr(settings, 'AI_REPLAY_ERROR_RATE', 0.0),
+        seed=getattr(settings, 'AI_REPLAY_SEED', None),
+    )
+
+
+def build_model(model_name, genai_factory, backend=None):
+    """
+    Model object for `model_name` on the configured backend.
+
+    Args:
+        model_name: Gemini model name
+        genai_factory: Callable returning the configured google.generativeai
+                       module; only called by the backends that need it
+        backend: Overrides AI_MODEL_BACKEND
+    """
+    backend = backend or get_backend_name()
+    if backend == 'replay':
+        return build_replay_model(model_name)
+
+    model = genai_factory().GenerativeModel(model_name)
+    if backend == 'record':
+        return RecordingModel(model, get_fixtures_dir())
+    return model
@@ -0,0 +1,421 @@
+"""
+Persistent cache for parsed AI model responses.
+
+Entries live in the AIResultCache table, so every web and worker process
+shares them. The image analysis cache is content-addressed: the key is the
+SHA-256 of the image bytes plus the model name and prompt version, so a
+re-uploaded photo is recognised regardless of its file name, and changing the
+model or prompt naturally misses.
+
+Market comparisons use two tiers: an in-process LRU in front of the shared
+table, with concurrent misses for the same key coalesced (`SingleFlight`, or
+`AsyncSingleFlight` for callers on the event loop).
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import AIResultCache
+
+logger = logging.getLogger(__name__)
+
+# Files are hashed in chunks of this size instead of being read whole
+HASH_CHUNK_SIZE = 1024 * 1024
+
+IMAGE_ANALYSIS_NAMESPACE = 'image_analysis'
+MARKET_COMPARISON_NAMESPACE = 'market_comparison'
+
+
+def sha256_of_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Stream a file through SHA-256 and return the hex digest"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_of_image(image_data, image_type='base64'):
+    """
+    Hash the image bytes for either image input form used by CarImageAnalyzer.
+
+    Args:
+        image_data: Base64 string or file path
+        image_type: "base64" or "file_path"
+    """
+    if image_type == 'file_path':
+        return sha256_of_file(image_data)
+    return hashlib.sha256(base64.b64decode(image_data)).hexdigest()
+
+
+def image_analysis_key(image_sha256, model_name, prompt_version):
+    return f"{image_sha256}:{model_name}:{prompt_version}"
+
+
+class ResultCache:
+    """
+    A namespace of the AIResultCache table with TTL eviction, and LRU
+    eviction beyond max_entries or max_bytes (the sum of the entries'
+    serialized size, `size_bytes`).
+
+    Hit/miss counters are kept per process (see `stats`); the per-entry
+    `hit_count` column accumulates across processes.
+    """
+
+    # Run eviction after this many writes from this process
+    EVICT_EVERY = 100
+
+    def __init__(self, namespace, ttl_seconds=None, max_entries=None, max_bytes=None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+    def _entries(self):
+        return AIResultCache.objects.filter(namespace=self.namespace)
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry"""
+        now = timezone.now()
+        entry = (
+            self._entries()
+            .filter(cache_key=key)
+            .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=now))
+            .only('pk', 'value')
+            .first()
+        )
+
+        with self._lock:
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        AIResultCache.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_accessed_at=now,
+        )
+        return entry.value
+
+    def set(self, key, value):
+        """Store a JSON-serializable value, replacing any existing entry"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.ttl_seconds) if self.ttl_seconds else None
+        defaults = {
+            'value': value,
+            'size_bytes': len(json.dumps(value, default=str)),
+            'hit_count': 0,
+            'last_accessed_at': now,
+            'expires_at': expires_at,
+        }
+        try:
+            AIResultCache.objects.update_or_create(
+                namespace=self.namespace, cache_key=key, defaults=defaults
+            )
+        except IntegrityError:
+            # Another process stored the same key first; theirs is as good as ours
+            pass
+
+        with self._lock:
+            self._writes += 1
+            evict_now = self._writes % self.EVICT_EVERY == 0
+        if evict_now:
+            self.evict()
+
+    def evict(self):
+        """
+        Delete expired entries, then the least recently used ones beyond
+        max_entries or past max_bytes in total.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        deleted, _ = self._entries().filter(expires_at__lte=timezone.now()).delete()
+
+        if self.max_entries or self.max_bytes:
+            # Keep the most recently used entries while both limits allow
+            stale_ids = []
+            kept = kept_bytes = 0
+            entries = self._entries().order_by('-last_accessed_at', '-pk').values_list('pk', 'size_bytes')
+            for pk, size_bytes in entries.iterator():
+                if (
+                    (self.max_entries and kept >= self.max_entries)
+                    or (self.max_bytes and kept_bytes + size_bytes > self.max_bytes)
+                ):
+                    stale_ids.append(pk)
+                    continue
+                kept += 1
+                kept_bytes += size_bytes
+            for start in range(0, len(stale_ids), 1000):
+                removed, _ = AIResultCache.objects.filter(pk__in=stale_ids[start:start + 1000]).delete()
+                deleted += removed
+
+        with self._lock:
+            self._evictions += deleted
+        if deleted:
+            logger.info(f"Evicted {deleted} entries from AI cache '{self.namespace}'")
+        return deleted
+
+    def clear(self):
+        self._entries().delete()
+
+    def stats(self):
+        """Process-local counters plus the table totals for this namespace"""
+        with self._lock:
+            hits, misses = self._hits, self._misses
+            writes, evictions = self._writes, self._evictions
+        totals = self._entries().aggregate(
+            total_size_bytes=Sum('size_bytes'),
+            total_hits=Sum('hit_count'),
+        )
+        lookups = hits + misses
+        return {
+            'namespace': self.namespace,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'writes': writes,
+            'evictions': evictions,
+            'entries': self._entries().count(),
+            'total_size_bytes': totals['total_size_bytes'] or 0,
+            'total_hits_all_processes': totals['total_hits'] or 0,
+            'ttl_seconds': self.ttl_seconds,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+        }
+
+
+class LocalLRUCache:
+    """Thread-safe in-process LRU with a per-entry TTL"""
+
+    def __init__(self, max_size=512, ttl_seconds=None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """In-process LRU in front of a shared ResultCache"""
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+        self.namespace = shared.namespace
+        self._lock = threading.Lock()
+        self._local_hits = 0
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            with self._lock:
+                self._local_hits += 1
+            return value
+
+        value = self.shared.get(key)
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        self.shared.set(key, value)
+
+    def evict(self):
+        return self.shared.evict()
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        stats = self.shared.stats()
+        with self._lock:
+            local_hits = self._local_hits
+        # Shared-tier misses are the misses of the whole cache
+        lookups = local_hits + stats['hits'] + stats['misses']
+        stats.update({
+            'local_hits': local_hits,
+            'shared_hits': stats['hits'],
+            'hits': local_hits + stats['hits'],
+            'hit_rate': round((local_hits + stats['hits']) / lookups, 4) if lookups else 0.0,
+            'local_entries': len(self.local),
+            'local_max_size': self.local.max_size,
+        })
+        return stats
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key within this process: the
+    first caller runs the function, the others wait for and share its result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns:
+            tuple: (result, shared) - shared is True when the result came
+            from another caller's in-flight call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call['event'].wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight call '{key}'")
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], True
+
+        try:
+            call['result'] = fn()
+            return call['result'], False
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop: concurrent awaiters of the
+    same key share one task. The shared task is shielded, so a cancelled
+    awaiter does not cancel it for the others.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.coalesced = 0
+
+    async def do(self, key, coroutine_fn):
+        """
+        Returns:
+            tuple: (result, shared) as in SingleFlight.do
+        """
+        task = self._tasks.get(key)
+        shared = task is not None and task.get_loop() is asyncio.get_running_loop()
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(coroutine_fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(key, None) if self._tasks.get(key) is done else None)
+        return await asyncio.shield(task), shared
+
+
+_image_analysis_cache = None
+_image_analysis_cache_lock = threading.Lock()
+_market_comparison_cache = None
+_market_comparison_cache_lock = threading.Lock()
+
+
+def get_image_analysis_cache():
+    """
+    Process-wide cache for CarImageAnalyzer results.
+
+    Returns:
+        ResultCache, or None when AI_IMAGE_CACHE_ENABLED is off
+    """
+    global _image_analysis_cache
+
+    if not getattr(settings, 'AI_IMAGE_CACHE_ENABLED', True):
+        return None
+
+    with _image_analysis_cache_lock:
+        if _image_analysis_cache is None:
+            _image_analysis_cache = ResultCache(
+                IMAGE_ANALYSIS_NAMESPACE,
+                ttl_seconds=getattr(settings, 'AI_IMAGE_CACHE_TTL', 30 * 24 * 3600),
+                max_entries=getattr(settings, 'AI_IMAGE_CACHE_MAX_ENTRIES', 10000),
+                max_bytes=getattr(settings, 'AI_IMAGE_CACHE_MAX_BYTES', 100 * 1024 * 1024) or None,
+            )
+        return _image_analysis_cache
+
+
+def get_market_comparison_cache():
+    """
+    Process-wide two-tier cache for CarImageAnalyzer.get_market_comparison.
+
+    Returns:
+        TieredCache, or None when AI_MARKET_CACHE_ENABLED is off
+    """
+    global _market_comparison_cache
+
+    if not getattr(settings, 'AI_MARKET_CACHE_ENABLED', True):
+        return None
+
+    with _market_comparison_cache_lock:
+        if _market_comparison_cache is None:
+            ttl = getattr(settings, 'AI_MARKET_CACHE_TTL', 7 * 24 * 3600)
+            _market_comparison_cache = TieredCache(
+                LocalLRUCache(
+                    max_size=getattr(settings, 'AI_MARKET_CACHE_LOCAL_SIZE', 512),
+                    ttl_seconds=ttl,
+                ),
+                ResultCache(
+                    MARKET_COMPARISON_NAMESPACE,
+                    ttl_seconds=ttl,
+                    max_entries=getattr(settings, 'AI_MARKET_CACHE_MAX_ENTRIES', 5000),
+                    max_bytes=getattr(settings, 'AI_MARKET_CACHE_MAX_BYTES', 20 * 1024 * 1024) or None,
+                ),
+            )
+        return _market_comparison_cache
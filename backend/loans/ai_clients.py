@@ -0,0 +1,118 @@
+"""
+Process-wide registry of AI SDK clients and services.
+
+Nothing here touches google.generativeai (or PIL, via the analyzers) until
+the first AI call, so `manage.py` commands and ASGI boot don't pay for the
+SDK import and don't fail when GEMINI_API_KEY is missing. Clients are created
+once per process under a lock and shared by all threads; GenerativeModel
+wraps a thread-safe gRPC client, and the services hold no per-request state.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_configured_api_key = None
+_models = {}
+_services = {}
+
+
+def get_api_key():
+    return getattr(settings, 'GEMINI_API_KEY', None) or os.getenv('GEMINI_API_KEY')
+
+
+def get_genai(api_key=None):
+    """
+    Import and configure the Gemini SDK on first use.
+
+    Args:
+        api_key: Key to configure; defaults to GEMINI_API_KEY. The SDK keeps one
+                 global configuration, so a different key reconfigures it.
+    """
+    global _configured_api_key
+
+    import google.generativeai as genai
+
+    api_key = api_key or get_api_key()
+    with _lock:
+        if api_key != _configured_api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+    return genai
+
+
+def get_generative_model(model_name, api_key=None):
+    """
+    Shared model for `model_name`, created on first use.
+
+    A GenerativeModel, or the replay/recording stand-in selected by
+    AI_MODEL_BACKEND (loans/ai_backends.py).
+    """
+    from .ai_backends import build_model, get_backend_name
+
+    backend = get_backend_name()
+    api_key = api_key or get_api_key()
+    cache_key = (backend, model_name, api_key)
+    model = _models.get(cache_key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(cache_key)
+        if model is None:
+            model = build_model(model_name, lambda: get_genai(api_key), backend=backend)
+            _models[cache_key] = model
+            logger.info(f"Created {backend} client for model {model_name}")
+        return model
+
+
+def _get_service(name, factory):
+    service = _services.get(name)
+    if service is not None:
+        return service
+
+    with _lock:
+        service = _services.get(name)
+        if service is None:
+            service = factory()
+            _services[name] = service
+        return service
+
+
+def get_car_valuation_service():
+    """
+    Shared CarValuationService.
+
+    Raises:
+        ValueError: GEMINI_API_KEY is not configured (nothing is cached, so a
+        later call retries)
+    """
+    def factory():
+        from .car_image_analyzer import CarValuationService
+        return CarValuationService()
+
+    return _get_service('car_valuation', factory)
+
+
+def get_gemini_loan_analyzer():
+    """Shared GeminiLoanAnalyzer"""
+    def factory():
+        from .gemini_loan_analyzer import GeminiLoanAnalyzer
+        return GeminiLoanAnalyzer()
+
+    return _get_service('gemini_loan_analyzer', factory)
+
+
+def reset():
+    """Drop all clients and services (tests, or after changing settings)"""
+    global _configured_api_key
+
+    with _lock:
+        _models.clear()
+        _services.clear()
+        _configured_api_key = None
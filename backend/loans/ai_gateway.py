@@ -0,0 +1,577 @@
+"""
+Single gateway for calls to the AI provider.
+
+Both CarImageAnalyzer and GeminiLoanAnalyzer send their model calls through
+`get_gateway().call(fn, ...)` (or `call_async` for the SDK's coroutine
+API), which applies, in order:
+
+- a circuit breaker: after AI_BREAKER_FAILURE_THRESHOLD consecutive upstream
+  failures the breaker opens and calls fail immediately with CircuitOpenError
+  (GeminiLoanAnalyzer turns that into its fallback response). After
+  AI_BREAKER_RESET_TIMEOUT one trial call is let through (half-open); its
+  outcome closes or re-opens the breaker.
+- a token bucket limiter (AI_RATE_LIMIT_PER_MINUTE, AI_RATE_LIMIT_BURST):
+  callers reserve a token and sleep until it is theirs, or get
+  RateLimitExceeded if that would take longer than AI_RATE_LIMIT_MAX_WAIT.
+- retries of transient upstream errors (429, 5xx, timeouts) with full-jitter
+  exponential backoff.
+- optional hedging: when AI_GATEWAY_HEDGE_AFTER is set, a call still running
+  after that many seconds is raced against a second identical request and the
+  first success wins.
+
+Limiter and breaker state live in the database (AIRateLimitBucket,
+AICircuitBreaker) and are updated with compare-and-set, so every web and
+worker process shares one budget and one view of upstream health.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F, Q
+
+from .models import AICircuitBreaker, AIRateLimitBucket
+
+logger = logging.getLogger(__name__)
+
+
+class GatewayError(Exception):
+    """Base class for calls rejected by the gateway itself"""
+
+
+class RateLimitExceeded(GatewayError):
+    """The shared rate limit would not allow the call within the allowed wait"""
+
+
+class CircuitOpenError(GatewayError):
+    """The upstream is considered degraded; the call was not attempted"""
+
+
+def is_retryable(error):
+    """Transient upstream failures: rate limited, server errors and timeouts"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.InternalServerError,
+        api_exceptions.BadGateway,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.GatewayTimeout,
+        api_exceptions.DeadlineExceeded,
+    ))
+
+
+def _get_or_create_row(model, name, defaults):
+    try:
+        row, _ = model.objects.get_or_create(name=name, defaults=defaults)
+    except IntegrityError:
+        # Another process created it between our SELECT and INSERT
+        row = model.objects.get(name=name)
+    return row
+
+
+class TokenBucket:
+    """
+    Token bucket in an AIRateLimitBucket row.
+
+    A caller reserves a token even when none is left (the balance goes
+    negative) and sleeps until the reservation matures, so waiting callers
+    are served in order without polling the database.
+    """
+
+    MAX_CAS_ATTEMPTS = 20
+
+    def __init__(self, name, rate_per_second, capacity, max_wait):
+        self.name = name
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._waits = 0
+        self._total_wait = 0.0
+        self._max_observed_wait = 0.0
+        self._rejected = 0
+
+    def _row(self):
+        return _get_or_create_row(
+            AIRateLimitBucket, self.name, {'tokens': self.capacity, 'refilled_at': time.time()}
+        )
+
+    def _available(self, row, now):
+        return min(self.capacity, row.tokens + max(0.0, now - row.refilled_at) * self.rate)
+
+    def reserve(self, max_wait=None):
+        """
+        Take a token.
+
+        Returns:
+            float: Seconds the caller must wait before using it
+
+        Raises:
+            RateLimitExceeded: The wait would exceed max_wait
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+
+        for _ in range(self.MAX_CAS_ATTEMPTS):
+            row = self._row()
+            now = time.time()
+            tokens = self._available(row, now) - 1
+            wait_seconds = -tokens / self.rate if tokens < 0 else 0.0
+
+            if wait_seconds > max_wait:
+                with self._lock:
+                    self._rejected += 1
+                raise RateLimitExceeded(
+                    f"AI rate limit '{self.name}' reached; next slot in {wait_seconds:.1f}s"
+                )
+
+            updated = AIRateLimitBucket.objects.filter(pk=row.pk, version=row.version).update(
+                tokens=tokens,
+                refilled_at=now,
+                version=F('version') + 1,
+            )
+            if updated:
+                with self._lock:
+                    self._acquired += 1
+                    if wait_seconds > 0:
+                        self._waits += 1
+                        self._total_wait += wait_seconds
+                        self._max_observed_wait = max(self._max_observed_wait, wait_seconds)
+                return wait_seconds
+
+            # Lost the race to another caller; re-read and try again
+            time.sleep(random.uniform(0, 0.005))
+
+        with self._lock:
+            self._rejected += 1
+        raise RateLimitExceeded(f"AI rate limit '{self.name}' is too contended")
+
+    def acquire(self, max_wait=None):
+        """Reserve a token and sleep until it can be used. Returns the wait."""
+        wait_seconds = self.reserve(max_wait)
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    def stats(self):
+        row = self._row()
+        with self._lock:
+            waits, total_wait = self._waits, self._total_wait
+            stats = {
+                'name': self.name,
+                'rate_per_minute': round(self.rate * 60, 2),
+                'capacity': self.capacity,
+                'max_wait_s': self.max_wait,
+                'tokens_available': round(self._available(row, time.time()), 2),
+                'acquired': self._acquired,
+                'waits': waits,
+                'total_wait_s': round(total_wait, 3),
+                'avg_wait_s': round(total_wait / waits, 3) if waits else 0.0,
+                'longest_wait_s': round(self._max_observed_wait, 3),
+                'rejected': self._rejected,
+            }
+        return stats
+
+
+class CircuitBreaker:
+    """Circuit breaker in an AICircuitBreaker row"""
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._fast_failures = 0
+
+    def _row(self):
+        return _get_or_create_row(AICircuitBreaker, self.name, {})
+
+    def _rows(self):
+        return AICircuitBreaker.objects.filter(name=self.name)
+
+    def before_call(self):
+        """
+        Returns:
+            bool: True when this call is the half-open trial
+
+        Raises:
+            CircuitOpenError: The breaker is open (or another caller holds the trial)
+        """
+        row = self._row()
+        if row.state == 'closed':
+            return False
+
+        now = time.time()
+        retry_in = (row.opened_at or 0) + self.reset_timeout - now
+        if retry_in <= 0:
+            # Cool-down over (or a previous trial never reported back): one caller gets the trial
+            won = AICircuitBreaker.objects.filter(pk=row.pk, version=row.version).update(
+                state='half_open',
+                opened_at=now,
+                version=F('version') + 1,
+            )
+            if won:
+                logger.info(f"AI circuit breaker '{self.name}' half-open, sending trial call")
+                return True
+            retry_in = self.reset_timeout
+
+        with self._lock:
+            self._fast_failures += 1
+        raise CircuitOpenError(
+            f"AI service temporarily unavailable (circuit open after repeated failures; retry in {max(retry_in, 0):.0f}s)"
+        )
+
+    def record_success(self, trial=False):
+        # Only writes when there is something to reset
+        reset = self._rows().filter(~Q(state='closed') | Q(consecutive_failures__gt=0)).update(
+            state='closed',
+            consecutive_failures=0,
+            version=F('version') + 1,
+        )
+        if reset and trial:
+            logger.info(f"AI circuit breaker '{self.name}' closed after successful trial call")
+
+    def record_failure(self, error, trial=False):
+        message = f"{type(error).__name__}: {str(error)}"[:1000]
+        now = time.time()
+
+        if trial:
+            self._rows().update(
+                state='open',
+                opened_at=now,
+                consecutive_failures=F('consecutive_failures') + 1,
+                times_opened=F('times_opened') + 1,
+                last_error=message,
+                version=F('version') + 1,
+            )
+            logger.warning(f"AI circuit breaker '{self.name}' trial call failed, re-opened: {message}")
+            return
+
+        self._row()
+        self._rows().update(
+            consecutive_failures=F('consecutive_failures') + 1,
+            last_error=message,
+            version=F('version') + 1,
+        )
+        opened = self._rows().filter(
+            state='closed', consecutive_failures__gte=self.failure_threshold
+        ).update(
+            state='open',
+            opened_at=now,
+            times_opened=F('times_opened') + 1,
+            version=F('version') + 1,
+        )
+        if opened:
+            logger.warning(f"AI circuit breaker '{self.name}' opened: {message}")
+
+    def release_trial(self):
+        """The trial call never reached the upstream; go back to open"""
+        self._rows().filter(state='half_open').update(state='open', version=F('version') + 1)
+
+    def stats(self):
+        row = self._row()
+        retry_in = None
+        if row.state != 'closed' and row.opened_at:
+            retry_in = round(max(0.0, row.opened_at + self.reset_timeout - time.time()), 1)
+        with self._lock:
+            fast_failures = self._fast_failures
+        return {
+            'name': self.name,
+            'state': row.state,
+            'consecutive_failures': row.consecutive_failures,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout_s': self.reset_timeout,
+            'times_opened': row.times_opened,
+            'trial_in_s': retry_in,
+            'last_error': row.last_error,
+            'fast_failures': fast_failures,
+        }
+
+
+class AIGateway:
+    """
+    Wraps model calls with the breaker, limiter, retries and hedging.
+    Every feature is optional; AIGateway() passes calls straight through.
+    """
+
+    def __init__(self, limiter=None, breaker=None, max_retries=0, retry_base=0.5,
+                 retry_max=8.0, hedge_after=None, hedge_workers=8):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge_after = hedge_after
+        self.hedge_workers = hedge_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'hedges': 0,
+            'hedge_wins': 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def retry_delay(self, retry_number):
+        """Full jitter: uniform in [0, min(retry_max, base * 2^(n-1))]"""
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** (retry_number - 1))))
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Call `fn(*args, **kwargs)` through the gateway.
+
+        Raises:
+            CircuitOpenError: Upstream degraded, call not attempted
+            RateLimitExceeded: Shared rate limit exhausted for longer than allowed
+            Exception: The last upstream error once retries are used up
+        """
+        self._count('calls')
+        retries = 0
+        while True:
+            trial = self._before_attempt()
+            if self.limiter:
+                time.sleep(self._reserve(trial))
+
+            try:
+                result = self._invoke(fn, args, kwargs)
+            except Exception as e:
+                delay = self._after_failure(e, trial, retries)
+                retries += 1
+                time.sleep(delay)
+                continue
+
+            self._after_success(trial)
+            return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        """
+        Async counterpart of `call` for coroutine functions such as
+        GenerativeModel.generate_content_async.
+
+        The limiter wait, retry backoff and hedge race are awaited rather than
+        slept on a thread; only the short breaker/limiter row updates run in
+        the sync_to_async thread. Cancelling the caller cancels the upstream
+        request (and gives back a half-open trial slot).
+        """
+        self._count('calls')
+        retries = 0
+        while True:
+            trial = await sync_to_async(self._before_attempt)()
+            try:
+                if self.limiter:
+                    await asyncio.sleep(await sync_to_async(self._reserve)(trial))
+                result = await self._invoke_async(fn, args, kwargs)
+            except asyncio.CancelledError:
+                if trial:
+                    await sync_to_async(self.breaker.release_trial)()
+                raise
+            except RateLimitExceeded:
+                raise
+            except Exception as e:
+                delay = await sync_to_async(self._after_failure)(e, trial, retries)
+                retries += 1
+                await asyncio.sleep(delay)
+                continue
+
+            await sync_to_async(self._after_success)(trial)
+            return result
+
+    def _before_attempt(self):
+        """Returns whether this attempt is the breaker's half-open trial"""
+        return self.breaker.before_call() if self.breaker else False
+
+    def _reserve(self, trial):
+        """Reserve a limiter token; returns the seconds to wait before calling"""
+        try:
+            return self.limiter.reserve()
+        except RateLimitExceeded:
+            if trial:
+                self.breaker.release_trial()
+            self._count('failed')
+            raise
+
+    def _after_success(self, trial):
+        if self.breaker:
+            self.breaker.record_success(trial)
+        self._count('succeeded')
+
+    def _after_failure(self, error, trial, retries):
+        """
+        Record a failed attempt.
+
+        Returns:
+            float: Backoff before the next attempt
+
+        Raises:
+            The error itself when it is not retryable or retries are used up
+        """
+        retryable = is_retryable(error)
+        if self.breaker:
+            if retryable:
+                self.breaker.record_failure(error, trial)
+            else:
+                # The upstream answered; the request itself was bad
+                self.breaker.record_success(trial)
+
+        if not retryable or retries >= self.max_retries:
+            self._count('failed')
+            raise error
+
+        self._count('retries')
+        delay = self.retry_delay(retries + 1)
+        logger.warning(f"AI call failed ({type(error).__name__}: {str(error)}), retry {retries + 1}/{self.max_retries} in {delay:.2f}s")
+        return delay
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.hedge_workers, thread_name_prefix='ai-gateway-hedge'
+                )
+            return self._executor
+
+    def _invoke(self, fn, args, kwargs):
+        if not self.hedge_after:
+            return fn(*args, **kwargs)
+
+        executor = self._get_executor()
+        primary = executor.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+
+        # Slow call: race a duplicate, but only if a token is free right now
+        if self.limiter:
+            try:
+                self.limiter.reserve(max_wait=0)
+            except RateLimitExceeded:
+                return primary.result()
+        hedge = executor.submit(fn, *args, **kwargs)
+        self._count('hedges')
+
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    # The loser keeps running in the background; its result is dropped
+                    return future.result()
+                first_error = first_error or future.exception()
+        raise first_error
+
+    async def _invoke_async(self, fn, args, kwargs):
+        if not self.hedge_after:
+            return await fn(*args, **kwargs)
+
+        primary = asyncio.ensure_future(fn(*args, **kwargs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done:
+                return primary.result()
+
+            # Slow call: race a duplicate, but only if a token is free right now
+            if self.limiter:
+                try:
+                    await sync_to_async(self.limiter.reserve)(max_wait=0)
+                except RateLimitExceeded:
+                    return await primary
+            hedge = asyncio.ensure_future(fn(*args, **kwargs))
+            tasks.append(hedge)
+            self._count('hedges')
+
+            pending = set(tasks)
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            # Unlike threads, the losing (or abandoned) request can be cancelled
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update({
+            'max_retries': self.max_retries,
+            'hedge_after_s': self.hedge_after,
+            'limiter': self.limiter.stats() if self.limiter else None,
+            'breaker': self.breaker.stats() if self.breaker else None,
+        })
+        return stats
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def build_gateway_from_settings():
+    if not getattr(settings, 'AI_GATEWAY_ENABLED', True):
+        return AIGateway()
+
+    limiter = None
+    per_minute = getattr(settings, 'AI_RATE_LIMIT_PER_MINUTE', 60)
+    if per_minute:
+        limiter = TokenBucket(
+            'gemini',
+            rate_per_second=per_minute / 60.0,
+            capacity=getattr(settings, 'AI_RATE_LIMIT_BURST', 10),
+            max_wait=getattr(settings, 'AI_RATE_LIMIT_MAX_WAIT', 30),
+        )
+
+    breaker = None
+    threshold = getattr(settings, 'AI_BREAKER_FAILURE_THRESHOLD', 5)
+    if threshold:
+        breaker = CircuitBreaker(
+            'gemini',
+            failure_threshold=threshold,
+            reset_timeout=getattr(settings, 'AI_BREAKER_RESET_TIMEOUT', 30),
+        )
+
+    return AIGateway(
+        limiter=limiter,
+        breaker=breaker,
+        max_retries=getattr(settings, 'AI_GATEWAY_MAX_RETRIES', 2),
+        retry_base=getattr(settings, 'AI_GATEWAY_RETRY_BASE', 0.5),
+        retry_max=getattr(settings, 'AI_GATEWAY_RETRY_MAX', 8),
+        hedge_after=getattr(settings, 'AI_GATEWAY_HEDGE_AFTER', 0) or None,
+    )
+
+
+def get_gateway():
+    """Process-wide gateway built from settings on first use"""
+    global _gateway
+
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = build_gateway_from_settings()
+        return _gateway
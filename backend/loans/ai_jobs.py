@@ -0,0 +1,314 @@
+"""
+Database-backed job queue for AI work.
+
+Producers call `enqueue_submit_analysis(application)` (or `enqueue_emails()`
+for decision emails); `manage.py run_ai_worker` claims jobs with
+`claim_next_job` and runs them with `run_job`.
+
+Claiming is a conditional UPDATE (compare-and-set on status/lock), so it works
+on SQLite and MySQL alike without SELECT ... FOR UPDATE SKIP LOCKED. A claimed
+job stays invisible to other workers until its visibility timeout expires; if
+the worker dies mid-job the job becomes claimable again and is retried.
+"""
+
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import ai_telemetry
+from .models import AIJob
+
+logger = logging.getLogger(__name__)
+
+
+class RetryableJobError(Exception):
+    """Raised by a job handler when the work should be retried later."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_visibility_timeout():
+    return timedelta(seconds=_setting('AI_JOB_VISIBILITY_TIMEOUT', 300))
+
+
+def compute_backoff(attempts):
+    """
+    Exponential backoff with jitter for the given (1-based) attempt number.
+
+    Returns:
+        timedelta: Delay before the job becomes claimable again
+    """
+    base = _setting('AI_JOB_BACKOFF_BASE', 10)
+    cap = _setting('AI_JOB_BACKOFF_MAX', 600)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    # Up to 25% jitter so retries from a burst of failures spread out
+    delay += random.uniform(0, delay * 0.25)
+    return timedelta(seconds=delay)
+
+
+def enqueue_job(job_type, application=None, payload=None, max_attempts=None):
+    """Create a queued job that is immediately claimable."""
+    return AIJob.objects.create(
+        job_type=job_type,
+        application=application,
+        payload=payload or {},
+        max_attempts=max_attempts or _setting('AI_JOB_MAX_ATTEMPTS', 5),
+        available_at=timezone.now(),
+    )
+
+
+def enqueue_submit_analysis(application, force=False):
+    """
+    Queue the submit-time vehicle valuation and Gemini analysis for an application.
+    Reuses an unfinished job for the same application instead of queueing a duplicate.
+
+    Args:
+        application: LoanApplication instance
+        force: Re-run the Gemini analysis even if the application is unchanged
+    """
+    existing = AIJob.objects.filter(
+        application=application,
+        job_type='submit_analysis',
+        status__in=('queued', 'running'),
+    ).order_by('-created_at').first()
+    if existing and (not force or existing.status == 'queued'):
+        if force and not existing.payload.get('force'):
+            existing.payload = dict(existing.payload, force=True)
+            AIJob.objects.filter(pk=existing.pk, status='queued').update(payload=existing.payload)
+        return existing
+
+    job = enqueue_job('submit_analysis', application=application, payload={'force': True} if force else None)
+    logger.info(f"Queued AI job {job.job_id} for application {application.application_id}")
+
+    if _setting('AI_JOBS_RUN_INLINE', False):
+        # Local development without a worker process
+        _run_inline(job)
+    return job
+
+
+def enqueue_emails(emails):
+    """
+    Queue emails for the worker instead of sending them inside the request.
+    Failed sends are retried with backoff like any other job.
+
+    Args:
+        emails: [(application, subject, message, recipient), ...]
+
+    Returns:
+        list: The queued AIJob instances
+    """
+    now = timezone.now()
+    jobs = AIJob.objects.bulk_create([
+        AIJob(
+            job_type='send_email',
+            application=application,
+            payload={'subject': subject, 'message': message, 'recipient_list': [recipient]},
+            max_attempts=_setting('AI_JOB_MAX_ATTEMPTS', 5),
+            available_at=now,
+        )
+        for application, subject, message, recipient in emails
+    ])
+    logger.info(f"Queued {len(jobs)} emails")
+
+    if jobs and _setting('AI_JOBS_RUN_INLINE', False):
+        # Not before the decisions the emails announce are committed
+        transaction.on_commit(lambda: [_run_inline(job) for job in jobs])
+    return jobs
+
+
+def _run_inline(job):
+    claimed = claim_job(job.pk, worker_id='inline')
+    if claimed:
+        run_job(claimed, worker_id='inline')
+        job.refresh_from_db()
+
+
+def _claimable_q(now):
+    return (
+        Q(status='queued', available_at__lte=now)
+        | Q(status='running', locked_until__lt=now)
+    )
+
+
+def claim_job(pk, worker_id, visibility_timeout=None):
+    """
+    Try to claim a specific job. Returns the claimed job or None if another
+    worker got it first (or it is not claimable).
+    """
+    now = timezone.now()
+    visibility_timeout = visibility_timeout or get_visibility_timeout()
+
+    updated = AIJob.objects.filter(_claimable_q(now), pk=pk).update(
+        status='running',
+        locked_by=worker_id,
+        locked_until=now + visibility_timeout,
+        attempts=F('attempts') + 1,
+        started_at=now,
+        updated_at=now,
+    )
+    if not updated:
+        return None
+
+    job = AIJob.objects.select_related('application').get(pk=pk)
+    if job.attempts > job.max_attempts:
+        # Lock expired on the final attempt (worker crashed or timed out)
+        _mark_failed(job, worker_id, job.last_error or 'Visibility timeout expired on final attempt')
+        return None
+    return job
+
+
+def claim_next_job(worker_id, visibility_timeout=None, batch_size=10):
+    """Claim the oldest claimable job, or return None when the queue is empty."""
+    now = timezone.now()
+    candidates = list(
+        AIJob.objects.filter(_claimable_q(now))
+        .order_by('available_at', 'pk')
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    for pk in candidates:
+        job = claim_job(pk, worker_id, visibility_timeout)
+        if job:
+            return job
+    return None
+
+
+def _owned(job, worker_id):
+    # Only the worker holding the lock may finish the job
+    return AIJob.objects.filter(pk=job.pk, status='running', locked_by=worker_id)
+
+
+def _mark_succeeded(job, worker_id, result):
+    now = timezone.now()
+    _owned(job, worker_id).update(
+        status='succeeded',
+        result=result,
+        last_error='',
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def _mark_failed(job, worker_id, error):
+    now = timezone.now()
+    _owned(job, worker_id).update(
+        status='failed',
+        last_error=error,
+        locked_until=None,
+        finished_at=now,
+        updated_at=now,
+    )
+
+
+def _schedule_retry(job, worker_id, error):
+    now = timezone.now()
+    _owned(job, worker_id).update(
+        status='queued',
+        last_error=error,
+        locked_until=None,
+        locked_by='',
+        available_at=now + compute_backoff(job.attempts),
+        updated_at=now,
+    )
+
+
+def run_job(job, worker_id):
+    """
+    Execute a claimed job and record its outcome.
+    Failed attempts are retried with backoff until max_attempts is reached.
+    """
+    handler = JOB_HANDLERS.get(job.job_type)
+    if handler is None:
+        _mark_failed(job, worker_id, f"No handler for job type '{job.job_type}'")
+        return
+
+    try:
+        with ai_telemetry.for_application(job.application):
+            result = handler(job)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)}"
+        if job.attempts < job.max_attempts:
+            logger.warning(f"AI job {job.job_id} attempt {job.attempts}/{job.max_attempts} failed, retrying: {error}")
+            _schedule_retry(job, worker_id, error)
+        else:
+            logger.error(f"AI job {job.job_id} failed after {job.attempts} attempts: {error}")
+            _mark_failed(job, worker_id, error)
+        return
+    finally:
+        # Write the job's model call logs (AICallLog) before claiming the next one
+        ai_telemetry.flush()
+
+    _mark_succeeded(job, worker_id, result)
+    logger.info(f"AI job {job.job_id} succeeded on attempt {job.attempts}")
+
+
+def handle_submit_analysis(job):
+    """Vehicle valuation followed by Gemini loan analysis for a submitted application."""
+    from . import ai_pipeline
+
+    application = job.application
+    if application is None:
+        raise ValueError('Application no longer exists')
+
+    # Applications the rules already decide don't need their photos valued either
+    prescreen_result = ai_pipeline.prescreen_application(application)
+    if prescreen_result is None:
+        valuation_result = ai_pipeline.analyze_vehicle_for_application(application)
+    else:
+        valuation_result = None
+        logger.info(f"Skipping vehicle valuation for application {application.application_id}: decided by pre-screen")
+
+    gemini_result = ai_pipeline.analyze_application_with_gemini(
+        application, force=job.payload.get('force', False)
+    )
+    if prescreen_result is not None and gemini_result.get('prescreen') and not gemini_result.get('analysis_skipped'):
+        gemini_result['prescreen']['llm_calls_avoided'] += ai_pipeline.vehicle_model_calls(
+            len(ai_pipeline.collect_vehicle_photos(application))
+        )
+    if gemini_result.get('error') and job.attempts < job.max_attempts:
+        # Fallback response: try again later rather than storing "manual review"
+        raise RetryableJobError(gemini_result['error'])
+    if not gemini_result.get('analysis_skipped'):
+        ai_pipeline.save_gemini_result(application, gemini_result)
+
+    result = {
+        'application_id': str(application.application_id),
+        'ai_analysis': ai_pipeline.summarize_gemini_result(gemini_result),
+        'ai_analysis_skipped': bool(gemini_result.get('analysis_skipped')),
+        'prescreen': gemini_result.get('prescreen'),
+        'vehicle_valuation': None,
+    }
+    if valuation_result:
+        value_comparison = valuation_result.pop('value_comparison', None)
+        result['vehicle_valuation'] = valuation_result
+        if value_comparison:
+            result['value_comparison'] = value_comparison
+    return result
+
+
+def handle_send_email(job):
+    """Send a queued email; SMTP errors are raised so the job is retried."""
+    from django.core.mail import send_mail
+
+    payload = job.payload
+    sent = send_mail(
+        payload['subject'],
+        payload['message'],
+        settings.DEFAULT_FROM_EMAIL,
+        payload['recipient_list'],
+        fail_silently=False,
+    )
+    return {'sent': sent}
+
+
+JOB_HANDLERS = {
+    'submit_analysis': handle_submit_analysis,
+    'send_email': handle_send_email,
+}
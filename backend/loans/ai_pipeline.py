@@ -0,0 +1,296 @@
+"""
+Submit-time AI pipeline for loan applications.
+
+These functions used to live on LoanApplicationViewSet and ran inside the
+submit request. They are now executed by the background job queue
+(see loans/ai_jobs.py) so a submit no longer holds a worker while Gemini runs.
+"""
+
+import logging
+import os
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import VehicleValuation
+from .ai_clients import get_car_valuation_service, get_gemini_loan_analyzer
+
+logger = logging.getLogger(__name__)
+
+
+# Document types uploaded through `upload_document` that are sent to the vision model
+VEHICLE_PHOTO_TYPES = (
+    'photo_vin_sticker',
+    'photo_odometer',
+    'photo_borrower',
+    'photo_front_car',
+    'photo_vin_plate',
+    'photo_license',
+    'photo_insurance',
+)
+
+# Same cap as the `analyze_vehicle` endpoint
+MAX_IMAGES_PER_EVALUATION = 10
+
+
+def collect_vehicle_photos(application):
+    """
+    Return (path, 'file_path') tuples for the application's uploaded vehicle photos.
+    """
+    documents = application.documents.filter(
+        document_type__in=VEHICLE_PHOTO_TYPES
+    ).order_by('uploaded_at')
+
+    photos = []
+    for document in documents:
+        try:
+            path = document.file.path
+        except (ValueError, NotImplementedError):
+            # No file attached or storage backend without local paths
+            continue
+        if os.path.exists(path):
+            photos.append((path, 'file_path'))
+
+    return photos[:MAX_IMAGES_PER_EVALUATION]
+
+
+def analyze_vehicle_for_application(application):
+    """
+    Analyze vehicle photos for an application and store the VehicleValuation.
+    Compares the AI-estimated value with the applicant's stated value.
+
+    Returns:
+        dict: Valuation summary, or None when there is nothing to analyze or the
+        image analysis produced no valuation.
+    """
+    evaluation = evaluate_vehicle(application)
+    if evaluation is None:
+        return None
+    analysis_result, photo_count = evaluation
+
+    valuation, created = VehicleValuation.objects.update_or_create(
+        application=application,
+        defaults=vehicle_valuation_fields(application, analysis_result, photo_count)
+    )
+
+    logger.info(f"Vehicle valuation {'created' if created else 'updated'} for application {application.application_id}")
+
+    # The Gemini loan analysis reads the valuation through the reverse accessor
+    application.vehicle_valuation = valuation
+    return summarize_vehicle_valuation(application, valuation, analysis_result, photo_count)
+
+
+def evaluate_vehicle(application):
+    """
+    Run the vehicle valuation on the application's photos without saving anything.
+
+    Returns:
+        tuple: (CarValuationService.evaluate_for_loan report, photos analyzed), or
+        None when there are no photos or the image analysis produced no valuation.
+    """
+    valid_photos = collect_vehicle_photos(application)
+
+    if not valid_photos:
+        logger.warning(f"No vehicle photos found for application {application.application_id}")
+        return None
+
+    valuation_service = get_car_valuation_service()
+    loan_amount = float(application.amount) if application.amount else 0
+
+    logger.info(f"Analyzing {len(valid_photos)} photos for application {application.application_id}")
+    analysis_result = valuation_service.evaluate_for_loan(
+        images=valid_photos,
+        loan_amount=loan_amount
+    )
+
+    if 'valuation' not in analysis_result:
+        logger.error(
+            f"Analysis failed for application {application.application_id}: "
+            f"{analysis_result.get('error') or analysis_result.get('reason')}"
+        )
+        return None
+
+    valuation_data = analysis_result['valuation']
+    logger.info(f"Estimated value: ${valuation_data.get('estimated_value', 0):,.2f}, LTV: {valuation_data.get('ltv_ratio', 0):.2f}%")
+    return analysis_result, len(valid_photos)
+
+
+def vehicle_valuation_fields(application, analysis_result, photo_count):
+    """VehicleValuation field values for an evaluate_vehicle report"""
+    vehicle_data = analysis_result.get('vehicle_analysis', {})
+    valuation_data = analysis_result.get('valuation', {})
+    existing_vehicle = application.vehicle_info
+
+    return {
+        'make': vehicle_data.get('make') or (existing_vehicle.make if existing_vehicle else ''),
+        'model': vehicle_data.get('model') or (existing_vehicle.model if existing_vehicle else ''),
+        'year': vehicle_data.get('year') or (existing_vehicle.year if existing_vehicle else ''),
+        'body_type': vehicle_data.get('body_type', ''),
+        'color': vehicle_data.get('color') or (existing_vehicle.color if existing_vehicle else ''),
+        'condition': vehicle_data.get('condition', 'good'),
+        'visible_damage': vehicle_data.get('visible_damage', []),
+        'features': vehicle_data.get('features', []),
+        'estimated_value_low': valuation_data.get('estimated_value', 0),
+        'estimated_value_high': valuation_data.get('estimated_value', 0),
+        'estimated_value_avg': valuation_data.get('estimated_value', 0),
+        'ltv_ratio': valuation_data.get('ltv_ratio', 0),
+        'max_loan_amount': valuation_data.get('max_loan_amount', 0),
+        'recommended_loan_amount': valuation_data.get('max_loan_amount', 0),
+        'risk_level': 'high' if not analysis_result.get('approved') else 'low',
+        'risk_factors': analysis_result.get('risk_factors', []),
+        'confidence_level': vehicle_data.get('confidence', 'medium'),
+        'images_analyzed': vehicle_data.get('images_analyzed', photo_count),
+        'analysis_notes': analysis_result.get('recommendation', ''),
+        'full_analysis_data': analysis_result,
+        'is_approved_for_loan': analysis_result.get('approved', False),
+        'approval_notes': analysis_result.get('recommendation', '')
+    }
+
+
+def summarize_vehicle_valuation(application, valuation, analysis_result, photo_count):
+    """Valuation summary returned with the submit job result"""
+    valuation_data = analysis_result.get('valuation', {})
+    summary = {
+        'analyzed': True,
+        'estimated_value': float(valuation_data.get('estimated_value', 0)),
+        'requested_amount': float(application.amount) if application.amount else 0.0,
+        'ltv_ratio': float(valuation_data.get('ltv_ratio', 0)),
+        'ai_approved': analysis_result.get('approved', False),
+        'recommendation': analysis_result.get('recommendation', ''),
+        'confidence': analysis_result.get('vehicle_analysis', {}).get('confidence', 'medium'),
+        'images_analyzed': photo_count
+    }
+
+    if application.applicant_estimated_value:
+        summary['value_comparison'] = valuation.compare_with_applicant_estimate()
+
+    return summary
+
+
+def prescreen_application(application):
+    """
+    Valuation-independent pre-screen rules (see GeminiLoanAnalyzer.prescreen),
+    checked before the vehicle photos are sent to the vision model.
+
+    Returns:
+        dict: The pre-screen result, or None when the application needs the AI pipeline
+    """
+    gemini_analyzer = get_gemini_loan_analyzer()
+    application_data = gemini_analyzer._prepare_application_data(application)
+    return gemini_analyzer.prescreen(application_data, include_valuation_rules=False)
+
+
+def vehicle_model_calls(photo_count):
+    """Model requests a vehicle evaluation of `photo_count` photos makes (before cache hits)"""
+    if not photo_count:
+        return 0
+    if getattr(settings, 'GEMINI_VISION_MODE', 'per_image') == 'combined':
+        return 1
+    # One request per photo plus the market comparison
+    return photo_count + 1
+
+
+def analyze_application_with_gemini(application, force=False):
+    """
+    Run the Gemini loan analysis for an application.
+    The result is not saved; see `save_gemini_result`.
+
+    The analysis is skipped when the application's data fingerprint matches
+    the one stored with the previous analysis, unless `force` is set.
+
+    Returns:
+        dict: Analysis result, with the data 'fingerprint'. Contains an 'error'
+        key when the analyzer had to fall back to a manual-review response, and
+        'analysis_skipped': True when the stored analysis was reused.
+    """
+    gemini_analyzer = get_gemini_loan_analyzer()
+    application_data = gemini_analyzer._prepare_application_data(application)
+    fingerprint = gemini_analyzer.fingerprint_application_data(application_data)
+
+    if (not force and application.ai_analysis_data
+            and application.ai_analysis_fingerprint == fingerprint):
+        logger.info(f"Application {application.application_id} unchanged since last AI analysis, skipping Gemini")
+        return dict(application.ai_analysis_data, analysis_skipped=True)
+
+    logger.info(f"Starting Gemini AI analysis for application {application.application_id}")
+    ai_result = gemini_analyzer.analyze_loan_application(application, application_data=application_data)
+    if not ai_result.get('error'):
+        # Fallback responses are not fingerprinted so the next run retries them
+        ai_result['fingerprint'] = fingerprint
+    return ai_result
+
+
+def rescore_application(application, force=False, revalue_vehicle=True):
+    """
+    Re-run the submit-time pipeline (pre-screen, vehicle valuation, Gemini
+    analysis) for an existing application without saving anything, so callers
+    can write many results in one batch.
+
+    Args:
+        application: LoanApplication
+        force: Re-run Gemini even when the stored analysis' fingerprint matches
+        revalue_vehicle: False to keep the stored VehicleValuation
+
+    Returns:
+        tuple: (VehicleValuation holding the new values, unsaved, or None when the
+        vehicle was not revalued; Gemini result as from analyze_application_with_gemini)
+    """
+    valuation = None
+    if revalue_vehicle and prescreen_application(application) is None:
+        evaluation = evaluate_vehicle(application)
+        if evaluation is not None:
+            analysis_result, photo_count = evaluation
+            valuation = getattr(application, 'vehicle_valuation', None) or VehicleValuation(application=application)
+            for field, value in vehicle_valuation_fields(application, analysis_result, photo_count).items():
+                setattr(valuation, field, value)
+            # Set explicitly: bulk_update skips auto_now
+            valuation.updated_at = timezone.now()
+            application.vehicle_valuation = valuation
+
+    return valuation, analyze_application_with_gemini(application, force=force)
+
+
+# LoanApplication fields written from a Gemini analysis result
+GEMINI_RESULT_FIELDS = [
+    'ai_recommendation',
+    'ai_risk_assessment',
+    'ai_approval_suggestion',
+    'ai_analysis_data',
+    'ai_analysis_fingerprint',
+    'ai_analysis_timestamp',
+    'updated_at',
+]
+
+
+def apply_gemini_result(application, ai_result):
+    """Set the application's ai_* fields from a Gemini analysis result, without saving."""
+    now = timezone.now()
+    application.ai_recommendation = ai_result.get('recommendation', '')
+    application.ai_risk_assessment = ai_result.get('risk_assessment', 'medium')
+    application.ai_approval_suggestion = ai_result.get('approval_suggestion', 'review')
+    application.ai_analysis_data = ai_result
+    application.ai_analysis_fingerprint = ai_result.get('fingerprint', '')
+    application.ai_analysis_timestamp = now
+    # Set explicitly: bulk_update (rescore_applications) skips auto_now
+    application.updated_at = now
+
+
+def save_gemini_result(application, ai_result):
+    """Persist a Gemini analysis result onto the application's ai_* fields."""
+    apply_gemini_result(application, ai_result)
+    application.save(update_fields=GEMINI_RESULT_FIELDS)
+
+    logger.info(f"Gemini AI analysis completed for application {application.application_id}")
+    logger.info(f"AI Suggestion: {ai_result.get('approval_suggestion')}, Risk: {ai_result.get('risk_assessment')}")
+
+
+def summarize_gemini_result(ai_result):
+    """Client-facing subset of a Gemini analysis (the shape submit used to return)."""
+    return {
+        'recommendation': ai_result.get('recommendation'),
+        'risk_assessment': ai_result.get('risk_assessment'),
+        'approval_suggestion': ai_result.get('approval_suggestion'),
+        'key_strengths': ai_result.get('key_strengths', []),
+        'key_concerns': ai_result.get('key_concerns', []),
+        'confidence_score': ai_result.get('confidence_score', 0),
+    }
@@ -0,0 +1,300 @@
+"""
+Telemetry for AI model calls (AICallLog).
+
+The analyzers wrap each model call in track() and report cache hits with
+record_cache_hit(). Rows are buffered in-process and written with one
+bulk_create once AI_TELEMETRY_BATCH_SIZE rows are waiting or the oldest is
+AI_TELEMETRY_FLUSH_INTERVAL seconds old, and at the end of every request and
+every AI job. Telemetry never fails the call it measures: a failed write is
+logged and its rows dropped, as are rows still buffered when a process dies.
+
+Calls made for an application are attributed to it with for_application(),
+which the pipeline sets around each job's analysis; the context carries over
+to the analyzers' worker threads and tasks.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_application_id = contextvars.ContextVar('ai_telemetry_application_id', default=None)
+
+_MILLION = Decimal(1000000)
+
+
+@contextmanager
+def for_application(application):
+    """Attribute the model calls made inside the block to `application`"""
+    token = _application_id.set(getattr(application, 'application_id', None))
+    try:
+        yield
+    finally:
+        _application_id.reset(token)
+
+
+def request_size(contents):
+    """
+    Returns:
+        tuple: (approximate request bytes, image count) of generate_content input
+    """
+    parts = contents if isinstance(contents, list) else [contents]
+    size = 0
+    images = 0
+    for part in parts:
+        if isinstance(part, str):
+            size += len(part.encode('utf-8'))
+            continue
+        images += 1
+        if isinstance(part, dict):
+            size += len(part.get('data') or b'')
+        elif isinstance(part, (bytes, bytearray)):
+            size += len(part)
+        else:
+            # PIL image sent at full resolution; the SDK re-encodes it
+            width, height = getattr(part, 'size', (0, 0))
+            size += width * height * 3 // 10
+    return size, images
+
+
+def usage_tokens(response):
+    """(prompt tokens, response tokens) from the response's usage metadata, or Nones"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return None, None
+    prompt_tokens = getattr(usage, 'prompt_token_count', None)
+    response_tokens = getattr(usage, 'candidates_token_count', None)
+    if not isinstance(prompt_tokens, int) or not isinstance(response_tokens, int):
+        return None, None
+    return prompt_tokens, response_tokens
+
+
+def call_cost(prompt_tokens, response_tokens):
+    """USD cost of a call at AI_PRICE_INPUT_PER_MILLION / AI_PRICE_OUTPUT_PER_MILLION"""
+    input_price = Decimal(str(getattr(settings, 'AI_PRICE_INPUT_PER_MILLION', 0.10)))
+    output_price = Decimal(str(getattr(settings, 'AI_PRICE_OUTPUT_PER_MILLION', 0.40)))
+    cost = ((prompt_tokens or 0) * input_price + (response_tokens or 0) * output_price) / _MILLION
+    return cost.quantize(Decimal('0.00000001'))
+
+
+def classify_error(error):
+    """AICallLog outcome for an exception raised by a tracked call"""
+    from .ai_gateway import CircuitOpenError, RateLimitExceeded
+
+    if isinstance(error, (TimeoutError, asyncio.CancelledError)):
+        return 'timeout'
+    if isinstance(error, RateLimitExceeded):
+        return 'rate_limited'
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, json.JSONDecodeError):
+        return 'invalid_response'
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return 'error'
+    if isinstance(error, exceptions.DeadlineExceeded):
+        return 'timeout'
+    if isinstance(error, exceptions.TooManyRequests):
+        return 'rate_limited'
+    return 'error'
+
+
+class CallLogBuffer:
+    """Thread-safe buffer of unsaved AICallLog rows, written in batches"""
+
+    def __init__(self, batch_size=50, flush_interval=5.0):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self._rows = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, row):
+        with self._lock:
+            if not self._rows:
+                self._oldest = time.monotonic()
+            self._rows.append(row)
+            due = (
+                len(self._rows) >= self.batch_size
+                or time.monotonic() - self._oldest >= self.flush_interval
+            )
+        if due and not _in_event_loop():
+            # On the event loop the next sync flush point writes them instead
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows; returns how many were written"""
+        from .models import AICallLog
+
+        with self._lock:
+            rows, self._rows = self._rows, []
+            self._oldest = None
+        if not rows:
+            return 0
+
+        try:
+            AICallLog.objects.bulk_create(rows, batch_size=500)
+        except Exception as e:
+            with self._lock:
+                self.dropped += len(rows)
+            logger.warning(f"Dropped {len(rows)} AI call log rows: {str(e)}")
+            return 0
+
+        with self._lock:
+            self.written += len(rows)
+        return len(rows)
+
+    def pending(self):
+        with self._lock:
+            return len(self._rows)
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_call_log_buffer():
+    """Process-wide buffer built from settings on first use, or None when telemetry is off"""
+    global _buffer
+
+    if not getattr(settings, 'AI_TELEMETRY_ENABLED', True):
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = CallLogBuffer(
+                batch_size=getattr(settings, 'AI_TELEMETRY_BATCH_SIZE', 50),
+                flush_interval=getattr(settings, 'AI_TELEMETRY_FLUSH_INTERVAL', 5),
+            )
+        return _buffer
+
+
+def flush():
+    """Write the shared buffer's rows now (end of a request or job)"""
+    if _buffer is not None and not _in_event_loop():
+        _buffer.flush()
+
+
+def _make_row(call_type, model_name, started_at, latency, contents=None, images=0,
+              response=None, cache_hit=False, outcome='success', error=''):
+    from .models import AICallLog
+
+    request_bytes = 0
+    if contents is not None:
+        request_bytes, images = request_size(contents)
+    prompt_tokens, response_tokens = usage_tokens(response)
+    return AICallLog(
+        call_type=call_type,
+        model_name=model_name or '',
+        application_id=_application_id.get(),
+        started_at=started_at,
+        latency_ms=round(latency * 1000, 2),
+        request_bytes=request_bytes,
+        image_count=images,
+        prompt_tokens=prompt_tokens,
+        response_tokens=response_tokens,
+        cost_usd=call_cost(prompt_tokens, response_tokens),
+        cache_hit=cache_hit,
+        outcome=outcome,
+        error=error[:255],
+    )
+
+
+class TrackedCall:
+    """Handle yielded by track(); give it the model response to record tokens"""
+
+    def __init__(self):
+        self.response = None
+
+    def set_response(self, response):
+        self.response = response
+
+
+@contextmanager
+def track(buffer, call_type, model_name, contents):
+    """
+    Time the model call made in the block and buffer its AICallLog row.
+    Exceptions are recorded with their outcome and re-raised.
+
+    Args:
+        buffer: CallLogBuffer, or None to record nothing
+        call_type: AICallLog call type
+        model_name: Model the call goes to
+        contents: What is sent to generate_content (sizes and image count)
+    """
+    call = TrackedCall()
+    if buffer is None:
+        yield call
+        return
+
+    started_at = timezone.now()
+    started = time.perf_counter()
+    try:
+        yield call
+    except BaseException as e:
+        buffer.add(_make_row(
+            call_type, model_name, started_at, time.perf_counter() - started, contents,
+            response=call.response, outcome=classify_error(e), error=f"{type(e).__name__}: {str(e)}",
+        ))
+        raise
+    buffer.add(_make_row(
+        call_type, model_name, started_at, time.perf_counter() - started, contents, response=call.response,
+    ))
+
+
+def record_cache_hit(buffer, call_type, model_name, started, images=0):
+    """
+    Buffer a row for a result served from cache instead of a model call.
+
+    Args:
+        started: time.perf_counter() value from before the cache lookup
+    """
+    if buffer is None:
+        return
+    latency = time.perf_counter() - started
+    buffer.add(_make_row(
+        call_type, model_name, timezone.now() - timedelta(seconds=latency), latency,
+        images=images, cache_hit=True,
+    ))
+
+
+def latency_percentiles(queryset, quantiles=(0.5, 0.95, 0.99)):
+    """
+    Nearest-rank latency percentiles of an AICallLog queryset, computed in the
+    database (one ordered OFFSET query per quantile) rather than by loading
+    every row.
+
+    Returns:
+        dict: {quantile: latency in ms, or None when there are no rows}
+    """
+    count = queryset.count()
+    ordered = queryset.order_by('latency_ms').values_list('latency_ms', flat=True)
+    percentiles = {}
+    for q in quantiles:
+        if not count:
+            percentiles[q] = None
+            continue
+        rank = min(count, max(1, math.ceil(q * count)))
+        percentiles[q] = ordered[rank - 1]
+    return percentiles
@@ -3,13 +3,173 @@
 # and provide market price estimations
 
 import os
+import asyncio
 import base64
+import contextvars
 import requests
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+import hashlib
 import json
+import time
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import google.generativeai as genai
+from django.db import connections
+from .ai_cache import (
+    AsyncSingleFlight,
+    SingleFlight,
+    get_image_analysis_cache,
+    get_market_comparison_cache,
+    image_analysis_key,
+    sha256_of_image,
+)
+from .ai_backends import requires_api_key
+from .ai_clients import get_generative_model
+from .ai_gateway import get_gateway
+from .ai_telemetry import get_call_log_buffer, record_cache_hit, track
+from .image_preprocessing import get_image_preprocessor
+from .vehicle_normalization import normalize_vehicle
+
+# Sentinel so callers can pass result_cache=None etc. to disable a stage
+_DEFAULT = object()
+
+# Coalesces concurrent market-comparison misses for the same vehicle
+_market_comparison_flight = SingleFlight()
+# Same for callers on the event loop
+_market_comparison_async_flight = AsyncSingleFlight()
+
+
+# Bump when the prompt or expected JSON changes so cached results are not reused
+IMAGE_PROMPT_VERSION = '1'
+# Same for the market comparison prompt
+MARKET_PROMPT_VERSION = '1'
+# Same for the single-request (combined) vehicle evaluation prompt
+COMBINED_PROMPT_VERSION = '1'
+
+# GEMINI_VISION_MODE values: one request per photo plus a market request, or
+# every photo and the market valuation in one request
+VISION_MODES = ('per_image', 'combined')
+
+IMAGE_ANALYSIS_PROMPT = """
+            Analyze this car image and provide detailed information in JSON format.
+            
+            Please identify and provide:
+            1. Make (e.g., Toyota, Honda, Ford)
+            2. Model (e.g., Camry, Accord, F-150)
+            3. Estimated year or year range
+            4. Body type (sedan, SUV, truck, etc.)
+            5. Color
+            6. Visible condition (excellent, good, fair, poor)
+            7. Any visible damage, dents, scratches, or issues
+            8. Estimated market value range (provide low and high estimates in USD)
+            9. Key features visible (alloy wheels, sunroof, etc.)
+            10. Confidence level of your assessment (low, medium, high)
+            11. Additional notes or observations
+            
+            Format your response as valid JSON with the following structure:
+            {
+                "make": "string",
+                "model": "string",
+                "year": "string or range",
+                "body_type": "string",
+                "color": "string",
+                "condition": "excellent|good|fair|poor",
+                "visible_damage": ["list of issues"],
+                "estimated_value": {
+                    "low": number,
+                    "high": number,
+                    "currency": "USD"
+                },
+                "features": ["list of features"],
+                "confidence": "low|medium|high",
+                "notes": "string"
+            }
+            
+            If you cannot identify something with certainty, mark it as "unknown" or provide your best estimate with lower confidence.
+            """
+
+COMBINED_ANALYSIS_PROMPT = """
+            You are an expert automotive appraiser and loan officer. The numbered photos that follow
+            all show the same vehicle from different angles. Use all of them together.
+            
+            Provide:
+            1. The vehicle's make, model, estimated year or year range, body type and color
+            2. Its overall condition (excellent, good, fair, poor) - the worst condition any photo shows
+            3. All visible damage, dents, scratches or issues, and key features, across all photos
+            4. Per photo: which view it shows and whether it is usable for an appraisal
+            5. Current market value range (low, average, high) in USD
+            6. Factors affecting the value and comparable vehicles in the market
+            7. Loan-to-value ratio recommendation (what percentage of value should be lent)
+            8. Risk assessment for lending (low, medium, high)
+            
+            Format your response as valid JSON with the following structure:
+            {
+                "vehicle": {
+                    "make": "string",
+                    "model": "string",
+                    "year": "string or range",
+                    "body_type": "string",
+                    "color": "string",
+                    "condition": "excellent|good|fair|poor",
+                    "visible_damage": ["list of issues"],
+                    "estimated_value": {
+                        "low": number,
+                        "high": number,
+                        "currency": "USD"
+                    },
+                    "features": ["list of features"],
+                    "confidence": "low|medium|high",
+                    "notes": "string"
+                },
+                "photos": [
+                    {
+                        "photo": number,
+                        "view": "front|rear|left|right|interior|odometer|other",
+                        "usable": true,
+                        "notes": "string"
+                    }
+                ],
+                "market": {
+                    "market_value": {
+                        "low": number,
+                        "average": number,
+                        "high": number,
+                        "currency": "USD"
+                    },
+                    "value_factors": ["list of factors"],
+                    "comparable_vehicles": [
+                        {
+                            "make": "string",
+                            "model": "string",
+                            "year": "string",
+                            "price": number
+                        }
+                    ],
+                    "loan_recommendation": {
+                        "ltv_ratio": number (0-100),
+                        "max_loan_amount": number,
+                        "reasoning": "string"
+                    },
+                    "risk_assessment": {
+                        "level": "low|medium|high",
+                        "factors": ["list of risk factors"]
+                    }
+                }
+            }
+            
+            If you cannot identify something with certainty, mark it as "unknown" or provide your best estimate with lower confidence.
+            """
+
+
+def _extract_json(content: str) -> str:
+    """Strip the markdown code fences Gemini sometimes wraps JSON in"""
+    if '```json' in content:
+        return content.split('```json')[1].split('```')[0].strip()
+    if '```' in content:
+        return content.split('```')[1].split('```')[0].strip()
+    return content
 
 
 class CarImageAnalyzer:
@@ -22,18 +182,69 @@ class CarImageAnalyzer:
     - Estimated market value
     """
     
-    def __init__(self):
+    def __init__(self, model=None, text_model=None, result_cache=_DEFAULT, market_cache=_DEFAULT,
+                 preprocessor=_DEFAULT, gateway=_DEFAULT, telemetry=_DEFAULT):
+        """
+        Args:
+            model: Optional vision model object (anything with generate_content);
+                   defaults to a Gemini GenerativeModel
+            text_model: Optional text model object for market comparisons
+            result_cache: ResultCache for parsed image analyses, or None to disable;
+                          defaults to the shared cache from loans.ai_cache
+            market_cache: Cache for market comparisons, or None to disable;
+                          defaults to the shared two-tier cache from loans.ai_cache
+            preprocessor: ImagePreprocessor applied before each model call, or None
+                          to send images at full resolution; defaults to settings
+            gateway: AIGateway every model call goes through (rate limit, circuit
+                     breaker, retries); defaults to the shared one from loans.ai_gateway
+            telemetry: CallLogBuffer that model calls and cache hits are logged to,
+                       or None to disable; defaults to the shared one from loans.ai_telemetry
+        """
         self.api_key = os.getenv('GEMINI_API_KEY')
         self.model_name = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
         self.text_model_name = os.getenv('GEMINI_TEXT_MODEL', 'gemini-2.0-flash')
         
-        if not self.api_key:
+        # Concurrent per-image analysis settings
+        self.max_concurrency = max(1, int(getattr(settings, 'GEMINI_IMAGE_CONCURRENCY', 4)))
+        self.image_timeout = float(getattr(settings, 'GEMINI_IMAGE_TIMEOUT', 60))
+        # Bound on the single multi-image request of analyze_vehicle_combined
+        self.combined_timeout = float(getattr(settings, 'GEMINI_COMBINED_TIMEOUT', 120))
+        
+        # Content-addressed cache of parsed results (skips the model call on a hit)
+        if result_cache is _DEFAULT:
+            result_cache = get_image_analysis_cache()
+        self.result_cache = result_cache
+        if market_cache is _DEFAULT:
+            market_cache = get_market_comparison_cache()
+        self.market_cache = market_cache
+        
+        # Downscale/re-encode stage (loans/image_preprocessing.py)
+        if preprocessor is _DEFAULT:
+            preprocessor = get_image_preprocessor()
+        self.preprocessor = preprocessor
+        
+        # Shared rate limiter / circuit breaker (loans/ai_gateway.py)
+        if gateway is _DEFAULT:
+            gateway = get_gateway()
+        self.gateway = gateway
+        
+        # Per-call latency, size, tokens and cost (AICallLog)
+        if telemetry is _DEFAULT:
+            telemetry = get_call_log_buffer()
+        self.telemetry = telemetry
+        
+        if model is not None:
+            self.model = model
+            self.text_model = text_model or model
+            return
+        
+        # The replay backend (AI_MODEL_BACKEND=replay) works without a key
+        if not self.api_key and requires_api_key():
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
-        # Configure Gemini API
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(self.model_name)
-        self.text_model = genai.GenerativeModel(self.text_model_name)
+        # Shared Gemini clients, created on first use (loans/ai_clients.py)
+        self.model = get_generative_model(self.model_name, self.api_key)
+        self.text_model = get_generative_model(self.text_model_name, self.api_key)
     
     def encode_image_to_base64(self, image_path: str) -> str:
         """Convert image file to base64 string"""
@@ -44,6 +255,24 @@ class CarImageAnalyzer:
         """Convert image bytes to base64 string"""
         return base64.b64encode(image_bytes).decode('utf-8')
     
+    def _load_image_part(self, image_data: str, image_type: str):
+        """
+        Returns:
+            tuple: (part for generate_content, open PIL image the caller must close or None)
+        """
+        if self.preprocessor is not None:
+            # Downscaled, metadata-free JPEG (cached next to file inputs)
+            return self.preprocessor.prepare(image_data, image_type), None
+        
+        import PIL.Image
+        import io
+        
+        if image_type == "file_path":
+            image = PIL.Image.open(image_data)
+        else:
+            image = PIL.Image.open(io.BytesIO(base64.b64decode(image_data)))
+        return image, image
+    
     def analyze_single_image(self, image_data: str, image_type: str = "base64") -> Dict:
         """
         Analyze a single car image using Gemini Pro Vision
@@ -57,78 +286,82 @@ class CarImageAnalyzer:
         """
         
         try:
-            # Prepare image for Gemini
-            if image_type == "file_path":
-                with open(image_data, "rb") as image_file:
-                    image_bytes = image_file.read()
-            else:
-                image_bytes = base64.b64decode(image_data)
-            
-            # Create image part for Gemini
-            import PIL.Image
-            import io
-            
-            image = PIL.Image.open(io.BytesIO(image_bytes))
+            started = time.perf_counter()
+            cache_key = self._image_cache_key(image_data, image_type)
+            cached = self._cached_image_analysis(cache_key)
+            if cached is not None:
+                record_cache_hit(self.telemetry, 'image_analysis', self.model_name, started, images=1)
+                return cached
             
-            prompt = """
-            Analyze this car image and provide detailed information in JSON format.
+            # Prepare image for Gemini
+            image_part, image = self._load_image_part(image_data, image_type)
+            contents = [IMAGE_ANALYSIS_PROMPT, image_part]
             
-            Please identify and provide:
-            1. Make (e.g., Toyota, Honda, Ford)
-            2. Model (e.g., Camry, Accord, F-150)
-            3. Estimated year or year range
-            4. Body type (sedan, SUV, truck, etc.)
-            5. Color
-            6. Visible condition (excellent, good, fair, poor)
-            7. Any visible damage, dents, scratches, or issues
-            8. Estimated market value range (provide low and high estimates in USD)
-            9. Key features visible (alloy wheels, sunroof, etc.)
-            10. Confidence level of your assessment (low, medium, high)
-            11. Additional notes or observations
+            # Generate response using Gemini (bounded so a hung call frees its worker thread)
+            try:
+                with track(self.telemetry, 'image_analysis', self.model_name, contents) as call:
+                    response = self.gateway.call(
+                        self.model.generate_content,
+                        contents,
+                        request_options={'timeout': self.image_timeout}
+                    )
+                    call.set_response(response)
+                    return self._store_image_analysis(response.text, cache_key)
+            finally:
+                if image is not None:
+                    image.close()
             
-            Format your response as valid JSON with the following structure:
-            {
-                "make": "string",
-                "model": "string",
-                "year": "string or range",
-                "body_type": "string",
-                "color": "string",
-                "condition": "excellent|good|fair|poor",
-                "visible_damage": ["list of issues"],
-                "estimated_value": {
-                    "low": number,
-                    "high": number,
-                    "currency": "USD"
-                },
-                "features": ["list of features"],
-                "confidence": "low|medium|high",
-                "notes": "string"
+        except json.JSONDecodeError as e:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Failed to parse response: {str(e)}"
             }
+        except Exception as e:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Unexpected error: {str(e)}"
+            }
+    
+    async def analyze_single_image_async(self, image_data: str, image_type: str = "base64") -> Dict:
+        """
+        Async counterpart of analyze_single_image using generate_content_async
+        
+        The model call is awaited on the event loop; hashing and resizing run in
+        a worker thread and cache reads/writes through sync_to_async.
+        """
+        
+        try:
+            started = time.perf_counter()
+            cache_key = await asyncio.to_thread(self._image_cache_key, image_data, image_type)
+            cached = await sync_to_async(self._cached_image_analysis)(cache_key)
+            if cached is not None:
+                record_cache_hit(self.telemetry, 'image_analysis', self.model_name, started, images=1)
+                return cached
             
-            If you cannot identify something with certainty, mark it as "unknown" or provide your best estimate with lower confidence.
-            """
-            
-            # Generate response using Gemini
-            response = self.model.generate_content([prompt, image])
-            content = response.text
-            
-            # Try to parse JSON from the response
-            # Gemini might wrap it in markdown code blocks
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
-            
-            analysis = json.loads(content)
-            analysis['raw_response'] = content
-            analysis['analyzed_at'] = datetime.now().isoformat()
+            image_part, image = await asyncio.to_thread(self._load_image_part, image_data, image_type)
+            contents = [IMAGE_ANALYSIS_PROMPT, image_part]
+            try:
+                with track(self.telemetry, 'image_analysis', self.model_name, contents) as call:
+                    async with asyncio.timeout(self.image_timeout):
+                        response = await self.gateway.call_async(
+                            self.model.generate_content_async,
+                            contents,
+                            request_options={'timeout': self.image_timeout}
+                        )
+                    call.set_response(response)
+                    return await sync_to_async(self._store_image_analysis)(response.text, cache_key)
+            finally:
+                if image is not None:
+                    image.close()
             
+        except TimeoutError:
             return {
-                'success': True,
-                'data': analysis,
-                'error': None
+                'success': False,
+                'data': None,
+                'error': f"Image analysis timed out after {self.image_timeout:g}s"
             }
-            
         except json.JSONDecodeError as e:
             return {
                 'success': False,
@@ -142,25 +375,89 @@ class CarImageAnalyzer:
                 'error': f"Unexpected error: {str(e)}"
             }
     
-    def analyze_multiple_images(self, images: List[Tuple[str, str]]) -> Dict:
+    def _image_cache_key(self, image_data: str, image_type: str) -> Optional[str]:
+        """Content-addressed result cache key, or None when caching is off"""
+        if self.result_cache is None:
+            return None
+        image_sha256 = sha256_of_image(image_data, image_type)
+        preprocessing = self.preprocessor.signature if self.preprocessor else 'original'
+        return image_analysis_key(image_sha256, self.model_name, f"{IMAGE_PROMPT_VERSION}:{preprocessing}")
+    
+    def _cached_image_analysis(self, cache_key: Optional[str]) -> Optional[Dict]:
+        if cache_key is None:
+            return None
+        cached = self.result_cache.get(cache_key)
+        if cached is None:
+            return None
+        return {
+            'success': True,
+            'data': cached,
+            'error': None,
+            'cached': True
+        }
+    
+    def _store_image_analysis(self, content: str, cache_key: Optional[str]) -> Dict:
+        """Parse a model response and cache it; raises json.JSONDecodeError on bad output"""
+        # Gemini might wrap the JSON in markdown code blocks
+        content = _extract_json(content)
+        
+        analysis = json.loads(content)
+        analysis['raw_response'] = content
+        analysis['analyzed_at'] = datetime.now().isoformat()
+        
+        if cache_key is not None:
+            self.result_cache.set(cache_key, analysis)
+        
+        return {
+            'success': True,
+            'data': analysis,
+            'error': None,
+            'cached': False
+        }
+    
+    def analyze_multiple_images(self, images: List[Tuple[str, str]], max_concurrency: Optional[int] = None) -> Dict:
         """
         Analyze multiple car images (different angles)
         
+        Images are analyzed concurrently on a bounded thread pool, so total latency
+        is roughly ceil(N / max_concurrency) model round trips instead of N.
+        Results keep the input order. Images that fail or exceed the per-image
+        timeout are reported in 'failed_results'; the rest are still aggregated.
+        
         Args:
             images: List of tuples (image_data, image_type)
+            max_concurrency: Parallel requests (defaults to GEMINI_IMAGE_CONCURRENCY)
         
         Returns:
             Aggregated analysis results
         """
         
-        results = []
-        for i, (image_data, image_type) in enumerate(images):
-            result = self.analyze_single_image(image_data, image_type)
+        results = self._analyze_images_concurrently(images, max_concurrency or self.max_concurrency)
+        return self._summarize_image_results(results)
+    
+    async def analyze_multiple_images_async(self, images: List[Tuple[str, str]], max_concurrency: Optional[int] = None) -> Dict:
+        """
+        Async counterpart of analyze_multiple_images
+        
+        Images are analyzed with asyncio.gather, at most max_concurrency at a
+        time. Cancelling the caller cancels the in-flight model requests.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+        
+        async def analyze(image_data, image_type):
+            async with semaphore:
+                return await self.analyze_single_image_async(image_data, image_type)
+        
+        results = await asyncio.gather(*(analyze(image_data, image_type) for image_data, image_type in images))
+        for i, result in enumerate(results):
             result['image_index'] = i
-            results.append(result)
+        return self._summarize_image_results(list(results))
+    
+    def _summarize_image_results(self, results: List[Dict]) -> Dict:
+        """Aggregate the successful per-image results and report the failed ones"""
         
-        # Aggregate results
         successful_analyses = [r for r in results if r['success']]
+        failed_results = [r for r in results if not r['success']]
         
         if not successful_analyses:
             return {
@@ -170,7 +467,76 @@ class CarImageAnalyzer:
             }
         
         # Combine insights from multiple images
-        return self._aggregate_analyses(successful_analyses)
+        aggregated = self._aggregate_analyses(successful_analyses)
+        aggregated['failed_results'] = failed_results
+        aggregated['data']['images_failed'] = len(failed_results)
+        return aggregated
+    
+    def _analyze_images_concurrently(self, images: List[Tuple[str, str]], max_concurrency: int) -> List[Dict]:
+        """
+        Fan out analyze_single_image calls and collect results in input order.
+        
+        At most max_concurrency images are in flight. Each gets image_timeout
+        from when it starts; one that runs past it is reported as timed out and
+        gives up its slot, so the images queued behind it still start and a
+        hung call can't hold up the batch.
+        """
+        if not images:
+            return []
+        
+        results = [None] * len(images)
+        queued = deque(enumerate(images))
+        running = {}  # future -> (image index, deadline)
+        # A thread per image: abandoned stragglers keep theirs while the queue moves on
+        executor = ThreadPoolExecutor(max_workers=len(images), thread_name_prefix='car-image-analysis')
+        try:
+            while queued or running:
+                while queued and len(running) < max_concurrency:
+                    i, (image_data, image_type) = queued.popleft()
+                    # Each task runs in a copy of the caller's context (telemetry attribution)
+                    future = executor.submit(contextvars.copy_context().run, self._analyze_in_worker, image_data, image_type)
+                    running[future] = (i, time.monotonic() + self.image_timeout)
+                
+                next_deadline = min(deadline for _, deadline in running.values())
+                done, _ = wait(running, timeout=max(0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, _ = running.pop(future)
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        results[i] = {
+                            'success': False,
+                            'data': None,
+                            'error': f"Unexpected error: {str(e)}"
+                        }
+                
+                # The SDK request timeout bounds each call; this is a backstop
+                now = time.monotonic()
+                for future, (i, deadline) in list(running.items()):
+                    if deadline <= now:
+                        del running[future]
+                        future.cancel()
+                        results[i] = {
+                            'success': False,
+                            'data': None,
+                            'error': f"Image analysis timed out after {self.image_timeout:g}s"
+                        }
+        finally:
+            # Don't block the caller on a straggler that ignored its timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        for i, result in enumerate(results):
+            result['image_index'] = i
+        return results
+    
+    def _analyze_in_worker(self, image_data: str, image_type: str) -> Dict:
+        """analyze_single_image on a pool thread, closing the DB connections the thread opened"""
+        try:
+            return self.analyze_single_image(image_data, image_type)
+        finally:
+            # The result cache and gateway query the database; pool threads are
+            # short-lived, so their connections would otherwise be left open
+            connections.close_all()
     
     def _aggregate_analyses(self, analyses: List[Dict]) -> Dict:
         """Combine multiple image analyses into a single comprehensive report"""
@@ -245,18 +611,341 @@ class CarImageAnalyzer:
             'individual_results': analyses
         }
     
+    def analyze_vehicle_combined(self, images: List[Tuple[str, str]]) -> Dict:
+        """
+        Analyze all photos and price the vehicle in a single model request
+        
+        Alternative to analyze_multiple_images + get_market_comparison
+        (GEMINI_VISION_MODE=combined): one round trip and one copy of the
+        instructions instead of N + 1. Photos that cannot be read are reported
+        in 'failed_results'; the request is all-or-nothing for the rest.
+        
+        Args:
+            images: List of tuples (image_data, image_type)
+        
+        Returns:
+            Same shape as analyze_multiple_images, plus 'market' in the shape
+            returned by get_market_comparison
+        """
+        
+        started = time.perf_counter()
+        failed_results = []
+        usable, cache_key = self._combined_inputs(images, failed_results)
+        if not usable:
+            return self._combined_failure('All image analyses failed', failed_results)
+        
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                record_cache_hit(self.telemetry, 'combined_analysis', self.model_name, started, images=len(usable))
+                return self._combined_result(cached, len(usable), failed_results, cached=True)
+        
+        opened = []
+        try:
+            contents, opened = self._combined_contents(usable, failed_results)
+            images_sent = len(contents) // 2
+            if not images_sent:
+                return self._combined_failure('All image analyses failed', failed_results)
+            
+            with track(self.telemetry, 'combined_analysis', self.model_name, contents) as call:
+                response = self.gateway.call(
+                    self.model.generate_content,
+                    contents,
+                    request_options={'timeout': self.combined_timeout}
+                )
+                call.set_response(response)
+                return self._finish_combined(response.text, cache_key, images_sent, len(usable), failed_results)
+        except json.JSONDecodeError as e:
+            return self._combined_failure(f"Failed to parse response: {str(e)}", failed_results)
+        except Exception as e:
+            return self._combined_failure(f"Unexpected error: {str(e)}", failed_results)
+        finally:
+            for image in opened:
+                image.close()
+    
+    async def analyze_vehicle_combined_async(self, images: List[Tuple[str, str]]) -> Dict:
+        """Async counterpart of analyze_vehicle_combined using generate_content_async"""
+        
+        started = time.perf_counter()
+        failed_results = []
+        usable, cache_key = await asyncio.to_thread(self._combined_inputs, images, failed_results)
+        if not usable:
+            return self._combined_failure('All image analyses failed', failed_results)
+        
+        if cache_key is not None:
+            cached = await sync_to_async(self.result_cache.get)(cache_key)
+            if cached is not None:
+                record_cache_hit(self.telemetry, 'combined_analysis', self.model_name, started, images=len(usable))
+                return self._combined_result(cached, len(usable), failed_results, cached=True)
+        
+        opened = []
+        try:
+            contents, opened = await asyncio.to_thread(self._combined_contents, usable, failed_results)
+            images_sent = len(contents) // 2
+            if not images_sent:
+                return self._combined_failure('All image analyses failed', failed_results)
+            
+            with track(self.telemetry, 'combined_analysis', self.model_name, contents) as call:
+                async with asyncio.timeout(self.combined_timeout):
+                    response = await self.gateway.call_async(
+                        self.model.generate_content_async,
+                        contents,
+                        request_options={'timeout': self.combined_timeout}
+                    )
+                call.set_response(response)
+                return await sync_to_async(self._finish_combined)(
+                    response.text, cache_key, images_sent, len(usable), failed_results
+                )
+        except TimeoutError:
+            return self._combined_failure(f"Vehicle analysis timed out after {self.combined_timeout:g}s", failed_results)
+        except json.JSONDecodeError as e:
+            return self._combined_failure(f"Failed to parse response: {str(e)}", failed_results)
+        except Exception as e:
+            return self._combined_failure(f"Unexpected error: {str(e)}", failed_results)
+        finally:
+            for image in opened:
+                image.close()
+    
+    def _combined_inputs(self, images: List[Tuple[str, str]], failed_results: List[Dict]):
+        """
+        Hash the photos for the combined request
+        
+        Returns:
+            tuple: (usable photos as (index, image_data, image_type, sha256),
+            result cache key or None); unreadable photos go to failed_results
+        """
+        usable = []
+        for i, (image_data, image_type) in enumerate(images):
+            try:
+                image_sha256 = sha256_of_image(image_data, image_type) if self.result_cache is not None else None
+            except Exception as e:
+                failed_results.append({
+                    'success': False,
+                    'data': None,
+                    'error': f"Unexpected error: {str(e)}",
+                    'image_index': i
+                })
+                continue
+            usable.append((i, image_data, image_type, image_sha256))
+        
+        cache_key = None
+        if usable and self.result_cache is not None:
+            # Keyed on the ordered photo set; the prompt numbers the photos
+            photos_sha256 = hashlib.sha256(','.join(sha for _, _, _, sha in usable).encode()).hexdigest()
+            preprocessing = self.preprocessor.signature if self.preprocessor else 'original'
+            cache_key = image_analysis_key(
+                photos_sha256, self.model_name, f"combined-{COMBINED_PROMPT_VERSION}:{preprocessing}"
+            )
+        return usable, cache_key
+    
+    def _combined_contents(self, usable: List[Tuple], failed_results: List[Dict]):
+        """
+        Returns:
+            tuple: (generate_content contents, opened PIL images the caller must close)
+        """
+        contents = [COMBINED_ANALYSIS_PROMPT]
+        opened = []
+        for position, (i, image_data, image_type, _) in enumerate(usable, start=1):
+            try:
+                image_part, image = self._load_image_part(image_data, image_type)
+            except Exception as e:
+                failed_results.append({
+                    'success': False,
+                    'data': None,
+                    'error': f"Unexpected error: {str(e)}",
+                    'image_index': i
+                })
+                continue
+            if image is not None:
+                opened.append(image)
+            contents.extend([f"Photo {position}:", image_part])
+        return contents, opened
+    
+    def _finish_combined(self, content: str, cache_key: Optional[str], images_sent: int, usable_count: int,
+                         failed_results: List[Dict]) -> Dict:
+        """Parse and cache a combined-mode response; raises on malformed output"""
+        analysis = json.loads(_extract_json(content))
+        if not isinstance(analysis.get('vehicle'), dict):
+            raise ValueError("response has no 'vehicle' object")
+        
+        # Only cache when every photo made it into the request
+        if cache_key is not None and images_sent == usable_count:
+            self.result_cache.set(cache_key, analysis)
+        
+        return self._combined_result(analysis, images_sent, failed_results, cached=False)
+    
+    def _combined_failure(self, error: str, failed_results: List[Dict]) -> Dict:
+        return {
+            'success': False,
+            'error': error,
+            'individual_results': failed_results
+        }
+    
+    def _combined_result(self, analysis: Dict, images_sent: int, failed_results: List[Dict], cached: bool) -> Dict:
+        """Shape a combined-mode response like analyze_multiple_images / get_market_comparison"""
+        vehicle = analysis['vehicle']
+        estimated_value = dict(vehicle.get('estimated_value') or {})
+        estimated_value.setdefault('currency', 'USD')
+        estimated_value['confidence'] = 'medium' if images_sent > 1 else 'low'
+        
+        data = {
+            'make': vehicle.get('make', 'unknown'),
+            'model': vehicle.get('model', 'unknown'),
+            'year': vehicle.get('year', 'unknown'),
+            'body_type': vehicle.get('body_type', 'unknown'),
+            'color': vehicle.get('color', 'unknown'),
+            'condition': vehicle.get('condition', 'good'),
+            'visible_damage': vehicle.get('visible_damage', []),
+            'estimated_value': estimated_value,
+            'features': vehicle.get('features', []),
+            'confidence': vehicle.get('confidence', 'medium'),
+            'notes': vehicle.get('notes', ''),
+            'photos': analysis.get('photos', []),
+            'images_analyzed': images_sent,
+            'images_failed': len(failed_results),
+            'analyzed_at': datetime.now().isoformat()
+        }
+        
+        market = analysis.get('market') or {}
+        try:
+            float(market['market_value']['average'])
+            market_result = {'success': True, 'data': market, 'error': None, 'cached': cached}
+        except (KeyError, TypeError, ValueError):
+            market_result = {
+                'success': False,
+                'data': None,
+                'error': 'Market analysis failed: combined response has no market value',
+                'cached': cached
+            }
+        
+        return {
+            'success': True,
+            'data': data,
+            'market': market_result,
+            'failed_results': failed_results,
+            'individual_results': [],
+            'cached': cached
+        }
+    
     def get_market_comparison(self, car_details: Dict) -> Dict:
         """
         Get market comparison data using Gemini Pro
         
+        The vehicle is normalized first (make aliases, case, year bucket) and the
+        result is cached per normalized vehicle, so the text model is only called
+        on a miss. Concurrent misses for the same vehicle share one model call.
+        
         Args:
             car_details: Dictionary with make, model, year, condition
         
         Returns:
             Market comparison data
         """
+        vehicle = normalize_vehicle(car_details)
+        if self.market_cache is None or vehicle['cache_key'] is None:
+            # Unidentified vehicles are not worth caching
+            return self._fetch_market_comparison(vehicle)
         
-        prompt = f"""
+        started = time.perf_counter()
+        cache_key = f"{vehicle['cache_key']}:{self.text_model_name}:{MARKET_PROMPT_VERSION}"
+        cached = self.market_cache.get(cache_key)
+        if cached is not None:
+            record_cache_hit(self.telemetry, 'market_comparison', self.text_model_name, started)
+            return {
+                'success': True,
+                'data': cached,
+                'error': None,
+                'cached': True
+            }
+        
+        def fetch_and_store():
+            result = self._fetch_market_comparison(vehicle)
+            if result['success']:
+                self.market_cache.set(cache_key, result['data'])
+            return result
+        
+        try:
+            result, shared = _market_comparison_flight.do(cache_key, fetch_and_store, timeout=self.image_timeout)
+        except TimeoutError as e:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Market analysis failed: {str(e)}"
+            }
+        if shared:
+            # Served by a concurrent caller's model call
+            record_cache_hit(self.telemetry, 'market_comparison', self.text_model_name, started)
+        return dict(result, cached=shared)
+    
+    async def get_market_comparison_async(self, car_details: Dict) -> Dict:
+        """Async counterpart of get_market_comparison (same cache and coalescing)"""
+        vehicle = normalize_vehicle(car_details)
+        if self.market_cache is None or vehicle['cache_key'] is None:
+            return await self._fetch_market_comparison_async(vehicle)
+        
+        started = time.perf_counter()
+        cache_key = f"{vehicle['cache_key']}:{self.text_model_name}:{MARKET_PROMPT_VERSION}"
+        cached = await sync_to_async(self.market_cache.get)(cache_key)
+        if cached is not None:
+            record_cache_hit(self.telemetry, 'market_comparison', self.text_model_name, started)
+            return {
+                'success': True,
+                'data': cached,
+                'error': None,
+                'cached': True
+            }
+        
+        async def fetch_and_store():
+            result = await self._fetch_market_comparison_async(vehicle)
+            if result['success']:
+                await sync_to_async(self.market_cache.set)(cache_key, result['data'])
+            return result
+        
+        result, shared = await _market_comparison_async_flight.do(cache_key, fetch_and_store)
+        if shared:
+            record_cache_hit(self.telemetry, 'market_comparison', self.text_model_name, started)
+        return dict(result, cached=shared)
+    
+    def _fetch_market_comparison(self, car_details: Dict) -> Dict:
+        """Ask the text model for market data on a normalized vehicle"""
+        
+        try:
+            # Use Gemini text model for market analysis
+            prompt = self._market_prompt(car_details)
+            with track(self.telemetry, 'market_comparison', self.text_model_name, prompt) as call:
+                response = self.gateway.call(self.text_model.generate_content, prompt)
+                call.set_response(response)
+                return self._parse_market_response(response.text)
+        except Exception as e:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Market analysis failed: {str(e)}"
+            }
+    
+    async def _fetch_market_comparison_async(self, car_details: Dict) -> Dict:
+        try:
+            prompt = self._market_prompt(car_details)
+            with track(self.telemetry, 'market_comparison', self.text_model_name, prompt) as call:
+                async with asyncio.timeout(self.image_timeout):
+                    response = await self.gateway.call_async(self.text_model.generate_content_async, prompt)
+                call.set_response(response)
+                return self._parse_market_response(response.text)
+        except TimeoutError:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Market analysis failed: timed out after {self.image_timeout:g}s"
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'data': None,
+                'error': f"Market analysis failed: {str(e)}"
+            }
+    
+    def _market_prompt(self, car_details: Dict) -> str:
+        return f"""
         You are an expert automotive appraiser and loan officer with extensive knowledge of vehicle values and lending practices.
         
         Based on the following car details, provide a market analysis and pricing comparison:
@@ -301,32 +990,17 @@ class CarImageAnalyzer:
             }}
         }}
         """
+    
+    def _parse_market_response(self, content: str) -> Dict:
+        # Gemini might wrap the JSON in markdown code blocks
+        market_data = json.loads(_extract_json(content))
         
-        try:
-            # Use Gemini text model for market analysis
-            response = self.text_model.generate_content(prompt)
-            content = response.text
-            
-            # Parse JSON response
-            if '```json' in content:
-                content = content.split('```json')[1].split('```')[0].strip()
-            elif '```' in content:
-                content = content.split('```')[1].split('```')[0].strip()
-            
-            market_data = json.loads(content)
-            
-            return {
-                'success': True,
-                'data': market_data,
-                'error': None
-            }
-            
-        except Exception as e:
-            return {
-                'success': False,
-                'data': None,
-                'error': f"Market analysis failed: {str(e)}"
-            }
+        return {
+            'success': True,
+            'data': market_data,
+            'error': None,
+            'cached': False
+        }
 
 
 class CarValuationService:
@@ -334,8 +1008,16 @@ class CarValuationService:
     High-level service for car valuation using image analysis
     """
     
-    def __init__(self):
-        self.analyzer = CarImageAnalyzer()
+    def __init__(self, analyzer=None, vision_mode=None):
+        """
+        Args:
+            analyzer: CarImageAnalyzer to use (defaults to a new Gemini-backed one)
+            vision_mode: "per_image" or "combined" (defaults to GEMINI_VISION_MODE)
+        """
+        self.vision_mode = vision_mode or getattr(settings, 'GEMINI_VISION_MODE', 'per_image')
+        if self.vision_mode not in VISION_MODES:
+            raise ValueError(f"Unknown GEMINI_VISION_MODE '{self.vision_mode}', expected one of {', '.join(VISION_MODES)}")
+        self.analyzer = analyzer or CarImageAnalyzer()
     
     def evaluate_for_loan(self, images: List[Tuple[str, str]], loan_amount: float) -> Dict:
         """
@@ -349,21 +1031,60 @@ class CarValuationService:
             Comprehensive evaluation report
         """
         
-        # Analyze images
-        analysis_result = self.analyzer.analyze_multiple_images(images)
+        # Analyze images (combined mode also prices the vehicle in the same request)
+        if self.vision_mode == 'combined':
+            analysis_result = self.analyzer.analyze_vehicle_combined(images)
+        else:
+            analysis_result = self.analyzer.analyze_multiple_images(images)
         
         if not analysis_result['success']:
-            return {
-                'approved': False,
-                'reason': 'Image analysis failed',
-                'error': analysis_result.get('error'),
-                'recommendation': 'Please upload clearer images of the vehicle'
-            }
+            return self._image_analysis_failed(analysis_result)
         
         car_data = analysis_result['data']
         
-        # Get market comparison
-        market_result = self.analyzer.get_market_comparison(car_data)
+        # Get market comparison (a separate request unless the combined one produced it)
+        market_result = analysis_result.get('market')
+        if not market_result or not market_result['success']:
+            market_result = self.analyzer.get_market_comparison(car_data)
+        
+        return self._build_report(car_data, market_result, loan_amount)
+    
+    async def evaluate_for_loan_async(self, images: List[Tuple[str, str]], loan_amount: float) -> Dict:
+        """
+        Async counterpart of evaluate_for_loan for ASGI views and consumers
+        
+        Model calls are awaited rather than blocking a thread, and per-image
+        analyses run concurrently with asyncio.gather. Wrap the call in
+        asyncio.timeout() to bound the whole evaluation; cancellation
+        propagates to the in-flight model requests.
+        """
+        
+        if self.vision_mode == 'combined':
+            analysis_result = await self.analyzer.analyze_vehicle_combined_async(images)
+        else:
+            analysis_result = await self.analyzer.analyze_multiple_images_async(images)
+        
+        if not analysis_result['success']:
+            return self._image_analysis_failed(analysis_result)
+        
+        car_data = analysis_result['data']
+        
+        market_result = analysis_result.get('market')
+        if not market_result or not market_result['success']:
+            market_result = await self.analyzer.get_market_comparison_async(car_data)
+        
+        return self._build_report(car_data, market_result, loan_amount)
+    
+    def _image_analysis_failed(self, analysis_result: Dict) -> Dict:
+        return {
+            'approved': False,
+            'reason': 'Image analysis failed',
+            'error': analysis_result.get('error'),
+            'recommendation': 'Please upload clearer images of the vehicle'
+        }
+    
+    def _build_report(self, car_data: Dict, market_result: Dict, loan_amount: float) -> Dict:
+        """Value the vehicle and decide on the requested amount"""
         
         if not market_result['success']:
             # Use image-based estimate only
@@ -414,9 +1135,6 @@ class CarValuationService:
             'recommendation': recommendation,
             'risk_factors': car_data.get('visible_damage', []),
             'confidence': car_data.get('confidence', 'medium'),
+            'vision_mode': self.vision_mode,
             'timestamp': datetime.now().isoformat()
         }
-
-
-# Singleton instance
-car_valuation_service = CarValuationService()
@@ -0,0 +1,187 @@
+"""
+Per-user dashboard summary (LoanApplicationViewSet.dashboard_statistics).
+
+The summary is computed with a fixed number of queries (one grouped
+aggregate for every count and sum) and kept in the Django cache per user,
+keyed on a version of the user's applications read from the database (their
+count, newest id and the sum of their cache_version, which every save bumps).
+Any create, save or delete, in any process, moves the version, so a stale
+entry is never read, even with a per-process cache. Writes that bypass signals
+(queryset.update()) should bump cache_version as well; those that don't are
+picked up when the entry expires after USER_DASHBOARD_CACHE_TTL seconds.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import LoanApplication
+
+logger = logging.getLogger(__name__)
+
+# Statuses counted separately in the summary
+SUMMARY_STATUSES = ('pending', 'approved', 'rejected', 'query')
+
+
+def summary_version(user_id):
+    """The version of a user's applications: one aggregate on the user_id index"""
+    version = LoanApplication.objects.filter(user_id=user_id).aggregate(
+        count=Count('id'), latest=Max('id'), versions=Sum('cache_version'),
+    )
+    return f"{version['count']}.{version['latest'] or 0}.{version['versions'] or 0}"
+
+
+def cache_key(user_id, version):
+    return f'loans:dashboard:{user_id}:{version}'
+
+
+def associate_by_email(user):
+    """
+    Attach guest applications submitted with the user's email to the user.
+
+    Returns:
+        int: Number of applications associated
+    """
+    if not user.email:
+        return 0
+    # A single UPDATE (no exists()/count() round trips first)
+    count = LoanApplication.objects.filter(
+        user=None,
+        personal_info__email__iexact=user.email,
+    ).update(user=user, cache_version=F('cache_version') + 1)
+    if count:
+        logger.info(f"Associated {count} applications with user {user.pk}")
+    return count
+
+
+def get_summary(user):
+    """
+    The user's dashboard summary, from the cache while their applications'
+    version is unchanged.
+
+    Guest applications are associated on a cache miss only: login already
+    associates them, so this catches ones submitted since.
+    """
+    version = summary_version(user.pk)
+    summary = cache.get(cache_key(user.pk, version))
+    if summary is None:
+        if associate_by_email(user):
+            version = summary_version(user.pk)
+        summary = build_summary(user)
+        cache.set(cache_key(user.pk, version), summary, getattr(settings, 'USER_DASHBOARD_CACHE_TTL', 300))
+    return summary
+
+
+def build_summary(user):
+    """
+    Compute the dashboard summary: one grouped aggregate for the metrics,
+    then the latest approved loan, the monthly chart and recent activity.
+
+    Returns:
+        dict: {"metrics": ..., "charts": ..., "recent_activity": [...]}
+    """
+    applications = LoanApplication.objects.filter(user=user)
+    submitted = Q(is_draft=False)
+    approved = submitted & Q(status='approved')
+
+    totals = applications.aggregate(
+        total_applications=Count('id', filter=submitted),
+        draft_count=Count('id', filter=Q(is_draft=True)),
+        total_borrowed=Sum('approved_amount', filter=approved),
+        total_requested=Sum('amount', filter=submitted),
+        **{
+            f'{name}_count': Count('id', filter=submitted & Q(status=name))
+            for name in SUMMARY_STATUSES
+        },
+    )
+    submitted_applications = applications.filter(submitted).order_by('-created_at')
+
+    total_applications = totals['total_applications']
+    approved_count = totals['approved_count']
+    total_borrowed = totals['total_borrowed'] or 0
+    current_balance = total_borrowed  # Simplified - would calculate based on payments
+
+    # Latest approved loan for the monthly payment calculation
+    monthly_payment = 0
+    next_due_date = None
+    latest_approved = None
+    if approved_count:
+        latest_approved = submitted_applications.filter(status='approved').only(
+            'approved_amount', 'term', 'approved_at',
+        ).first()
+    if latest_approved and latest_approved.approved_amount and latest_approved.term:
+        # Simple calculation: loan amount / term in months
+        monthly_payment = float(latest_approved.approved_amount) / latest_approved.term
+        # Next due date (assuming monthly payments)
+        if latest_approved.approved_at:
+            from dateutil.relativedelta import relativedelta
+            next_due_date = latest_approved.approved_at + relativedelta(months=1)
+
+    # Applications per month over the last 6 months
+    chart_labels = []
+    chart_data = []
+    if total_applications:
+        monthly_apps = submitted_applications.filter(
+            created_at__gte=timezone.now() - timedelta(days=180)
+        ).annotate(month=TruncMonth('created_at')).values('month').annotate(count=Count('id')).order_by('month')
+        for entry in monthly_apps:
+            chart_labels.append(entry['month'].strftime('%b %Y'))
+            chart_data.append(entry['count'])
+
+    recent_activity = [
+        {
+            'id': app['id'],
+            'application_id': str(app['application_id']),
+            'amount': float(app['amount'] or 0),
+            'status': app['status'],
+            'created_at': app['created_at'],
+            'updated_at': app['updated_at'],
+        }
+        for app in submitted_applications.values(
+            'id', 'application_id', 'amount', 'status', 'created_at', 'updated_at',
+        )[:5]
+    ] if total_applications else []
+
+    # Account health score (simplified)
+    account_health = ''
+    if total_applications > 0:
+        approval_rate = (approved_count / total_applications) * 100
+        if approval_rate >= 75:
+            account_health = 'Excellent'
+        elif approval_rate >= 50:
+            account_health = 'Good'
+        elif approval_rate >= 25:
+            account_health = 'Fair'
+
+    return {
+        'metrics': {
+            'total_applications': total_applications,
+            'draft_count': totals['draft_count'],
+            'pending_count': totals['pending_count'],
+            'approved_count': approved_count,
+            'rejected_count': totals['rejected_count'],
+            'query_count': totals['query_count'],
+            'active_loans': approved_count,
+            'total_borrowed': float(total_borrowed),
+            'total_requested': float(totals['total_requested'] or 0),
+            'current_balance': float(current_balance),
+            'monthly_payment': float(monthly_payment),
+            'next_due_date': next_due_date,
+            'account_health': account_health,
+        },
+        'charts': {
+            'applications_over_time': {
+                'labels': chart_labels,
+                'data': chart_data,
+            },
+            'status_distribution': {
+                name: totals[f'{name}_count'] for name in SUMMARY_STATUSES
+            },
+        },
+        'recent_activity': recent_activity,
+    }
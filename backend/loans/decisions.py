@@ -0,0 +1,221 @@
+"""
+Admin decisions (approve / reject) on many loan applications at once.
+
+`decide()` loads every application in one query and checks each decision
+against the same policy as the single approve/reject actions
+(LoanApplication.get_max_eligible_loan). The valid ones are applied in one
+transaction with conditional UPDATEs: an application is only decided if its
+status is still the one that was checked. Notes and notifications are
+bulk-created (notifications are pushed to open WebSocket connections on
+commit), and the emails are queued for the worker (ai_jobs) instead of
+being sent inside the request.
+
+Because UPDATEs skip the model signals, `applications_decided` is sent
+after them so other apps can follow the status changes (admin_app moves
+the DailyStats rollups); cache versions are advanced in the UPDATEs.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from notifications import push
+from notifications.models import Notification
+
+from .models import LoanApplication, LoanApplicationNote
+
+logger = logging.getLogger(__name__)
+
+# Sent inside the transaction with decided=[(application, previous_status), ...];
+# the applications carry their new status
+applications_decided = Signal()
+
+# Statuses an application can be approved or rejected from
+DECIDABLE_STATUSES = ('pending', 'under_review')
+
+DECISION_STATUSES = {'approve': 'approved', 'reject': 'rejected'}
+
+NOTIFICATION_MESSAGES = {
+    'approve': "Your loan application #{application_id} has been approved!",
+    'reject': "Your loan application #{application_id} has been rejected.",
+}
+
+
+def approval_email(application, approved_amount, notes):
+    """(subject, message) telling the applicant their loan was approved"""
+    subject = 'Loan Application Approved - DriveCash'
+    message = f"""
+Dear {application.personal_info.first_name if application.personal_info else 'Valued Customer'},
+
+Congratulations! Your loan application has been approved.
+
+Application ID: {application.application_id}
+Approved Amount: ${approved_amount:,.2f}
+Status: Approved
+
+{notes if notes else ''}
+
+Please log in to your account to review the details and next steps.
+
+Thank you for choosing DriveCash!
+
+Best regards,
+DriveCash Team
+                """
+    return subject, message
+
+
+def rejection_email(application, notes):
+    """(subject, message) telling the applicant their loan was declined"""
+    subject = 'Loan Application Update - DriveCash'
+    message = f"""
+Dear {application.personal_info.first_name if application.personal_info else 'Valued Customer'},
+
+We regret to inform you that your loan application has been declined.
+
+Application ID: {application.application_id}
+Status: Declined
+
+Reason:
+{notes if notes else 'Please contact us for more information.'}
+
+If you have any questions or would like to discuss this decision, please don't hesitate to contact our support team.
+
+Thank you for your interest in DriveCash.
+
+Best regards,
+DriveCash Team
+                """
+    return subject, message
+
+
+def policy_for(application):
+    return {
+        'vehicle_value': application.get_vehicle_value_for_policy(),
+        'max_ltv_ratio': getattr(settings, 'LOAN_MAX_LTV_RATIO', 0.5),
+        'absolute_cap': getattr(settings, 'LOAN_MAX_LIMIT', 25000),
+        'max_eligible': application.get_max_eligible_loan(),
+    }
+
+
+def check(application, item):
+    """
+    Why `item` can't be applied to `application`, or None if it can.
+
+    Returns:
+        dict: {'error': ...} (with 'policy' for amounts over the limit) or None
+    """
+    verb = item['decision']
+    if application is None:
+        return {'error': 'Application not found.'}
+    if application.is_draft or application.status == 'draft':
+        return {'error': f'Draft applications cannot be {DECISION_STATUSES[verb]}.'}
+    if application.status not in DECIDABLE_STATUSES:
+        return {'error': f"Cannot {verb} an application in '{application.status}' status."}
+    if verb == 'approve':
+        policy = policy_for(application)
+        if float(item['approved_amount']) > policy['max_eligible']:
+            return {'error': 'Approved amount exceeds policy limit.', 'policy': policy}
+    return None
+
+
+def decide(admin, decisions):
+    """
+    Approve or reject applications, each decision independently.
+
+    Args:
+        admin: User making the decisions
+        decisions: [{'id', 'decision' ('approve' or 'reject'),
+                     'approved_amount' (to approve), 'notes'}, ...]
+
+    Returns:
+        list: One result per decision, in order: {'id', 'decision', 'success'}
+              plus 'status' and 'approved_amount', or 'error' (and 'policy')
+    """
+    ids = {item['id'] for item in decisions}
+    applications = LoanApplication.objects.filter(pk__in=ids).select_related(
+        'personal_info', 'user', 'vehicle_valuation',
+    ).only(
+        'id', 'application_id', 'status', 'is_draft', 'amount', 'created_at', 'applicant_estimated_value',
+        'personal_info__first_name', 'user__email', 'vehicle_valuation__estimated_value_avg',
+    ).in_bulk()
+
+    results = []
+    accepted = []
+    seen = set()
+    for item in decisions:
+        result = {'id': item['id'], 'decision': item['decision']}
+        application = applications.get(item['id'])
+        if item['id'] in seen:
+            problem = {'error': 'Duplicate decision for this application.'}
+        else:
+            problem = check(application, item)
+        seen.add(item['id'])
+        if problem:
+            result.update(success=False, **problem)
+        else:
+            accepted.append((item, application, result))
+        results.append(result)
+
+    now = timezone.now()
+    decided = []
+    notes = []
+    notifications = []
+    emails = []
+    with transaction.atomic():
+        for item, application, result in accepted:
+            previous_status = application.status
+            new_status = DECISION_STATUSES[item['decision']]
+            note_text = item.get('notes', '')
+            changes = {'status': new_status, 'is_draft': False, 'updated_at': now, 'cache_version': F('cache_version') + 1}
+            if item['decision'] == 'approve':
+                approved_amount = float(item['approved_amount'])
+                changes.update(approved_amount=item['approved_amount'], approved_by=admin, approved_at=now)
+            else:
+                approved_amount = None
+                changes['approved_amount'] = None
+            if note_text:
+                changes['approval_notes'] = note_text
+
+            # Compare-and-set: not if another admin decided it since it was checked
+            updated = LoanApplication.objects.filter(
+                pk=application.pk, status=previous_status, is_draft=False,
+            ).update(**changes)
+            if not updated:
+                result.update(success=False, error='Application was changed by another request; reload and try again.')
+                continue
+
+            application.status = new_status
+            result.update(success=True, status=new_status, approved_amount=approved_amount)
+            decided.append((application, previous_status))
+
+            if item['decision'] == 'reject' and note_text:
+                notes.append(LoanApplicationNote(application=application, author=admin, note=note_text))
+            if application.user:
+                notifications.append(Notification(
+                    recipient=application.user,
+                    message=NOTIFICATION_MESSAGES[item['decision']].format(application_id=application.application_id),
+                ))
+                if application.user.email:
+                    if item['decision'] == 'approve':
+                        subject, message = approval_email(application, approved_amount, note_text)
+                    else:
+                        subject, message = rejection_email(application, note_text)
+                    emails.append((application, subject, message, application.user.email))
+
+        LoanApplicationNote.objects.bulk_create(notes)
+        Notification.objects.bulk_create(notifications)
+        # bulk_create() skips the post_save signal that pushes them
+        push.send_on_commit(notifications)
+        if emails:
+            from .ai_jobs import enqueue_emails
+            enqueue_emails(emails)
+        if decided:
+            applications_decided.send(sender=LoanApplication, decided=decided)
+
+    logger.info(f"Admin {admin.pk} decided {len(decided)} of {len(decisions)} applications")
+    return results
@@ -4,84 +4,286 @@ This service analyzes loan applications using Google's Gemini AI to provide
 intelligent recommendations for loan approval decisions.
 """
 
-import google.generativeai as genai
 from decimal import Decimal
+import asyncio
+import hashlib
 import json
 import logging
 from datetime import datetime
+from asgiref.sync import sync_to_async
 from django.conf import settings
 
+from .ai_clients import get_generative_model
+from .ai_gateway import get_gateway
+from .ai_telemetry import get_call_log_buffer, track
+
 logger = logging.getLogger(__name__)
 
+# Sentinel so callers can pass telemetry=None to disable call logging
+_DEFAULT = object()
+
+# Bump when the analysis prompt or response handling changes; part of the
+# application fingerprint, so stored analyses are redone after a bump
+PROMPT_VERSION = '1'
+
+# Pre-screen decisions, most severe first; the final suggestion is the most severe rule hit
+PRESCREEN_SEVERITY = ('reject', 'review', 'conditional')
+
+# (prompt key, LoanApplicationDocument.document_type) pairs reported to the model
+DOCUMENT_CHECKLIST = (
+    ('vin_sticker', 'photo_vin_sticker'),
+    ('odometer', 'photo_odometer'),
+    ('borrower_photo', 'photo_borrower'),
+    ('car_front', 'photo_front_car'),
+    ('vin_plate', 'photo_vin_plate'),
+    ('license', 'photo_license'),
+    ('insurance', 'photo_insurance'),
+)
+
 
 class GeminiLoanAnalyzer:
     """
     Service class for analyzing loan applications using Gemini AI
     """
     
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, gateway=None, telemetry=_DEFAULT):
         """
         Initialize the Gemini AI analyzer
         
         Args:
             api_key: Gemini API key (defaults to settings if not provided)
+            gateway: AIGateway for model calls (defaults to the shared one)
+            telemetry: CallLogBuffer model calls are logged to, or None to disable
+                       (defaults to the shared one)
         """
         self.api_key = api_key or getattr(settings, 'GEMINI_API_KEY', None)
-        genai.configure(api_key=self.api_key)
         
-        # Use Gemini 1.5 Flash for fast analysis
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Use Gemini 1.5 Flash for fast analysis (shared client, created on first use)
+        self.model_name = 'gemini-1.5-flash'
+        self.model = get_generative_model(self.model_name, self.api_key)
+        self.gateway = gateway or get_gateway()
+        self.telemetry = get_call_log_buffer() if telemetry is _DEFAULT else telemetry
+        # Bound on the async path's model call (the sync path relies on the SDK default)
+        self.timeout = float(getattr(settings, 'GEMINI_ANALYSIS_TIMEOUT', 60))
+        
+    def fingerprint_application_data(self, application_data):
+        """
+        Canonical hash of the data the analysis is based on
         
-    def analyze_loan_application(self, application):
+        Args:
+            application_data: Output of _prepare_application_data
+            
+        Returns:
+            str: SHA-256 hex digest of the data, model name, prompt version and loan limits
+        """
+        canonical = json.dumps(
+            {
+                'data': application_data,
+                'model': self.model_name,
+                'prompt_version': PROMPT_VERSION,
+                # _check_loan_limits reads these, so a policy change invalidates the analysis
+                'loan_max_limit': getattr(settings, 'LOAN_MAX_LIMIT', 25000),
+                'loan_max_ltv_ratio': float(getattr(settings, 'LOAN_MAX_LTV_RATIO', 0.50)),
+                # Same for the pre-screen rules
+                'prescreen_enabled': getattr(settings, 'AI_PRESCREEN_ENABLED', True),
+                'prescreen_ltv_multiple': float(getattr(settings, 'AI_PRESCREEN_LTV_MULTIPLE', 1.5)),
+            },
+            sort_keys=True,
+            separators=(',', ':'),
+            default=str,
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
+    def analyze_loan_application(self, application, application_data=None):
         """
         Analyze a loan application and provide AI recommendations
         
         Args:
             application: LoanApplication model instance
+            application_data: Optional output of _prepare_application_data, when
+                              the caller already built it (e.g. to fingerprint it)
             
         Returns:
             dict: Analysis results containing recommendation, risk assessment, and approval suggestion
         """
         try:
             # Prepare application data for AI analysis
-            application_data = self._prepare_application_data(application)
+            if application_data is None:
+                application_data = self._prepare_application_data(application)
             
             # Enforce loan limit rules before AI analysis
             loan_limit_check = self._check_loan_limits(application_data)
             
+            # Clear-cut applications are decided by rules, without a model call
+            prescreen_result = self.prescreen(application_data, loan_limit_check)
+            if prescreen_result is not None:
+                return self._finish_prescreen(application, prescreen_result, loan_limit_check)
+            
             # Generate the analysis prompt
             prompt = self._create_analysis_prompt(application_data)
             
-            # Call Gemini AI
+            # Call Gemini AI (rate limited; fails fast into the fallback while the breaker is open)
             logger.info(f"Analyzing loan application {application.application_id} with Gemini AI")
-            response = self.model.generate_content(prompt)
+            with track(self.telemetry, 'loan_analysis', self.model_name, prompt) as call:
+                response = self.gateway.call(self.model.generate_content, prompt)
+                call.set_response(response)
             
-            # Parse the response
-            analysis_result = self._parse_ai_response(response.text)
+            return self._finish_analysis(application, response.text, loan_limit_check)
             
-            # Override AI suggestion if loan limits are violated
-            if not loan_limit_check['within_limits']:
-                analysis_result['approval_suggestion'] = 'reject' if loan_limit_check['exceeds_by_large_margin'] else 'conditional'
-                analysis_result['key_concerns'].insert(0, loan_limit_check['message'])
-                analysis_result['suggested_loan_amount'] = loan_limit_check['max_eligible_amount']
-                if not loan_limit_check['exceeds_by_large_margin']:
-                    analysis_result['conditions_for_approval'].insert(0, f"Reduce loan amount to ${loan_limit_check['max_eligible_amount']:,.2f} or less")
+        except Exception as e:
+            logger.error(f"Error analyzing loan application {application.application_id}: {str(e)}")
+            return self._create_fallback_response(str(e))
+    
+    async def analyze_loan_application_async(self, application, application_data=None):
+        """
+        Async counterpart of analyze_loan_application using generate_content_async
+        
+        The related rows are read through sync_to_async; the model call is awaited
+        on the event loop and bounded by GEMINI_ANALYSIS_TIMEOUT. Timeouts and
+        errors return the same fallback response as the sync path.
+        """
+        try:
+            if application_data is None:
+                application_data = await sync_to_async(self._prepare_application_data)(application)
             
-            # Add metadata
-            analysis_result['raw_response'] = response.text
-            analysis_result['analyzed_at'] = datetime.now().isoformat()
-            analysis_result['application_id'] = str(application.application_id)
-            analysis_result['loan_limit_check'] = loan_limit_check
+            loan_limit_check = self._check_loan_limits(application_data)
+            prescreen_result = self.prescreen(application_data, loan_limit_check)
+            if prescreen_result is not None:
+                return self._finish_prescreen(application, prescreen_result, loan_limit_check)
             
-            logger.info(f"Successfully analyzed application {application.application_id}")
-            logger.info(f"AI Suggestion: {analysis_result.get('approval_suggestion')}, Risk: {analysis_result.get('risk_assessment')}")
+            prompt = self._create_analysis_prompt(application_data)
             
-            return analysis_result
+            logger.info(f"Analyzing loan application {application.application_id} with Gemini AI (async)")
+            with track(self.telemetry, 'loan_analysis', self.model_name, prompt) as call:
+                async with asyncio.timeout(self.timeout):
+                    response = await self.gateway.call_async(
+                        self.model.generate_content_async, prompt, request_options={'timeout': self.timeout}
+                    )
+                call.set_response(response)
             
+            return self._finish_analysis(application, response.text, loan_limit_check)
+            
+        except TimeoutError:
+            logger.error(f"Gemini analysis of application {application.application_id} timed out after {self.timeout:g}s")
+            return self._create_fallback_response(f"Timed out after {self.timeout:g}s")
         except Exception as e:
             logger.error(f"Error analyzing loan application {application.application_id}: {str(e)}")
             return self._create_fallback_response(str(e))
     
+    def prescreen(self, application_data, loan_limit_check=None, include_valuation_rules=True):
+        """
+        Rules-based decision for clear-cut applications, made before any model call
+        
+        Rules: active bankruptcy, no reported income, requested amount more than
+        20% over LOAN_MAX_LIMIT, and loan-to-value above LOAN_MAX_LTV_RATIO times
+        AI_PRESCREEN_LTV_MULTIPLE.
+        
+        Args:
+            application_data: Output of _prepare_application_data
+            loan_limit_check: Output of _check_loan_limits, when already computed
+            include_valuation_rules: False to skip the loan-to-value rule, e.g.
+                                     before the vehicle has been valued
+            
+        Returns:
+            dict: Result in the _parse_ai_response schema plus 'prescreen'
+            (rules hit, model calls avoided), or None when the application
+            needs the model
+        """
+        if not getattr(settings, 'AI_PRESCREEN_ENABLED', True):
+            return None
+        
+        if loan_limit_check is None:
+            loan_limit_check = self._check_loan_limits(application_data)
+        
+        financial = application_data['financial']
+        requested_amount = loan_limit_check['requested_amount']
+        max_loan = getattr(settings, 'LOAN_MAX_LIMIT', 25000)
+        max_ltv_ratio = float(getattr(settings, 'LOAN_MAX_LTV_RATIO', 0.50))
+        
+        # (rule, decision, concern, condition for approval)
+        hits = []
+        if str(financial['active_bankruptcy']).strip().lower() == 'yes':
+            hits.append(('active_bankruptcy', 'reject', 'Applicant reports an active bankruptcy', None))
+        
+        if not financial['annual_income'] and not financial['gross_monthly_income']:
+            hits.append(('missing_income', 'review', 'No income reported', 'Provide proof of income'))
+        
+        # Same 20% margin _check_loan_limits uses for "exceeds by a large margin"
+        if requested_amount > max_loan * 1.2:
+            hits.append((
+                'hard_cap',
+                'reject',
+                f"Requested amount ${requested_amount:,.2f} exceeds the maximum loan of ${max_loan:,.2f}",
+                None,
+            ))
+        
+        vehicle_value = loan_limit_check['vehicle_value']
+        if include_valuation_rules and vehicle_value > 0:
+            ltv_ratio = requested_amount / vehicle_value
+            ltv_limit = max_ltv_ratio * float(getattr(settings, 'AI_PRESCREEN_LTV_MULTIPLE', 1.5))
+            if ltv_ratio > ltv_limit:
+                hits.append((
+                    'ltv_far_above_limit',
+                    'reject',
+                    f"Requested amount is {ltv_ratio:.0%} of the vehicle value (policy maximum {max_ltv_ratio:.0%})",
+                    None,
+                ))
+        
+        if not hits:
+            return None
+        
+        decision = min((hit[1] for hit in hits), key=PRESCREEN_SEVERITY.index)
+        concerns = [hit[2] for hit in hits]
+        return {
+            'approval_suggestion': decision,
+            'risk_assessment': 'high',
+            'recommendation': f"Decided by pre-screen rules without AI analysis: {'; '.join(concerns)}.",
+            'key_strengths': [],
+            'key_concerns': concerns,
+            'conditions_for_approval': [hit[3] for hit in hits if hit[3]],
+            'suggested_loan_amount': 0,
+            'suggested_interest_rate_range': '',
+            'confidence_score': 100,
+            'prescreen': {
+                'rules': [hit[0] for hit in hits],
+                'llm_calls_avoided': 1,
+            },
+        }
+    
+    def _finish_prescreen(self, application, prescreen_result, loan_limit_check):
+        prescreen_result['analyzed_at'] = datetime.now().isoformat()
+        prescreen_result['application_id'] = str(application.application_id)
+        prescreen_result['loan_limit_check'] = loan_limit_check
+        
+        logger.info(
+            f"Application {application.application_id} decided by pre-screen "
+            f"({', '.join(prescreen_result['prescreen']['rules'])}): {prescreen_result['approval_suggestion']}"
+        )
+        return prescreen_result
+    
+    def _finish_analysis(self, application, response_text, loan_limit_check):
+        """Parse the model response and apply the loan limit overrides"""
+        analysis_result = self._parse_ai_response(response_text)
+        
+        # Override AI suggestion if loan limits are violated
+        if not loan_limit_check['within_limits']:
+            analysis_result['approval_suggestion'] = 'reject' if loan_limit_check['exceeds_by_large_margin'] else 'conditional'
+            analysis_result['key_concerns'].insert(0, loan_limit_check['message'])
+            analysis_result['suggested_loan_amount'] = loan_limit_check['max_eligible_amount']
+            if not loan_limit_check['exceeds_by_large_margin']:
+                analysis_result['conditions_for_approval'].insert(0, f"Reduce loan amount to ${loan_limit_check['max_eligible_amount']:,.2f} or less")
+        
+        # Add metadata
+        analysis_result['raw_response'] = response_text
+        analysis_result['analyzed_at'] = datetime.now().isoformat()
+        analysis_result['application_id'] = str(application.application_id)
+        analysis_result['loan_limit_check'] = loan_limit_check
+        
+        logger.info(f"Successfully analyzed application {application.application_id}")
+        logger.info(f"AI Suggestion: {analysis_result.get('approval_suggestion')}, Risk: {analysis_result.get('risk_assessment')}")
+        
+        return analysis_result
+    
     def _prepare_application_data(self, application):
         """
         Extract and prepare application data for AI analysis
@@ -151,15 +353,7 @@ class GeminiLoanAnalyzer:
             },
             
             # Documents Submitted
-            'documents_submitted': {
-                'vin_sticker': bool(application.photo_vin_sticker),
-                'odometer': bool(application.photo_odometer),
-                'borrower_photo': bool(application.photo_borrower),
-                'car_front': bool(application.photo_front_car),
-                'vin_plate': bool(application.photo_vin),
-                'license': bool(application.photo_license),
-                'insurance': bool(application.photo_insurance),
-            },
+            'documents_submitted': self._documents_submitted(application),
             
             # AI Vehicle Valuation (if available)
             'vehicle_valuation': None
@@ -180,6 +374,23 @@ class GeminiLoanAnalyzer:
         
         return data
     
+    def _documents_submitted(self, application):
+        """
+        Map each required photo to whether it has been uploaded.
+        Photos are LoanApplicationDocument rows; objects without a documents
+        relation (e.g. run_ai_smoketest.MockApplication) expose photo_* attributes.
+        """
+        documents = getattr(application, 'documents', None)
+        if documents is not None:
+            uploaded = set(documents.values_list('document_type', flat=True))
+            return {key: doc_type in uploaded for key, doc_type in DOCUMENT_CHECKLIST}
+        
+        legacy_fields = {'photo_vin_plate': 'photo_vin'}
+        return {
+            key: bool(getattr(application, legacy_fields.get(doc_type, doc_type), None))
+            for key, doc_type in DOCUMENT_CHECKLIST
+        }
+    
     def _check_loan_limits(self, application_data):
         """
         Check if requested loan amount complies with business rules:
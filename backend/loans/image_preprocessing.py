@@ -0,0 +1,137 @@
+"""
+Image preprocessing before vision model calls.
+
+Phone photos are 4-12 MB and far larger than the model needs. Each image is
+decoded with JPEG draft mode (the decoder downscales by 1/2, 1/4 or 1/8
+while decoding, so the full-resolution bitmap is never built), rotated per
+its EXIF orientation, capped at AI_IMAGE_MAX_DIMENSION and re-encoded as a
+metadata-free JPEG at AI_IMAGE_JPEG_QUALITY.
+
+For file inputs the derivative is written next to the original
+(`photo.jpg` -> `photo.ai1600q85.jpg`) and reused while it is newer than
+the original.
+"""
+
+import base64
+import io
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+JPEG_MIME_TYPE = 'image/jpeg'
+
+
+def downscale_to_jpeg(source, max_dimension, quality):
+    """
+    Decode, orient, downscale and re-encode an image.
+
+    Args:
+        source: File path or binary file-like object
+        max_dimension: Longest side of the output in pixels
+        quality: JPEG quality (1-95)
+
+    Returns:
+        bytes: JPEG data without EXIF or other metadata
+    """
+    with Image.open(source) as image:
+        # Only JPEG supports draft mode; other formats ignore the call. The
+        # requested size must keep the aspect ratio: draft picks the largest
+        # scale that keeps *both* sides at or above it.
+        width, height = image.size
+        ratio = max_dimension / max(width, height)
+        if ratio < 1:
+            image.draft('RGB', (max(1, int(width * ratio)), max(1, int(height * ratio))))
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        # No exif/icc_profile arguments, so metadata is not carried over
+        image.save(output, 'JPEG', quality=quality, optimize=True)
+        return output.getvalue()
+
+
+class ImagePreprocessor:
+    """Produces the downscaled JPEG parts sent to the vision model"""
+
+    def __init__(self, max_dimension=None, quality=None, cache_derivatives=None):
+        self.max_dimension = int(max_dimension or getattr(settings, 'AI_IMAGE_MAX_DIMENSION', 1600))
+        self.quality = int(quality or getattr(settings, 'AI_IMAGE_JPEG_QUALITY', 85))
+        if cache_derivatives is None:
+            cache_derivatives = getattr(settings, 'AI_IMAGE_CACHE_DERIVATIVES', True)
+        self.cache_derivatives = cache_derivatives
+
+    @property
+    def signature(self):
+        """Identifies the output so cached analyses of other sizes are not reused"""
+        return f"{self.max_dimension}px-q{self.quality}"
+
+    def derivative_path(self, path):
+        root, _ = os.path.splitext(path)
+        return f"{root}.ai{self.max_dimension}q{self.quality}.jpg"
+
+    def prepare(self, image_data, image_type='base64'):
+        """
+        Args:
+            image_data: Base64 string or file path
+            image_type: "base64" or "file_path"
+
+        Returns:
+            dict: Inline image part ({'mime_type', 'data'}) for generate_content
+        """
+        if image_type == 'file_path':
+            data = self._prepare_file(image_data)
+        else:
+            data = downscale_to_jpeg(
+                io.BytesIO(base64.b64decode(image_data)), self.max_dimension, self.quality
+            )
+        return {'mime_type': JPEG_MIME_TYPE, 'data': data}
+
+    def _prepare_file(self, path):
+        if not self.cache_derivatives:
+            return downscale_to_jpeg(path, self.max_dimension, self.quality)
+
+        derivative = self.derivative_path(path)
+        try:
+            if os.path.getmtime(derivative) >= os.path.getmtime(path):
+                with open(derivative, 'rb') as f:
+                    return f.read()
+        except OSError:
+            pass
+
+        data = downscale_to_jpeg(path, self.max_dimension, self.quality)
+        self._write_derivative(derivative, data)
+        return data
+
+    def _write_derivative(self, derivative, data):
+        # Write-then-rename so concurrent readers never see a partial file
+        directory = os.path.dirname(derivative) or '.'
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, derivative)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            # Read-only media storage: still usable, just not cached
+            logger.warning(f"Could not cache preprocessed image {derivative}: {str(e)}")
+
+
+def get_image_preprocessor():
+    """
+    Returns:
+        ImagePreprocessor, or None when AI_IMAGE_PREPROCESSING_ENABLED is off
+        (images are then sent at full resolution)
+    """
+    if not getattr(settings, 'AI_IMAGE_PREPROCESSING_ENABLED', True):
+        return None
+    return ImagePreprocessor()
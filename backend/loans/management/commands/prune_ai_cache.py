@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from loans.ai_cache import get_image_analysis_cache, get_market_comparison_cache
+
+
+class Command(BaseCommand):
+    help = 'Evict expired and least recently used entries from the AI result caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete every entry instead of only evicting',
+        )
+
+    def handle(self, *args, **options):
+        caches = [
+            ('AI_IMAGE_CACHE_ENABLED', get_image_analysis_cache()),
+            ('AI_MARKET_CACHE_ENABLED', get_market_comparison_cache()),
+        ]
+        for setting_name, cache in caches:
+            if cache is None:
+                self.stdout.write(f'Skipping disabled cache ({setting_name}=False)')
+                continue
+
+            if options['clear']:
+                cache.clear()
+                self.stdout.write(self.style.SUCCESS(f"Cleared AI cache '{cache.namespace}'"))
+                continue
+
+            deleted = cache.evict()
+            stats = cache.stats()
+            self.stdout.write(self.style.SUCCESS(
+                f"Evicted {deleted} entries from '{cache.namespace}', {stats['entries']} remaining"
+            ))
@@ -0,0 +1,319 @@
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, time as dt_time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from loans import ai_pipeline, ai_telemetry, response_cache
+from loans.models import LoanApplication, VehicleValuation
+
+
+# VehicleValuation fields rescoring overwrites
+VALUATION_FIELDS = [
+    'make', 'model', 'year', 'body_type', 'color', 'condition', 'visible_damage', 'features',
+    'estimated_value_low', 'estimated_value_high', 'estimated_value_avg', 'ltv_ratio',
+    'max_loan_amount', 'recommended_loan_amount', 'risk_level', 'risk_factors',
+    'confidence_level', 'images_analyzed', 'analysis_notes', 'full_analysis_data',
+    'is_approved_for_loan', 'approval_notes', 'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-run the vehicle valuation and Gemini analysis over existing applications '
+        '(after a prompt or policy change), resumable from a checkpoint file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status',
+            nargs='+',
+            choices=[choice for choice, _ in LoanApplication.STATUS_CHOICES],
+            help='Only applications in these statuses (default: every submitted application)',
+        )
+        parser.add_argument(
+            '--submitted-after',
+            type=date.fromisoformat,
+            help='Only applications submitted on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--submitted-before',
+            type=date.fromisoformat,
+            help='Only applications submitted before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'AI_RESCORE_CONCURRENCY', 4),
+            help='Applications scored in parallel',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Rows fetched per database round trip while iterating',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Results written per bulk_update',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='rescore_applications.checkpoint.json',
+            help='Progress file; a rerun with the same filters resumes after the last written application',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore an existing checkpoint and start from the beginning',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-run Gemini even for applications whose data fingerprint is unchanged',
+        )
+        parser.add_argument(
+            '--skip-vehicle',
+            action='store_true',
+            help='Keep the stored vehicle valuations and only redo the Gemini analysis',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after this many applications',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many applications would be rescored',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.filters = {
+            'status': sorted(options['status'] or []),
+            'submitted_after': options['submitted_after'].isoformat() if options['submitted_after'] else None,
+            'submitted_before': options['submitted_before'].isoformat() if options['submitted_before'] else None,
+            'skip_vehicle': options['skip_vehicle'],
+            'force': options['force'],
+        }
+        self.checkpoint_path = options['checkpoint']
+        self.checkpoint = self._load_checkpoint()
+
+        queryset = self._queryset()
+        total = queryset.count()
+        if options['limit']:
+            total = min(total, options['limit'])
+        if self.checkpoint['last_pk']:
+            self.stdout.write(
+                f"Resuming after application #{self.checkpoint['last_pk']} "
+                f"({self.checkpoint['processed']} already processed)"
+            )
+        self.stdout.write(f'{total} applications to rescore')
+        if options['dry_run'] or not total:
+            return
+
+        self._run(queryset, total)
+
+    def _queryset(self):
+        queryset = LoanApplication.objects.filter(is_draft=False)
+        if self.filters['status']:
+            queryset = queryset.filter(status__in=self.filters['status'])
+        if self.options['submitted_after']:
+            queryset = queryset.filter(submitted_at__gte=self._start_of(self.options['submitted_after']))
+        if self.options['submitted_before']:
+            queryset = queryset.filter(submitted_at__lt=self._start_of(self.options['submitted_before']))
+
+        # Resume: everything up to last_pk is written; failures are retried
+        resume = Q(pk__gt=self.checkpoint['last_pk'])
+        if self.checkpoint['failed_ids']:
+            resume |= Q(pk__in=self.checkpoint['failed_ids'])
+        queryset = queryset.filter(resume)
+
+        # Everything _prepare_application_data reads, so worker threads don't query per field
+        return queryset.select_related(
+            'user', 'personal_info', 'identification_info', 'address',
+            'financial_profile', 'vehicle_info', 'vehicle_valuation',
+        ).order_by('pk')
+
+    def _start_of(self, day):
+        start = datetime.combine(day, dt_time.min)
+        return timezone.make_aware(start) if settings.USE_TZ else start
+
+    def _run(self, queryset, total):
+        concurrency = max(1, self.options['concurrency'])
+        batch_size = max(1, self.options['batch_size'])
+        applications = queryset.iterator(chunk_size=max(1, self.options['chunk_size']))
+        if self.options['limit']:
+            applications = itertools.islice(applications, self.options['limit'])
+
+        # pks in dispatch (= pk) order; the checkpoint advances past the written prefix
+        self.dispatched = deque()
+        self.settled = set()
+        self.failed_ids = set()
+        # Failures carried over from the previous run, until they succeed
+        self.retry_ids = set(self.checkpoint['failed_ids'])
+        self.pending_applications = []
+        self.pending_valuations = []
+        self.counts = {'rescored': 0, 'unchanged': 0, 'failed': 0}
+        self.started = time.monotonic()
+        self.total = total
+
+        in_flight = set()
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='rescore')
+        try:
+            for application in applications:
+                # Bounded queue: don't materialize the whole queryset as futures
+                while len(in_flight) >= concurrency * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._collect(done, batch_size)
+                self.dispatched.append(application.pk)
+                in_flight.add(executor.submit(self._score, application))
+
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                self._collect(done, batch_size)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, writing finished results; rerun to resume...')
+            for future in in_flight:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._collect([future for future in in_flight if future.done() and not future.cancelled()], 1)
+            self._flush()
+            raise CommandError(f'Interrupted; progress saved to {self.checkpoint_path}')
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self._flush()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {self.counts['rescored']} rescored, {self.counts['unchanged']} unchanged, "
+            f"{self.counts['failed']} failed in {time.monotonic() - self.started:.1f}s"
+        ))
+        if self.failed_ids:
+            self.stdout.write(f'Failed applications are retried on the next run: {sorted(self.failed_ids)}')
+
+    def _score(self, application):
+        """Runs on a pool thread; nothing is written here"""
+        try:
+            with ai_telemetry.for_application(application):
+                valuation, ai_result = ai_pipeline.rescore_application(
+                    application,
+                    force=self.options['force'],
+                    revalue_vehicle=not self.options['skip_vehicle'],
+                )
+            return application, valuation, ai_result, None
+        except Exception as e:
+            return application, None, None, f'{type(e).__name__}: {str(e)}'
+        finally:
+            connections.close_all()
+
+    def _collect(self, futures, batch_size):
+        for future in futures:
+            application, valuation, ai_result, error = future.result()
+            error = error or (ai_result or {}).get('error')
+            if error:
+                self.counts['failed'] += 1
+                self.failed_ids.add(application.pk)
+                self.settled.add(application.pk)
+                self.stderr.write(f'Application #{application.pk} failed: {error}')
+                continue
+
+            if valuation is not None:
+                self.pending_valuations.append(valuation)
+            if ai_result.get('analysis_skipped'):
+                self.counts['unchanged'] += 1
+                if valuation is None:
+                    self.settled.add(application.pk)
+                    continue
+            else:
+                ai_pipeline.apply_gemini_result(application, ai_result)
+                self.pending_applications.append(application)
+                self.counts['rescored'] += 1
+
+        if len(self.pending_applications) + len(self.pending_valuations) >= batch_size:
+            self._flush()
+
+    def _flush(self):
+        """Write pending results in bulk, then move the checkpoint forward"""
+        applications, self.pending_applications = self.pending_applications, []
+        valuations, self.pending_valuations = self.pending_valuations, []
+
+        if applications or valuations:
+            new_valuations = [valuation for valuation in valuations if valuation.pk is None]
+            existing_valuations = [valuation for valuation in valuations if valuation.pk is not None]
+            with transaction.atomic():
+                if new_valuations:
+                    VehicleValuation.objects.bulk_create(new_valuations)
+                if existing_valuations:
+                    VehicleValuation.objects.bulk_update(existing_valuations, VALUATION_FIELDS)
+                if applications:
+                    LoanApplication.objects.bulk_update(applications, ai_pipeline.GEMINI_RESULT_FIELDS)
+                # Bulk writes skip the signals that version cached responses
+                response_cache.bump(pk__in={application.pk for application in applications} | {
+                    valuation.application_id for valuation in valuations
+                })
+            ai_telemetry.flush()
+
+        self.settled.update(application.pk for application in applications)
+        self.settled.update(valuation.application_id for valuation in valuations)
+        self._advance_checkpoint()
+
+    def _advance_checkpoint(self):
+        advanced = False
+        while self.dispatched and self.dispatched[0] in self.settled:
+            pk = self.dispatched.popleft()
+            self.settled.discard(pk)
+            if pk not in self.failed_ids:
+                self.retry_ids.discard(pk)
+            self.checkpoint['last_pk'] = max(self.checkpoint['last_pk'], pk)
+            self.checkpoint['processed'] += 1
+            advanced = True
+        if not advanced:
+            return
+
+        # Failures behind the watermark are retried on the next run; the ones
+        # ahead of it are picked up again by pk anyway
+        self.checkpoint['failed_ids'] = sorted(
+            self.retry_ids | {pk for pk in self.failed_ids if pk <= self.checkpoint['last_pk']}
+        )
+        self._save_checkpoint()
+
+        elapsed = time.monotonic() - self.started
+        done_count = sum(self.counts.values())
+        self.stdout.write(
+            f"{done_count}/{self.total} applications ({done_count / elapsed:.1f}/s), "
+            f"checkpoint at #{self.checkpoint['last_pk']}"
+        )
+
+    def _load_checkpoint(self):
+        empty = {'filters': self.filters, 'last_pk': 0, 'processed': 0, 'failed_ids': []}
+        if self.options['restart'] or not os.path.exists(self.checkpoint_path):
+            return empty
+
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('filters') != self.filters:
+            raise CommandError(
+                f'{self.checkpoint_path} was written with different options '
+                f"({checkpoint.get('filters')}); use --restart or another --checkpoint"
+            )
+        return checkpoint
+
+    def _save_checkpoint(self):
+        self.checkpoint['updated_at'] = timezone.now().isoformat()
+        # Write-then-rename so an interrupted write never leaves a truncated checkpoint
+        tmp_path = f'{self.checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
@@ -0,0 +1,93 @@
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from loans.ai_jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued AI jobs (vehicle valuation and Gemini loan analysis) and decision emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=getattr(settings, 'AI_WORKER_CONCURRENCY', 2),
+            help='Number of jobs processed in parallel (worker threads)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=getattr(settings, 'AI_JOB_VISIBILITY_TIMEOUT', 300),
+            help='Seconds a claimed job stays invisible to other workers',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once the queue is empty instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        self.poll_interval = options['poll_interval']
+        self.visibility_timeout = timedelta(seconds=options['visibility_timeout'])
+        self.burst = options['burst']
+        self.stop_event = threading.Event()
+        base_worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.stdout.write(f'Starting AI worker {base_worker_id} with concurrency {concurrency}...')
+
+        threads = [
+            threading.Thread(
+                target=self._work_loop,
+                args=(f'{base_worker_id}:{i}',),
+                name=f'ai-worker-{i}',
+                daemon=True,
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping AI worker, waiting for running jobs to finish...')
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS('AI worker stopped'))
+
+    def _work_loop(self, worker_id):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                job = claim_next_job(worker_id, visibility_timeout=self.visibility_timeout)
+
+                if job is None:
+                    if self.burst:
+                        return
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+
+                self.stdout.write(f'[{worker_id}] Running {job.job_type} job {job.job_id} (attempt {job.attempts})')
+                started = time.monotonic()
+                run_job(job, worker_id)
+                self.stdout.write(f'[{worker_id}] Finished job {job.job_id} in {time.monotonic() - started:.1f}s')
+        finally:
+            connection.close()
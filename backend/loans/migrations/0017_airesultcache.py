@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0016_aijob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIResultCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=50)),
+                ('cache_key', models.CharField(max_length=255)),
+                ('value', models.JSONField()),
+                ('size_bytes', models.PositiveIntegerField(default=0)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['namespace', 'last_accessed_at'], name='loans_aires_namespa_b7f6a6_idx'), models.Index(fields=['expires_at'], name='loans_aires_expires_4abe56_idx')],
+                'constraints': [models.UniqueConstraint(fields=('namespace', 'cache_key'), name='unique_ai_cache_entry')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0017_airesultcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanapplication',
+            name='ai_analysis_fingerprint',
+            field=models.CharField(blank=True, default='', help_text='Hash of the application data and prompt version the AI analysis was based on', max_length=64),
+        ),
+    ]
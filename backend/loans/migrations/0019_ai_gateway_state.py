@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0018_loanapplication_ai_analysis_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICircuitBreaker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('state', models.CharField(choices=[('closed', 'Closed'), ('open', 'Open'), ('half_open', 'Half-open')], default='closed', max_length=10)),
+                ('consecutive_failures', models.PositiveIntegerField(default=0)),
+                ('opened_at', models.FloatField(blank=True, help_text='Unix timestamp the breaker last opened', null=True)),
+                ('times_opened', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AIRateLimitBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('tokens', models.FloatField(help_text='Tokens left at refilled_at (negative while calls are queued)')),
+                ('refilled_at', models.FloatField(help_text='Unix timestamp of the last update')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
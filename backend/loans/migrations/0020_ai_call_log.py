@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0019_ai_gateway_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AICallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('call_type', models.CharField(choices=[('image_analysis', 'Image analysis'), ('combined_analysis', 'Combined vehicle analysis'), ('market_comparison', 'Market comparison'), ('loan_analysis', 'Loan analysis')], max_length=20)),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('application_id', models.UUIDField(blank=True, db_index=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('latency_ms', models.FloatField()),
+                ('request_bytes', models.PositiveIntegerField(default=0)),
+                ('image_count', models.PositiveSmallIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('response_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('cost_usd', models.DecimalField(decimal_places=8, default=0, max_digits=12)),
+                ('cache_hit', models.BooleanField(default=False)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('invalid_response', 'Invalid response'), ('timeout', 'Timed out'), ('rate_limited', 'Rate limited'), ('circuit_open', 'Circuit open'), ('error', 'Error')], max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['call_type', 'started_at'], name='loans_aical_call_ty_b46497_idx'), models.Index(fields=['started_at'], name='loans_aical_started_c1bcc3_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0022_application_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aijob',
+            name='job_type',
+            field=models.CharField(choices=[('submit_analysis', 'Submit-time AI Analysis'), ('send_email', 'Send Email')], max_length=50),
+        ),
+    ]
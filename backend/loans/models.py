@@ -232,6 +232,9 @@ class LoanApplication(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     submitted_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every write to the application or its related rows; keys the
+    # response cache and ETags (loans.response_cache)
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
     
     # Draft session tracking (for anonymous users)
     session_key = models.CharField(max_length=255, null=True, blank=True)
@@ -271,6 +274,7 @@ class LoanApplication(models.Model):
     )
     ai_analysis_data = models.JSONField(null=True, blank=True, help_text="Full AI analysis response from Gemini")
     ai_analysis_timestamp = models.DateTimeField(null=True, blank=True, help_text="When AI analysis was performed")
+    ai_analysis_fingerprint = models.CharField(max_length=64, blank=True, default='', help_text="Hash of the application data and prompt version the AI analysis was based on")
     
     # Approval fields (admin decision tracking)
     approved_amount = models.DecimalField(
@@ -296,6 +300,9 @@ class LoanApplication(models.Model):
             models.Index(fields=['user', 'status']),
             models.Index(fields=['session_key']),
             models.Index(fields=['application_id']),
+            # Keyset pagination (loans.pagination): all applications, and per user
+            models.Index(fields=['-created_at', '-id'], name='loan_app_created_id_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='loan_app_user_created_id_idx'),
         ]
     
     def __str__(self):
@@ -719,3 +726,175 @@ class VehicleValuation(models.Model):
             notes.append("💡 Consider offering higher loan amount if creditworthy")
         
         return "\n".join(notes)
+
+
+class AIJob(models.Model):
+    """
+    Durable background job for AI work (vehicle valuation, Gemini analysis)
+    and for emails queued by admin decisions.
+    Jobs are claimed by `manage.py run_ai_worker` processes; a claimed job is
+    invisible to other workers until `locked_until` passes, so a crashed
+    worker's job is picked up again automatically.
+    """
+    JOB_TYPE_CHOICES = (
+        ('submit_analysis', 'Submit-time AI Analysis'),
+        ('send_email', 'Send Email'),
+    )
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    job_type = models.CharField(max_length=50, choices=JOB_TYPE_CHOICES)
+    application = models.ForeignKey(
+        LoanApplication,
+        on_delete=models.CASCADE,
+        related_name='ai_jobs',
+        null=True,
+        blank=True
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # Retry bookkeeping
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    available_at = models.DateTimeField(help_text="Earliest time the job may be claimed (used for retry backoff)")
+    locked_until = models.DateTimeField(null=True, blank=True, help_text="Visibility timeout for the current claim")
+    locked_by = models.CharField(max_length=255, blank=True, default='')
+
+    # Outcome
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_job_type_display()} job {self.job_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
+class AIResultCache(models.Model):
+    """
+    Persistent cache of parsed AI model responses, shared by all processes.
+    Entries are grouped by namespace (e.g. 'image_analysis') and looked up
+    by a content-derived key. See loans/ai_cache.py.
+    """
+    namespace = models.CharField(max_length=50)
+    cache_key = models.CharField(max_length=255)
+    value = models.JSONField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['namespace', 'cache_key'], name='unique_ai_cache_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['namespace', 'last_accessed_at']),
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.namespace}:{self.cache_key}"
+
+
+class AIRateLimitBucket(models.Model):
+    """
+    Token bucket shared by every process calling the AI provider.
+    Updated with compare-and-set on `version`; see loans/ai_gateway.py.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    tokens = models.FloatField(help_text="Tokens left at refilled_at (negative while calls are queued)")
+    refilled_at = models.FloatField(help_text="Unix timestamp of the last update")
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.2f} tokens"
+
+
+class AICircuitBreaker(models.Model):
+    """Circuit breaker state shared by every process calling the AI provider"""
+    STATE_CHOICES = (
+        ('closed', 'Closed'),
+        ('open', 'Open'),
+        ('half_open', 'Half-open'),
+    )
+
+    name = models.CharField(max_length=50, unique=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='closed')
+    consecutive_failures = models.PositiveIntegerField(default=0)
+    opened_at = models.FloatField(null=True, blank=True, help_text="Unix timestamp the breaker last opened")
+    times_opened = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.state}"
+
+
+class AICallLog(models.Model):
+    """
+    One model call (or cache hit standing in for one) made by the AI pipeline.
+    Written in batches by loans/ai_telemetry.py.
+    """
+    CALL_TYPE_CHOICES = (
+        ('image_analysis', 'Image analysis'),
+        ('combined_analysis', 'Combined vehicle analysis'),
+        ('market_comparison', 'Market comparison'),
+        ('loan_analysis', 'Loan analysis'),
+    )
+    OUTCOME_CHOICES = (
+        ('success', 'Success'),
+        ('invalid_response', 'Invalid response'),
+        ('timeout', 'Timed out'),
+        ('rate_limited', 'Rate limited'),
+        ('circuit_open', 'Circuit open'),
+        ('error', 'Error'),
+    )
+
+    call_type = models.CharField(max_length=20, choices=CALL_TYPE_CHOICES)
+    model_name = models.CharField(max_length=100, blank=True)
+    # Not a foreign key: logs outlive applications and are written without extra lookups
+    application_id = models.UUIDField(null=True, blank=True, db_index=True)
+    started_at = models.DateTimeField()
+    latency_ms = models.FloatField()
+    request_bytes = models.PositiveIntegerField(default=0)
+    image_count = models.PositiveSmallIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    response_tokens = models.PositiveIntegerField(null=True, blank=True)
+    cost_usd = models.DecimalField(max_digits=12, decimal_places=8, default=0)
+    cache_hit = models.BooleanField(default=False)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['call_type', 'started_at']),
+            models.Index(fields=['started_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.call_type} {self.outcome} {self.latency_ms:.0f}ms"
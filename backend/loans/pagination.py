@@ -0,0 +1,110 @@
+"""
+Keyset pagination for loan application lists.
+
+Pages are ordered newest first on (created_at, id), which is unique, so the
+order is stable while rows are added. A page is found by seeking past the
+last row of the previous one (WHERE (created_at, id) < cursor) on the
+matching index, so a deep page costs the same as the first. Cursors are
+opaque, base64-encoded JSON positions.
+"""
+
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ApplicationCursorPagination(BasePagination):
+    """
+    Query parameters: `cursor` (the `next` value of the previous page, as a
+    link) and `page_size` (capped at LOAN_APPLICATION_MAX_PAGE_SIZE).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, 'LOAN_APPLICATION_PAGE_SIZE', 20)
+        max_page_size = getattr(settings, 'LOAN_APPLICATION_MAX_PAGE_SIZE', 100)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            pass
+        return max(1, min(page_size, max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        One page of `queryset` (model instances, or dicts with created_at and
+        id from .values()).
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            # The redundant created_at <= bound lets the database seek the index to the
+            # cursor instead of scanning it from the newest row
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+                created_at__lte=created_at,
+            )
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_next_cursor(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        if isinstance(last, dict):
+            return self.encode_cursor(last['created_at'], last['id'])
+        return self.encode_cursor(last.created_at, last.id)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    @staticmethod
+    def encode_cursor(created_at, pk):
+        return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), pk]).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """(created_at, id) from a cursor; ParseError (400) if it is malformed"""
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            created_at = parse_datetime(created_at)
+            if created_at is None:
+                raise ValueError(cursor)
+            return created_at, int(pk)
+        except (ValueError, TypeError, ArithmeticError):
+            raise ParseError(self.invalid_cursor_message)
@@ -0,0 +1,142 @@
+"""
+Versioned response cache and conditional GETs for loan application reads.
+
+Every application carries a cache_version that loans.signals bumps on any
+write to the application or its related rows (applicant info, documents,
+notes, vehicle valuation). Serialized applications and document listings
+are cached under (application id, version), so an entry never has to be
+invalidated: a write makes the next read miss. ETags are derived from the
+same versions, so a poll whose If-None-Match still matches is answered with
+304 Not Modified after a single version lookup, without serializing.
+
+Entries live in the "responses" cache (settings.CACHES), which can be local
+memory, a directory (FileBasedCache) or a shared server such as Redis.
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import LoanApplication
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+
+def is_enabled():
+    return getattr(settings, 'LOAN_RESPONSE_CACHE_ENABLED', True)
+
+
+def get_cache():
+    return caches[RESPONSE_CACHE_ALIAS]
+
+
+def bump(**filters):
+    """Advance the version of the applications matching `filters`"""
+    return LoanApplication.objects.filter(**filters).update(cache_version=F('cache_version') + 1)
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag for a representation built from `parts` (ids and versions).
+
+    The host is included because serialized file URLs are absolute.
+    """
+    key = repr((request.get_host(), request.get_full_path(), parts))
+    return quote_etag(hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+
+def is_not_modified(request, etag):
+    """Whether the request's If-None-Match matches `etag`"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # Weak comparison for If-None-Match (RFC 9110 13.1.2)
+    return '*' in etags or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in etags]
+
+
+def conditional_response(request, etag, build):
+    """
+    304 when the client already has `etag`, otherwise the body from build().
+
+    Args:
+        request: DRF request
+        etag: Quoted ETag of the current representation
+        build: Callable returning the response body
+
+    Returns:
+        Response: With the ETag and a Cache-Control that makes clients revalidate
+    """
+    if is_not_modified(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(build(), status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _key(kind, request, pk, version):
+    return f'loans:{kind}:{request.get_host()}:{pk}:{version}'
+
+
+def _fieldset_kind(kind, fields):
+    """`kind` qualified by a sparse fieldset, so each field selection is cached apart"""
+    if fields is None:
+        return kind
+    return f"{kind}.{hashlib.sha256(','.join(fields).encode('utf-8')).hexdigest()[:12]}"
+
+
+def serialize_applications(request, versions, serialize, fields=None):
+    """
+    Serialized applications, from the cache where the version matches.
+
+    Args:
+        request: DRF request (part of the key; file URLs are absolute)
+        versions: [(pk, cache_version), ...] in response order
+        serialize: Callable taking a list of pks and returning their
+                   serialized dicts in any order (e.g. serializer(many=True).data)
+        fields: Sparse fieldset `serialize` produces (None: every field)
+
+    Returns:
+        list: Serialized applications in the order of `versions`
+    """
+    if not is_enabled():
+        data = {item['id']: item for item in serialize([pk for pk, _ in versions])}
+        return [data[pk] for pk, _ in versions if pk in data]
+
+    cache = get_cache()
+    kind = _fieldset_kind('application', fields)
+    keys = {pk: _key(kind, request, pk, version) for pk, version in versions}
+    cached = cache.get_many(list(keys.values()))
+    data = {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+    missing = [pk for pk in keys if pk not in data]
+    if missing:
+        fresh = {item['id']: item for item in serialize(missing)}
+        data.update(fresh)
+        timeout = getattr(settings, 'LOAN_RESPONSE_CACHE_TTL', 86400)
+        cache.set_many({keys[pk]: item for pk, item in fresh.items()}, timeout)
+    logger.debug(f"Serialized {len(missing)} of {len(keys)} applications")
+    return [data[pk] for pk, _ in versions if pk in data]
+
+
+def cached_payload(kind, request, pk, version, build):
+    """A response body for one application version, built on a miss"""
+    if not is_enabled():
+        return build()
+    cache = get_cache()
+    key = _key(kind, request, pk, version)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, getattr(settings, 'LOAN_RESPONSE_CACHE_TTL', 86400))
+    return payload
@@ -9,7 +9,11 @@ from .models import (
     ApplicantFinancialProfile,
     ApplicantAddress,
     VehicleInformation,
+    AIJob,
 )
+from django.conf import settings
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -517,8 +521,27 @@ class LoanApplicationDocumentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'uploaded_at', 'is_analyzed', 'ai_analysis_result', 'file_url']
 
 
-class LoanApplicationSerializer(serializers.ModelSerializer):
-    """Serializer for loan applications"""
+class SparseFieldsetMixin:
+    """
+    Serializer that keeps only the field names passed as `fields`
+    (see sparse_fieldset() for reading them from ?fields= and ?expand=).
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class LoanApplicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Serializer for loan applications.
+
+    Querysets serialized with many=True should go through setup_eager_loading(),
+    otherwise every row costs several extra queries. Pass the same `fields`
+    to both to load and serialize a sparse fieldset.
+    """
     documents = LoanApplicationDocumentSerializer(many=True, read_only=True)
     vehicle_valuation = serializers.SerializerMethodField()
     document_summary = serializers.SerializerMethodField()
@@ -691,6 +714,80 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         required=False
     )
     
+    # Columns the method fields read, as ORM paths (anything else is loaded by its source)
+    FIELD_DEPENDENCIES = {
+        'full_name': ['personal_info__first_name', 'personal_info__last_name'],
+        'vehicle_valuation': [
+            f'vehicle_valuation__{name}' for name in (
+                'estimated_value_avg', 'estimated_value_low', 'estimated_value_high', 'condition',
+                'risk_level', 'ltv_ratio', 'max_loan_amount', 'is_approved_for_loan',
+                'confidence_level', 'analyzed_at',
+            )
+        ],
+        'document_summary': [],
+        'documents': [],
+        'query_notes': ['status'],
+    }
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """
+        Load everything the serializer reads in a fixed number of queries:
+        the one-to-one relations in the main query with a document count, the
+        documents in one prefetch, and each application's latest admin query
+        note (picked by a correlated subquery) in another.
+
+        With `fields` (a sparse fieldset), only the columns those fields read
+        are loaded, and only the relations they use are joined or prefetched.
+        """
+        if fields is None:
+            fields = cls.Meta.fields
+            columns = None
+        else:
+            # created_at is the keyset pagination key of application lists
+            columns = {'id', 'created_at'}
+            for name in fields:
+                if name in cls.FIELD_DEPENDENCIES:
+                    columns.update(cls.FIELD_DEPENDENCIES[name])
+                else:
+                    declared = cls._declared_fields.get(name)
+                    source = declared.source if declared is not None and declared.source else name
+                    columns.add(source.replace('.', '__'))
+
+        prefetches = []
+        if 'documents' in fields:
+            prefetches.append('documents')
+        elif 'document_summary' in fields:
+            prefetches.append(Prefetch(
+                'documents', queryset=LoanApplicationDocument.objects.only('id', 'application_id', 'document_type'),
+            ))
+        if 'query_notes' in fields:
+            latest_admin_note = LoanApplicationNote.objects.filter(
+                application=OuterRef('application'),
+                author__user_type='admin',
+            ).order_by('-created_at', '-pk').values('pk')[:1]
+            prefetches.append(Prefetch(
+                'notes',
+                queryset=LoanApplicationNote.objects.filter(
+                    application__status='query', pk=Subquery(latest_admin_note),
+                ).select_related('author'),
+                to_attr='latest_query_notes',
+            ))
+
+        if columns is None:
+            queryset = queryset.select_related(
+                'personal_info', 'identification_info', 'financial_profile',
+                'address', 'vehicle_info', 'vehicle_valuation',
+            )
+        else:
+            relations = sorted({column.split('__')[0] for column in columns if '__' in column})
+            queryset = queryset.select_related(*relations).only(*columns)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if 'document_summary' in fields:
+            queryset = queryset.annotate(document_count=Count('documents', distinct=True))
+        return queryset
+
     def get_full_name(self, obj):
         """Get the full name for the loan applicant"""
         try:
@@ -734,7 +831,10 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
             # Count related documents (this is the correct way to check for photos/documents)
             if hasattr(obj, 'documents'):
                 related_docs = obj.documents.all()
-                document_count = related_docs.count()
+                # Annotated by setup_eager_loading; otherwise count the (possibly prefetched) rows
+                document_count = getattr(obj, 'document_count', None)
+                if document_count is None:
+                    document_count = len(related_docs)
                 document_types = [doc.get_document_type_display() for doc in related_docs]
             
             return {
@@ -750,7 +850,11 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         """Get the latest admin query note for this application"""
         try:
             if obj.status == 'query':
-                latest_note = obj.notes.filter(author__user_type='admin').order_by('-created_at').first()
+                if hasattr(obj, 'latest_query_notes'):
+                    # Prefetched by setup_eager_loading
+                    latest_note = obj.latest_query_notes[0] if obj.latest_query_notes else None
+                else:
+                    latest_note = obj.notes.filter(author__user_type='admin').select_related('author').order_by('-created_at').first()
                 if latest_note:
                     return {
                         'note': latest_note.note,
@@ -792,6 +896,52 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
                         'ai_recommendation', 'ai_risk_assessment', 'ai_approval_suggestion', 
                         'ai_analysis_data', 'ai_analysis_timestamp',
                         'approved_at', 'approved_by']
+
+
+# Compact representation of the application list (GET /api/loans/applications/)
+LOAN_APPLICATION_LIST_FIELDS = (
+    'id', 'application_id', 'user', 'status', 'is_draft', 'full_name', 'first_name', 'last_name',
+    'email', 'phone', 'amount', 'term', 'interest_rate', 'approved_amount', 'ai_approval_suggestion',
+    'created_at', 'updated_at', 'submitted_at',
+)
+
+
+def sparse_fieldset(request, default=None):
+    """
+    LoanApplicationSerializer field names selected by the request.
+
+    ?fields=a,b replaces the view's default fields; ?expand=c,d adds to them
+    (e.g. ?expand=documents on the compact list). `id` is always included.
+
+    Args:
+        request: DRF request
+        default: Field names without ?fields= (None: every field)
+
+    Returns:
+        tuple: Field names in serializer order, or None for every field
+
+    Raises:
+        ParseError: For unknown field names
+    """
+    from rest_framework.exceptions import ParseError
+
+    def names(param):
+        value = request.query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    fields, expand = names('fields'), names('expand')
+    if not fields and not expand:
+        return tuple(default) if default is not None else None
+
+    available = LoanApplicationSerializer.Meta.fields
+    unknown = sorted(set(fields + expand) - set(available))
+    if unknown:
+        raise ParseError(f"Unknown fields: {', '.join(unknown)}")
+
+    selected = set(fields or (default if default is not None else available)) | set(expand) | {'id'}
+    return tuple(name for name in available if name in selected)
+
+
 class LoanApplicationCreateSerializer(LoanApplicationDataMixin, serializers.ModelSerializer):
     """Serializer for creating loan applications (drafts)"""
     
@@ -1118,6 +1268,30 @@ class LoanDecisionActionSerializer(serializers.Serializer):
     flagged_fields = serializers.ListField(child=serializers.CharField(), required=False, allow_null=True)
 
 
+class BulkDecisionItemSerializer(serializers.Serializer):
+    """One decision of a bulk admin decision"""
+    id = serializers.IntegerField()
+    decision = serializers.ChoiceField(choices=('approve', 'reject'))
+    approved_amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        if attrs['decision'] == 'approve' and attrs.get('approved_amount') is None:
+            raise serializers.ValidationError({'approved_amount': 'This field is required to approve.'})
+        return attrs
+
+
+class BulkDecisionSerializer(serializers.Serializer):
+    """Serializer for the bulk admin decision action"""
+    decisions = BulkDecisionItemSerializer(many=True, allow_empty=False)
+
+    def validate_decisions(self, value):
+        limit = getattr(settings, 'LOAN_BULK_DECISION_MAX_ITEMS', 200)
+        if len(value) > limit:
+            raise serializers.ValidationError(f'At most {limit} decisions per request.')
+        return value
+
+
 class VehicleValuationSerializer(serializers.ModelSerializer):
     """Serializer for vehicle valuation results"""
     estimated_value_avg = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
@@ -1136,3 +1310,24 @@ class VehicleValuationSerializer(serializers.ModelSerializer):
             'analyzed_at', 'updated_at'
         ]
         read_only_fields = ['id', 'analyzed_at', 'updated_at']
+
+
+class AIJobSerializer(serializers.ModelSerializer):
+    """Serializer for background AI job status"""
+    application_id = serializers.UUIDField(source='application.application_id', read_only=True, allow_null=True)
+    status_url = serializers.SerializerMethodField()
+    
+    def get_status_url(self, obj):
+        """Polling URL for this job"""
+        url = reverse('ai-job-detail', kwargs={'job_id': obj.job_id})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    class Meta:
+        model = AIJob
+        fields = [
+            'job_id', 'job_type', 'application_id', 'status', 'status_url',
+            'attempts', 'max_attempts', 'available_at', 'last_error', 'result',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -1,4 +1,6 @@
-from django.db.models.signals import post_migrate
+from django.core.signals import request_finished
+from django.db.models import F
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
 from django.apps import apps
 import logging
@@ -43,3 +45,68 @@ def associate_applications_with_users(sender, **kwargs):
             logger.info(f"Signal handler: Associated {associated_count} applications with users")
     except Exception as e:
         logger.error(f"Error in associate_applications_with_users: {str(e)}")
+
+
+@receiver(request_finished)
+def flush_ai_call_logs(sender, **kwargs):
+    """Write the model call logs (AICallLog) buffered while handling the request"""
+    from .ai_telemetry import flush
+
+    flush()
+
+
+@receiver(pre_save, sender='loans.LoanApplication')
+def advance_application_version(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    A new version for every save, so cached responses and ETags go stale.
+    Incremented in the save's own UPDATE, so a stale in-memory copy can't
+    write an old version back.
+    """
+    if raw or instance._state.adding:
+        return
+    if update_fields is None or 'cache_version' in update_fields:
+        instance.cache_version = F('cache_version') + 1
+
+
+@receiver(post_save, sender='loans.LoanApplication')
+def bump_application_version(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    """Saves limited to update_fields don't write cache_version; bump it separately"""
+    from .response_cache import bump
+
+    if not raw and not created and update_fields is not None and 'cache_version' not in update_fields:
+        bump(pk=instance.pk)
+
+
+# Applicant rows the application points to, by the LoanApplication field name
+APPLICANT_RELATIONS = {
+    'loans.ApplicantPersonalInfo': 'personal_info',
+    'loans.ApplicantIdentification': 'identification_info',
+    'loans.ApplicantFinancialProfile': 'financial_profile',
+    'loans.ApplicantAddress': 'address',
+    'loans.VehicleInformation': 'vehicle_info',
+}
+
+
+def bump_for_applicant_row(sender, instance, raw=False, **kwargs):
+    from .response_cache import bump
+
+    if not raw:
+        bump(**{APPLICANT_RELATIONS[sender._meta.label]: instance})
+
+
+for label in APPLICANT_RELATIONS:
+    post_save.connect(bump_for_applicant_row, sender=label, dispatch_uid=f'bump_version_{label}')
+
+
+@receiver(post_save, sender='loans.LoanApplicationDocument')
+@receiver(post_delete, sender='loans.LoanApplicationDocument')
+@receiver(post_save, sender='loans.LoanApplicationNote')
+@receiver(post_delete, sender='loans.LoanApplicationNote')
+@receiver(post_save, sender='loans.VehicleValuation')
+@receiver(post_delete, sender='loans.VehicleValuation')
+def bump_for_application_child(sender, instance, raw=False, **kwargs):
+    """Documents, notes and the valuation are part of the serialized application"""
+    from .response_cache import bump
+
+    if not raw and instance.application_id:
+        bump(pk=instance.application_id)
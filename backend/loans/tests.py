@@ -1,3 +1,1663 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from accounts.models import User
+from .models import (
+    LoanApplication,
+    ApplicantPersonalInfo,
+    ApplicantAddress,
+    ApplicantFinancialProfile,
+    VehicleInformation,
+    AIJob,
+    AIResultCache,
+    AICircuitBreaker,
+    AICallLog,
+    LoanApplicationDocument,
+    LoanApplicationNote,
+)
+from . import ai_backends, ai_clients, ai_jobs, ai_telemetry
+from .ai_cache import LocalLRUCache, ResultCache, TieredCache, sha256_of_file, sha256_of_image
+from .ai_gateway import AIGateway, CircuitBreaker, CircuitOpenError, RateLimitExceeded, TokenBucket
+from .car_image_analyzer import CarImageAnalyzer, CarValuationService
+from .gemini_loan_analyzer import GeminiLoanAnalyzer
+from .image_preprocessing import ImagePreprocessor, downscale_to_jpeg
+from .vehicle_normalization import bucket_year, normalize_vehicle
+
+
+def create_application(user=None, **overrides):
+    """Create a complete, submittable loan application"""
+    personal_info = ApplicantPersonalInfo.objects.create(
+        first_name='Jane', last_name='Doe', email='jane@example.com',
+        phone='5550000000', dob=date(1990, 1, 1)
+    )
+    fields = {
+        'user': user,
+        'personal_info': personal_info,
+        'address': ApplicantAddress.objects.create(street='1 Main St', city='Austin', state='TX', zip_code='73301'),
+        'financial_profile': ApplicantFinancialProfile.objects.create(income=60000, employment_status='employed'),
+        'vehicle_info': VehicleInformation.objects.create(make='Toyota', model='Camry', year='2018', vin='1HGCM82633A004352'),
+        'amount': 5000,
+        'accept_terms': True,
+        'signature': 'Jane Doe',
+    }
+    fields.update(overrides)
+    return LoanApplication.objects.create(**fields)
+
+
+def make_image_base64(width, height=40):
+    """Encode a blank JPEG of the given size as base64"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, 'JPEG')
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+class FakeVisionModel:
+    """Echoes the image width back in the analysis; fails for `fail_widths`, takes `slow_widths` seconds"""
+
+    def __init__(self, latency=0.0, fail_widths=(), slow_widths=None):
+        self.latency = latency
+        self.fail_widths = set(fail_widths)
+        self.slow_widths = slow_widths or {}
+        self.calls = 0
+        self.cancelled = 0
+
+    def generate_content(self, contents, request_options=None):
+        self.calls += 1
+        time.sleep(self.slow_widths.get(self._width(contents), self.latency))
+        return self._respond(contents)
+
+    async def generate_content_async(self, contents, request_options=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return self._respond(contents)
+
+    @staticmethod
+    def _width(contents):
+        from PIL import Image
+
+        image = contents[1]
+        if isinstance(image, dict):
+            image = Image.open(io.BytesIO(image['data']))
+        return image.size[0]
+
+    def _respond(self, contents):
+        width = self._width(contents)
+        if width in self.fail_widths:
+            raise RuntimeError('upstream error')
+        return mock.Mock(text=json.dumps({
+            'make': 'Toyota', 'model': 'Camry', 'condition': 'good',
+            'estimated_value': {'low': 10000, 'high': 12000},
+            'notes': str(width),
+        }))
+
+
+class FakeCombinedModel:
+    """Answers the single-request vehicle evaluation; records the photos per call"""
+
+    def __init__(self, include_market=True):
+        self.include_market = include_market
+        self.photos_per_call = []
+
+    async def generate_content_async(self, contents, request_options=None):
+        return self.generate_content(contents, request_options)
+
+    def generate_content(self, contents, request_options=None):
+        photos = [part for part in contents[1:] if not isinstance(part, str)]
+        self.photos_per_call.append(len(photos))
+        analysis = {
+            'vehicle': {
+                'make': 'Toyota', 'model': 'Camry', 'year': '2018', 'condition': 'fair',
+                'estimated_value': {'low': 15000, 'high': 17000},
+            },
+            'photos': [{'photo': i + 1, 'view': 'other', 'usable': True} for i in range(len(photos))],
+        }
+        if self.include_market:
+            analysis['market'] = {'market_value': {'low': 15000, 'average': 16000, 'high': 17000}}
+        return mock.Mock(text='```json\n' + json.dumps(analysis) + '\n```')
+
+
+class FakeTextModel:
+    """Returns a fixed market comparison and records the prompts it was sent"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+        time.sleep(self.latency)
+        return self._respond()
+
+    async def generate_content_async(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.latency)
+        return self._respond()
+
+    def _respond(self):
+        return mock.Mock(text=json.dumps({
+            'market_value': {'low': 14000, 'average': 16000, 'high': 18000, 'currency': 'USD'},
+        }))
+
+
+class AIJobQueueTestCase(TestCase):
+    def setUp(self):
+        self.application = create_application()
+
+    def test_claim_is_exclusive(self):
+        """A claimed job is invisible to other workers until its lock expires"""
+        job = ai_jobs.enqueue_job('submit_analysis', application=self.application)
+
+        claimed = ai_jobs.claim_next_job('worker-a')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, 'running')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(ai_jobs.claim_next_job('worker-b'))
+
+    def test_expired_visibility_timeout_is_reclaimed(self):
+        """Jobs abandoned by a crashed worker become claimable again"""
+        job = ai_jobs.enqueue_job('submit_analysis', application=self.application)
+        ai_jobs.claim_next_job('worker-a')
+        AIJob.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        reclaimed = ai_jobs.claim_next_job('worker-b')
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.locked_by, 'worker-b')
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_failed_attempt_is_retried_with_backoff(self):
+        job = ai_jobs.enqueue_job('submit_analysis', application=self.application, max_attempts=2)
+        failing = mock.Mock(side_effect=RuntimeError('quota exceeded'))
+
+        with mock.patch.dict(ai_jobs.JOB_HANDLERS, {'submit_analysis': failing}):
+            ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued')
+            self.assertGreater(job.available_at, timezone.now())
+            self.assertIn('quota exceeded', job.last_error)
+
+            AIJob.objects.filter(pk=job.pk).update(available_at=timezone.now())
+            ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+            self.assertEqual(job.attempts, 2)
+
+    def test_submit_analysis_saves_results(self):
+        job = ai_jobs.enqueue_job('submit_analysis', application=self.application)
+        ai_result = {
+            'approval_suggestion': 'approve',
+            'risk_assessment': 'low',
+            'recommendation': 'Looks good',
+        }
+
+        with mock.patch('loans.ai_pipeline.analyze_vehicle_for_application', return_value=None), \
+                mock.patch('loans.ai_pipeline.analyze_application_with_gemini', return_value=ai_result):
+            ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+
+        job.refresh_from_db()
+        self.application.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual(job.result['ai_analysis']['approval_suggestion'], 'approve')
+        self.assertEqual(self.application.ai_approval_suggestion, 'approve')
+        self.assertIsNotNone(self.application.ai_analysis_timestamp)
+
+
+class GeminiFingerprintTestCase(TestCase):
+    ai_result = {
+        'approval_suggestion': 'approve',
+        'risk_assessment': 'low',
+        'recommendation': 'Looks good',
+    }
+
+    def setUp(self):
+        self.application = create_application()
+        self.analyze = mock.patch.object(
+            GeminiLoanAnalyzer, 'analyze_loan_application', side_effect=lambda *a, **kw: dict(self.ai_result)
+        ).start()
+        mock.patch('loans.ai_pipeline.analyze_vehicle_for_application', return_value=None).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def run_analysis(self, force=False):
+        job = ai_jobs.enqueue_submit_analysis(self.application, force=force)
+        ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+        job.refresh_from_db()
+        self.application.refresh_from_db()
+        return job
+
+    def test_fingerprint_tracks_application_data(self):
+        analyzer = GeminiLoanAnalyzer(api_key='test')
+        data = analyzer._prepare_application_data(self.application)
+        fingerprint = analyzer.fingerprint_application_data(data)
+
+        self.assertEqual(fingerprint, analyzer.fingerprint_application_data(analyzer._prepare_application_data(self.application)))
+        data['loan']['requested_amount'] += 1
+        self.assertNotEqual(fingerprint, analyzer.fingerprint_application_data(data))
+
+    def test_unchanged_application_skips_gemini(self):
+        first = self.run_analysis()
+        self.assertFalse(first.result['ai_analysis_skipped'])
+        self.assertEqual(len(self.application.ai_analysis_fingerprint), 64)
+        analyzed_at = self.application.ai_analysis_timestamp
+
+        second = self.run_analysis()
+        self.assertEqual(second.status, 'succeeded')
+        self.assertTrue(second.result['ai_analysis_skipped'])
+        self.assertEqual(second.result['ai_analysis']['approval_suggestion'], 'approve')
+        self.assertEqual(self.application.ai_analysis_timestamp, analyzed_at)
+        self.assertEqual(self.analyze.call_count, 1)
+
+    def test_changed_application_or_force_reanalyzes(self):
+        self.run_analysis()
+        self.application.amount = 6000
+        self.application.save()
+        self.assertFalse(self.run_analysis().result['ai_analysis_skipped'])
+
+        self.assertFalse(self.run_analysis(force=True).result['ai_analysis_skipped'])
+        self.assertEqual(self.analyze.call_count, 3)
+
+    def test_fallback_result_is_not_fingerprinted(self):
+        self.analyze.side_effect = lambda *a, **kw: {'error': 'quota', 'approval_suggestion': 'review'}
+        job = ai_jobs.enqueue_job('submit_analysis', application=self.application, max_attempts=1)
+        ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+        self.application.refresh_from_db()
+
+        self.assertEqual(self.application.ai_approval_suggestion, 'review')
+        self.assertEqual(self.application.ai_analysis_fingerprint, '')
+
+
+class PrescreenTestCase(TestCase):
+    def setUp(self):
+        self.application = create_application()
+        self.analyzer = GeminiLoanAnalyzer(api_key='test', gateway=AIGateway())
+        self.analyzer.model = mock.Mock()
+        self.analyzer.model.generate_content.return_value = mock.Mock(
+            text=json.dumps({'approval_suggestion': 'approve', 'risk_assessment': 'low'})
+        )
+
+    def update_financial_profile(self, **fields):
+        profile = self.application.financial_profile
+        for name, value in fields.items():
+            setattr(profile, name, value)
+        profile.save()
+
+    def test_regular_application_goes_to_the_model(self):
+        result = self.analyzer.analyze_loan_application(self.application)
+
+        self.assertEqual(result['approval_suggestion'], 'approve')
+        self.assertNotIn('prescreen', result)
+        self.analyzer.model.generate_content.assert_called_once()
+
+    def test_active_bankruptcy_is_rejected_without_model_call(self):
+        self.update_financial_profile(active_bankruptcy='Yes')
+
+        result = self.analyzer.analyze_loan_application(self.application)
+
+        self.assertEqual(result['approval_suggestion'], 'reject')
+        self.assertEqual(result['prescreen'], {'rules': ['active_bankruptcy'], 'llm_calls_avoided': 1})
+        self.assertEqual(set(result) - {'prescreen', 'analyzed_at', 'application_id', 'loan_limit_check'},
+                         set(self.analyzer._parse_ai_response('{}')))
+        self.analyzer.model.generate_content.assert_not_called()
+
+    def test_missing_income_needs_review(self):
+        self.update_financial_profile(income=None, gross_monthly_income=None)
+
+        result = self.analyzer.analyze_loan_application(self.application)
+
+        self.assertEqual(result['approval_suggestion'], 'review')
+        self.assertEqual(result['conditions_for_approval'], ['Provide proof of income'])
+
+    def test_amount_far_over_the_limits(self):
+        self.application.amount = 40000
+        self.application.applicant_estimated_value = 30000
+        self.application.save()
+
+        result = self.analyzer.analyze_loan_application(self.application)
+
+        self.assertEqual(result['prescreen']['rules'], ['hard_cap', 'ltv_far_above_limit'])
+        self.analyzer.model.generate_content.assert_not_called()
+
+    def test_mild_overage_is_still_analyzed(self):
+        self.application.amount = 26000
+        self.application.save()
+
+        result = self.analyzer.analyze_loan_application(self.application)
+
+        self.assertEqual(result['approval_suggestion'], 'conditional')
+        self.analyzer.model.generate_content.assert_called_once()
+
+    def test_submit_job_skips_vehicle_valuation_and_counts_avoided_calls(self):
+        self.update_financial_profile(active_bankruptcy='Yes')
+
+        with mock.patch('loans.ai_pipeline.get_gemini_loan_analyzer', return_value=self.analyzer), \
+                mock.patch('loans.ai_pipeline.analyze_vehicle_for_application') as analyze_vehicle:
+            job = ai_jobs.enqueue_submit_analysis(self.application)
+            ai_jobs.run_job(ai_jobs.claim_next_job('worker-a'), 'worker-a')
+
+        analyze_vehicle.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.result['prescreen']['rules'], ['active_bankruptcy'])
+
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+        stats = client.get('/api/admin/ai/prescreen/statistics/').data
+        self.assertEqual(stats['applicationsPrescreened'], 1)
+        self.assertEqual(stats['llmCallsAvoided'], 1)
+        self.assertEqual(stats['byRule'], {'active_bankruptcy': 1})
+
+
+class SubmitEnqueuesAIJobTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.application = create_application(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_submit_returns_job_without_running_ai(self):
+        with mock.patch('loans.ai_pipeline.analyze_application_with_gemini') as gemini:
+            response = self.client.post('/api/loans/applications/submit/', {'id': self.application.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        gemini.assert_not_called()
+        job_id = response.data['ai_job']['job_id']
+        self.assertEqual(response.data['ai_job']['status'], 'queued')
+
+        status_response = self.client.get(f'/api/loans/ai-jobs/{job_id}/')
+        self.assertEqual(status_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(status_response.data['application_id'], str(self.application.application_id))
+
+    def test_guest_polls_jobs_of_their_session_draft(self):
+        from .ai_jobs import enqueue_submit_analysis
+
+        guest = APIClient()
+        draft = create_application(session_key=guest.session.session_key)
+        job = enqueue_submit_analysis(draft)
+
+        response = guest.get(f'/api/loans/applications/{draft.id}/ai_status/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(guest.get(response.data['status_url']).status_code, status.HTTP_200_OK)
+
+        other = APIClient()
+        other.session.save()
+        self.assertEqual(other.get(f'/api/loans/ai-jobs/{job.job_id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(APIClient().get(f'/api/loans/ai-jobs/{job.job_id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_reanalyze_is_admin_only_and_forced(self):
+        self.application.submit()
+        url = f'/api/loans/applications/{self.application.id}/reanalyze/'
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.client.force_authenticate(admin)
+        response = self.client.post(url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(AIJob.objects.get(job_id=response.data['job_id']).payload['force'])
+
+
+@override_settings(AI_IMAGE_CACHE_ENABLED=False)
+class CarImageAnalyzerConcurrencyTestCase(SimpleTestCase):
+    def test_results_keep_input_order_with_partial_failure(self):
+        widths = [40, 50, 60, 70]
+        images = [(make_image_base64(width), 'base64') for width in widths]
+        analyzer = CarImageAnalyzer(model=FakeVisionModel(fail_widths={50}), gateway=AIGateway(), telemetry=None)
+
+        result = analyzer.analyze_multiple_images(images, max_concurrency=3)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['data']['images_analyzed'], 3)
+        self.assertEqual(result['data']['images_failed'], 1)
+        self.assertEqual(result['failed_results'][0]['image_index'], 1)
+        self.assertEqual([r['data']['notes'] for r in result['individual_results']], ['40', '60', '70'])
+
+    @override_settings(GEMINI_IMAGE_TIMEOUT=0.2)
+    def test_slow_image_times_out(self):
+        images = [(make_image_base64(40), 'base64')]
+        analyzer = CarImageAnalyzer(model=FakeVisionModel(latency=1.0), gateway=AIGateway(), telemetry=None)
+
+        started = time.monotonic()
+        result = analyzer.analyze_multiple_images(images)
+
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertFalse(result['success'])
+        self.assertIn('timed out', result['individual_results'][0]['error'])
+
+    @override_settings(GEMINI_IMAGE_TIMEOUT=0.3)
+    def test_hung_images_do_not_hold_up_the_batch(self):
+        # Both slots hang first; the fast images queued behind them must still
+        # run, each timed from its own start
+        widths = [40, 50, 60, 70, 80, 90]
+        images = [(make_image_base64(width), 'base64') for width in widths]
+        model = FakeVisionModel(latency=0.05, slow_widths={40: 2.0, 50: 2.0})
+        analyzer = CarImageAnalyzer(model=model, gateway=AIGateway(), telemetry=None)
+
+        started = time.monotonic()
+        result = analyzer.analyze_multiple_images(images, max_concurrency=2)
+        elapsed = time.monotonic() - started
+
+        # One timeout plus two rounds of fast images, not one timeout per image
+        self.assertLess(elapsed, 0.3 + 0.5)
+        self.assertEqual(result['data']['images_analyzed'], 4)
+        self.assertEqual([r['image_index'] for r in result['failed_results']], [0, 1])
+        self.assertTrue(all('timed out' in r['error'] for r in result['failed_results']))
+
+
+class ImageAnalysisCacheTestCase(TestCase):
+    def setUp(self):
+        self.cache = ResultCache('test_images', ttl_seconds=3600, max_entries=100)
+        self.model = FakeVisionModel()
+        self.analyzer = CarImageAnalyzer(model=self.model, result_cache=self.cache, gateway=AIGateway())
+
+    def test_repeat_image_skips_model(self):
+        image = make_image_base64(40)
+
+        first = self.analyzer.analyze_single_image(image)
+        second = self.analyzer.analyze_single_image(image)
+
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['data']['notes'], '40')
+        self.assertEqual(self.model.calls, 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_file_and_base64_of_same_bytes_share_entry(self):
+        image = make_image_base64(40)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'car.jpg')
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(image))
+
+            self.assertEqual(sha256_of_file(path, chunk_size=7), sha256_of_image(image))
+            self.analyzer.analyze_single_image(image)
+            result = self.analyzer.analyze_single_image(path, image_type='file_path')
+
+        self.assertTrue(result['cached'])
+        self.assertEqual(self.model.calls, 1)
+
+    def test_model_name_is_part_of_key(self):
+        image = make_image_base64(40)
+        self.analyzer.analyze_single_image(image)
+        self.analyzer.model_name = 'another-model'
+
+        self.assertFalse(self.analyzer.analyze_single_image(image)['cached'])
+        self.assertEqual(self.model.calls, 2)
+
+    def test_failed_analysis_is_not_cached(self):
+        analyzer = CarImageAnalyzer(model=FakeVisionModel(fail_widths={40}), result_cache=self.cache, gateway=AIGateway())
+        self.assertFalse(analyzer.analyze_single_image(make_image_base64(40))['success'])
+        self.assertEqual(AIResultCache.objects.count(), 0)
+
+    def test_expired_entry_misses(self):
+        self.cache.set('key', {'make': 'Toyota'})
+        AIResultCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.evict(), 1)
+
+    def test_evicts_least_recently_used_beyond_max_entries(self):
+        cache = ResultCache('test_images', max_entries=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, {'key': key})
+        AIResultCache.objects.filter(cache_key='a').update(last_accessed_at=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(
+            sorted(AIResultCache.objects.values_list('cache_key', flat=True)),
+            ['a', 'c'],
+        )
+
+    def test_evicts_least_recently_used_beyond_max_bytes(self):
+        cache = ResultCache('test_images', max_bytes=60)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, {'data': key * 20})
+        AIResultCache.objects.filter(cache_key='a').update(last_accessed_at=timezone.now() + timedelta(minutes=1))
+
+        self.assertEqual(cache.evict(), 2)
+        self.assertEqual(list(AIResultCache.objects.values_list('cache_key', flat=True)), ['a'])
+        self.assertLessEqual(cache.stats()['total_size_bytes'], 60)
+
+
+class VehicleNormalizationTestCase(SimpleTestCase):
+    def test_aliases_case_and_punctuation_share_a_key(self):
+        variants = [
+            {'make': 'Chevy', 'model': 'Silverado-1500', 'year': '2019', 'condition': 'Good'},
+            {'make': 'CHEVROLET', 'model': 'silverado 1500', 'year': '2018-2019', 'condition': 'good'},
+        ]
+        keys = {normalize_vehicle(v)['cache_key'] for v in variants}
+        self.assertEqual(keys, {'chevrolet|silverado1500|2018-2019|good'})
+
+    def test_year_buckets(self):
+        self.assertEqual(bucket_year('2017', bucket_size=2), '2016-2017')
+        self.assertEqual(bucket_year('circa 2016-2018', bucket_size=5), '2015-2019')
+        self.assertIsNone(bucket_year('unknown'))
+
+    def test_unidentified_vehicle_has_no_key(self):
+        self.assertIsNone(normalize_vehicle({'make': 'unknown', 'model': 'Camry', 'year': '2018'})['cache_key'])
+
+
+class MarketComparisonCacheTestCase(TestCase):
+    def setUp(self):
+        self.text_model = FakeTextModel()
+        self.cache = TieredCache(LocalLRUCache(max_size=10), ResultCache('test_market', ttl_seconds=3600))
+
+    def make_analyzer(self):
+        return CarImageAnalyzer(
+            model=FakeVisionModel(), text_model=self.text_model,
+            result_cache=None, market_cache=self.cache, gateway=AIGateway(),
+        )
+
+    def test_equivalent_vehicles_reuse_market_data(self):
+        first = self.make_analyzer().get_market_comparison(
+            {'make': 'VW', 'model': 'Golf', 'year': '2016', 'condition': 'fair'})
+        second = self.make_analyzer().get_market_comparison(
+            {'make': 'volkswagen', 'model': 'GOLF', 'year': '2017', 'condition': 'Fair'})
+
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['data']['market_value']['average'], 16000)
+        self.assertEqual(len(self.text_model.prompts), 1)
+        self.assertIn('Make: Volkswagen', self.text_model.prompts[0])
+        self.assertIn('Year: 2016-2017', self.text_model.prompts[0])
+
+    def test_local_tier_answers_without_queries(self):
+        vehicle = {'make': 'Toyota', 'model': 'Camry', 'year': '2018', 'condition': 'good'}
+        self.make_analyzer().get_market_comparison(vehicle)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(self.make_analyzer().get_market_comparison(vehicle)['cached'])
+        self.assertEqual(self.cache.stats()['local_hits'], 1)
+
+    def test_shared_tier_refills_local_tier(self):
+        vehicle = {'make': 'Toyota', 'model': 'Camry', 'year': '2018', 'condition': 'good'}
+        self.make_analyzer().get_market_comparison(vehicle)
+        self.cache.local.clear()
+
+        self.assertTrue(self.make_analyzer().get_market_comparison(vehicle)['cached'])
+        self.assertEqual(len(self.cache.local), 1)
+        self.assertEqual(len(self.text_model.prompts), 1)
+
+
+class MarketComparisonSingleFlightTestCase(SimpleTestCase):
+    def test_concurrent_misses_make_one_model_call(self):
+        text_model = FakeTextModel(latency=0.2)
+        analyzer = CarImageAnalyzer(
+            model=FakeVisionModel(), text_model=text_model,
+            result_cache=None, market_cache=LocalLRUCache(), gateway=AIGateway(), telemetry=None,
+        )
+        vehicle = {'make': 'Honda', 'model': 'Civic', 'year': '2015', 'condition': 'good'}
+        results = []
+
+        threads = [
+            threading.Thread(target=lambda: results.append(analyzer.get_market_comparison(vehicle)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(text_model.prompts), 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r['success'] for r in results))
+
+
+class ImagePreprocessingTestCase(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_photo(self, size=(1200, 800), orientation=None):
+        from PIL import Image
+
+        path = os.path.join(self.tmp.name, 'photo.jpg')
+        exif = Image.Exif()
+        exif[0x010F] = 'PhoneMaker'
+        if orientation:
+            exif[0x0112] = orientation
+        Image.new('RGB', size, color=(200, 30, 30)).save(path, 'JPEG', quality=95, exif=exif)
+        return path
+
+    def test_downscales_orients_and_strips_metadata(self):
+        from PIL import Image
+
+        path = self.write_photo(orientation=6)  # rotated 90 degrees
+        part = ImagePreprocessor(max_dimension=300, quality=80).prepare(path, 'file_path')
+
+        self.assertEqual(part['mime_type'], 'image/jpeg')
+        image = Image.open(io.BytesIO(part['data']))
+        self.assertEqual(image.size, (200, 300))
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertLess(len(part['data']), os.path.getsize(path))
+
+    def test_derivative_is_cached_next_to_original(self):
+        path = self.write_photo()
+        preprocessor = ImagePreprocessor(max_dimension=300, quality=80)
+
+        with mock.patch('loans.image_preprocessing.downscale_to_jpeg', wraps=downscale_to_jpeg) as downscale:
+            first = preprocessor.prepare(path, 'file_path')
+            second = preprocessor.prepare(path, 'file_path')
+            self.assertEqual(downscale.call_count, 1)
+            self.assertEqual(first, second)
+            self.assertTrue(os.path.exists(os.path.join(self.tmp.name, 'photo.ai300q80.jpg')))
+
+            # A replaced original invalidates the derivative
+            later = os.path.getmtime(preprocessor.derivative_path(path)) + 10
+            os.utime(path, (later, later))
+            preprocessor.prepare(path, 'file_path')
+            self.assertEqual(downscale.call_count, 2)
+
+    def test_analyzer_sends_preprocessed_image(self):
+        analyzer = CarImageAnalyzer(
+            model=FakeVisionModel(), result_cache=None, market_cache=None,
+            preprocessor=ImagePreprocessor(max_dimension=100), gateway=AIGateway(), telemetry=None,
+        )
+        result = analyzer.analyze_single_image(self.write_photo(), 'file_path')
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['data']['notes'], '100')
+
+
+class AIClientRegistryTestCase(SimpleTestCase):
+    def setUp(self):
+        ai_clients.reset()
+        self.addCleanup(ai_clients.reset)
+        self.genai = mock.Mock()
+        self.genai.GenerativeModel.side_effect = lambda name: mock.Mock(model_name=name)
+        patcher = mock.patch.object(ai_clients, 'get_genai', return_value=self.genai)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_models_are_created_once_and_shared_across_threads(self):
+        models = []
+        threads = [
+            threading.Thread(target=lambda: models.append(ai_clients.get_generative_model('gemini-test', 'key')))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len({id(model) for model in models}), 1)
+        self.assertEqual(self.genai.GenerativeModel.call_count, 1)
+        self.assertIsNot(ai_clients.get_generative_model('gemini-other', 'key'), models[0])
+
+    def test_services_are_reused(self):
+        self.assertIs(ai_clients.get_gemini_loan_analyzer(), ai_clients.get_gemini_loan_analyzer())
+
+
+class ApplicationListQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.client = APIClient()
+
+    def add_applications(self, count):
+        for _ in range(count):
+            application = create_application(user=self.user, status='query', is_draft=False)
+            for document_type in ('id', 'photo_front_car'):
+                LoanApplicationDocument.objects.create(
+                    application=application, document_type=document_type, title=document_type, file='loan_documents/x.jpg'
+                )
+            LoanApplicationNote.objects.create(application=application, author=self.admin, note='Older question')
+            LoanApplicationNote.objects.create(application=application, author=self.admin, note='Latest question')
+            LoanApplicationNote.objects.create(application=application, author=self.user, note='Reply')
+
+    def count_queries(self, url, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_applications(self):
+        for url, user in (
+            ('/api/loans/applications/my_applications/', self.user),
+            ('/api/loans/applications/?expand=document_summary,query_notes', self.admin),
+        ):
+            LoanApplication.objects.all().delete()
+            self.add_applications(2)
+            few, _ = self.count_queries(url, user)
+            self.add_applications(8)
+            many, response = self.count_queries(url, user)
+
+            self.assertEqual(few, many, url)
+
+        application = response.data['results'][0]
+        self.assertEqual(application['document_summary']['total_count'], 2)
+        self.assertEqual(application['query_notes']['note'], 'Latest question')
+
+
+class ApplicationFieldsetTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches['responses'].clear()
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.application = create_application(user=self.user, status='pending', is_draft=False, ai_analysis_data={'raw_response': 'x' * 1000})
+        self.client = APIClient()
+
+    def get(self, url, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, ' '.join(query['sql'] for query in queries)
+
+    def test_list_is_compact_by_default(self):
+        from .serializers import LOAN_APPLICATION_LIST_FIELDS
+
+        response, sql = self.get('/api/loans/applications/', self.admin)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), set(LOAN_APPLICATION_LIST_FIELDS))
+        self.assertEqual(response.data['results'][0]['full_name'], 'Jane Doe')
+        self.assertNotIn('ai_analysis_data', sql)
+        self.assertNotIn('loans_applicantaddress', sql)
+        self.assertNotIn('loans_loanapplicationdocument', sql)
+
+    def test_fields_and_expand(self):
+        response, sql = self.get('/api/loans/applications/?fields=status,amount', self.admin)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'status', 'amount'})
+        self.assertNotIn('loans_applicantpersonalinfo', sql)
+
+        response, _ = self.get('/api/loans/applications/?expand=documents,city', self.admin)
+        self.assertIn('documents', response.data['results'][0])
+        self.assertIn('city', response.data['results'][0])
+        self.assertIn('full_name', response.data['results'][0])
+
+    def test_frontend_expansions(self):
+        # The admin loans list and the customer profile expand the compact list
+        response, _ = self.get('/api/loans/applications/?page_size=100&expand=ai_analysis_data', self.admin)
+        self.assertEqual(response.data['results'][0]['ai_analysis_data'], {'raw_response': 'x' * 1000})
+
+        expand = ','.join([
+            'dob', 'social_security', 'banks_name', 'identification_no', 'street', 'city', 'state', 'zip_code',
+            'income_source', 'gross_monthly_income', 'employment_length', 'direct_deposit', 'credit_score',
+            'ai_risk_assessment', 'approved_at', 'applicant_estimated_value', 'vehicle_year', 'vehicle_make',
+            'vehicle_model', 'vehicle_vin', 'vehicle_mileage', 'registration_state', 'license_plate',
+        ])
+        response, _ = self.get(f'/api/loans/applications/?page_size=100&expand={expand}', self.user)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['results'][0]['first_name'], 'Jane')
+        self.assertEqual(response.data['results'][0]['street'], '1 Main St')
+        self.assertIn('income_source', response.data['results'][0])
+
+    def test_retrieve_and_my_applications(self):
+        url = f'/api/loans/applications/{self.application.pk}/'
+        full, _ = self.get(url, self.user)
+        self.assertIn('ai_analysis_data', full.data)
+
+        sparse, sql = self.get(f'{url}?fields=city,vehicle_valuation', self.user)
+        self.assertEqual(set(sparse.data), {'id', 'city', 'vehicle_valuation'})
+        self.assertNotIn('ai_analysis_data', sql)
+        self.assertNotEqual(sparse['ETag'], full['ETag'])
+
+        # Cached per field selection
+        mine, _ = self.get('/api/loans/applications/my_applications/', self.user)
+        self.assertIn('ai_analysis_data', mine.data['applications'][0])
+        mine, _ = self.get('/api/loans/applications/my_applications/?fields=status', self.user)
+        self.assertEqual(mine.data['applications'], [{'id': self.application.pk, 'status': 'pending'}])
+
+    def test_unknown_field_is_rejected(self):
+        response, _ = self.get('/api/loans/applications/?fields=status,password', self.admin)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', str(response.data))
+
+
+class UserDashboardStatisticsTestCase(TestCase):
+    url = '/api/loans/applications/dashboard_statistics/'
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response.data
+
+    def test_constant_queries_and_cached(self):
+        def approved():
+            create_application(user=self.user, amount=2000, status='approved', is_draft=False, approved_amount=1800, term=12)
+
+        create_application(user=self.user, status='pending', is_draft=False)
+        approved()
+        few, _ = self.get()
+        for _ in range(8):
+            approved()
+        create_application(user=self.user)
+        many, data = self.get()
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, 6)
+        metrics = data['metrics']
+        self.assertEqual(
+            {key: metrics[key] for key in ('total_applications', 'draft_count', 'pending_count', 'approved_count')},
+            {'total_applications': 10, 'draft_count': 1, 'pending_count': 1, 'approved_count': 9},
+        )
+        self.assertEqual(metrics['total_borrowed'], 16200.0)
+        self.assertEqual(metrics['total_requested'], 23000.0)
+        self.assertEqual(metrics['monthly_payment'], 150.0)
+        self.assertEqual(len(data['recent_activity']), 5)
+
+        # Only the version query
+        cached, cached_data = self.get()
+        self.assertEqual(cached, 1)
+        self.assertEqual(cached_data, data)
+
+    def test_refreshed_by_status_change_and_association(self):
+        application = create_application(user=self.user, status='pending', is_draft=False)
+        self.assertEqual(self.get()[1]['metrics']['pending_count'], 1)
+
+        application.status = 'approved'
+        application.save(update_fields=['status'])
+        # A guest application with the user's email is associated on the next miss
+        create_application(status='rejected', is_draft=False)
+        data = self.get()[1]
+        self.assertEqual(data['metrics']['pending_count'], 0)
+        self.assertEqual(data['metrics']['approved_count'], 1)
+        self.assertEqual(data['metrics']['rejected_count'], 1)
+
+        # Entries are keyed on the applications' version rather than dropped in
+        # this process, so a write from another worker (here without signals) is seen
+        from django.db.models import F
+
+        LoanApplication.objects.filter(pk=application.pk).update(status='query', cache_version=F('cache_version') + 1)
+        self.assertEqual(self.get()[1]['metrics']['query_count'], 1)
+
+
+class ApplicationResponseCacheTestCase(TestCase):
+    def setUp(self):
+        from loans import response_cache
+
+        response_cache.get_cache().clear()
+        self.addCleanup(response_cache.get_cache().clear)
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.applications = [create_application(user=self.user, status='pending', is_draft=False) for _ in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, etag=None):
+        """Response and the number of applications serialized for it"""
+        from .serializers import LoanApplicationSerializer
+
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        to_representation = LoanApplicationSerializer.to_representation
+        with mock.patch.object(
+            LoanApplicationSerializer, 'to_representation', autospec=True, side_effect=to_representation,
+        ) as serialized:
+            response = self.client.get(url, **headers)
+        return response, serialized.call_count
+
+    def test_retrieve_etag_and_not_modified(self):
+        url = f'/api/loans/applications/{self.applications[0].pk}/'
+        response, serialized = self.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(serialized, 1)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        response, serialized = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(serialized, 0)
+
+        # A related row write makes a new version
+        LoanApplicationNote.objects.create(application=self.applications[0], author=self.admin, note='Question')
+        response, serialized = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(serialized, 1)
+
+    def test_my_applications_serializes_only_changed(self):
+        url = '/api/loans/applications/my_applications/'
+        first, serialized = self.get(url)
+        self.assertEqual(serialized, 3)
+        self.assertEqual(first.data['summary']['pending'], 3)
+
+        # No If-None-Match: served from the cached serializations
+        response, serialized = self.get(url)
+        self.assertEqual(serialized, 0)
+        self.assertEqual(response.data, first.data)
+        self.assertEqual(self.get(url, first['ETag'])[0].status_code, status.HTTP_304_NOT_MODIFIED)
+
+        application = self.applications[1]
+        application.status = 'approved'
+        application.save()
+        response, serialized = self.get(url, first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(serialized, 1)
+        self.assertEqual(response.data['summary']['approved'], 1)
+        self.assertEqual(
+            [item['status'] for item in response.data['applications'] if item['id'] == application.pk],
+            ['approved'],
+        )
+
+    def test_documents_etag_follows_uploads(self):
+        application = self.applications[0]
+        url = f'/api/loans/applications/{application.pk}/documents/'
+        response = self.client.get(url)
+        self.assertEqual(response.data['total_count'], 0)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        from django.core.files.base import ContentFile
+
+        document = LoanApplicationDocument(application=application, document_type='id', title='ID')
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            document.file.save('id.jpg', ContentFile(b'jpeg'))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_count'], 1)
+
+
+class ApplicationPaginationTestCase(TestCase):
+    def setUp(self):
+        from loans import response_cache
+
+        response_cache.get_cache().clear()
+        self.addCleanup(response_cache.get_cache().clear)
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.applications = [create_application(user=self.user, status='pending', is_draft=False) for _ in range(7)]
+        # Ties on created_at are broken by id
+        same_time = timezone.now() - timedelta(days=1)
+        LoanApplication.objects.filter(pk__in=[app.pk for app in self.applications[2:5]]).update(created_at=same_time)
+        self.expected = list(LoanApplication.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.client = APIClient()
+
+    def walk(self, url, user, key):
+        """Follow `next` links; returns the ids of every page and the query count of each page"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user)
+        pages, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in response.data[key]])
+            queries.append(len(captured))
+            url = response.data['next']
+        return pages, queries
+
+    def test_admin_list_walks_every_row_once(self):
+        pages, queries = self.walk('/api/loans/applications/?page_size=3', self.admin, 'results')
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.expected)
+        # Deep pages cost the same as the first
+        self.assertEqual(len(set(queries)), 1)
+
+    def test_my_applications_pages_with_full_summary(self):
+        pages, _ = self.walk('/api/loans/applications/my_applications/?page_size=4', self.user, 'applications')
+
+        self.assertEqual(sum(pages, []), self.expected)
+        response = self.client.get('/api/loans/applications/my_applications/?page_size=4')
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(response.data['summary']['pending'], 7)
+
+    @override_settings(LOAN_APPLICATION_MAX_PAGE_SIZE=2)
+    def test_page_size_limit_and_invalid_cursor(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/loans/applications/?page_size=50')
+        self.assertEqual(len(response.data['results']), 2)
+
+        response = self.client.get('/api/loans/applications/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(LOAN_MAX_LIMIT=10000, LOAN_MAX_LTV_RATIO=0.5)
+class BulkDecisionTestCase(TestCase):
+    url = '/api/loans/applications/bulk_decision/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def pending(self, count, **overrides):
+        return [
+            create_application(user=self.user, status='pending', is_draft=False, applicant_estimated_value=12000, **overrides)
+            for _ in range(count)
+        ]
+
+    def post(self, decisions):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'decisions': decisions}, format='json')
+        return response, len(queries)
+
+    def test_decisions_are_applied_and_reported_per_item(self):
+        from django.core import mail
+        from admin_app import rollups
+
+        approve, over_limit, reject = self.pending(3)
+        draft = create_application(user=self.user)
+        response, _ = self.post([
+            {'id': approve.pk, 'decision': 'approve', 'approved_amount': '6000.00', 'notes': 'Welcome'},
+            {'id': over_limit.pk, 'decision': 'approve', 'approved_amount': '6000.01'},
+            {'id': reject.pk, 'decision': 'reject', 'notes': 'Income could not be verified'},
+            {'id': draft.pk, 'decision': 'reject'},
+            {'id': 999999, 'decision': 'reject'},
+            {'id': approve.pk, 'decision': 'reject'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['summary'], {'approved': 1, 'rejected': 1, 'failed': 4})
+        results = response.data['results']
+        self.assertEqual([result['success'] for result in results], [True, False, True, False, False, False])
+        self.assertEqual(results[1]['policy']['max_eligible'], 6000.0)
+        self.assertEqual(results[3]['error'], 'Draft applications cannot be rejected.')
+
+        approve.refresh_from_db()
+        over_limit.refresh_from_db()
+        reject.refresh_from_db()
+        self.assertEqual((approve.status, float(approve.approved_amount), approve.approved_by), ('approved', 6000.0, self.admin))
+        self.assertEqual(over_limit.status, 'pending')
+        self.assertEqual(reject.status, 'rejected')
+        self.assertEqual(reject.notes.get().note, 'Income could not be verified')
+        self.assertEqual(self.user.notifications.count(), 2)
+
+        # Emails are queued for the worker, not sent in the request
+        self.assertEqual(mail.outbox, [])
+        jobs = AIJob.objects.filter(job_type='send_email')
+        self.assertEqual(jobs.count(), 2)
+        for job in jobs:
+            ai_jobs.run_job(ai_jobs.claim_job(job.pk, 'worker-a'), 'worker-a')
+        self.assertEqual(sorted(message.subject for message in mail.outbox), [
+            'Loan Application Approved - DriveCash', 'Loan Application Update - DriveCash',
+        ])
+        self.assertEqual(rollups.diff(), [])
+
+    def test_query_count_does_not_grow_with_decisions(self):
+        def decide(applications):
+            return self.post([
+                {'id': application.pk, 'decision': 'approve' if i % 2 else 'reject', 'approved_amount': '1000', 'notes': 'n'}
+                for i, application in enumerate(applications)
+            ])
+
+        # The first decisions of the day create its rollup rows
+        decide(self.pending(2))
+        _, few = decide(self.pending(2))
+        response, many = decide(self.pending(10))
+
+        self.assertEqual(response.data['summary']['failed'], 0)
+        # One conditional UPDATE per decision, the rest in bulk
+        self.assertEqual(many - few, 8)
+
+    def test_requires_admin_and_amount(self):
+        application, = self.pending(1)
+        response, _ = self.post([{'id': application.pk, 'decision': 'approve'}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(self.user)
+        response, _ = self.post([{'id': application.pk, 'decision': 'reject'}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        application.refresh_from_db()
+        self.assertEqual(application.status, 'pending')
+
+
+@override_settings(
+    AI_MODEL_BACKEND='replay', AI_REPLAY_LATENCY_MEDIAN=0, AI_REPLAY_LATENCY_P95=0,
+    AI_REPLAY_LATENCY_PER_IMAGE=0, AI_REPLAY_ERROR_RATE=0,
+)
+class ReplayBackendTestCase(SimpleTestCase):
+    def setUp(self):
+        ai_clients.reset()
+        self.addCleanup(ai_clients.reset)
+
+    def write_photos(self, count):
+        from PIL import Image
+
+        directory = tempfile.mkdtemp()
+        paths = []
+        for i in range(count):
+            path = os.path.join(directory, f'{i}.jpg')
+            Image.new('RGB', (64, 48), color=(i * 40, 0, 0)).save(path, 'JPEG')
+            paths.append((path, 'file_path'))
+        return paths
+
+    def test_valuation_runs_offline_from_recorded_responses(self):
+        with mock.patch.dict(os.environ, {'GEMINI_API_KEY': ''}):
+            analyzer = CarImageAnalyzer(result_cache=None, market_cache=None, preprocessor=None, gateway=AIGateway(), telemetry=None)
+        self.assertIsInstance(analyzer.model, ai_backends.ReplayModel)
+
+        report = CarValuationService(analyzer=analyzer).evaluate_for_loan(self.write_photos(2), loan_amount=5000)
+
+        self.assertTrue(report['approved'])
+        self.assertEqual(report['valuation']['estimated_value'], 16200)
+        self.assertEqual(analyzer.model.stats()['by_kind'], {'image_analysis': 2, 'market_comparison': 1})
+
+    def test_loan_analysis_replays_fixtures_round_robin(self):
+        analyzer = GeminiLoanAnalyzer(gateway=AIGateway(), telemetry=None)
+        prompt = 'Respond with {"approval_suggestion": ...}'
+        fixtures = ai_backends.load_fixtures(ai_backends.DEFAULT_FIXTURES_DIR, 'loan_analysis')
+
+        suggestions = [
+            analyzer._parse_ai_response(analyzer.model.generate_content(prompt).text)['approval_suggestion']
+            for _ in range(len(fixtures) + 1)
+        ]
+
+        self.assertEqual(suggestions, ['approve', 'conditional', 'review', 'approve'])
+
+    def test_simulated_errors_and_timeouts_are_retryable(self):
+        from .ai_gateway import is_retryable
+
+        failing = ai_backends.ReplayModel(
+            'test', latency=ai_backends.LatencyProfile(0, 0, 0), error_rate=1, seed=3
+        )
+        for _ in range(4):
+            with self.assertRaises(Exception) as raised:
+                failing.generate_content('market')
+            self.assertTrue(is_retryable(raised.exception))
+
+        slow = ai_backends.ReplayModel('test', latency=ai_backends.LatencyProfile(5, 5, 0))
+        started = time.monotonic()
+        with self.assertRaises(Exception) as raised:
+            slow.generate_content('market', request_options={'timeout': 0.05})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(is_retryable(raised.exception))
+        self.assertEqual(slow.stats()['timeouts'], 1)
+
+    def test_latency_profile_matches_median_and_p95(self):
+        import random
+
+        profile = ai_backends.LatencyProfile(median=1.0, p95=3.0, per_image=0.5)
+        rng = random.Random(7)
+        samples = sorted(profile.sample(rng) for _ in range(4000))
+
+        self.assertAlmostEqual(samples[2000], 1.0, delta=0.1)
+        self.assertAlmostEqual(samples[3800], 3.0, delta=0.4)
+        self.assertEqual(ai_backends.LatencyProfile(2, 2, 0.5).sample(rng, images=2), 3.0)
+
+    def test_recorded_responses_can_be_replayed(self):
+        directory = tempfile.mkdtemp()
+        real_model = FakeTextModel()
+        recorder = ai_backends.RecordingModel(real_model, directory)
+
+        recorded = recorder.generate_content('Market data for a Toyota Camry')
+        replayed = ai_backends.ReplayModel('test', fixtures_dir=directory, latency=ai_backends.LatencyProfile(0, 0, 0))
+
+        self.assertEqual(replayed.generate_content('Market data for a Honda Civic').text, recorded.text)
+
+
+class AICallTelemetryTestCase(TestCase):
+    def setUp(self):
+        self.buffer = ai_telemetry.CallLogBuffer(batch_size=100, flush_interval=60)
+
+    def make_analyzer(self, model=None):
+        return CarImageAnalyzer(
+            model=model or FakeVisionModel(), result_cache=ResultCache('test_telemetry'),
+            gateway=AIGateway(), telemetry=self.buffer,
+        )
+
+    def test_calls_and_cache_hits_are_buffered_then_written_in_one_batch(self):
+        analyzer = self.make_analyzer()
+        image = make_image_base64(40)
+
+        analyzer.analyze_single_image(image, 'base64')
+        analyzer.analyze_single_image(image, 'base64')
+
+        self.assertEqual(AICallLog.objects.count(), 0)
+        self.assertEqual(self.buffer.pending(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 2)
+
+        call, hit = AICallLog.objects.order_by('cache_hit')
+        self.assertEqual((call.call_type, call.outcome, call.cache_hit, call.image_count), ('image_analysis', 'success', False, 1))
+        self.assertGreater(call.request_bytes, len(base64.b64decode(image)))
+        self.assertGreater(call.latency_ms, 0)
+        self.assertTrue(hit.cache_hit)
+        self.assertEqual(hit.request_bytes, 0)
+
+    def test_full_batch_is_written_immediately(self):
+        self.buffer.batch_size = 2
+        analyzer = self.make_analyzer()
+
+        analyzer.analyze_single_image(make_image_base64(40), 'base64')
+        self.assertEqual(AICallLog.objects.count(), 0)
+        analyzer.analyze_single_image(make_image_base64(50), 'base64')
+
+        self.assertEqual(AICallLog.objects.count(), 2)
+        self.assertEqual(self.buffer.pending(), 0)
+
+    @override_settings(AI_PRICE_INPUT_PER_MILLION=0.10, AI_PRICE_OUTPUT_PER_MILLION=0.40)
+    def test_tokens_cost_and_failure_outcomes(self):
+        response = ai_backends.ReplayResponse('{}', prompt_tokens=1000, response_tokens=500)
+        with ai_telemetry.track(self.buffer, 'loan_analysis', 'gemini-test', 'prompt') as call:
+            call.set_response(response)
+        with self.assertRaises(RateLimitExceeded):
+            with ai_telemetry.track(self.buffer, 'loan_analysis', 'gemini-test', 'prompt'):
+                raise RateLimitExceeded('no tokens')
+        self.buffer.flush()
+
+        success, limited = AICallLog.objects.order_by('id')
+        self.assertEqual((success.prompt_tokens, success.response_tokens), (1000, 500))
+        self.assertEqual(str(success.cost_usd), '0.00030000')
+        self.assertEqual(limited.outcome, 'rate_limited')
+        self.assertIsNone(limited.prompt_tokens)
+        self.assertIn('no tokens', limited.error)
+
+    def test_calls_on_pool_threads_are_attributed_to_the_application(self):
+        application = create_application()
+        analyzer = CarImageAnalyzer(model=FakeVisionModel(), result_cache=None, gateway=AIGateway(), telemetry=self.buffer)
+        images = [(make_image_base64(width), 'base64') for width in (40, 50, 60)]
+
+        with ai_telemetry.for_application(application):
+            analyzer.analyze_multiple_images(images, max_concurrency=3)
+        self.buffer.flush()
+
+        self.assertEqual(
+            list(AICallLog.objects.values_list('application_id', 'outcome')),
+            [(application.application_id, 'success')] * 3,
+        )
+
+    def test_admin_statistics_report_percentiles_and_daily_cost(self):
+        now = timezone.now()
+        AICallLog.objects.bulk_create([
+            AICallLog(call_type='image_analysis', started_at=now, latency_ms=ms, outcome='success', cost_usd='0.001')
+            for ms in range(1, 101)
+        ] + [
+            AICallLog(call_type='image_analysis', started_at=now, latency_ms=0.5, outcome='success', cache_hit=True),
+            AICallLog(call_type='loan_analysis', started_at=now - timedelta(days=1), latency_ms=900, outcome='timeout'),
+            AICallLog(call_type='loan_analysis', started_at=now - timedelta(days=30), latency_ms=900, outcome='success'),
+        ])
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        stats = client.get('/api/admin/ai/calls/statistics/').data
+
+        images = stats['callTypes']['image_analysis']
+        self.assertEqual(images['latencyMs'], {'p50': 50, 'p95': 95, 'p99': 99})
+        self.assertEqual((images['calls'], images['modelCalls'], images['cacheHits']), (101, 100, 1))
+        self.assertAlmostEqual(images['costUsd'], 0.1)
+        self.assertEqual(stats['callTypes']['loan_analysis']['byOutcome'], {'timeout': 1})
+        self.assertEqual([(row['callType'], row['calls']) for row in stats['daily']], [('loan_analysis', 1), ('image_analysis', 101)])
+
+        user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        client.force_authenticate(user)
+        self.assertEqual(client.get('/api/admin/ai/calls/statistics/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FlakyCall:
+    """Callable that raises the queued errors in order, then returns 'ok'"""
+
+    def __init__(self, *errors, latency=0):
+        self.errors = list(errors)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            raise error
+        return 'ok'
+
+
+@override_settings(
+    AI_MODEL_BACKEND='replay', AI_REPLAY_LATENCY_MEDIAN=0, AI_REPLAY_LATENCY_P95=0,
+    AI_GATEWAY_ENABLED=False, AI_TELEMETRY_ENABLED=False,
+)
+class RescoreApplicationsTestCase(TransactionTestCase):
+    # Scoring runs on pool threads, which only see committed rows
+    def setUp(self):
+        ai_clients.reset()
+        self.addCleanup(ai_clients.reset)
+        # The process-wide gateway may have been built by an earlier test with the
+        # breaker enabled; its writes from pool threads lock the test database
+        gateway = mock.patch('loans.ai_gateway._gateway', None)
+        gateway.start()
+        self.addCleanup(gateway.stop)
+        self.checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+        self.applications = [
+            create_application(is_draft=False, status='pending', submitted_at=timezone.now())
+            for _ in range(3)
+        ]
+
+    def rescore(self, *args):
+        # One batch, written after every thread is done: the shared-cache in-memory
+        # test database reports 'table is locked' for a write racing a thread's read
+        out = io.StringIO()
+        call_command(
+            'rescore_applications', '--skip-vehicle', '--concurrency', '2', '--batch-size', '50',
+            '--checkpoint', self.checkpoint, *args, stdout=out, stderr=io.StringIO(),
+        )
+        return out.getvalue()
+
+    def read_checkpoint(self):
+        with open(self.checkpoint, encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_rescores_in_batches_and_checkpoints(self):
+        create_application(is_draft=True)
+
+        output = self.rescore()
+
+        self.assertIn('3 rescored', output)
+        for application in self.applications:
+            application.refresh_from_db()
+            self.assertIn(application.ai_approval_suggestion, ('approve', 'conditional', 'review'))
+            self.assertTrue(application.ai_analysis_fingerprint)
+        self.assertEqual(self.read_checkpoint()['last_pk'], self.applications[-1].pk)
+        self.assertIn('0 applications to rescore', self.rescore())
+
+    def test_resumes_after_checkpoint(self):
+        first = self.applications[0]
+        with open(self.checkpoint, 'w', encoding='utf-8') as f:
+            json.dump({
+                'filters': {'status': [], 'submitted_after': None, 'submitted_before': None,
+                            'skip_vehicle': True, 'force': False},
+                'last_pk': first.pk, 'processed': 1, 'failed_ids': [],
+            }, f)
+
+        self.assertIn('2 rescored', self.rescore())
+
+        first.refresh_from_db()
+        self.assertIsNone(first.ai_analysis_data)
+        # A checkpoint only resumes the run it was written for
+        with self.assertRaises(CommandError):
+            self.rescore('--force')
+
+    def test_failed_applications_are_retried_on_next_run(self):
+        from . import ai_pipeline
+
+        failing = self.applications[1]
+        rescore_application = ai_pipeline.rescore_application
+
+        def flaky(application, **kwargs):
+            if application.pk == failing.pk:
+                raise RuntimeError('model unavailable')
+            return rescore_application(application, **kwargs)
+
+        with mock.patch('loans.ai_pipeline.rescore_application', side_effect=flaky):
+            self.assertIn('1 failed', self.rescore())
+        self.assertEqual(self.read_checkpoint()['failed_ids'], [failing.pk])
+
+        output = self.rescore()
+
+        self.assertIn('1 applications to rescore', output)
+        self.assertEqual(self.read_checkpoint()['failed_ids'], [])
+        failing.refresh_from_db()
+        self.assertTrue(failing.ai_analysis_fingerprint)
+
+
+class AIGatewayTestCase(TestCase):
+    def make_breaker(self, threshold=2):
+        return CircuitBreaker('test', failure_threshold=threshold, reset_timeout=60)
+
+    def test_token_bucket_allows_burst_then_waits_or_rejects(self):
+        bucket = TokenBucket('test', rate_per_second=10, capacity=2, max_wait=0.05)
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        with self.assertRaises(RateLimitExceeded):
+            bucket.reserve()
+        self.assertAlmostEqual(bucket.reserve(max_wait=1), 0.1, delta=0.02)
+
+        stats = bucket.stats()
+        self.assertEqual((stats['acquired'], stats['waits'], stats['rejected']), (3, 1, 1))
+
+    def test_breaker_opens_and_fails_fast(self):
+        gateway = AIGateway(breaker=self.make_breaker())
+        call = FlakyCall(TimeoutError('slow'), TimeoutError('slow'))
+
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                gateway.call(call)
+        with self.assertRaises(CircuitOpenError):
+            gateway.call(call)
+
+        self.assertEqual(call.calls, 2)
+        self.assertEqual(gateway.stats()['breaker']['state'], 'open')
+
+    def test_half_open_trial_closes_breaker(self):
+        breaker = self.make_breaker()
+        gateway = AIGateway(breaker=breaker)
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                gateway.call(FlakyCall(TimeoutError('slow')))
+        AICircuitBreaker.objects.filter(name='test').update(opened_at=time.time() - 61)
+
+        self.assertEqual(gateway.call(FlakyCall()), 'ok')
+        state = AICircuitBreaker.objects.get(name='test')
+        self.assertEqual((state.state, state.consecutive_failures, state.times_opened), ('closed', 0, 1))
+
+    def test_client_errors_do_not_trip_breaker_or_retry(self):
+        gateway = AIGateway(breaker=self.make_breaker(threshold=1), max_retries=2)
+        call = FlakyCall(ValueError('bad request'))
+
+        with self.assertRaises(ValueError):
+            gateway.call(call)
+
+        self.assertEqual(call.calls, 1)
+        self.assertEqual(AICircuitBreaker.objects.get(name='test').state, 'closed')
+
+    def test_transient_errors_are_retried(self):
+        gateway = AIGateway(max_retries=2, retry_base=0.01)
+        call = FlakyCall(TimeoutError('slow'), ConnectionError('reset'))
+
+        self.assertEqual(gateway.call(call), 'ok')
+        self.assertEqual(call.calls, 3)
+        self.assertEqual(gateway.stats()['retries'], 2)
+
+    def test_slow_call_is_hedged(self):
+        gateway = AIGateway(hedge_after=0.05)
+        call = FlakyCall(latency=0.5)
+        started = time.monotonic()
+        # Only the first request is slow
+        slow_then_fast = lambda: call() if call.calls == 0 else 'ok'
+
+        self.assertEqual(gateway.call(slow_then_fast), 'ok')
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(gateway.stats()['hedge_wins'], 1)
+
+    def test_async_hedge_cancels_the_slower_request(self):
+        gateway = AIGateway(hedge_after=0.05)
+        started = []
+        cancelled = []
+
+        async def request():
+            started.append(time.monotonic())
+            try:
+                await asyncio.sleep(0.5 if len(started) == 1 else 0)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return len(started)
+
+        self.assertEqual(asyncio.run(gateway.call_async(request)), 2)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(gateway.stats()['hedge_wins'], 1)
+
+    def test_loan_analysis_falls_back_while_breaker_is_open(self):
+        AICircuitBreaker.objects.create(name='test', state='open', opened_at=time.time())
+        analyzer = GeminiLoanAnalyzer(api_key='test', gateway=AIGateway(breaker=self.make_breaker()))
+        analyzer.model = mock.Mock()
+
+        result = analyzer.analyze_loan_application(create_application())
+
+        self.assertEqual(result['approval_suggestion'], 'review')
+        self.assertIn('circuit open', result['error'])
+        analyzer.model.generate_content.assert_not_called()
+
+
+class CombinedVisionModeTestCase(TestCase):
+    def setUp(self):
+        self.model = FakeCombinedModel()
+        self.text_model = FakeTextModel()
+        self.images = [(make_image_base64(width), 'base64') for width in (40, 50, 60)]
+
+    def make_analyzer(self, model=None):
+        return CarImageAnalyzer(
+            model=model or self.model, text_model=self.text_model,
+            result_cache=ResultCache('test_combined'), market_cache=None, gateway=AIGateway(),
+        )
+
+    def test_all_photos_and_market_in_one_request(self):
+        result = self.make_analyzer().analyze_vehicle_combined(self.images)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(self.model.photos_per_call, [3])
+        self.assertEqual(result['data']['images_analyzed'], 3)
+        self.assertEqual(result['data']['condition'], 'fair')
+        self.assertEqual(result['market']['data']['market_value']['average'], 16000)
+
+        again = self.make_analyzer().analyze_vehicle_combined(self.images)
+        self.assertTrue(again['cached'])
+        self.assertEqual(len(self.model.photos_per_call), 1)
+
+    def test_valuation_service_uses_combined_mode(self):
+        service = CarValuationService(analyzer=self.make_analyzer(), vision_mode='combined')
+
+        report = service.evaluate_for_loan(self.images, loan_amount=5000)
+
+        self.assertEqual(report['vision_mode'], 'combined')
+        self.assertEqual(report['valuation']['estimated_value'], 16000)
+        self.assertEqual(self.text_model.prompts, [])
+
+    def test_missing_market_block_falls_back_to_market_request(self):
+        analyzer = self.make_analyzer(FakeCombinedModel(include_market=False))
+        service = CarValuationService(analyzer=analyzer, vision_mode='combined')
+
+        report = service.evaluate_for_loan(self.images, loan_amount=5000)
+
+        self.assertEqual(len(self.text_model.prompts), 1)
+        self.assertEqual(report['market_data']['market_value']['average'], 16000)
+
+    def test_unknown_mode_is_rejected(self):
+        with self.assertRaises(ValueError):
+            CarValuationService(analyzer=self.make_analyzer(), vision_mode='batch')
+
+
+class AsyncAnalysisTestCase(SimpleTestCase):
+    def make_analyzer(self, model=None, text_model=None):
+        return CarImageAnalyzer(
+            model=model or FakeVisionModel(), text_model=text_model or FakeTextModel(),
+            result_cache=None, market_cache=LocalLRUCache(), gateway=AIGateway(), telemetry=None,
+        )
+
+    def test_images_are_analyzed_concurrently_in_order(self):
+        images = [(make_image_base64(width), 'base64') for width in (40, 50, 60, 70)]
+        analyzer = self.make_analyzer(FakeVisionModel(latency=0.2, fail_widths={50}))
+
+        started = time.monotonic()
+        result = asyncio.run(analyzer.analyze_multiple_images_async(images, max_concurrency=4))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(result['data']['images_analyzed'], 3)
+        self.assertEqual(result['failed_results'][0]['image_index'], 1)
+        self.assertEqual([r['data']['notes'] for r in result['individual_results']], ['40', '60', '70'])
+
+    @override_settings(GEMINI_IMAGE_TIMEOUT=0.1)
+    def test_slow_image_times_out(self):
+        analyzer = self.make_analyzer(FakeVisionModel(latency=1.0))
+
+        result = asyncio.run(analyzer.analyze_single_image_async(make_image_base64(40)))
+
+        self.assertFalse(result['success'])
+        self.assertIn('timed out', result['error'])
+
+    def test_cancelling_evaluation_cancels_model_calls(self):
+        model = FakeVisionModel(latency=1.0)
+        service = CarValuationService(analyzer=self.make_analyzer(model), vision_mode='per_image')
+        images = [(make_image_base64(width), 'base64') for width in (40, 50)]
+
+        async def evaluate_with_deadline():
+            async with asyncio.timeout(0.1):
+                await service.evaluate_for_loan_async(images, loan_amount=5000)
+
+        with self.assertRaises(TimeoutError):
+            asyncio.run(evaluate_with_deadline())
+        self.assertEqual(model.cancelled, 2)
+
+    def test_evaluate_for_loan_async(self):
+        text_model = FakeTextModel()
+        service = CarValuationService(analyzer=self.make_analyzer(text_model=text_model), vision_mode='per_image')
+        images = [(make_image_base64(width), 'base64') for width in (40, 50)]
+
+        report = asyncio.run(service.evaluate_for_loan_async(images, loan_amount=5000))
+
+        self.assertEqual(report['valuation']['estimated_value'], 16000)
+        self.assertEqual(len(text_model.prompts), 1)
+
+
+class AsyncLoanAnalysisTestCase(TestCase):
+    def setUp(self):
+        self.application = create_application()
+        self.analyzer = GeminiLoanAnalyzer(api_key='test', gateway=AIGateway())
+        self.analyzer.model = mock.Mock()
+        # Built up front: the async path would read it on another thread's connection
+        self.data = self.analyzer._prepare_application_data(self.application)
+
+    def test_async_analysis(self):
+        async def generate(prompt, request_options=None):
+            return mock.Mock(text=json.dumps({'approval_suggestion': 'approve', 'risk_assessment': 'low'}))
+        self.analyzer.model.generate_content_async = generate
+
+        result = asyncio.run(self.analyzer.analyze_loan_application_async(self.application, self.data))
+
+        self.assertEqual(result['approval_suggestion'], 'approve')
+        self.assertTrue(result['loan_limit_check']['within_limits'])
+        self.analyzer.model.generate_content.assert_not_called()
+
+    def test_async_analysis_timeout_returns_fallback(self):
+        async def generate(prompt, request_options=None):
+            await asyncio.sleep(1)
+        self.analyzer.model.generate_content_async = generate
+        self.analyzer.timeout = 0.05
+
+        result = asyncio.run(self.analyzer.analyze_loan_application_async(self.application, self.data))
+
+        self.assertEqual(result['approval_suggestion'], 'review')
+        self.assertIn('Timed out', result['error'])
@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import LoanApplicationViewSet, LoanApplicationDocumentViewSet
+from .views import LoanApplicationViewSet, LoanApplicationDocumentViewSet, AIJobViewSet
 
 router = DefaultRouter()
 router.register(r'applications', LoanApplicationViewSet, basename='loan-application')
 router.register(r'documents', LoanApplicationDocumentViewSet, basename='loan-document')
+router.register(r'ai-jobs', AIJobViewSet, basename='ai-job')
 
 # Get the submit view from the viewset
 submit_view = LoanApplicationViewSet.as_view({
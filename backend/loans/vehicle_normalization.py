@@ -0,0 +1,120 @@
+"""
+Normalization of vehicle descriptions produced by the vision model.
+
+The model describes the same car in many ways ("Chevy", "chevrolet",
+"2017-2019", "F-150" vs "F150"). Normalizing before building prompts and
+cache keys lets applicants with the same vehicle share one market lookup.
+"""
+
+import re
+
+from django.conf import settings
+
+
+# Alias (case-folded, punctuation collapsed to spaces) -> canonical make
+MAKE_ALIASES = {
+    'chevy': 'Chevrolet',
+    'chev': 'Chevrolet',
+    'vw': 'Volkswagen',
+    'volkswagon': 'Volkswagen',
+    'mercedes': 'Mercedes-Benz',
+    'mercedes benz': 'Mercedes-Benz',
+    'benz': 'Mercedes-Benz',
+    'mb': 'Mercedes-Benz',
+    'bmw': 'BMW',
+    'gmc': 'GMC',
+    'alfa': 'Alfa Romeo',
+    'landrover': 'Land Rover',
+    'range rover': 'Land Rover',
+    'mini cooper': 'MINI',
+    'mini': 'MINI',
+    'infinity': 'Infiniti',
+    'hyundai motor': 'Hyundai',
+    'toyota motor': 'Toyota',
+    'ford motor': 'Ford',
+    'dodge ram': 'Ram',
+}
+
+CONDITIONS = ('excellent', 'good', 'fair', 'poor')
+
+UNKNOWN_VALUES = {'', 'unknown', 'n/a', 'na', 'none', 'null', 'unidentified', 'not visible'}
+
+_YEAR_RE = re.compile(r'\b(19[5-9]\d|20\d\d)\b')
+
+
+def _clean(value):
+    """Case-fold and collapse punctuation/whitespace to single spaces"""
+    text = str(value or '').casefold()
+    text = re.sub(r'[^\w]+', ' ', text)
+    return ' '.join(text.split())
+
+
+def normalize_make(make):
+    cleaned = _clean(make)
+    if cleaned in UNKNOWN_VALUES:
+        return None
+    if cleaned in MAKE_ALIASES:
+        return MAKE_ALIASES[cleaned]
+    return cleaned.title()
+
+
+def normalize_model(model):
+    """
+    Returns:
+        tuple: (key, display) - key ignores punctuation and spacing
+        ("F-150" and "f150" -> "f150"); display keeps a readable form
+    """
+    cleaned = _clean(model)
+    if cleaned in UNKNOWN_VALUES:
+        return None, None
+    return cleaned.replace(' ', ''), ' '.join(str(model).split())
+
+
+def bucket_year(year, bucket_size=None):
+    """
+    Map a year or year range ("2018", "2017-2019", "circa 2016") onto a
+    fixed bucket such as "2018-2019". Returns None when no year is found.
+    """
+    bucket_size = bucket_size or getattr(settings, 'VEHICLE_YEAR_BUCKET_SIZE', 2)
+    years = [int(y) for y in _YEAR_RE.findall(str(year or ''))]
+    if not years:
+        return None
+    midpoint = (min(years) + max(years)) // 2
+    if bucket_size <= 1:
+        return str(midpoint)
+    start = midpoint - (midpoint % bucket_size)
+    return f"{start}-{start + bucket_size - 1}"
+
+
+def normalize_condition(condition):
+    cleaned = _clean(condition)
+    return cleaned if cleaned in CONDITIONS else 'unknown'
+
+
+def normalize_vehicle(car_details):
+    """
+    Normalize the fields used for market comparison.
+
+    Args:
+        car_details: Dictionary with make, model, year, condition
+
+    Returns:
+        dict: make, model, year, condition for prompts, plus 'cache_key',
+        which is None when make, model or year could not be identified
+    """
+    make = normalize_make(car_details.get('make'))
+    model_key, model_display = normalize_model(car_details.get('model'))
+    year = bucket_year(car_details.get('year'))
+    condition = normalize_condition(car_details.get('condition'))
+
+    cache_key = None
+    if make and model_key and year:
+        cache_key = f"{make.casefold()}|{model_key}|{year}|{condition}"
+
+    return {
+        'make': make or 'unknown',
+        'model': model_display or 'unknown',
+        'year': year or 'unknown',
+        'condition': condition,
+        'cache_key': cache_key,
+    }
@@ -6,8 +6,10 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.conf import settings
+from django.db.models import F
 from django.core.files.base import ContentFile
 import base64
+import logging
 import os
 from .models import (
     LoanApplication,
@@ -15,6 +17,7 @@ from .models import (
     LoanApplicationDocument,
     VehicleValuation,
     VehicleInformation,
+    AIJob,
 )
 from .serializers import (
     LoanApplicationSerializer,
@@ -23,12 +26,18 @@ from .serializers import (
     LoanApplicationSubmitSerializer,
     LoanApplicationNoteSerializer,
     LoanApplicationDocumentSerializer,
-    DraftToUserSerializer
+    DraftToUserSerializer,
+    AIJobSerializer,
+    LOAN_APPLICATION_LIST_FIELDS,
+    sparse_fieldset,
 )
 from notifications.models import Notification
 from accounts.models import User
-from .car_image_analyzer import CarValuationService
-from .gemini_loan_analyzer import GeminiLoanAnalyzer
+from .ai_clients import get_car_valuation_service
+from .ai_jobs import enqueue_submit_analysis
+from .pagination import ApplicationCursorPagination
+
+logger = logging.getLogger(__name__)
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
@@ -60,6 +69,8 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
     Supports draft creation, updates, and submission.
     """
     queryset = LoanApplication.objects.all()
+    # Keyset pages for list; my_applications pages its applications the same way
+    pagination_class = ApplicationCursorPagination
     parser_classes = []  # Will be set dynamically based on action
     permission_classes = []  # Will be set dynamically in get_permissions()
     # Enable JWT authentication - permissions will control access per action
@@ -81,7 +92,7 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         """
         if self.action == 'create':
             return [AllowAny()]
-        elif self.action in ['update', 'partial_update', 'retrieve']:
+        elif self.action in ['update', 'partial_update', 'retrieve', 'ai_status']:
             return [AllowAny()]  # Will check ownership in get_queryset
         elif self.action == 'list':
             return [IsAuthenticated()]  # Require authentication for listing applications
@@ -101,6 +112,22 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         context = super().get_serializer_context()
         context['request'] = self.request
         return context
+
+    def get_fieldset(self):
+        """
+        LoanApplicationSerializer fields for reads: ?fields=/?expand= over the
+        compact list representation for `list`, or over every field otherwise
+        (None).
+        """
+        if not hasattr(self, '_fieldset'):
+            default = LOAN_APPLICATION_LIST_FIELDS if self.action == 'list' else None
+            self._fieldset = sparse_fieldset(self.request, default)
+        return self._fieldset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ['list', 'retrieve', 'my_applications']:
+            kwargs.setdefault('fields', self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
     
     def get_queryset(self):
         """Filter queryset based on user"""
@@ -108,18 +135,50 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         
         # Admin users can see all applications
         if user.is_authenticated and hasattr(user, 'user_type') and user.user_type == 'admin':
-            return LoanApplication.objects.all()
+            queryset = LoanApplication.objects.all()
         
         # Authenticated users see their own applications
-        if user.is_authenticated:
-            return LoanApplication.objects.filter(user=user)
+        elif user.is_authenticated:
+            queryset = LoanApplication.objects.filter(user=user)
         
         # Anonymous users see their draft applications via session
-        session_key = self.request.session.session_key
-        if session_key:
-            return LoanApplication.objects.filter(session_key=session_key, is_draft=True)
+        elif self.request.session.session_key:
+            queryset = LoanApplication.objects.filter(session_key=self.request.session.session_key, is_draft=True)
         
-        return LoanApplication.objects.none()
+        else:
+            return LoanApplication.objects.none()
+
+        if self.action in ['list', 'retrieve']:
+            queryset = LoanApplicationSerializer.setup_eager_loading(queryset, self.get_fieldset())
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return one application, serialized from the response cache when its
+        version is unchanged; 304 when the client's If-None-Match is current.
+        """
+        from django.http import Http404
+        from .response_cache import conditional_response, make_etag, serialize_applications
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        version = self.filter_queryset(self.get_queryset()).order_by().filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        ).values_list('pk', 'cache_version').first()
+        if version is None:
+            raise Http404
+
+        def build():
+            applications = serialize_applications(
+                request,
+                [version],
+                lambda pks: self.get_serializer(self.get_queryset().filter(pk__in=pks), many=True).data,
+                fields=self.get_fieldset(),
+            )
+            if not applications:
+                raise Http404
+            return applications[0]
+
+        return conditional_response(request, make_etag(request, version), build)
         
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def dashboard_statistics(self, request):
@@ -154,71 +213,69 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         Requires authentication.
         URL: /api/loans/applications/my_applications/
         """
-        print(f"[DEBUG] ========== my_applications endpoint called ==========")
-        print(f"[DEBUG] request.user: {request.user}")
-        print(f"[DEBUG] request.user.is_authenticated: {request.user.is_authenticated}")
-        print(f"[DEBUG] request.user.email: {getattr(request.user, 'email', 'NO EMAIL')}")
-        print(f"[DEBUG] request.user.id: {getattr(request.user, 'id', 'NO ID')}")
-        print(f"[DEBUG] Authorization header: {request.headers.get('Authorization', 'NOT SET')}")
-        
         if not request.user.is_authenticated:
-            print(f"[DEBUG] User is NOT authenticated - this should not happen with IsAuthenticated permission")
             return Response({"detail": "Authentication required"}, status=401)
         
         # First, associate any unassociated applications with this user based on email
-        if request.user.email:
-            # Find applications with the same email but no user
-            user_email = request.user.email.lower()
-            unassociated_apps = LoanApplication.objects.filter(
-                user=None,
-                personal_info__email__iexact=user_email
-            )
-            
-            # Associate these applications with the current user
-            if unassociated_apps.exists():
-                print(f"[DEBUG] Associating {unassociated_apps.count()} applications with user {request.user}")
-                unassociated_apps.update(user=request.user)
+        from .dashboard import associate_by_email
+        associate_by_email(request.user)
         
-        # Get all applications for this user, ordered by most recent first
-        applications = LoanApplication.objects.filter(user=request.user).select_related(
-            'personal_info',
-            'vehicle_info',
-            'financial_profile',
-            'address'
-        ).order_by('-created_at')
+        # One keyset page of this user's applications, most recent first. Their
+        # versions key the cached serializations and the ETag, so an unchanged
+        # poll gets a 304
+        from django.db.models import Count
+        from .response_cache import conditional_response, make_etag, serialize_applications
+        applications = LoanApplication.objects.filter(user=request.user)
+        paginator = self.paginator
+        page = paginator.paginate_queryset(
+            applications.values('id', 'cache_version', 'status', 'created_at'), request, view=self,
+        )
+        versions = tuple((row['id'], row['cache_version']) for row in page)
+        next_link = paginator.get_next_link()
         
-        print(f"[DEBUG] Found {applications.count()} applications for user {request.user.email}")
+        # Summary statistics over all of the user's applications, in one grouped query
+        status_counts = dict(
+            applications.order_by().values_list('status').annotate(count=Count('id'))
+        )
+        total = sum(status_counts.values())
         
-        serializer = self.get_serializer(applications, many=True)
+        logger.debug(f"Found {total} applications for user {request.user.pk}")
         
-        # Add summary statistics
-        response_data = {
-            'count': applications.count(),
-            'applications': serializer.data,
-            'summary': {
-                'total': applications.count(),
-                'draft': applications.filter(status='draft').count(),
-                'pending': applications.filter(status='pending').count(),
-                'under_review': applications.filter(status='under_review').count(),
-                'approved': applications.filter(status='approved').count(),
-                'rejected': applications.filter(status='rejected').count(),
+        def build():
+            return {
+                'count': total,
+                'applications': serialize_applications(
+                    request,
+                    versions,
+                    lambda pks: self.get_serializer(
+                        LoanApplicationSerializer.setup_eager_loading(
+                            LoanApplication.objects.filter(pk__in=pks), self.get_fieldset(),
+                        ),
+                        many=True,
+                    ).data,
+                    fields=self.get_fieldset(),
+                ),
+                'next': next_link,
+                'summary': {
+                    'total': total,
+                    'draft': status_counts.get('draft', 0),
+                    'pending': status_counts.get('pending', 0),
+                    'under_review': status_counts.get('under_review', 0),
+                    'approved': status_counts.get('approved', 0),
+                    'rejected': status_counts.get('rejected', 0),
+                }
             }
-        }
         
-        return Response(response_data)
+        etag = make_etag(request, versions, tuple(sorted(status_counts.items())), next_link)
+        return conditional_response(request, etag, build)
     
     def create(self, request, *args, **kwargs):
         """Create a new loan application (draft by default)"""
-        print(f"[DEBUG] CREATE - User: {request.user}, Authenticated: {request.user.is_authenticated}")
-        print(f"[DEBUG] CREATE - Request data keys: {request.data.keys()}")
+        logger.debug(f"Creating application (user {request.user.pk}), fields: {sorted(request.data.keys())}")
         
         # Ensure session exists for anonymous users
         if not request.user.is_authenticated and not request.session.session_key:
             request.session.create()
-            print(f"[DEBUG] Created session: {request.session.session_key}")
-        
-        # Log request data for debugging
-        print(f"Creating application with data: {request.data}")
         
         # Check required fields directly - handle both string and boolean values
         is_draft_value = request.data.get('is_draft', True)
@@ -282,161 +339,6 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         
         return super().update(request, *args, **kwargs)
     
-    def _analyze_vehicle_on_submit(self, application):
-        """
-        Automatically analyze vehicle photos when application is submitted.
-        Compares GPT-estimated value with applicant's stated value.
-        Returns valuation data or None if analysis fails.
-        """
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        try:
-            # Collect all uploaded vehicle photos
-            photo_fields = [
-                application.photo_vin_sticker,
-                application.photo_odometer,
-                application.photo_borrower,
-                application.photo_front_car,
-                application.photo_vin,
-                application.photo_license,
-                application.photo_insurance,
-            ]
-            
-            # Filter out empty fields and get valid image paths
-            valid_photos = []
-            for photo in photo_fields:
-                if photo and hasattr(photo, 'path'):
-                    valid_photos.append((photo.path, 'file_path'))
-            
-            if not valid_photos:
-                logger.warning(f"No vehicle photos found for application {application.application_id}")
-                return None
-            
-            # Initialize valuation service
-            valuation_service = CarValuationService()
-            
-            # Get requested loan amount
-            loan_amount = float(application.amount) if application.amount else 0
-            
-            # Perform analysis using uploaded photos
-            logger.info(f"Analyzing {len(valid_photos)} photos for application {application.application_id}")
-            analysis_result = valuation_service.evaluate_for_loan(
-                images=valid_photos,
-                loan_amount=loan_amount
-            )
-            
-            if not analysis_result.get('approved') is not None:
-                logger.error(f"Analysis failed for application {application.application_id}")
-                return None
-            
-            # Extract vehicle analysis data
-            vehicle_data = analysis_result.get('vehicle_analysis', {})
-            valuation_data = analysis_result.get('valuation', {})
-            
-            # Create or update VehicleValuation record
-            existing_vehicle = application.vehicle_info
-
-            valuation, created = VehicleValuation.objects.update_or_create(
-                application=application,
-                defaults={
-                    'make': vehicle_data.get('make') or (existing_vehicle.make if existing_vehicle else ''),
-                    'model': vehicle_data.get('model') or (existing_vehicle.model if existing_vehicle else ''),
-                    'year': vehicle_data.get('year') or (existing_vehicle.year if existing_vehicle else ''),
-                    'body_type': vehicle_data.get('body_type', ''),
-                    'color': vehicle_data.get('color') or (existing_vehicle.color if existing_vehicle else ''),
-                    'condition': vehicle_data.get('condition', 'good'),
-                    'visible_damage': vehicle_data.get('visible_damage', []),
-                    'features': vehicle_data.get('features', []),
-                    'estimated_value_low': valuation_data.get('estimated_value', 0),
-                    'estimated_value_high': valuation_data.get('estimated_value', 0),
-                    'estimated_value_avg': valuation_data.get('estimated_value', 0),
-                    'ltv_ratio': valuation_data.get('ltv_ratio', 0),
-                    'max_loan_amount': valuation_data.get('max_loan_amount', 0),
-                    'recommended_loan_amount': valuation_data.get('max_loan_amount', 0),
-                    'risk_level': 'high' if not analysis_result.get('approved') else 'low',
-                    'risk_factors': analysis_result.get('risk_factors', []),
-                    'confidence_level': vehicle_data.get('confidence', 'medium'),
-                    'images_analyzed': vehicle_data.get('images_analyzed', len(valid_photos)),
-                    'analysis_notes': analysis_result.get('recommendation', ''),
-                    'full_analysis_data': analysis_result,
-                    'is_approved_for_loan': analysis_result.get('approved', False),
-                    'approval_notes': analysis_result.get('recommendation', '')
-                }
-            )
-            
-            logger.info(f"Vehicle valuation {'created' if created else 'updated'} for application {application.application_id}")
-            logger.info(f"Estimated value: ${valuation_data.get('estimated_value', 0):,.2f}, LTV: {valuation_data.get('ltv_ratio', 0):.2f}%")
-            
-            # Return summary for response
-            return {
-                'analyzed': True,
-                'estimated_value': float(valuation_data.get('estimated_value', 0)),
-                'requested_amount': float(loan_amount),
-                'ltv_ratio': float(valuation_data.get('ltv_ratio', 0)),
-                'ai_approved': analysis_result.get('approved', False),
-                'recommendation': analysis_result.get('recommendation', ''),
-                'confidence': vehicle_data.get('confidence', 'medium'),
-                'images_analyzed': len(valid_photos)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing vehicle for application {application.application_id}: {str(e)}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return None
-    
-    def _analyze_with_gemini_ai(self, application):
-        """
-        Analyze loan application with Gemini AI and save results to database.
-        Returns AI analysis data or None if analysis fails.
-        This is optional - submission will succeed even if AI analysis fails.
-        """
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        try:
-            logger.info(f"Starting Gemini AI analysis for application {application.application_id}")
-            
-            # Initialize Gemini analyzer
-            gemini_analyzer = GeminiLoanAnalyzer()
-            
-            # Perform AI analysis
-            ai_result = gemini_analyzer.analyze_loan_application(application)
-            
-            if not ai_result:
-                logger.warning(f"Gemini AI analysis returned no results for application {application.application_id}")
-                return None
-            
-            # Save AI analysis to application
-            application.ai_recommendation = ai_result.get('recommendation', '')
-            application.ai_risk_assessment = ai_result.get('risk_assessment', 'medium')
-            application.ai_approval_suggestion = ai_result.get('approval_suggestion', 'review')
-            application.ai_analysis_data = ai_result
-            application.ai_analysis_timestamp = timezone.now()
-            application.save()
-            
-            logger.info(f"Gemini AI analysis completed for application {application.application_id}")
-            logger.info(f"AI Suggestion: {ai_result.get('approval_suggestion')}, Risk: {ai_result.get('risk_assessment')}")
-            
-            return ai_result
-            
-        except ImportError as e:
-            logger.warning(f"Gemini AI not available (missing dependencies): {str(e)}")
-            logger.info("Application will be submitted without AI analysis - manual review required")
-            return None
-        except Exception as e:
-            # Check if it's a credentials error
-            error_msg = str(e).lower()
-            if 'credential' in error_msg or 'authentication' in error_msg or 'adc' in error_msg:
-                logger.warning(f"Gemini AI credentials not configured for application {application.application_id}")
-                logger.info("Application will be submitted without AI analysis. To enable AI analysis, configure Google Cloud credentials.")
-            else:
-                logger.error(f"Error in Gemini AI analysis for application {application.application_id}: {str(e)}")
-                import traceback
-                logger.error(traceback.format_exc())
-            return None
-    
     @action(detail=False, methods=['post'], permission_classes=[AllowAny])
     def submit(self, request):
         """
@@ -618,56 +520,66 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
             application.session_key = None  # Clear session key when associating with user
             application.save()
         
-        # Automatically analyze vehicle photos and estimate value
-        valuation_result = self._analyze_vehicle_on_submit(application)
-        
-        # Analyze application with Gemini AI
-        gemini_result = self._analyze_with_gemini_ai(application)
-        
         # Submit the application
         try:
             application.submit()
-            # Create notifications for all admin users
-            admin_users = User.objects.filter(user_type='admin')
-            for admin in admin_users:
-                Notification.objects.create(
-                    recipient=admin,
-                    message=f"New loan application #{application.application_id} submitted."
-                )
+            # One notification for all admin users
+            Notification.objects.broadcast('admins', f"New loan application #{application.application_id} submitted.")
         except ValueError as exc:
             return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Vehicle valuation and Gemini analysis run in the background (manage.py run_ai_worker).
+        # Clients poll the job's status_url; results land in VehicleValuation and ai_* fields.
+        ai_job = enqueue_submit_analysis(application)
+        
         response_serializer = LoanApplicationSerializer(application)
         response_data = {
             'message': 'Application submitted successfully!',
-            'application': response_serializer.data
+            'application': response_serializer.data,
+            'ai_job': AIJobSerializer(ai_job, context={'request': request}).data,
         }
         
-        # Include AI analysis in response
-        if gemini_result:
-            response_data['ai_analysis'] = {
-                'recommendation': gemini_result.get('recommendation'),
-                'risk_assessment': gemini_result.get('risk_assessment'),
-                'approval_suggestion': gemini_result.get('approval_suggestion'),
-                'key_strengths': gemini_result.get('key_strengths', []),
-                'key_concerns': gemini_result.get('key_concerns', []),
-                'confidence_score': gemini_result.get('confidence_score', 0),
-            }
+        return Response(response_data, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def ai_status(self, request, pk=None):
+        """
+        Status of the most recent background AI job for this application.
+        Open to guests for the drafts their session owns, like upload_document.
+        """
+        application = self.get_object()
         
-        # Include valuation data if analysis was successful
-        if valuation_result:
-            response_data['vehicle_valuation'] = valuation_result
-            
-            # If we have both AI and applicant estimates, include comparison
-            if application.applicant_estimated_value:
-                try:
-                    valuation_obj = VehicleValuation.objects.get(application=application)
-                    comparison = valuation_obj.compare_with_applicant_estimate()
-                    response_data['value_comparison'] = comparison
-                except VehicleValuation.DoesNotExist:
-                    pass
+        permission = IsOwnerOrAdmin()
+        if not permission.has_object_permission(request, self, application):
+            return Response(
+                {'error': 'You do not have permission to view this application.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         
-        return Response(response_data, status=status.HTTP_200_OK)
+        job = application.ai_jobs.filter(job_type='submit_analysis').order_by('-created_at').first()
+        if not job:
+            return Response({'error': 'No AI analysis has been queued for this application.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(AIJobSerializer(job, context={'request': request}).data, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    def reanalyze(self, request, pk=None):
+        """
+        Admin action: queue the AI analysis again.
+        Unchanged applications reuse the stored analysis unless 'force' is true (the default).
+        """
+        application = self.get_object()
+        
+        if not hasattr(request.user, 'user_type') or request.user.user_type != 'admin':
+            return Response({'error': 'Only admins can re-run the AI analysis.'}, status=status.HTTP_403_FORBIDDEN)
+        
+        if application.is_draft or application.status == 'draft':
+            return Response({'error': 'Draft applications cannot be analyzed.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        force = str(request.data.get('force', True)).lower() in ('true', '1')
+        ai_job = enqueue_submit_analysis(application, force=force)
+        
+        return Response(AIJobSerializer(ai_job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def associate_draft(self, request):
@@ -731,7 +643,7 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
             LoanApplication.objects.filter(
                 user=None,
                 personal_info__email__iexact=app_email
-            ).update(user=request.user)
+            ).update(user=request.user, cache_version=F('cache_version') + 1)
         
         response_serializer = LoanApplicationSerializer(application)
         return Response(
@@ -815,17 +727,18 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
             
             # Get image paths for analysis
             image_paths = [doc.file.path for doc in saved_images]
+            images_to_analyze = [(path, 'file_path') for path in image_paths]
             
-            # Initialize valuation service
-            valuation_service = CarValuationService()
+            # Shared valuation service (created on first use)
+            valuation_service = get_car_valuation_service()
             
             # Get loan amount from application
             loan_amount = float(application.amount) if application.amount else 10000.0
             
             # Perform analysis
             analysis_result = valuation_service.evaluate_for_loan(
-                image_paths=image_paths,
-                requested_loan_amount=loan_amount
+                images=images_to_analyze,
+                loan_amount=loan_amount
             )
             
             # Store analysis results in documents
@@ -991,41 +904,12 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
                 message=f"Your loan application #{application.application_id} has been approved!"
             )
 
-        # Send notification email to user
+        # Queue the notification email for the worker
         if application.user and application.user.email:
-            try:
-                from django.core.mail import send_mail
-                from django.template.loader import render_to_string
-                
-                subject = 'Loan Application Approved - DriveCash'
-                message = f"""
-Dear {application.personal_info.first_name if application.personal_info else 'Valued Customer'},
-
-Congratulations! Your loan application has been approved.
-
-Application ID: {application.application_id}
-Approved Amount: ${approved_amount:,.2f}
-Status: Approved
-
-{approval_notes if approval_notes else ''}
-
-Please log in to your account to review the details and next steps.
-
-Thank you for choosing DriveCash!
-
-Best regards,
-DriveCash Team
-                """
-                
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [application.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Failed to send approval email: {str(e)}")
+            from .ai_jobs import enqueue_emails
+            from .decisions import approval_email
+            subject, message = approval_email(application, approved_amount, approval_notes)
+            enqueue_emails([(application, subject, message, application.user.email)])
 
         response = LoanApplicationSerializer(application)
         return Response(
@@ -1079,46 +963,50 @@ DriveCash Team
                 note=notes
             )
 
-        # Send notification email to user
+        # Queue the notification email for the worker
         if application.user and application.user.email:
-            try:
-                from django.core.mail import send_mail
-                
-                subject = 'Loan Application Update - DriveCash'
-                message = f"""
-Dear {application.personal_info.first_name if application.personal_info else 'Valued Customer'},
-
-We regret to inform you that your loan application has been declined.
-
-Application ID: {application.application_id}
-Status: Declined
+            from .ai_jobs import enqueue_emails
+            from .decisions import rejection_email
+            subject, message = rejection_email(application, notes)
+            enqueue_emails([(application, subject, message, application.user.email)])
 
-Reason:
-{notes if notes else 'Please contact us for more information.'}
+        response = LoanApplicationSerializer(application)
+        return Response(
+            {
+                'message': 'Application rejected successfully.',
+                'application': response.data,
+            },
+            status=status.HTTP_200_OK
+        )
 
-If you have any questions or would like to discuss this decision, please don't hesitate to contact our support team.
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk_decision(self, request):
+        """
+        Admin action: approve or reject many applications in one request.
+        URL: /api/loans/applications/bulk_decision/
 
-Thank you for your interest in DriveCash.
+        Body: {"decisions": [{"id": 1, "decision": "approve", "approved_amount": "5000.00",
+        "notes": "..."}, {"id": 2, "decision": "reject", "notes": "..."}]}. Each decision
+        is validated and applied on its own; the response has a result per decision.
+        """
+        if not hasattr(request.user, 'user_type') or request.user.user_type != 'admin':
+            return Response({'error': 'Only admins can decide applications.'}, status=status.HTTP_403_FORBIDDEN)
 
-Best regards,
-DriveCash Team
-                """
-                
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [application.user.email],
-                    fail_silently=True,
-                )
-            except Exception as e:
-                print(f"Failed to send rejection email: {str(e)}")
+        from .decisions import decide
+        from .serializers import BulkDecisionSerializer
+        serializer = BulkDecisionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        response = LoanApplicationSerializer(application)
+        results = decide(request.user, serializer.validated_data['decisions'])
+        logger.debug(f"Bulk decision: {len(results)} decisions by admin {request.user.pk}")
         return Response(
             {
-                'message': 'Application rejected successfully.',
-                'application': response.data,
+                'results': results,
+                'summary': {
+                    'approved': sum(1 for result in results if result.get('status') == 'approved'),
+                    'rejected': sum(1 for result in results if result.get('status') == 'rejected'),
+                    'failed': sum(1 for result in results if not result['success']),
+                },
             },
             status=status.HTTP_200_OK
         )
@@ -1271,13 +1159,8 @@ DriveCash Team
             note="User has addressed the query and resubmitted the application for review."
         )
 
-        # Create notifications for all admin users
-        admin_users = User.objects.filter(user_type='admin')
-        for admin in admin_users:
-            Notification.objects.create(
-                recipient=admin,
-                message=f"Query resolved for loan application #{application.application_id}."
-            )
+        # One notification for all admin users
+        Notification.objects.broadcast('admins', f"Query resolved for loan application #{application.application_id}.")
         
         # Send notification email to admins
         try:
@@ -1311,11 +1194,15 @@ DriveCash Admin Team
         except Exception as e:
             print(f"Failed to send query resolution email to admins: {str(e)}")
         
+        # Re-run AI analysis on the changes; the worker skips Gemini if nothing relevant changed
+        ai_job = enqueue_submit_analysis(application)
+        
         response = LoanApplicationSerializer(application)
         return Response(
             {
                 'message': 'Query resolved. Application resubmitted for review.',
                 'application': response.data,
+                'ai_job': AIJobSerializer(ai_job, context={'request': request}).data,
             },
             status=status.HTTP_200_OK
         )
@@ -1358,53 +1245,63 @@ DriveCash Admin Team
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Collect all document fields and their metadata
-        documents = []
-        document_fields = [
-            ('photo_vin_sticker', 'VIN Sticker'),
-            ('photo_odometer', 'Odometer'),
-            ('photo_borrower', 'Borrower ID'),
-            ('photo_front_car', 'Vehicle Front'),
-            ('photo_vin', 'VIN Plate'),
-            ('photo_license', 'Driver\'s License'),
-            ('photo_insurance', 'Insurance'),
-        ]
-        
-        for field_name, display_name in document_fields:
-            field_value = getattr(application, field_name)
-            if field_value:
+        from .response_cache import cached_payload, conditional_response, make_etag
+
+        def build_documents():
+            # Collect all document fields and their metadata
+            documents = []
+            document_fields = [
+                ('photo_vin_sticker', 'VIN Sticker'),
+                ('photo_odometer', 'Odometer'),
+                ('photo_borrower', 'Borrower ID'),
+                ('photo_front_car', 'Vehicle Front'),
+                ('photo_vin', 'VIN Plate'),
+                ('photo_license', 'Driver\'s License'),
+                ('photo_insurance', 'Insurance'),
+            ]
+            
+            for field_name, display_name in document_fields:
+                field_value = getattr(application, field_name, None)
+                if field_value:
+                    documents.append({
+                        'id': f"{application.id}_{field_name}",
+                        'field_name': field_name,
+                        'display_name': display_name,
+                        'url': field_value.url if hasattr(field_value, 'url') else str(field_value),
+                        'filename': field_value.name.split('/')[-1] if hasattr(field_value, 'name') else display_name,
+                        'size': field_value.size if hasattr(field_value, 'size') else None,
+                        'uploaded_at': application.updated_at
+                    })
+            
+            # Also include documents from LoanApplicationDocument model
+            loan_documents = LoanApplicationDocument.objects.filter(application=application)
+            for doc in loan_documents:
                 documents.append({
-                    'id': f"{application.id}_{field_name}",
-                    'field_name': field_name,
-                    'display_name': display_name,
-                    'url': field_value.url if hasattr(field_value, 'url') else str(field_value),
-                    'filename': field_value.name.split('/')[-1] if hasattr(field_value, 'name') else display_name,
-                    'size': field_value.size if hasattr(field_value, 'size') else None,
-                    'uploaded_at': application.updated_at
+                    'id': doc.id,
+                    'field_name': doc.document_type,
+                    'display_name': doc.title,
+                    'url': doc.file.url if hasattr(doc.file, 'url') else str(doc.file),
+                    'filename': doc.file.name.split('/')[-1] if hasattr(doc.file, 'name') else doc.title,
+                    'size': doc.file.size if hasattr(doc.file, 'size') else None,
+                    'uploaded_at': doc.uploaded_at,
+                    'description': doc.description,
+                    'document_type': doc.document_type,
+                    'is_analyzed': doc.is_analyzed,
+                    'ai_analysis_result': doc.ai_analysis_result
                 })
+            
+            return {
+                'application_id': application.application_id,
+                'documents': documents,
+                'total_count': len(documents)
+            }
         
-        # Also include documents from LoanApplicationDocument model
-        loan_documents = LoanApplicationDocument.objects.filter(application=application)
-        for doc in loan_documents:
-            documents.append({
-                'id': doc.id,
-                'field_name': doc.document_type,
-                'display_name': doc.title,
-                'url': doc.file.url if hasattr(doc.file, 'url') else str(doc.file),
-                'filename': doc.file.name.split('/')[-1] if hasattr(doc.file, 'name') else doc.title,
-                'size': doc.file.size if hasattr(doc.file, 'size') else None,
-                'uploaded_at': doc.uploaded_at,
-                'description': doc.description,
-                'document_type': doc.document_type,
-                'is_analyzed': doc.is_analyzed,
-                'ai_analysis_result': doc.ai_analysis_result
-            })
-        
-        return Response({
-            'application_id': application.application_id,
-            'documents': documents,
-            'total_count': len(documents)
-        }, status=status.HTTP_200_OK)
+        # Listing reads file sizes from storage; cache it per application version
+        return conditional_response(
+            request,
+            make_etag(request, application.pk, application.cache_version),
+            lambda: cached_payload('documents', request, application.pk, application.cache_version, build_documents),
+        )
 
     @action(detail=True, methods=['post'], permission_classes=[AllowAny], parser_classes=[MultiPartParser, FormParser])
     def upload_document(self, request, pk=None):
@@ -1532,142 +1429,14 @@ DriveCash Admin Team
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def dashboard_statistics(self, request):
-        """Get user dashboard statistics with loan data and charts"""
-        user = request.user
-        
-        # First, associate any unassociated applications with this user based on email
-        if user.email:
-            user_email = user.email.lower()
-            unassociated_apps = LoanApplication.objects.filter(
-                user=None,
-                personal_info__email__iexact=user_email
-            )
-            
-            if unassociated_apps.exists():
-                print(f"[DASHBOARD] Associating {unassociated_apps.count()} applications with user {user}")
-                unassociated_apps.update(user=user)
-        
-        # Get user's applications (exclude drafts)
-        applications = LoanApplication.objects.filter(
-            user=user,
-            is_draft=False
-        ).order_by('-created_at')
-        
-        # Debug logging
-        print(f"[DASHBOARD] User: {user.email}")
-        print(f"[DASHBOARD] Total applications found: {applications.count()}")
-        
-        # Calculate statistics
-        total_applications = applications.count()
-        pending_count = applications.filter(status='pending').count()
-        approved_count = applications.filter(status='approved').count()
-        rejected_count = applications.filter(status='rejected').count()
-        query_count = applications.filter(status='query').count()
-        draft_count = LoanApplication.objects.filter(user=user, is_draft=True).count()
-        active_loans = approved_count
-        
-        print(f"[DASHBOARD] Pending: {pending_count}, Approved: {approved_count}, Rejected: {rejected_count}, Query: {query_count}, Drafts: {draft_count}")
-        
-        # Calculate financial metrics
-        total_borrowed = sum(app.approved_amount or 0 for app in applications.filter(status='approved'))
-        total_requested = sum(app.amount or 0 for app in applications)
-        current_balance = total_borrowed  # Simplified - would calculate based on payments
-        
-        # Get latest approved loan for monthly payment calculation
-        latest_approved = applications.filter(status='approved').first()
-        monthly_payment = 0
-        next_due_date = None
-        if latest_approved and latest_approved.approved_amount and latest_approved.term:
-            # Simple calculation: loan amount / term in months
-            monthly_payment = float(latest_approved.approved_amount) / latest_approved.term
-            # Calculate next due date (assuming monthly payments)
-            if latest_approved.approved_at:
-                from dateutil.relativedelta import relativedelta
-                next_due_date = latest_approved.approved_at + relativedelta(months=1)
-        
-        # Get recent applications for chart data (last 6 months)
-        from datetime import datetime, timedelta
-        from django.db.models import Count
-        from django.db.models.functions import TruncMonth
-        
-        six_months_ago = timezone.now() - timedelta(days=180)
-        monthly_apps = applications.filter(
-            created_at__gte=six_months_ago
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            count=Count('id')
-        ).order_by('month')
-        
-        # Format chart data
-        chart_labels = []
-        chart_data = []
-        for entry in monthly_apps:
-            month_name = entry['month'].strftime('%b %Y')
-            chart_labels.append(month_name)
-            chart_data.append(entry['count'])
-        
-        # Get status distribution for pie chart
-        status_distribution = {
-            'pending': pending_count,
-            'approved': approved_count,
-            'rejected': rejected_count,
-            'query': query_count,
-        }
-        
-        # Get recent activity (last 5 applications)
-        recent_activity = []
-        for app in applications[:5]:
-            recent_activity.append({
-                'id': app.id,
-                'application_id': str(app.application_id),
-                'amount': float(app.amount or 0),
-                'status': app.status,
-                'created_at': app.created_at,
-                'updated_at': app.updated_at,
-            })
-        
-        # Account health score (simplified)
-        if total_applications > 0:
-            approval_rate = (approved_count / total_applications) * 100
-            if approval_rate >= 75:
-                account_health = 'Excellent'
-            elif approval_rate >= 50:
-                account_health = 'Good'
-            elif approval_rate >= 25:
-                account_health = 'Fair'
-            else:
-                account_health = ''
-        else:
-            account_health = ''
-        
-        response_data = {
-            'metrics': {
-                'total_applications': total_applications,
-                'draft_count': draft_count,
-                'pending_count': pending_count,
-                'approved_count': approved_count,
-                'rejected_count': rejected_count,
-                'query_count': query_count,
-                'active_loans': active_loans,
-                'total_borrowed': float(total_borrowed),
-                'total_requested': float(total_requested),
-                'current_balance': float(current_balance),
-                'monthly_payment': float(monthly_payment),
-                'next_due_date': next_due_date,
-                'account_health': account_health,
-            },
-            'charts': {
-                'applications_over_time': {
-                    'labels': chart_labels,
-                    'data': chart_data,
-                },
-                'status_distribution': status_distribution,
-            },
-            'recent_activity': recent_activity,
-        }
-        
-        print(f"[DASHBOARD] Response data: {response_data['metrics']}")
+        """
+        Get user dashboard statistics with loan data and charts.
+        Served from a per-user cache (loans.dashboard); a miss costs a constant
+        number of queries however many applications the user has.
+        """
+        from .dashboard import get_summary
+
+        response_data = get_summary(request.user)
         
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -1716,3 +1485,32 @@ class LoanApplicationDocumentViewSet(viewsets.ModelViewSet):
         serializer.save(application=application)
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AIJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only status endpoint for background AI jobs.
+    Clients poll /api/loans/ai-jobs/<job_id>/ after submitting an application.
+    """
+    serializer_class = AIJobSerializer
+    permission_classes = [AllowAny]  # Ownership is checked in get_queryset
+    lookup_field = 'job_id'
+    
+    def get_queryset(self):
+        """
+        Admins see all jobs, users only jobs for their own applications, and
+        guests jobs for the drafts their session owns (the IsOwnerOrAdmin check)
+        """
+        user = self.request.user
+        queryset = AIJob.objects.select_related('application')
+        
+        if hasattr(user, 'user_type') and user.user_type == 'admin':
+            return queryset
+        
+        if user.is_authenticated:
+            return queryset.filter(application__user=user)
+        
+        session_key = self.request.session.session_key
+        if not session_key:
+            return queryset.none()
+        return queryset.filter(application__user=None, application__is_draft=True, application__session_key=session_key)
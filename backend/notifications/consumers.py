@@ -0,0 +1,110 @@
+"""
+WebSocket Consumer for Real-time Notifications
+Pushes a user's notifications as they are created, so clients don't poll
+"""
+import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from .models import Notification, audiences_for
+from .push import audience_group_name, group_name
+from .serializers import NotificationSerializer
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for the current user's notifications, direct and
+    broadcast to their audiences (e.g. all admins).
+
+    Connect to ws/notifications/?token=<JWT>&last_seen_id=<id>. With
+    last_seen_id, the notifications created since that id (while the client
+    was disconnected) are replayed first, followed by a `replay_complete`
+    message; after that each new notification arrives as a `notification`
+    message. A notification created during the replay can arrive twice, so
+    clients should de-duplicate by id.
+    """
+
+    async def connect(self):
+        """
+        Called when WebSocket connection is established
+        """
+        self.user = self.scope.get('user')
+
+        # Verify user is authenticated (JWTAuthMiddleware)
+        if not self.user or not self.user.is_authenticated:
+            await self.close()
+            return
+
+        # Join the groups before replaying, so nothing created in between is missed
+        self.group_names = [group_name(self.user.id)] + [
+            audience_group_name(audience) for audience in audiences_for(self.user)
+        ]
+        for name in self.group_names:
+            await self.channel_layer.group_add(name, self.channel_name)
+        await self.accept()
+
+        last_seen_id = self.get_last_seen_id()
+        if last_seen_id is not None:
+            await self.replay(last_seen_id)
+
+    async def disconnect(self, close_code):
+        """
+        Called when WebSocket connection is closed
+        """
+        for name in getattr(self, 'group_names', []):
+            await self.channel_layer.group_discard(name, self.channel_name)
+
+    def get_last_seen_id(self):
+        query_params = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            return int(query_params['last_seen_id'][0])
+        except (KeyError, IndexError, ValueError):
+            return None
+
+    async def replay(self, last_seen_id):
+        """
+        Send the notifications newer than last_seen_id, oldest first.
+        At most NOTIFICATION_REPLAY_LIMIT are sent; `truncated` tells the
+        client to reload the full list instead.
+        """
+        notifications, truncated = await self.get_notifications_since(last_seen_id)
+        for notification in notifications:
+            await self.send_notification(notification)
+        await self.send(text_data=json.dumps({
+            'type': 'replay_complete',
+            'count': len(notifications),
+            'truncated': truncated,
+        }))
+
+    # Receive handlers
+    async def notification_message(self, event):
+        """
+        Send a newly created notification to WebSocket
+        """
+        await self.send_notification(event['notification'])
+
+    async def send_notification(self, notification):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'notification': notification,
+        }))
+
+    # Database operations
+    @database_sync_to_async
+    def get_notifications_since(self, last_seen_id):
+        """
+        The user's notifications with an id above last_seen_id
+
+        Returns:
+            tuple: (serialized notifications oldest first, whether older ones were left out)
+        """
+        limit = getattr(settings, 'NOTIFICATION_REPLAY_LIMIT', 100)
+        notifications = list(
+            Notification.objects.for_user(self.user).filter(id__gt=last_seen_id).order_by('-id')[:limit + 1]
+        )
+        truncated = len(notifications) > limit
+        notifications = notifications[:limit][::-1]
+        return NotificationSerializer(notifications, many=True).data, truncated
@@ -0,0 +1,131 @@
+"""
+Fold the per-admin copies of admin events into broadcast notifications.
+
+`submit` and `resolve_query` used to write one notification per admin. Each
+event's copies (same message, created together) become one broadcast to
+"admins". The read state carries over: an admin who had read their copy, or
+who never had one, gets a receipt. Each admin's receipts are then collapsed
+into a watermark where possible. The reverse writes the copies back.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Q
+
+# Messages of the events that were sent to every admin
+ADMIN_EVENTS = Q(message__startswith='New loan application #', message__endswith=' submitted.') | Q(
+    message__startswith='Query resolved for loan application #',
+)
+
+# Copies of one event were created by the same request
+EVENT_WINDOW = timedelta(minutes=1)
+
+BATCH_SIZE = 1000
+
+
+def group_copies(copies):
+    """Split copies ordered by (message, created_at) into one list per event"""
+    group = []
+    for copy in copies:
+        if group and (
+            copy.message != group[0].message
+            or copy.created_at - group[0].created_at > EVENT_WINDOW
+            or copy.recipient_id in {other.recipient_id for other in group}
+        ):
+            yield group
+            group = []
+        group.append(copy)
+    if group:
+        yield group
+
+
+def compact_receipts(apps, admin_ids):
+    """Replace each admin's leading run of receipts with their watermark"""
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationReadState = apps.get_model('notifications', 'NotificationReadState')
+    NotificationReceipt = apps.get_model('notifications', 'NotificationReceipt')
+
+    broadcast_ids = list(Notification.objects.filter(audience='admins', recipient=None).order_by('id').values_list('id', flat=True))
+    for admin_id in admin_ids:
+        receipts = set(NotificationReceipt.objects.filter(user_id=admin_id).values_list('notification_id', flat=True))
+        watermark = 0
+        for pk in broadcast_ids:
+            if pk not in receipts:
+                break
+            watermark = pk
+        if watermark:
+            NotificationReadState.objects.update_or_create(user_id=admin_id, defaults={'broadcasts_read_through': watermark})
+            NotificationReceipt.objects.filter(user_id=admin_id, notification_id__lte=watermark).delete()
+
+
+def fold_admin_copies(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationReceipt = apps.get_model('notifications', 'NotificationReceipt')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    admin_ids = set(User.objects.filter(user_type='admin').values_list('id', flat=True))
+    copies = Notification.objects.filter(ADMIN_EVENTS, audience='user', recipient_id__in=admin_ids).order_by(
+        'message', 'created_at', 'id',
+    )
+
+    folded = []
+    receipts = []
+    for group in group_copies(copies.iterator(chunk_size=BATCH_SIZE)):
+        broadcast = Notification.objects.create(audience='admins', recipient=None, message=group[0].message)
+        # created_at is auto_now_add; keep the event's time
+        Notification.objects.filter(pk=broadcast.pk).update(created_at=group[0].created_at)
+
+        unread = {copy.recipient_id for copy in group if not copy.read}
+        receipts.extend(
+            NotificationReceipt(user_id=admin_id, notification_id=broadcast.pk)
+            for admin_id in admin_ids - unread
+        )
+        folded.extend(copy.pk for copy in group)
+
+        if len(receipts) >= BATCH_SIZE:
+            NotificationReceipt.objects.bulk_create(receipts)
+            receipts = []
+    NotificationReceipt.objects.bulk_create(receipts)
+
+    for start in range(0, len(folded), BATCH_SIZE):
+        Notification.objects.filter(pk__in=folded[start:start + BATCH_SIZE]).delete()
+
+    compact_receipts(apps, admin_ids)
+
+
+def expand_admin_broadcasts(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationReadState = apps.get_model('notifications', 'NotificationReadState')
+    NotificationReceipt = apps.get_model('notifications', 'NotificationReceipt')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    admin_ids = list(User.objects.filter(user_type='admin').values_list('id', flat=True))
+    watermarks = dict(NotificationReadState.objects.values_list('user_id', 'broadcasts_read_through'))
+    receipts = set(NotificationReceipt.objects.values_list('user_id', 'notification_id'))
+
+    broadcasts = Notification.objects.filter(audience='admins', recipient=None).order_by('id')
+    for broadcast in broadcasts.iterator(chunk_size=BATCH_SIZE):
+        copies = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=admin_id,
+                message=broadcast.message,
+                read=broadcast.pk <= watermarks.get(admin_id, 0) or (admin_id, broadcast.pk) in receipts,
+            )
+            for admin_id in admin_ids
+        ])
+        Notification.objects.filter(pk__in=[copy.pk for copy in copies if copy.pk]).update(created_at=broadcast.created_at)
+    broadcasts.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_broadcast_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fold_admin_copies, expand_admin_broadcasts),
+    ]
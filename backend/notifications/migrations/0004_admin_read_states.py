@@ -0,0 +1,32 @@
+"""
+Give every existing admin a read state (at 0 unless 0003 set a watermark).
+After this, an audience member without one has just joined, and
+notifications.signals creates it at the newest broadcast.
+"""
+
+from django.conf import settings
+from django.db import migrations
+
+
+def create_admin_read_states(apps, schema_editor):
+    NotificationReadState = apps.get_model('notifications', 'NotificationReadState')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+
+    with_state = NotificationReadState.objects.values('user_id')
+    admins = User.objects.filter(user_type='admin').exclude(id__in=with_state).values_list('id', flat=True)
+    NotificationReadState.objects.bulk_create(
+        [NotificationReadState(user_id=admin_id) for admin_id in admins.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_fold_admin_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_admin_read_states, migrations.RunPython.noop),
+    ]
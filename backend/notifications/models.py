@@ -1,12 +1,141 @@
 from django.db import models
+from django.db.models import BooleanField, Case, Exists, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
+
+def audiences_for(user):
+    """The broadcast audiences `user` belongs to"""
+    return ['admins'] if getattr(user, 'user_type', None) == 'admin' else []
+
+
+def read_watermark(user):
+    """The user's broadcast read watermark as a subquery (0 before their first mark_all_read)"""
+    return Coalesce(
+        Subquery(NotificationReadState.objects.filter(user=user).values('broadcasts_read_through')[:1]),
+        Value(0),
+    )
+
+
+class NotificationQuerySet(models.QuerySet):
+    def broadcast(self, audience, message):
+        """One notification for every member of `audience`, read state tracked per user"""
+        return self.create(audience=audience, message=message)
+
+    def for_user(self, user):
+        """
+        The user's direct notifications merged with the broadcasts to their
+        audiences, annotated with `is_read` for this user.
+
+        A broadcast is read when its id is at or below the user's watermark
+        (NotificationReadState, moved by mark_all_read) or when the user
+        has a NotificationReceipt for it (read on its own).
+        """
+        return self.filter(
+            Q(recipient=user) | Q(recipient__isnull=True, audience__in=audiences_for(user))
+        ).annotate(
+            is_read=Case(
+                When(recipient__isnull=False, then='read'),
+                When(id__lte=read_watermark(user), then=Value(True)),
+                When(Exists(NotificationReceipt.objects.filter(user=user, notification=OuterRef('pk'))), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+
+    def latest_broadcast_id(self, audiences):
+        """Id of the newest broadcast to any of `audiences` (None when there is none)"""
+        return self.filter(recipient__isnull=True, audience__in=audiences).aggregate(latest=Max('id'))['latest']
+
+    def unread_count(self, user):
+        """Unread direct notifications plus unread broadcasts, without loading rows"""
+        direct = self.filter(recipient=user, read=False).count()
+        audiences = audiences_for(user)
+        if not audiences:
+            return direct
+        broadcasts = self.filter(recipient__isnull=True, audience__in=audiences, id__gt=read_watermark(user))
+        unread = broadcasts.exclude(Exists(NotificationReceipt.objects.filter(user=user, notification=OuterRef('pk'))))
+        return direct + unread.count()
+
+    def mark_read(self, user, notification):
+        """Mark one notification read for `user` (a receipt for broadcasts)"""
+        if notification.is_broadcast:
+            NotificationReceipt.objects.get_or_create(user=user, notification=notification)
+        elif not notification.read:
+            self.filter(pk=notification.pk).update(read=True)
+        notification.is_read = True
+
+    def mark_all_read(self, user):
+        """
+        Mark every notification of `user` read: their direct ones in place,
+        broadcasts by moving the watermark to the latest one (the receipts
+        below it are no longer needed).
+        """
+        self.filter(recipient=user, read=False).update(read=True)
+        latest = self.latest_broadcast_id(audiences_for(user))
+        if latest is None:
+            return
+        NotificationReadState.objects.get_or_create(user=user)
+        # Conditional, so a concurrent mark_all_read can't move it backwards
+        NotificationReadState.objects.filter(user=user, broadcasts_read_through__lt=latest).update(broadcasts_read_through=latest)
+        NotificationReceipt.objects.filter(user=user, notification_id__lte=latest).delete()
+
+
 class Notification(models.Model):
-    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    AUDIENCE_CHOICES = (
+        ('user', 'Recipient only'),
+        ('admins', 'All admins'),
+    )
+
+    # Null for broadcasts, which reach every member of `audience`
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications', null=True, blank=True)
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default='user')
     message = models.CharField(max_length=255)
+    # Direct notifications only; broadcasts are read per user (NotificationReadState, NotificationReceipt)
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['audience', 'id'], name='notification_audience_id_idx'),
+        ]
+
+    @property
+    def is_broadcast(self):
+        return self.recipient_id is None
+
     def __str__(self):
+        if self.is_broadcast:
+            return f"Notification for {self.get_audience_display()}: {self.message}"
         return f"Notification for {self.recipient.email}: {self.message}"
 
+
+class NotificationReadState(models.Model):
+    """
+    A user's read watermark: every broadcast up to this id is read. Created
+    at the newest broadcast when the user joins an audience (notifications
+    signals), so earlier broadcasts don't show up as unread.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_read_state')
+    broadcasts_read_through = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} read broadcasts through {self.broadcasts_read_through}"
+
+
+class NotificationReceipt(models.Model):
+    """A broadcast read by one user on its own (above their watermark)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notification_receipts')
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'notification'], name='unique_notification_receipt'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} read notification {self.notification_id}"
@@ -0,0 +1,60 @@
+"""
+Real-time delivery of notifications over WebSocket (NotificationConsumer).
+
+Each user's connections join the channel layer group `group_name(user_id)`,
+plus `audience_group_name(audience)` for each broadcast audience they belong
+to. Notifications are pushed to the matching group once the transaction
+that created them commits: a post_save signal covers
+Notification.objects.create(), and code that bulk-creates notifications
+calls send_on_commit() itself. Pushing is best effort; the REST list and
+the consumer's replay on reconnect are the source of truth.
+"""
+
+import logging
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def audience_group_name(audience):
+    return f'notifications_audience_{audience}'
+
+
+def send(notifications):
+    """Push `notifications` to their recipients' groups now"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for notification in notifications:
+        if notification.pk is None:
+            # bulk_create() doesn't set ids on every database (MySQL); clients
+            # get these from the replay on their next connect
+            continue
+        try:
+            if notification.is_broadcast:
+                group = audience_group_name(notification.audience)
+            else:
+                group = group_name(notification.recipient_id)
+            async_to_sync(channel_layer.group_send)(group, {
+                'type': 'notification.message',
+                'notification': NotificationSerializer(notification).data,
+            })
+        except Exception as e:
+            logger.warning(f"Could not push notification {notification.pk}: {e}")
+
+
+def send_on_commit(notifications):
+    """Push `notifications` once the current transaction commits (now outside one)"""
+    notifications = list(notifications)
+    if notifications:
+        transaction.on_commit(partial(send, notifications))
@@ -4,4 +4,12 @@ from .models import Notification
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ('id', 'message', 'read', 'created_at')
+        fields = ('id', 'message', 'read', 'audience', 'created_at')
+        read_only_fields = ('audience',)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Per-user read state of broadcasts (Notification.objects.for_user)
+        if hasattr(instance, 'is_read'):
+            data['read'] = instance.is_read
+        return data
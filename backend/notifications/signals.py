@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Notification, NotificationReadState, audiences_for
+from .push import send_on_commit
+
+
+@receiver(post_save, sender=Notification)
+def push_created_notification(sender, instance, created, raw=False, **kwargs):
+    """Push new notifications to the recipient's open WebSocket connections"""
+    if created and not raw:
+        send_on_commit([instance])
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_user_type(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the stored user_type, so start_read_watermark can tell whether it changed"""
+    if raw or instance._state.adding or (update_fields is not None and 'user_type' not in update_fields):
+        return
+    instance._previous_user_type = sender.objects.filter(pk=instance.pk).values_list('user_type', flat=True).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def start_read_watermark(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    A user who joins an audience (a new admin, or a user made admin, again or
+    for the first time) starts with the broadcasts sent before as read, as
+    they never had copies of them
+    """
+    if raw or (update_fields is not None and 'user_type' not in update_fields):
+        return
+    previous_user_type = instance.__dict__.pop('_previous_user_type', None)
+    if not created and previous_user_type == instance.user_type:
+        return
+    audiences = audiences_for(instance)
+    if not audiences:
+        return
+    latest = Notification.objects.latest_broadcast_id(audiences) or 0
+    _, started = NotificationReadState.objects.get_or_create(user=instance, defaults={'broadcasts_read_through': latest})
+    if not started:
+        # Conditional like mark_all_read, so the watermark never moves backwards
+        NotificationReadState.objects.filter(user=instance, broadcasts_read_through__lt=latest).update(broadcasts_read_through=latest)
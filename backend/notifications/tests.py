@@ -1,3 +1,201 @@
-from django.test import TestCase
+import asyncio
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from loans.tests import create_application
+from .models import Notification, NotificationReadState, NotificationReceipt
+
+
+class BroadcastNotificationTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admins = [
+            User.objects.create_user(username=f'admin{i}', email=f'admin{i}@example.com', password='pass12345', user_type='admin')
+            for i in range(2)
+        ]
+        self.client = APIClient()
+
+    def fetch(self, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as queries:
+            listing = self.client.get('/api/notifications/').data
+        unread = self.client.get('/api/notifications/unread_count/').data['unread_count']
+        return {n['message']: n['read'] for n in listing}, unread, len(queries)
+
+    def test_submit_writes_one_row_for_all_admins(self):
+        application = create_application(user=self.user)
+        self.client.force_authenticate(self.user)
+        with mock.patch('loans.ai_pipeline.analyze_application_with_gemini'):
+            response = self.client.post('/api/loans/applications/submit/', {'id': application.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+        broadcast = Notification.objects.get(audience='admins')
+        self.assertIsNone(broadcast.recipient)
+        for admin in self.admins:
+            self.assertEqual(self.fetch(admin)[:2], ({broadcast.message: False}, 1))
+        self.assertEqual(self.fetch(self.user)[:2], ({}, 0))
+
+    def test_read_state_is_per_user(self):
+        first = Notification.objects.broadcast('admins', 'First')
+        Notification.objects.broadcast('admins', 'Second')
+        Notification.objects.create(recipient=self.admins[0], message='Direct')
+        reader, other = self.admins
+
+        _, _, queries = self.fetch(reader)
+        self.client.patch(f'/api/notifications/{first.pk}/', {'read': True}, format='json')
+        self.assertEqual(self.fetch(reader)[:2], ({'First': True, 'Second': False, 'Direct': False}, 2))
+        self.assertEqual(self.fetch(other)[:2], ({'First': False, 'Second': False}, 2))
+
+        self.client.force_authenticate(other)
+        self.client.post('/api/notifications/mark_all_as_read/')
+        Notification.objects.broadcast('admins', 'Third')
+        listing, unread, more_queries = self.fetch(other)
+        self.assertEqual((listing, unread), ({'First': True, 'Second': True, 'Third': False}, 1))
+        self.assertEqual(NotificationReadState.objects.get(user=other).broadcasts_read_through, first.pk + 1)
+        # Read state comes from the list query itself
+        self.assertEqual(queries, more_queries)
+
+        # Dismissing a broadcast only hides it for that user
+        self.client.delete(f'/api/notifications/{first.pk}/')
+        self.assertTrue(Notification.objects.filter(pk=first.pk).exists())
+
+    def test_new_admin_starts_at_latest_broadcast(self):
+        Notification.objects.broadcast('admins', 'Before')
+        late = User.objects.create_user(username='late', email='late@example.com', password='pass12345', user_type='admin')
+        promoted = User.objects.create_user(username='promoted', email='promoted@example.com', password='pass12345')
+        promoted.user_type = 'admin'
+        promoted.save(update_fields=['user_type'])
+        Notification.objects.broadcast('admins', 'After')
+
+        for admin in (late, promoted):
+            self.assertEqual(self.fetch(admin)[:2], ({'Before': True, 'After': False}, 1))
+        self.assertEqual(self.fetch(self.admins[0])[1], 2)
+
+    def test_readmitted_admin_starts_at_latest_broadcast(self):
+        admin = self.admins[0]
+        Notification.objects.broadcast('admins', 'Before')
+        admin.user_type = 'user'
+        admin.save()
+        Notification.objects.broadcast('admins', 'While demoted')
+        admin.user_type = 'admin'
+        admin.save()
+        Notification.objects.broadcast('admins', 'After')
+
+        self.assertEqual(self.fetch(admin)[:2], ({'Before': True, 'While demoted': True, 'After': False}, 1))
+        # Saving an admin without changing user_type leaves the watermark alone
+        self.admins[1].save()
+        self.assertEqual(self.fetch(self.admins[1])[1], 3)
+
+    def test_migration_folds_admin_copies(self):
+        import importlib
+        from django.apps import apps
+
+        fold = importlib.import_module('notifications.migrations.0003_fold_admin_notifications')
+        reader, other = self.admins
+        late = User.objects.create_user(username='late', email='late@example.com', password='pass12345', user_type='admin')
+        for message in ('New loan application #1 submitted.', 'Query resolved for loan application #1.'):
+            Notification.objects.create(recipient=reader, message=message, read=True)
+            Notification.objects.create(recipient=other, message=message, read=message.startswith('New'))
+        Notification.objects.create(recipient=self.user, message='Your loan application #1 has been approved!')
+
+        fold.fold_admin_copies(apps, None)
+
+        self.assertEqual(Notification.objects.filter(audience='admins').count(), 2)
+        self.assertEqual(Notification.objects.filter(audience='user').count(), 1)
+        self.assertEqual(self.fetch(reader)[1], 0)
+        self.assertEqual(self.fetch(other)[:2], ({
+            'New loan application #1 submitted.': True, 'Query resolved for loan application #1.': False,
+        }, 1))
+        # Admins without a copy never saw these events; they stay read
+        self.assertEqual(self.fetch(late)[1], 0)
+        # Runs of receipts collapse into watermarks
+        self.assertEqual(NotificationReceipt.objects.count(), 0)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}, NOTIFICATION_REPLAY_LIMIT=2)
+class NotificationConsumerTestCase(TransactionTestCase):
+    # The consumer reads through database_sync_to_async, which closes connections
+    # that are inside a test transaction
+    def setUp(self):
+        self.user = User.objects.create_user(username='jane', email='jane@example.com', password='pass12345')
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pass12345', user_type='admin')
+
+    async def connect(self, user, query=''):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from chat.middleware import JWTAuthMiddlewareStack
+        from .routing import websocket_urlpatterns
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        token = await asyncio.to_thread(lambda: str(AccessToken.for_user(user))) if user else 'invalid'
+        communicator = WebsocketCommunicator(
+            JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns)),
+            f'/ws/notifications/?token={token}{query}',
+        )
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    async def test_created_notifications_are_pushed_to_the_recipient(self):
+        from channels.db import database_sync_to_async
+
+        communicator, connected = await self.connect(self.user)
+        self.assertTrue(connected)
+        admin_communicator, _ = await self.connect(self.admin)
+
+        application = await database_sync_to_async(create_application)(user=self.user, status='pending', is_draft=False)
+        await database_sync_to_async(self.client.force_login)(self.admin)
+        response = await database_sync_to_async(self.client.post)(
+            f'/api/loans/applications/{application.pk}/reject/', {'notes': 'No'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        message = await communicator.receive_json_from()
+        self.assertEqual(message['type'], 'notification')
+        self.assertIn('has been rejected', message['notification']['message'])
+        self.assertTrue(await admin_communicator.receive_nothing())
+
+        # Bulk decisions bulk_create their notifications and push them explicitly
+        other = await database_sync_to_async(create_application)(user=self.user, status='pending', is_draft=False)
+        response = await database_sync_to_async(self.client.post)(
+            '/api/loans/applications/bulk_decision/',
+            {'decisions': [{'id': other.pk, 'decision': 'approve', 'approved_amount': '1000'}]},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        message = await communicator.receive_json_from()
+        self.assertIn('has been approved', message['notification']['message'])
+
+        await communicator.disconnect()
+        await admin_communicator.disconnect()
+
+    async def test_reconnect_replays_since_last_seen_id(self):
+        from channels.db import database_sync_to_async
+        create = database_sync_to_async(Notification.objects.create)
+        seen = await create(recipient=self.user, message='Seen')
+        await create(recipient=self.admin, message='Not yours')
+        missed = [await create(recipient=self.user, message=f'Missed {i}') for i in range(2)]
+
+        communicator, _ = await self.connect(self.user, f'&last_seen_id={seen.pk}')
+        replayed = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual([message['notification']['id'] for message in replayed[:2]], [n.pk for n in missed])
+        self.assertEqual(replayed[2], {'type': 'replay_complete', 'count': 2, 'truncated': False})
+        await communicator.disconnect()
+
+        # Past NOTIFICATION_REPLAY_LIMIT only the newest are replayed
+        communicator, _ = await self.connect(self.user, '&last_seen_id=0')
+        replayed = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual([message['notification']['message'] for message in replayed[:2]], ['Missed 0', 'Missed 1'])
+        self.assertTrue(replayed[2]['truncated'])
+        await communicator.disconnect()
+
+    async def test_requires_authentication(self):
+        _, connected = await self.connect(None)
+
+        self.assertFalse(connected)
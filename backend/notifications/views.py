@@ -11,10 +11,33 @@ class NotificationViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(recipient=self.request.user).order_by('-created_at')
+        # Direct notifications and broadcasts to the user's audiences, with their read state
+        return self.queryset.for_user(self.request.user).order_by('-created_at')
+
+    def perform_create(self, serializer):
+        serializer.save(recipient=self.request.user)
+
+    def perform_update(self, serializer):
+        notification = serializer.instance
+        if not notification.is_broadcast:
+            serializer.save()
+            notification.is_read = notification.read
+        elif serializer.validated_data.get('read'):
+            # Broadcasts are shared: only the user's own read state changes
+            Notification.objects.mark_read(self.request.user, notification)
+
+    def perform_destroy(self, instance):
+        if instance.is_broadcast:
+            # Dismissing a broadcast marks it read for this user only
+            Notification.objects.mark_read(self.request.user, instance)
+        else:
+            instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': Notification.objects.unread_count(request.user)})
 
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        self.get_queryset().update(read=True)
+        Notification.objects.mark_all_read(request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
-
@@ -0,0 +1,351 @@
+"""
+Benchmarks for the admin and loan APIs against a throwaway SQLite database.
+
+Usage:
+    python run_admin_benchmark.py users [--users 100000] [--loans-per-user 0.5] [--page-size 12] [--runs 5]
+    python run_admin_benchmark.py dashboard [--users 100000] [--loans-per-user 10] [--runs 5]
+    python run_admin_benchmark.py polls [--applications 20] [--runs 50]
+    python run_admin_benchmark.py fieldsets [--rows 100] [--runs 20]
+"""
+import os
+import time
+import random
+import argparse
+import contextlib
+import statistics
+import tempfile
+from datetime import date, timedelta
+
+# Configure Django settings
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
+import django
+
+django.setup()
+
+
+def median_ms(func, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+@contextlib.contextmanager
+def throwaway_database():
+    """Create the schema in a temporary SQLite file and drop it afterwards."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+
+def seed_users(count, loans_per_user, seed=1, loan_age_days=0):
+    """Bulk insert `count` regular users, and loans for a share of them."""
+    from django.utils import timezone
+
+    from accounts.models import User
+    from loans.models import LoanApplication
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    batch = 5000
+    for start in range(0, count, batch):
+        User.objects.bulk_create([
+            User(
+                username=f'user{i}', email=f'user{i}@example.com', password='!',
+                first_name=f'First{i % 997}', last_name=f'Last{i % 991}',
+                is_verified=i % 5 != 0,
+            )
+            for i in range(start, min(count, start + batch))
+        ])
+    # created_at is auto_now_add; spread it out so the default sort is realistic
+    for start in range(0, count, batch):
+        users = list(User.objects.filter(user_type='user').order_by('id')[start:start + batch])
+        for offset, user in enumerate(users):
+            user.created_at = now - timedelta(minutes=start + offset)
+        User.objects.bulk_update(users, ['created_at'])
+
+    user_ids = list(User.objects.filter(user_type='user').values_list('id', flat=True))
+    statuses = ['approved', 'active', 'disbursed', 'rejected', 'pending']
+    total = int(count * loans_per_user)
+    for start in range(0, total, batch):
+        LoanApplication.objects.bulk_create([
+            LoanApplication(
+                user_id=rng.choice(user_ids), amount=rng.randrange(1000, 20000, 500),
+                status=rng.choice(statuses), is_draft=False,
+            )
+            for _ in range(min(batch, total - start))
+        ])
+    if loan_age_days:
+        # created_at is auto_now_add; spread the loans over the period in one statement (SQLite)
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {LoanApplication._meta.db_table} "
+                "SET created_at = datetime('now', '-' || (abs(random()) %% %s) || ' seconds')",
+                [loan_age_days * 86400],
+            )
+    return total
+
+
+def bench_users(args):
+    """
+    get_all_users latency by page depth: OFFSET pages (`page`) vs. keyset
+    pages (`cursor`), for the default created_at sort and the totalBorrowed
+    aggregate sort.
+    """
+    from rest_framework.test import APIClient
+
+    from accounts.models import User
+
+    with throwaway_database():
+        started = time.perf_counter()
+        loans = seed_users(args.users, args.loans_per_user)
+        print(f"seeded {args.users} users and {loans} loans in {time.perf_counter() - started:.1f}s")
+
+        admin = User.objects.create_user(username='bench-admin', email='admin@example.com', password='bench12345', user_type='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        last_page = (args.users + args.page_size - 1) // args.page_size
+        depths = sorted({1, 10, 100, 1000, last_page // 2, last_page} & set(range(1, last_page + 1)))
+        rows = []
+        for sort_by in args.sort:
+            params = {'sortBy': sort_by, 'sortOrder': 'desc', 'pageSize': args.page_size}
+            # The cursor that starts page N is the nextCursor of page N-1 (fetched untimed)
+            cursors = {
+                page: client.get('/api/admin/users/', dict(params, page=page - 1)).data['nextCursor']
+                for page in depths if page > 1
+            }
+
+            for page in depths:
+                offset_ms = median_ms(lambda: client.get('/api/admin/users/', dict(params, page=page)), args.runs)
+                if page == 1:
+                    keyset_ms = offset_ms
+                else:
+                    keyset_ms = median_ms(lambda: client.get('/api/admin/users/', dict(params, cursor=cursors[page])), args.runs)
+                rows.append((sort_by, page, offset_ms, keyset_ms))
+
+    print(f"{'sortBy':>14} {'page':>6} {'offset':>10} {'cursor':>10}")
+    for sort_by, page, offset_ms, keyset_ms in rows:
+        print(f"{sort_by:>14} {page:>6} {offset_ms:>8.1f}ms {keyset_ms:>8.1f}ms")
+    return rows
+
+
+def bench_dashboard(args):
+    """Queries and latency of GET /api/admin/dashboard/statistics/."""
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    from accounts.models import User
+    from admin_app import rollups
+
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    with throwaway_database():
+        started = time.perf_counter()
+        loans = seed_users(args.users, args.loans_per_user, loan_age_days=300)
+        print(f"seeded {args.users} users and {loans} loans in {time.perf_counter() - started:.1f}s")
+        # Seeding bulk inserts, which the DailyStats signals don't see
+        started = time.perf_counter()
+        rows = rollups.rebuild()
+        print(f"rebuilt {rows} daily stats rows in {time.perf_counter() - started:.1f}s")
+
+        admin = User.objects.create_user(username='bench-admin', email='admin@example.com', password='bench12345', user_type='admin')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        with connection.execute_wrapper(count_query):
+            response = client.get('/api/admin/dashboard/statistics/')
+        assert response.status_code == 200, response.data
+        latency_ms = median_ms(lambda: client.get('/api/admin/dashboard/statistics/'), args.runs)
+
+    print(f"dashboard statistics: {len(queries)} queries, median {latency_ms:.1f}ms over {args.runs} runs")
+    return len(queries), latency_ms
+
+
+def cpu_ms(func, runs):
+    """Median process CPU time of func() in milliseconds"""
+    samples = []
+    for _ in range(runs):
+        started = time.process_time()
+        func()
+        samples.append(time.process_time() - started)
+    return statistics.median(samples) * 1000
+
+
+def bench_polls(args):
+    """
+    CPU per poll of the client's application reads (my_applications, one
+    application, its documents): response cache off, warm cache without
+    If-None-Match, and conditional GETs answered with 304.
+    """
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from accounts.models import User
+    from loans.models import ApplicantPersonalInfo, LoanApplication, LoanApplicationDocument
+    from loans.response_cache import get_cache
+
+    media = tempfile.mkdtemp()
+    os.makedirs(os.path.join(media, 'loan_documents'))
+    with open(os.path.join(media, 'loan_documents', 'id.jpg'), 'wb') as f:
+        f.write(b'\xff\xd8' * 1024)
+
+    with throwaway_database(), override_settings(MEDIA_ROOT=media):
+        user = User.objects.create_user(username='bench-user', email='bench@example.com', password='bench12345')
+        for i in range(args.applications):
+            application = LoanApplication.objects.create(
+                user=user, amount=5000, status='pending', is_draft=False,
+                personal_info=ApplicantPersonalInfo.objects.create(
+                    first_name='Bench', last_name=f'User{i}', email='bench@example.com', phone='5550000000', dob=date(1990, 1, 1),
+                ),
+            )
+            LoanApplicationDocument.objects.bulk_create([
+                LoanApplicationDocument(application=application, document_type='id', title='ID', file='loan_documents/id.jpg')
+                for _ in range(3)
+            ])
+        client = APIClient()
+        client.force_authenticate(user)
+        first = LoanApplication.objects.filter(user=user).first()
+        urls = {
+            'my_applications': '/api/loans/applications/my_applications/',
+            'retrieve': f'/api/loans/applications/{first.pk}/',
+            'documents': f'/api/loans/applications/{first.pk}/documents/',
+        }
+
+        rows = []
+        for name, url in urls.items():
+            with override_settings(LOAN_RESPONSE_CACHE_ENABLED=False):
+                uncached = cpu_ms(lambda: client.get(url), args.runs)
+            get_cache().clear()
+            etag = client.get(url)['ETag']
+            warm = cpu_ms(lambda: client.get(url), args.runs)
+            not_modified = cpu_ms(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), args.runs)
+            rows.append((name, uncached, warm, not_modified))
+
+    print(f"{'endpoint':>16} {'no cache':>10} {'cached':>10} {'304':>10}   (CPU per poll, {args.applications} applications)")
+    for name, uncached, warm, not_modified in rows:
+        print(f"{name:>16} {uncached:>8.2f}ms {warm:>8.2f}ms {not_modified:>8.2f}ms")
+    return rows
+
+
+def bench_fieldsets(args):
+    """
+    Payload bytes and load + serialization time per page of applications for
+    the full LoanApplicationSerializer, the compact list fields and a
+    ?fields= selection. Applications carry every related object, documents,
+    a vehicle valuation and an AI analysis with its raw model response.
+    """
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory
+
+    from accounts.models import User
+    from loans.models import (
+        ApplicantAddress, ApplicantFinancialProfile, ApplicantIdentification, ApplicantPersonalInfo,
+        LoanApplication, LoanApplicationDocument, VehicleInformation, VehicleValuation,
+    )
+    from loans.serializers import LOAN_APPLICATION_LIST_FIELDS, LoanApplicationSerializer
+
+    analysis = {
+        'loan_assessment': {'interest_rate': 12.5, 'risk_level': 'medium', 'recommendation': 'approve'},
+        'raw_response': 'The applicant presents a stable income and a well maintained vehicle. ' * 40,
+    }
+
+    with throwaway_database():
+        user = User.objects.create_user(username='bench-user', email='bench@example.com', password='bench12345')
+        for i in range(args.rows):
+            personal_info = ApplicantPersonalInfo.objects.create(
+                first_name='Bench', last_name=f'User{i}', email='bench@example.com', phone='5550000000', dob=date(1990, 1, 1),
+            )
+            application = LoanApplication.objects.create(
+                user=user, amount=5000, term=12, status='pending', is_draft=False, ai_analysis_data=analysis,
+                ai_recommendation='Approve with standard terms', ai_risk_assessment='Medium risk',
+                personal_info=personal_info,
+                identification_info=ApplicantIdentification.objects.create(
+                    personal_info=personal_info, identification_type='drivers_license', identification_no='D1234567',
+                ),
+                financial_profile=ApplicantFinancialProfile.objects.create(income=60000, employment_status='employed'),
+                address=ApplicantAddress.objects.create(street='1 Main St', city='Austin', state='TX', zip_code='73301'),
+                vehicle_info=VehicleInformation.objects.create(make='Toyota', model='Camry', year='2018', vin='1HGCM82633A004352'),
+            )
+            VehicleValuation.objects.create(
+                application=application, make='Toyota', model='Camry', year='2018', estimated_value_avg=15000,
+                full_analysis_data=analysis, analysis_notes='Minor wear consistent with age. ' * 10,
+            )
+            LoanApplicationDocument.objects.bulk_create([
+                LoanApplicationDocument(application=application, document_type='id', title='ID', file='loan_documents/id.jpg')
+                for _ in range(3)
+            ])
+
+        request = APIRequestFactory().get('/api/loans/applications/')
+        fieldsets = {
+            'full': None,
+            'compact list': LOAN_APPLICATION_LIST_FIELDS,
+            '?fields=': ('id', 'status', 'amount', 'full_name'),
+        }
+
+        rows = []
+        for name, fields in fieldsets.items():
+            def serialize():
+                queryset = LoanApplicationSerializer.setup_eager_loading(LoanApplication.objects.all(), fields)
+                data = LoanApplicationSerializer(queryset, many=True, fields=fields, context={'request': request}).data
+                return JSONRenderer().render(data)
+
+            payload = serialize()
+            rows.append((name, len(payload), median_ms(serialize, args.runs)))
+
+    print(f"{'fieldset':>14} {'bytes':>10} {'time':>10}   (per {args.rows} rows)")
+    for name, size, latency_ms in rows:
+        print(f"{name:>14} {size:>10} {latency_ms:>8.2f}ms")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    users = subparsers.add_parser('users', help='get_all_users latency by page depth, OFFSET vs. keyset pagination')
+    users.add_argument('--users', type=int, default=100000)
+    users.add_argument('--loans-per-user', type=float, default=0.5)
+    users.add_argument('--page-size', type=int, default=12)
+    users.add_argument('--sort', nargs='+', default=['createdDate', 'totalBorrowed'])
+    users.add_argument('--runs', type=int, default=5)
+    users.set_defaults(func=bench_users)
+
+    dashboard = subparsers.add_parser('dashboard', help='Admin dashboard statistics queries and latency')
+    dashboard.add_argument('--users', type=int, default=100000)
+    dashboard.add_argument('--loans-per-user', type=float, default=10, help='Loans per user (default 10, 1M loans)')
+    dashboard.add_argument('--runs', type=int, default=5)
+    dashboard.set_defaults(func=bench_dashboard)
+
+    polls = subparsers.add_parser('polls', help='CPU per poll of loan application reads, with and without the response cache')
+    polls.add_argument('--applications', type=int, default=20)
+    polls.add_argument('--runs', type=int, default=50)
+    polls.set_defaults(func=bench_polls)
+
+    fieldsets = subparsers.add_parser('fieldsets', help='Payload bytes and serialization time of sparse fieldsets')
+    fieldsets.add_argument('--rows', type=int, default=100)
+    fieldsets.add_argument('--runs', type=int, default=20)
+    fieldsets.set_defaults(func=bench_fieldsets)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
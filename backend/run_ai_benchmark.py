@@ -0,0 +1,572 @@
+"""
+Offline benchmarks for the AI pipeline.
+
+Uses fake models with fixed latency, or the replay backend (loans/ai_backends.py),
+so no Gemini credentials or network are needed.
+
+Usage:
+    python run_ai_benchmark.py concurrency [--images 10] [--latency 0.5] [--concurrency 1 2 4 10]
+    python run_ai_benchmark.py preprocess [--images 10] [--width 4032 --height 3024] [--max-dimension 1600]
+    python run_ai_benchmark.py startup [--runs 5]
+    python run_ai_benchmark.py vision-mode [--images 6] [--concurrency 4] [--runs 3]
+    python run_ai_benchmark.py submit [--applications 20] [--photos 4] [--workers 1 2 4 8] [--error-rate 0.05]
+"""
+import os
+import sys
+import io
+import json
+import math
+import time
+import argparse
+import contextlib
+import resource
+import statistics
+import subprocess
+import tempfile
+import threading
+
+# Configure Django settings
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
+import django
+
+django.setup()
+
+from google.generativeai.types import content_types
+
+from loans import ai_clients
+from loans.ai_gateway import AIGateway
+from loans.car_image_analyzer import COMBINED_ANALYSIS_PROMPT, CarImageAnalyzer, CarValuationService
+from loans.image_preprocessing import ImagePreprocessor
+
+
+FAKE_IMAGE_ANALYSIS = {
+    'make': 'Toyota',
+    'model': 'Camry',
+    'year': '2018',
+    'body_type': 'sedan',
+    'color': 'blue',
+    'condition': 'good',
+    'visible_damage': [],
+    'estimated_value': {'low': 15000, 'high': 18000, 'currency': 'USD'},
+    'features': ['alloy wheels'],
+    'confidence': 'medium',
+    'notes': 'Benchmark fixture',
+}
+
+
+FAKE_MARKET_COMPARISON = {
+    'market_value': {'low': 14500, 'average': 16200, 'high': 18000, 'currency': 'USD'},
+    'value_factors': ['mileage', 'regional demand'],
+    'comparable_vehicles': [{'make': 'Toyota', 'model': 'Camry', 'year': '2018', 'price': 16000}],
+    'loan_recommendation': {'ltv_ratio': 50, 'max_loan_amount': 8100, 'reasoning': 'Benchmark fixture'},
+    'risk_assessment': {'level': 'low', 'factors': []},
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stand-in for genai.GenerativeModel that sleeps for a fixed latency."""
+
+    def __init__(self, latency, payload=None):
+        self.latency = latency
+        self.payload = payload or FAKE_IMAGE_ANALYSIS
+        self.calls = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents, request_options=None, **kwargs):
+        sent = 0
+        if isinstance(contents, list):
+            # Encode image parts the way the SDK would before uploading them
+            for part in contents:
+                if not isinstance(part, str):
+                    sent += len(content_types.to_blob(part).data)
+        with self._lock:
+            self.calls += 1
+            self.bytes_sent += sent
+        time.sleep(self.latency)
+        return FakeResponse(json.dumps(self.payload))
+
+
+class MeteredModel:
+    """
+    Fake model that estimates tokens and latency per request, for comparing
+    request shapes. Images cost 258 tokens per 768x768 tile (258 flat when both
+    sides are <= 384px), text about 4 characters per token. Latency is
+    base + per image + per output token.
+    """
+
+    def __init__(self, base_latency, image_latency, output_token_latency):
+        self.base_latency = base_latency
+        self.image_latency = image_latency
+        self.output_token_latency = output_token_latency
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def image_tokens(part):
+        from PIL import Image
+
+        if isinstance(part, dict):
+            with Image.open(io.BytesIO(part['data'])) as image:
+                width, height = image.size
+        else:
+            width, height = part.size
+        if width <= 384 and height <= 384:
+            return 258
+        return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+    def generate_content(self, contents, request_options=None, **kwargs):
+        parts = contents if isinstance(contents, list) else [contents]
+        texts = [part for part in parts if isinstance(part, str)]
+        images = [part for part in parts if not isinstance(part, str)]
+
+        if parts[0] is COMBINED_ANALYSIS_PROMPT:
+            payload = {
+                'vehicle': FAKE_IMAGE_ANALYSIS,
+                'photos': [{'photo': i + 1, 'view': 'other', 'usable': True, 'notes': ''} for i in range(len(images))],
+                'market': FAKE_MARKET_COMPARISON,
+            }
+        elif images:
+            payload = FAKE_IMAGE_ANALYSIS
+        else:
+            payload = FAKE_MARKET_COMPARISON
+        text = json.dumps(payload)
+
+        input_tokens = sum(len(t) for t in texts) // 4 + sum(self.image_tokens(part) for part in images)
+        output_tokens = len(text) // 4
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+        time.sleep(self.base_latency + self.image_latency * len(images) + self.output_token_latency * output_tokens)
+        return FakeResponse(text)
+
+
+def make_test_images(directory, count, size=(640, 480)):
+    """Write `count` small JPEGs and return (path, 'file_path') tuples."""
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        path = os.path.join(directory, f'bench_{i}.jpg')
+        Image.new('RGB', size, color=(i * 20 % 255, 80, 160)).save(path, 'JPEG')
+        images.append((path, 'file_path'))
+    return images
+
+
+def make_phone_photos(directory, count, size=(4032, 3024), quality=92):
+    """Write `count` noisy full-size JPEGs (roughly phone-camera file sizes)."""
+    from PIL import Image
+
+    images = []
+    for i in range(count):
+        path = os.path.join(directory, f'phone_{i}.jpg')
+        if not os.path.exists(path):
+            channels = [Image.effect_noise(size, 40 + i) for _ in range(3)]
+            exif = Image.Exif()
+            exif[0x0112] = 6  # portrait shot, stored rotated
+            Image.merge('RGB', channels).save(path, 'JPEG', quality=quality, exif=exif)
+        images.append((path, 'file_path'))
+    return images
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_preprocess_mode(args):
+    """One 10-image evaluation in this process; prints a JSON result line."""
+    images = make_phone_photos(args.photos_dir, args.images, (args.width, args.height))
+    preprocessor = None
+    if args.mode != 'original':
+        preprocessor = ImagePreprocessor(max_dimension=args.max_dimension, quality=args.quality)
+
+    model = FakeModel(0)
+    analyzer = CarImageAnalyzer(model=model, result_cache=None, market_cache=None, preprocessor=preprocessor,
+                                gateway=AIGateway())
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    result = analyzer.analyze_multiple_images(images, max_concurrency=args.concurrency)
+    print(json.dumps({
+        'mode': args.mode,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'bytes_sent': model.bytes_sent,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'rss_before_mb': round(rss_before, 1),
+        'success': result['success'],
+    }))
+
+
+def bench_preprocess(args):
+    """Bytes sent to the model and peak RSS, original vs. preprocessed images."""
+    if args.mode:
+        return run_preprocess_mode(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = make_phone_photos(tmp, args.images, (args.width, args.height))
+        original_bytes = sum(os.path.getsize(path) for path, _ in images)
+
+        rows = []
+        # 'preprocessed' writes the derivatives that 'cached' then reuses
+        for mode in ('original', 'preprocessed', 'cached'):
+            # Separate process per mode: ru_maxrss never goes down
+            output = subprocess.run(
+                [sys.executable, __file__, 'preprocess', '--mode', mode, '--photos-dir', tmp,
+                 '--images', str(args.images), '--width', str(args.width), '--height', str(args.height),
+                 '--max-dimension', str(args.max_dimension), '--quality', str(args.quality),
+                 '--concurrency', str(args.concurrency)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{args.images} photos {args.width}x{args.height}, {original_bytes / 1e6:.1f} MB on disk, "
+          f"max dimension {args.max_dimension}, quality {args.quality}, concurrency {args.concurrency}")
+    print(f"{'mode':>13} {'bytes sent':>12} {'peak RSS':>10} {'baseline':>10} {'elapsed':>9}")
+    for row in rows:
+        print(f"{row['mode']:>13} {row['bytes_sent'] / 1e6:>10.2f}MB {row['peak_rss_mb']:>8.1f}MB "
+              f"{row['rss_before_mb']:>8.1f}MB {row['elapsed_s']:>8.3f}s")
+    return rows
+
+
+STARTUP_PROBE = """
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
+if sys.argv[1] == 'asgi':
+    import drivecash_backend.asgi
+    from django.urls import get_resolver
+    # First HTTP request: the URLconf and every view module get imported
+    get_resolver().url_patterns
+else:
+    from django.core.management import execute_from_command_line
+    execute_from_command_line(['manage.py', 'check'])
+print(json.dumps({
+    'elapsed_s': time.perf_counter() - started,
+    'genai_loaded': 'google.generativeai' in sys.modules,
+    'pil_loaded': 'PIL.Image' in sys.modules,
+}))
+"""
+
+
+def bench_startup(args):
+    """Cold start of `manage.py check` and ASGI boot + URLconf load, in fresh processes."""
+    rows = []
+    for target in ('manage.py check', 'asgi + urls'):
+        samples = []
+        for _ in range(args.runs):
+            env = dict(os.environ)
+            if args.without_key:
+                env.pop('GEMINI_API_KEY', None)
+            proc = subprocess.run(
+                [sys.executable, '-c', STARTUP_PROBE, 'asgi' if target.startswith('asgi') else 'check'],
+                capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+            )
+            if proc.returncode != 0:
+                print(f"{target}: failed\n{proc.stderr.strip().splitlines()[-1]}")
+                break
+            samples.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        if samples:
+            rows.append({
+                'target': target,
+                'median_s': round(statistics.median(s['elapsed_s'] for s in samples), 3),
+                'genai_loaded': samples[0]['genai_loaded'],
+                'pil_loaded': samples[0]['pil_loaded'],
+            })
+
+    print(f"{'target':>16} {'median':>8} {'genai':>6} {'PIL':>6}")
+    for row in rows:
+        print(f"{row['target']:>16} {row['median_s']:>7.3f}s {str(row['genai_loaded']):>6} {str(row['pil_loaded']):>6}")
+    return rows
+
+
+def bench_concurrency(args):
+    """Wall-clock time of analyze_multiple_images vs. max concurrency."""
+    with tempfile.TemporaryDirectory() as tmp:
+        images = make_test_images(tmp, args.images)
+        rows = []
+        for k in args.concurrency:
+            analyzer = CarImageAnalyzer(model=FakeModel(args.latency), result_cache=None, gateway=AIGateway())
+            started = time.perf_counter()
+            result = analyzer.analyze_multiple_images(images, max_concurrency=k)
+            elapsed = time.perf_counter() - started
+            rows.append({
+                'concurrency': k,
+                'elapsed_s': round(elapsed, 3),
+                'expected_s': round(math.ceil(args.images / k) * args.latency, 3),
+                'sequential_s': round(args.images * args.latency, 3),
+                'success': result['success'],
+            })
+
+    print(f"{args.images} images, {args.latency:g}s fake model latency")
+    print(f"{'k':>4} {'elapsed':>9} {'ceil(N/k)*lat':>14} {'N*lat':>8}")
+    for row in rows:
+        print(f"{row['concurrency']:>4} {row['elapsed_s']:>8.3f}s {row['expected_s']:>13.3f}s {row['sequential_s']:>7.3f}s")
+    return rows
+
+
+def bench_vision_mode(args):
+    """Latency, request count and estimated cost of evaluate_for_loan per GEMINI_VISION_MODE."""
+    with tempfile.TemporaryDirectory() as tmp:
+        images = make_test_images(tmp, args.images, size=(args.width, args.height))
+        rows = []
+        for mode in ('per_image', 'combined'):
+            samples = []
+            for _ in range(args.runs):
+                model = MeteredModel(args.base_latency, args.image_latency, args.output_token_latency)
+                analyzer = CarImageAnalyzer(
+                    model=model, result_cache=None, market_cache=None, gateway=AIGateway(),
+                    preprocessor=ImagePreprocessor(max_dimension=args.max_dimension),
+                )
+                analyzer.max_concurrency = args.concurrency
+                service = CarValuationService(analyzer=analyzer, vision_mode=mode)
+                started = time.perf_counter()
+                report = service.evaluate_for_loan(images, loan_amount=5000)
+                samples.append(time.perf_counter() - started)
+            cost = (model.input_tokens * args.input_price + model.output_tokens * args.output_price) / 1e6
+            rows.append({
+                'mode': mode,
+                'median_s': round(statistics.median(samples), 3),
+                'requests': model.calls,
+                'input_tokens': model.input_tokens,
+                'output_tokens': model.output_tokens,
+                'cost_usd': round(cost, 6),
+                'estimated_value': report['valuation']['estimated_value'],
+            })
+
+    print(f"{args.images} photos {args.width}x{args.height} (sent at <= {args.max_dimension}px), "
+          f"concurrency {args.concurrency}, latency {args.base_latency:g}s + {args.image_latency:g}s/image "
+          f"+ {args.output_token_latency * 1000:g}ms/output token")
+    print(f"{'mode':>10} {'median':>8} {'requests':>9} {'in tokens':>10} {'out tokens':>11} {'cost':>10}")
+    for row in rows:
+        print(f"{row['mode']:>10} {row['median_s']:>7.3f}s {row['requests']:>9} {row['input_tokens']:>10} "
+              f"{row['output_tokens']:>11} ${row['cost_usd']:>9.5f}")
+    return rows
+
+
+def make_submittable_application(user, photo_paths):
+    """Complete draft application with vehicle photos attached, ready for the submit endpoint."""
+    from datetime import date
+
+    from django.core.files import File
+
+    from loans.models import (
+        ApplicantAddress, ApplicantFinancialProfile, ApplicantPersonalInfo,
+        LoanApplication, LoanApplicationDocument, VehicleInformation,
+    )
+
+    application = LoanApplication.objects.create(
+        user=user,
+        personal_info=ApplicantPersonalInfo.objects.create(
+            first_name='Jane', last_name='Doe', email=user.email, phone='5550000000', dob=date(1990, 1, 1),
+        ),
+        address=ApplicantAddress.objects.create(street='1 Main St', city='Austin', state='TX', zip_code='73301'),
+        financial_profile=ApplicantFinancialProfile.objects.create(income=60000, employment_status='employed'),
+        vehicle_info=VehicleInformation.objects.create(make='Toyota', model='Camry', year='2018', vin='1HGCM82633A004352'),
+        amount=5000,
+        applicant_estimated_value=16000,
+        accept_terms=True,
+        signature='Jane Doe',
+    )
+    for path, document_type in zip(photo_paths, ('photo_front_car', 'photo_vin_sticker', 'photo_odometer', 'photo_vin_plate')):
+        with open(path, 'rb') as f:
+            LoanApplicationDocument.objects.create(
+                application=application, document_type=document_type, title=document_type,
+                file=File(f, name=os.path.basename(path)),
+            )
+    return application
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def bench_submit(args):
+    """
+    End-to-end submit throughput on the replay backend: POST the submit endpoint
+    for each application, then drain the queue with `run_ai_worker --burst`.
+    Runs against a throwaway SQLite database.
+    """
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import override_settings
+    from django.test.utils import setup_test_environment
+    from rest_framework.test import APIClient
+
+    from accounts.models import User
+    from loans.models import AIJob
+
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides = {
+            'AI_MODEL_BACKEND': 'replay',
+            'AI_REPLAY_LATENCY_MEDIAN': args.latency_median,
+            'AI_REPLAY_LATENCY_P95': args.latency_p95,
+            'AI_REPLAY_LATENCY_PER_IMAGE': args.latency_per_image,
+            'AI_REPLAY_ERROR_RATE': args.error_rate,
+            'AI_REPLAY_SEED': args.seed,
+            'AI_RATE_LIMIT_PER_MINUTE': args.rate_limit,
+            'AI_JOBS_RUN_INLINE': False,
+            'MEDIA_ROOT': os.path.join(tmp, 'media'),
+        }
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+        if connection.vendor == 'sqlite':
+            # Worker threads write concurrently; wait for the lock instead of failing jobs with "database is locked"
+            connection.settings_dict.setdefault('OPTIONS', {}).update({'timeout': 30, 'transaction_mode': 'IMMEDIATE'})
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        rows = []
+        try:
+            with override_settings(**overrides):
+                ai_clients.reset()
+                user = User.objects.create_user(username='bench', email='bench@example.com', password='bench12345')
+                User.objects.create_user(username='bench-admin', email='admin@example.com', password='bench12345', user_type='admin')
+                client = APIClient()
+                client.force_authenticate(user)
+
+                for workers in args.workers:
+                    applications = []
+                    for i in range(args.applications):
+                        # Distinct photos per application so the image cache doesn't answer for the model
+                        photo_dir = os.path.join(tmp, f'photos_{workers}_{i}')
+                        os.makedirs(photo_dir)
+                        photos = make_phone_photos(photo_dir, args.photos, size=(320, 240))
+                        applications.append(make_submittable_application(user, [path for path, _ in photos]))
+
+                    submit_latencies = []
+                    started = time.perf_counter()
+                    for application in applications:
+                        request_started = time.perf_counter()
+                        # The submit view prints its validation trace; keep it out of the results
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            response = client.post('/api/loans/applications/submit/', {'id': application.id}, format='json')
+                        submit_latencies.append(time.perf_counter() - request_started)
+                        assert response.status_code == 200, response.data
+                    submit_elapsed = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    call_command('run_ai_worker', concurrency=workers, burst=True, poll_interval=0.1, stdout=io.StringIO())
+                    drain_elapsed = time.perf_counter() - started
+
+                    jobs = AIJob.objects.filter(application__in=applications)
+                    rows.append({
+                        'workers': workers,
+                        'submit_p50_ms': round(percentile(submit_latencies, 0.5) * 1000, 1),
+                        'submit_p95_ms': round(percentile(submit_latencies, 0.95) * 1000, 1),
+                        'submits_per_s': round(len(applications) / submit_elapsed, 1),
+                        'drain_s': round(drain_elapsed, 2),
+                        'jobs_per_s': round(len(applications) / drain_elapsed, 2),
+                        'succeeded': jobs.filter(status='succeeded').count(),
+                        'failed': jobs.filter(status='failed').count(),
+                        'pending': jobs.exclude(status__in=('succeeded', 'failed')).count(),
+                    })
+                model_stats = [model.stats() for model in ai_clients._models.values() if hasattr(model, 'stats')]
+                call_logs = summarize_call_logs()
+        finally:
+            ai_clients.reset()
+            connection.creation.destroy_test_db(connection.settings_dict['NAME'], verbosity=0)
+
+    print(f"{args.applications} applications x {args.photos} photos, replay latency median {args.latency_median:g}s "
+          f"p95 {args.latency_p95:g}s +{args.latency_per_image:g}s/image, error rate {args.error_rate:g}")
+    print(f"{'workers':>7} {'submit p50':>11} {'p95':>8} {'submits/s':>10} {'drain':>8} {'jobs/s':>7} "
+          f"{'ok':>4} {'failed':>6} {'pending':>7}")
+    for row in rows:
+        print(f"{row['workers']:>7} {row['submit_p50_ms']:>9.1f}ms {row['submit_p95_ms']:>6.1f}ms {row['submits_per_s']:>10.1f} "
+              f"{row['drain_s']:>7.2f}s {row['jobs_per_s']:>7.2f} {row['succeeded']:>4} {row['failed']:>6} {row['pending']:>7}")
+    calls = sum(stats['calls'] for stats in model_stats)
+    errors = sum(stats['errors'] + stats['timeouts'] for stats in model_stats)
+    print(f"model requests: {calls} ({errors} simulated errors)")
+    print(f"{'call type':>18} {'calls':>6} {'cached':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'cost':>10}")
+    for row in call_logs:
+        print(f"{row['call_type']:>18} {row['calls']:>6} {row['cache_hits']:>7} {row['p50']:>6.0f}ms "
+              f"{row['p95']:>6.0f}ms {row['p99']:>6.0f}ms ${row['cost']:>9.5f}")
+    return rows
+
+
+def summarize_call_logs():
+    """Per call type latency percentiles and cost from the AICallLog rows written during the run."""
+    from django.db.models import Count, Q, Sum
+
+    from loans import ai_telemetry
+    from loans.models import AICallLog
+
+    ai_telemetry.flush()
+    rows = []
+    totals = AICallLog.objects.values('call_type').annotate(
+        calls=Count('id'), cache_hits=Count('id', filter=Q(cache_hit=True)), cost=Sum('cost_usd'),
+    ).order_by('call_type')
+    for row in totals:
+        model_calls = AICallLog.objects.filter(call_type=row['call_type'], cache_hit=False)
+        percentiles = ai_telemetry.latency_percentiles(model_calls)
+        rows.append(dict(
+            row, cost=float(row['cost'] or 0),
+            p50=percentiles[0.5] or 0, p95=percentiles[0.95] or 0, p99=percentiles[0.99] or 0,
+        ))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='scenario', required=True)
+
+    concurrency = subparsers.add_parser('concurrency', help='Per-image fan-out in analyze_multiple_images')
+    concurrency.add_argument('--images', type=int, default=10)
+    concurrency.add_argument('--latency', type=float, default=0.5, help='Fake model latency in seconds')
+    concurrency.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 10])
+    concurrency.set_defaults(func=bench_concurrency)
+
+    preprocess = subparsers.add_parser('preprocess', help='Bytes sent and peak RSS with and without image preprocessing')
+    preprocess.add_argument('--images', type=int, default=10)
+    preprocess.add_argument('--width', type=int, default=4032)
+    preprocess.add_argument('--height', type=int, default=3024)
+    preprocess.add_argument('--max-dimension', type=int, default=1600)
+    preprocess.add_argument('--quality', type=int, default=85)
+    preprocess.add_argument('--concurrency', type=int, default=4)
+    preprocess.add_argument('--mode', choices=['original', 'preprocessed', 'cached'], help=argparse.SUPPRESS)
+    preprocess.add_argument('--photos-dir', help=argparse.SUPPRESS)
+    preprocess.set_defaults(func=bench_preprocess)
+
+    startup = subparsers.add_parser('startup', help='Process cold-start time and which SDKs get imported')
+    startup.add_argument('--runs', type=int, default=5)
+    startup.add_argument('--without-key', action='store_true', help='Unset GEMINI_API_KEY for the child processes')
+    startup.set_defaults(func=bench_startup)
+
+    vision_mode = subparsers.add_parser('vision-mode', help='Per-image requests vs. one combined request (GEMINI_VISION_MODE)')
+    vision_mode.add_argument('--images', type=int, default=6)
+    vision_mode.add_argument('--width', type=int, default=1600)
+    vision_mode.add_argument('--height', type=int, default=1200)
+    vision_mode.add_argument('--max-dimension', type=int, default=1600)
+    vision_mode.add_argument('--concurrency', type=int, default=4)
+    vision_mode.add_argument('--runs', type=int, default=3)
+    vision_mode.add_argument('--base-latency', type=float, default=0.6, help='Fixed seconds per request')
+    vision_mode.add_argument('--image-latency', type=float, default=0.15, help='Extra seconds per image in a request')
+    vision_mode.add_argument('--output-token-latency', type=float, default=0.005, help='Seconds per output token')
+    vision_mode.add_argument('--input-price', type=float, default=0.10, help='USD per 1M input tokens')
+    vision_mode.add_argument('--output-price', type=float, default=0.40, help='USD per 1M output tokens')
+    vision_mode.set_defaults(func=bench_vision_mode)
+
+    submit = subparsers.add_parser('submit', help='Submit endpoint + AI worker throughput on the replay backend (AI_MODEL_BACKEND=replay)')
+    submit.add_argument('--applications', type=int, default=20)
+    submit.add_argument('--photos', type=int, default=4, help='Vehicle photos per application (at most 4)')
+    submit.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='run_ai_worker --concurrency values')
+    submit.add_argument('--latency-median', type=float, default=0.8, help='Replay latency median in seconds')
+    submit.add_argument('--latency-p95', type=float, default=2.0, help='Replay latency 95th percentile in seconds')
+    submit.add_argument('--latency-per-image', type=float, default=0.1, help='Extra replay seconds per image')
+    submit.add_argument('--error-rate', type=float, default=0.0, help='Fraction of model requests failing with 429/503')
+    submit.add_argument('--rate-limit', type=float, default=0, help='AI_RATE_LIMIT_PER_MINUTE (0 disables the limiter)')
+    submit.add_argument('--seed', type=int, default=1)
+    submit.set_defaults(func=bench_submit)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
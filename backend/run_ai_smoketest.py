@@ -1,13 +1,20 @@
 import os
+import sys
 import json
 from datetime import date
 
+# `python run_ai_smoketest.py --replay` answers from the recorded responses in
+# loans/ai_replay (AI_MODEL_BACKEND=replay) instead of calling the Gemini API
+if '--replay' in sys.argv:
+    os.environ['AI_MODEL_BACKEND'] = 'replay'
+
 # Configure Django settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drivecash_backend.settings')
 import django
 
 django.setup()
 
+from loans.ai_gateway import AIGateway
 from loans.gemini_loan_analyzer import GeminiLoanAnalyzer
 
 
@@ -190,7 +197,8 @@ class MockApplication:
 
 if __name__ == '__main__':
     app = MockApplication()
-    analyzer = GeminiLoanAnalyzer()
+    # Pass-through gateway: the shared one keeps its limiter/breaker state in the database
+    analyzer = GeminiLoanAnalyzer(gateway=AIGateway())
     result = analyzer.analyze_loan_application(app)
 
     # Print a compact summary
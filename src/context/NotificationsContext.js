@@ -6,6 +6,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from "react";
 import { useUserData } from "./AppDataContext";
 import notificationsService from "services/notificationsService";
+import notificationWebSocket from "services/notificationSocket";
 
 const NotificationsContext = createContext();
 
@@ -29,14 +30,57 @@ export function NotificationsProvider({ children }) {
       const fetchedNotifications = await notificationsService.getNotifications();
       setNotifications(fetchedNotifications);
       setUnreadCount(fetchedNotifications.filter((n) => !n.read).length);
+      fetchedNotifications.forEach((n) => notificationWebSocket.markSeen(n.id));
     }
   }, [user]);
 
   useEffect(() => {
+    if (!user) {
+      return undefined;
+    }
     fetchNotifications();
-    const interval = setInterval(fetchNotifications, 60000); // Poll every 60 seconds
-    return () => clearInterval(interval);
-  }, [fetchNotifications]);
+
+    // New notifications are pushed over the WebSocket; poll only while it is down
+    let interval = null;
+    const startPolling = () => {
+      if (!interval) {
+        interval = setInterval(fetchNotifications, 60000); // Poll every 60 seconds
+      }
+    };
+    const stopPolling = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+
+    const unsubscribe = notificationWebSocket.onMessage((data) => {
+      if (data.type === 'connection') {
+        if (data.status === 'connected') {
+          stopPolling();
+        } else {
+          startPolling();
+        }
+      } else if (data.type === 'notification') {
+        const incoming = data.notification;
+        // A notification created during a replay can arrive twice
+        setNotifications((prev) => (prev.some((n) => n.id === incoming.id) ? prev : [incoming, ...prev]));
+      } else if (data.type === 'replay_complete' && data.truncated) {
+        fetchNotifications();
+      }
+    });
+    if (!notificationWebSocket.connect()) {
+      startPolling();
+    }
+
+    return () => {
+      unsubscribe();
+      stopPolling();
+      notificationWebSocket.disconnect();
+    };
+  }, [user, fetchNotifications]);
+
+  useEffect(() => {
+    setUnreadCount(notifications.filter((n) => !n.read).length);
+  }, [notifications]);
 
   const markAsRead = async (notificationId) => {
     await notificationsService.markAsRead(notificationId);
@@ -281,6 +281,9 @@ function AdminLoans() {
   const [loans, setLoans] = useState([]);
   const [total, setTotal] = useState(0);
   const [loading, setLoading] = useState(false);
+  // The server list is paged; older loans are loaded on demand from `next`
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Search and filters
   const [search, setSearch] = useState("");
@@ -317,8 +320,9 @@ function AdminLoans() {
   const loadLoans = useCallback(async () => {
     setLoading(true);
     try {
-      const fetchedLoans = await fetchAdminLoans();
+      const { loans: fetchedLoans, next } = await fetchAdminLoans();
       setAllLoans(fetchedLoans);
+      setNextPage(next);
       setSelectedLoans([]);
       setSelectAll(false);
     } catch (error) {
@@ -333,6 +337,21 @@ function AdminLoans() {
     loadLoans();
   }, [loadLoans]);
 
+  const loadMoreLoans = useCallback(async () => {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const { loans: fetchedLoans, next } = await fetchAdminLoans(nextPage);
+      setAllLoans((prev) => [...prev, ...fetchedLoans]);
+      setNextPage(next);
+    } catch (error) {
+      console.error("Error loading more loans", error);
+      showNotification("Error loading more loans", "error");
+    } finally {
+      setLoadingMore(false);
+    }
+  }, [nextPage, showNotification]);
+
   const filteredLoans = useMemo(() => {
     let items = [...allLoans];
 
@@ -768,7 +787,7 @@ function AdminLoans() {
                           count={(summary.pendingCount + summary.queryCount).toString()}
             </MDTypography>
             <MDTypography variant="caption" color="text">
-              Total: {total} loans | Selected: {selectedLoans.length}
+              Total: {total}{nextPage ? "+" : ""} loans | Selected: {selectedLoans.length}
             </MDTypography>
           </MDBox>
           <MDBox display="flex" gap={1}>
@@ -1159,12 +1178,19 @@ function AdminLoans() {
               ]}
             />
           </MDBox>
-          <Pagination
-            count={totalPages}
-            page={page}
-            onChange={(e, newPage) => setPage(newPage)}
-            color="primary"
-          />
+          <MDBox display="flex" alignItems="center" gap={2}>
+            <Pagination
+              count={totalPages}
+              page={page}
+              onChange={(e, newPage) => setPage(newPage)}
+              color="primary"
+            />
+            {nextPage && (
+              <MDButton variant="outlined" size="small" onClick={loadMoreLoans} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load older loans"}
+              </MDButton>
+            )}
+          </MDBox>
         </MDBox>
       </Card>
 
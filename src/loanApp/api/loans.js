@@ -1,4 +1,5 @@
 import { apiClient } from "utils/apiClient";
+import { fetchAllPages } from "utils/pagination";
 
 // Guard function to remove null, undefined, and empty values
 const removeNullValues = (obj) => {
@@ -264,21 +265,27 @@ export async function putLoan(loan) {
   }
 }
 
-export async function fetchLoans() {
+// One page of the application list ({ next, results }); pass the previous
+// page's `next` link to get the following one
+export async function fetchLoans(next = null) {
   try {
-    const response = await apiClient.get("/loans/applications/");
+    // ai_analysis_data is not in the compact list; the admin list derives its rate from it
+    const response = await apiClient.get(next || "/loans/applications/?page_size=100&expand=ai_analysis_data");
     return response.data;
   } catch (error) {
     console.error("Error fetching loans:", error);
-    return [];
+    return { results: [], next: null };
   }
 }
 
-// Fetch all loan applications for the authenticated user
+// Fetch all loan applications for the authenticated user (every page; one user's set is small)
 export async function fetchMyApplications() {
   try {
-    const response = await apiClient.get("/loans/applications/my_applications/");
-    return response.data;
+    return await fetchAllPages(
+      async (url) => (await apiClient.get(url)).data,
+      "/loans/applications/my_applications/?page_size=100",
+      "applications",
+    );
   } catch (error) {
     console.error("Error fetching my applications:", error);
     throw error;
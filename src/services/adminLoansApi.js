@@ -64,8 +64,13 @@ const normalizeLoan = (loan) => {
   };
 };
 
-export async function fetchAdminLoans() {
-  const response = await fetchLoansApi();
+/**
+ * One page of loans for the admin screen, newest first
+ * @param {string|null} next - The previous page's `next` link, null for the first page
+ * @returns {Promise<{loans: Array, next: string|null}>}
+ */
+export async function fetchAdminLoans(next = null) {
+  const response = await fetchLoansApi(next);
 
   let records = [];
   if (Array.isArray(response)) {
@@ -78,7 +83,7 @@ export async function fetchAdminLoans() {
     records = response.data;
   }
 
-  return records.map(normalizeLoan);
+  return { loans: records.map(normalizeLoan), next: response?.next || null };
 }
 
 export async function fetchAdminLoanDetails(id) {
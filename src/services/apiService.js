@@ -3,6 +3,8 @@
  * Handles live data fetching from DriveCash backend APIs
  */
 
+import { fetchAllPages } from '../utils/pagination';
+
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
 
 // API request helper with error handling
@@ -26,7 +28,9 @@ const apiRequest = async (endpoint, options = {}) => {
   };
 
   try {
-    const response = await fetch(`${API_BASE_URL}${endpoint}`, config);
+    // Absolute URLs (e.g. a paged list's `next` link) are used as-is
+    const url = /^https?:\/\//.test(endpoint) ? endpoint : `${API_BASE_URL}${endpoint}`;
+    const response = await fetch(url, config);
     
     if (!response.ok) {
       const errorData = await response.json().catch(() => ({}));
@@ -48,14 +52,70 @@ export const fetchUserAccount = async () => {
   return await apiRequest('/accounts/profile/');
 };
 
+// Fields the customer profile reads, added to the compact application list
+const PROFILE_APPLICATION_FIELDS = [
+  'dob', 'social_security', 'banks_name', 'identification_no',
+  'street', 'city', 'state', 'zip_code',
+  'income_source', 'gross_monthly_income', 'employment_length', 'direct_deposit',
+  'credit_score', 'ai_risk_assessment', 'approved_at', 'applicant_estimated_value',
+  'vehicle_year', 'vehicle_make', 'vehicle_model', 'vehicle_vin', 'vehicle_mileage',
+  'registration_state', 'license_plate',
+];
+
+const PROFILE_APPLICATIONS_QUERY = `?page_size=100&expand=${PROFILE_APPLICATION_FIELDS.join(',')}`;
+
+/**
+ * Group an application's flat applicant fields into the nested objects the
+ * customer profile reads (personal_info, address, financial_profile, ...)
+ * @param {object} application - Loan application from the API
+ * @returns {object} The application with the nested objects added
+ */
+const nestApplicationProfile = (application) => ({
+  ...application,
+  personal_info: application.personal_info || {
+    first_name: application.first_name,
+    last_name: application.last_name,
+    email: application.email,
+    phone: application.phone,
+    dob: application.dob,
+    social_security: application.social_security,
+    banks_name: application.banks_name,
+  },
+  identification_info: application.identification_info || {
+    identification_no: application.identification_no,
+  },
+  address: application.address || {
+    street: application.street,
+    city: application.city,
+    state: application.state,
+    zip_code: application.zip_code,
+  },
+  financial_profile: application.financial_profile || {
+    income_source: application.income_source,
+    gross_monthly_income: application.gross_monthly_income,
+    employment_length: application.employment_length,
+    direct_deposit: application.direct_deposit,
+  },
+  vehicle_info: application.vehicle_info || {
+    year: application.vehicle_year,
+    make: application.vehicle_make,
+    model: application.vehicle_model,
+    vin: application.vehicle_vin,
+    mileage: application.vehicle_mileage,
+    registration_state: application.registration_state,
+    license_plate: application.license_plate,
+  },
+});
+
 /**
  * Fetch user's loan applications
  * @param {number} userId - User ID (optional, uses current user if not provided)
  * @returns {Promise<Array>} Loan applications
  */
 export const fetchUserLoanApplications = async (userId = null) => {
-  // Use the available endpoint without user parameter
-  return await apiRequest('/loans/applications/');
+  // Use the available endpoint without user parameter; a user's own applications fit in a few pages
+  const data = await fetchAllPages(apiRequest, `/loans/applications/${PROFILE_APPLICATIONS_QUERY}`);
+  return data.results.map(nestApplicationProfile);
 };
 
 /**
@@ -4,6 +4,7 @@
  */
 
 import { generateCustomerProfile } from '../utils/customerIdGenerator';
+import { fetchUserLoanApplications } from './apiService';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000/api';
 
@@ -26,9 +27,12 @@ export const fetchCustomerProfile = async (userId) => {
     };
 
     // Fetch user profile data - updated to use available endpoints
-    const [userResponse, loansResponse] = await Promise.all([
+    const [userResponse, loanApplications] = await Promise.all([
       fetch(`${API_BASE_URL}/accounts/profile/`, { headers }),
-      fetch(`${API_BASE_URL}/loans/applications/`, { headers }) // Removed user parameter
+      fetchUserLoanApplications().catch((error) => {
+        console.log('Loan applications unavailable:', error.message);
+        return [];
+      }),
     ]);
 
     if (!userResponse.ok) {
@@ -39,13 +43,6 @@ export const fetchCustomerProfile = async (userId) => {
     }
 
     const userData = await userResponse.json();
-    let loanApplications = [];
-
-    if (loansResponse.ok) {
-      loanApplications = await loansResponse.json();
-    } else if (loansResponse.status === 401) {
-      console.log('Loan applications require authentication');
-    }
 
     // Generate complete profile from API data
     return await buildProfileFromApiData(userData, loanApplications, userId);
@@ -0,0 +1,131 @@
+/**
+ * WebSocket Service for Real-time Notifications
+ * Receives the user's notifications as they are created (ws/notifications/),
+ * replaying the ones missed while disconnected
+ */
+
+function getAccessToken() {
+  // Same token handling as the chat socket and apiClient
+  let token = localStorage.getItem('authToken');
+  if (token) {
+    try {
+      const maybeJson = JSON.parse(token);
+      if (maybeJson && typeof maybeJson === 'object') {
+        token = maybeJson.access
+          || maybeJson.token
+          || (maybeJson.tokens && maybeJson.tokens.access)
+          || null;
+      }
+    } catch (_) {
+      // token is a plain string, use as-is
+    }
+  }
+  return token;
+}
+
+class NotificationWebSocket {
+  constructor() {
+    this.ws = null;
+    this.listeners = new Set();
+    this.lastSeenId = null;
+    this.reconnectAttempts = 0;
+    this.maxReconnectAttempts = 10;
+    this.reconnectDelay = 1000;
+    this.reconnectTimer = null;
+  }
+
+  connect() {
+    if (this.ws && (this.ws.readyState === WebSocket.OPEN || this.ws.readyState === WebSocket.CONNECTING)) {
+      return this.ws;
+    }
+
+    const token = getAccessToken();
+    if (!token) {
+      return null;
+    }
+
+    const wsProtocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const wsHost = process.env.REACT_APP_WS_HOST || 'localhost:8000';
+    let wsUrl = `${wsProtocol}//${wsHost}/ws/notifications/?token=${token}`;
+    if (this.lastSeenId !== null) {
+      // Replay whatever arrived while disconnected
+      wsUrl += `&last_seen_id=${this.lastSeenId}`;
+    }
+
+    try {
+      this.ws = new WebSocket(wsUrl);
+
+      this.ws.onopen = () => {
+        this.reconnectAttempts = 0;
+        this.notifyListeners({ type: 'connection', status: 'connected' });
+      };
+
+      this.ws.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          if (data.type === 'notification') {
+            this.markSeen(data.notification.id);
+          }
+          this.notifyListeners(data);
+        } catch (error) {
+          console.error('[NotificationSocket] Error parsing message:', error);
+        }
+      };
+
+      this.ws.onclose = (event) => {
+        this.ws = null;
+        this.notifyListeners({ type: 'connection', status: 'disconnected' });
+
+        // Auto-reconnect if not a normal closure
+        if (event.code !== 1000 && this.reconnectAttempts < this.maxReconnectAttempts) {
+          this.reconnectAttempts++;
+          this.reconnectTimer = setTimeout(() => this.connect(), this.reconnectDelay * this.reconnectAttempts);
+        }
+      };
+
+      return this.ws;
+    } catch (error) {
+      console.error('[NotificationSocket] Connection error:', error);
+      return null;
+    }
+  }
+
+  disconnect() {
+    clearTimeout(this.reconnectTimer);
+    if (this.ws) {
+      this.ws.close(1000, 'Client disconnect');
+      this.ws = null;
+    }
+    this.lastSeenId = null;
+  }
+
+  markSeen(id) {
+    if (id !== null && id !== undefined && (this.lastSeenId === null || id > this.lastSeenId)) {
+      this.lastSeenId = id;
+    }
+  }
+
+  onMessage(callback) {
+    this.listeners.add(callback);
+    return () => this.listeners.delete(callback);
+  }
+
+  notifyListeners(data) {
+    this.listeners.forEach((callback) => {
+      try {
+        callback(data);
+      } catch (error) {
+        console.error('[NotificationSocket] Listener error:', error);
+      }
+    });
+  }
+
+  isConnected() {
+    return this.ws && this.ws.readyState === WebSocket.OPEN;
+  }
+}
+
+// Singleton instance
+const notificationWebSocket = new NotificationWebSocket();
+
+export default notificationWebSocket;
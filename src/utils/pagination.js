@@ -0,0 +1,26 @@
+/**
+ * Paged list helpers
+ * List endpoints return { next, <rows key>: [...] }, where `next` is the
+ * absolute link to the following page (null on the last one)
+ */
+
+/**
+ * Load every page of a list. Only for sets that stay small, such as one
+ * user's own applications; large lists (the admin loans screen) should load
+ * the next page on demand instead.
+ * @param {Function} fetchPage - Loads a URL and resolves to its parsed JSON
+ * @param {string} url - URL of the first page
+ * @param {string} key - Field holding the rows
+ * @returns {Promise<object>} The last page, with every page's rows under `key`
+ */
+export async function fetchAllPages(fetchPage, url, key = "results") {
+  const rows = [];
+  let data = null;
+  let next = url;
+  while (next) {
+    data = await fetchPage(next);
+    rows.push(...(data?.[key] || []));
+    next = data?.next;
+  }
+  return { ...data, [key]: rows, next: null };
+}